@@ -1,12 +1,17 @@
 from flask import request
-from flask_socketio import emit
+from flask_socketio import emit, join_room, leave_room
 
 from .. import socketio
 from .. import logger
 from .. import appConfig
 from .. import devManager
+from .. import sceneManager
+from .. import scheduler
+from device.Tracer import tracer
+from exceptions import InvalidConfig, InvalidCommandBatch, SceneNotFound
 
 MODULE_ID = 'socketio.api'
+DEVICES_ROOM = 'devices'
 
 #
 # Websocket API
@@ -24,7 +29,7 @@ def onDisconnet():
 def onGetManufsList(payload):
     logger.info(f"{MODULE_ID}: Received getManufacturersList message from {request.remote_addr}")
     logger.debug(payload)
-    emit('manufacturersList', {'result': 'success', 'manufacturers': devManager.listManufacturers()})
+    emit('manufacturersList', {'result': 'success', 'manufacturers': devManager.listManufacturer()})
 
 @socketio.on('getCommandSetsList')
 def onGetCmdSetsList(payload):
@@ -36,12 +41,35 @@ def onGetCmdSetsList(payload):
 def onGetDevicesList(payload):
     logger.info(f"{MODULE_ID}: Received getDevicesList message from {request.remote_addr}")
     logger.debug(payload)
-    emit('devicesList', {'result': 'success', 'devices': devManager.getDevsConfigList})
+    emit('devicesList', {'result': 'success', 'devices': devManager.getDevsConfigList()})
+
+@socketio.on('subscribeDevices')
+def onSubscribeDevices(payload):
+    logger.info(f"{MODULE_ID}: Received subscribeDevices message from {request.remote_addr}")
+    logger.debug(payload)
+    join_room(DEVICES_ROOM)
+    emit('devicesSnapshot', {'result': 'success', **devManager.getDevicesSnapshot()})
+
+@socketio.on('unsubscribeDevices')
+def onUnsubscribeDevices(payload):
+    logger.info(f"{MODULE_ID}: Received unsubscribeDevices message from {request.remote_addr}")
+    logger.debug(payload)
+    leave_room(DEVICES_ROOM)
+
+def pushDevicesDelta(delta):
+    socketio.emit('devicesDelta', delta, room=DEVICES_ROOM)
+
+devManager.addListener(pushDevicesDelta)
 
 @socketio.on('addDevice')
 def onAddDevice(payload):
     logger.info(f"{MODULE_ID}: Received addDevice message from {request.remote_addr}")
-    logger.debug(payload['newDevConfig'])
+    logger.debug(payload)
+    try:
+        appConfig.validateDeviceConfig(payload.get('newDevConfig'))
+    except InvalidConfig as e:
+        emit('deviceAdded', {'result': 'failed', 'message': str(e)})
+        return
     result = devManager.addDevice(payload['newDevConfig'])
     emit('deviceAdded', result)
 
@@ -50,6 +78,11 @@ def onUpdateDevice(payload):
     result = {'result': 'success'}
     logger.info(f"{MODULE_ID}: Received updateDevice message from {request.remote_addr}")
     logger.debug(payload)
+    try:
+        appConfig.validateDeviceConfig(payload.get('updatedDevConfig'))
+    except InvalidConfig as e:
+        emit('deviceUpdated', {'result': 'failed', 'message': str(e)})
+        return
     devToUpdate = devManager.getDeviceByIdx(payload['deviceIdx'])
     if devToUpdate is not None:
         devToUpdate.setConfig(payload['updatedDevConfig'])
@@ -59,6 +92,69 @@ def onUpdateDevice(payload):
         result['message'] = 'Device not found!!'
     emit('deviceUpdated', result)
 
+@socketio.on('sendCommands')
+def onSendCommands(payload):
+    logger.info(f"{MODULE_ID}: Received sendCommands message from {request.remote_addr}")
+    logger.debug(payload)
+    sid = request.sid
+    try:
+        devManager.sendCommands(payload.get('commands'),
+            lambda result: socketio.emit('commandsResult', result, to=sid))
+    except InvalidCommandBatch as e:
+        emit('commandsResult', {'result': 'invalid', 'message': str(e)})
+
+@socketio.on('getScenes')
+def onGetScenes(payload):
+    logger.info(f"{MODULE_ID}: Received getScenes message from {request.remote_addr}")
+    logger.debug(payload)
+    emit('scenes', {'result': 'success', 'scenes': sceneManager.getScenes()})
+
+@socketio.on('runScene')
+def onRunScene(payload):
+    logger.info(f"{MODULE_ID}: Received runScene message from {request.remote_addr}")
+    logger.debug(payload)
+    sid = request.sid
+    try:
+        sceneManager.runScene(payload['scene'],
+            lambda result: socketio.emit('sceneResult', result, to=sid))
+    except (SceneNotFound, InvalidConfig) as e:
+        emit('sceneResult', {'scene': payload['scene'], 'result': 'invalid', 'message': str(e)})
+
+@socketio.on('schedule')
+def onSchedule(payload):
+    logger.info(f"{MODULE_ID}: Received schedule message from {request.remote_addr}")
+    logger.debug(payload)
+    emit('scheduleResult', scheduler.handleRequest(payload))
+
+@socketio.on('getTraces')
+def onGetTraces(payload=None):
+    logger.info(f"{MODULE_ID}: Received getTraces message from {request.remote_addr}")
+    logger.debug(payload)
+    if payload is None:
+        payload = {}
+    if type(payload) is not dict:
+        emit('traces', {'result': 'failed', 'message': 'invalid request'})
+        return
+    limit = payload.get('limit')
+    if limit is not None and type(limit) is not int:
+        emit('traces', {'result': 'failed', 'message': 'invalid limit'})
+        return
+    emit('traces', {'result': 'success', 'traces': tracer.getTraces(limit, payload.get('id'))})
+
+@socketio.on('exportTraces')
+def onExportTraces(payload):
+    logger.info(f"{MODULE_ID}: Received exportTraces message from {request.remote_addr}")
+    logger.debug(payload)
+    try:
+        count = tracer.export()
+    except OSError as e:
+        emit('tracesExported', {'result': 'failed', 'message': str(e)})
+        return
+    if count is None:
+        emit('tracesExported', {'result': 'failed', 'message': 'no trace export file'})
+        return
+    emit('tracesExported', {'result': 'success', 'count': count, 'file': tracer.exportPath})
+
 @socketio.on('saveDevices')
 def onSaveDevices(payload):
     logger.info(f"{MODULE_ID}: Received saveDeviceConfig message from {request.remote_addr}")
@@ -75,6 +171,7 @@ def onSaveDevCommandSet(payload):
         payload['deviceToSave']['location'])
     if devToSave is not None:
         result = devToSave.saveCommandSet()
+        devManager.invalidateCatalog()
     else:
         result['message'] = 'Device not found!!'
     emit('devCmdSetSaved', result)
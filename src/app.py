@@ -1,14 +1,36 @@
+import os
+import signal
 import sys
+import threading
 
 from config import Config
 from device.DeviceManager import DeviceManager
-from logger import initLogger
+from device.DiscoveryPublisher import DiscoveryPublisher
+from device.Gateway import Gateway
+from device.GroupManager import GroupManager
+from device.SceneManager import SceneManager
+from device.Scheduler import Scheduler
+from device.StatusPublisher import StatusPublisher
+from device.LocalEndpoint import LocalEndpoint
+from device.Metrics import registry
+from device.MetricsPublisher import MetricsPublisher
+from device.NetworkLoop import NetworkLoop
+from device.RateLimiter import RateLimiter
+from device.Tracer import tracer
+from device.Transmitter import Transmitter
+from logger import initLogger, stopLogger
 
 
 class App:
     """
     The application class.
     """
+    # The local command endpoint has no authentication, its servers are
+    # only started when PIIR_SOCKET (preferably in a private runtime
+    # directory) or PIIR_HTTP_PORT is set.
+    LOCAL_SOCKET = ''
+    LOCAL_HTTP_PORT = ''
+
     def __init__(self):
         """
         Contructor.
@@ -16,33 +38,124 @@ class App:
         logger = initLogger()
         self.logger = logger.getLogger('APP')
         self.logger.info('Initializing the app.')
+        self.stopEvent = threading.Event()
 
         self.config = Config(logger)
-        self.deviceMngr = DeviceManager(logger, self.config)
+        self.netLoop = NetworkLoop(logger)
+        self.transmitter = Transmitter(
+            logger, rateLimiter=RateLimiter.fromConfig(self.config))
+        self.deviceMngr = DeviceManager(logger, self.config, self.netLoop,
+                                        self.transmitter,
+                                        self.config.getShardCount())
+        self.gateway = Gateway(logger, self.config, self.deviceMngr,
+                               self.netLoop)
+        self.sceneMngr = SceneManager(logger, self.deviceMngr, self.netLoop)
+        self.sceneMngr.registerTopics(self.gateway)
+        self.groupMngr = GroupManager(logger, self.deviceMngr)
+        self.groupMngr.registerTopics(self.gateway)
+        self.statusPublisher = StatusPublisher(
+            logger, self.deviceMngr, self.netLoop,
+            self.config.getStatusInterval())
+        self.statusPublisher.registerTopics(self.gateway)
+        self.discovery = DiscoveryPublisher(
+            logger, self.deviceMngr, self.config.getDiscoveryPrefix())
+        self.discovery.registerTopics(self.gateway)
+        self.scheduler = Scheduler(logger, self.deviceMngr, self.netLoop,
+                                   self.sceneMngr)
+        self.scheduler.registerTopics(self.gateway)
+        self.metricsPublisher = MetricsPublisher(
+            logger, self.netLoop, self.config.getMetricsInterval())
+        self.metricsPublisher.registerTopics(self.gateway)
+        for collector in (self.transmitter.collectMetrics,
+                          self.deviceMngr.collectMetrics,
+                          self.gateway.collectMetrics,
+                          self.scheduler.collectMetrics):
+            registry.addCollector(collector)
+        registry.addSource(self.deviceMngr.getShardMetrics)
+        socketPath = os.environ.get('PIIR_SOCKET', self.LOCAL_SOCKET)
+        self.endpoint = LocalEndpoint(logger, self.deviceMngr,
+                                      socketPath or None,
+                                      self._getLocalHttpPort())
+        tracer.setExportPath(os.environ.get('PIIR_TRACE_FILE') or None)
+        tracer.addSource(self.deviceMngr.getShardTraces)
 
         self.logger.info('App initialized.')
 
+    def _getLocalHttpPort(self):
+        """
+        Get the loopback HTTP port of the local endpoint (PIIR_HTTP_PORT).
+
+        Return:
+            The HTTP port, None when disabled or invalid.
+        """
+        httpPort = os.environ.get('PIIR_HTTP_PORT', self.LOCAL_HTTP_PORT)
+        if not httpPort:
+            return None
+        try:
+            port = int(httpPort)
+        except ValueError:
+            port = -1
+        if not 0 <= port <= 65535:
+            self.logger.error(f"Invalid PIIR_HTTP_PORT {httpPort}, the local "
+                              f"HTTP endpoint is disabled.")
+            return None
+        return port
+
     def run(self):
         """
         Run the application.
         """
         self.logger.info('Running the app.')
+        self.transmitter.start()
+        self.netLoop.start()
         self.deviceMngr.startLoops()
+        self.gateway.startLoop()
+        self.endpoint.start()
+        self.scheduler.start()
+        self.statusPublisher.start()
+        self.metricsPublisher.start()
+
+    def wait(self):
+        """
+        Block the main thread until the application is asked to stop
+        (SIGTERM or keyboard interrupt).
+        """
+        signal.signal(signal.SIGTERM, lambda signum, frame:
+                      self.stopEvent.set())
+        self.stopEvent.wait()
 
     def stop(self):
         """
         Stop the application.
         """
         self.logger.info('Stopping the app.')
+        self.metricsPublisher.stop()
+        self.statusPublisher.stop()
+        self.scheduler.stop()
+        self.endpoint.stop()
+        self.gateway.stopLoop()
+        try:
+            count = tracer.export()
+            if count is not None:
+                self.logger.info(f"Exported {count} command traces.")
+        except OSError as e:
+            self.logger.error(f"Unable to export the command traces: {e}")
         self.deviceMngr.stopLoops()
+        self.netLoop.stop()
+        self.transmitter.stop()
+        stopLogger()
 
 
 if __name__ == '__main__':
     app = App()
+    exitCode = 0
     try:
         app.run()
-        while True:
-            pass
+        app.wait()
+    except KeyboardInterrupt:
+        pass
     except Exception:
-        app.stop()
-        sys.exit(0)
+        app.logger.exception('The app failed.')
+        exitCode = 1
+    app.stop()
+    sys.exit(exitCode)
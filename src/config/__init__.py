@@ -1,7 +1,9 @@
 import os
 import json
 
-from exceptions import HardwareFileAccess, MqttFileAccess
+from exceptions import HardwareFileAccess, MqttFileAccess, \
+    InvalidDeviceConfig
+from .schema import validateDevice, validateHardware, validateMqtt
 
 
 class Config:
@@ -9,6 +11,11 @@ class Config:
     HW_CONFIG_FILE = 'hardware.json'
     MQTT_CONFIG_FILE = 'mqtt.json'
 
+    DEFAULT_GATEWAY_TOPIC = 'piirblaster'
+    # The MQTT protocol version: 4 (v3.1.1) or 5 (v5).
+    DEFAULT_MQTT_PROTOCOL = 4
+    DEFAULT_STATUS_INTERVAL = 5.0
+
     SAVE_MQTT_CONFIG = 'MQTT configuration saved'
     ERR_SAVE_MQTT_CONFIG = 'Error accessing MQTT configuration file!!'
     SAVE_HW_CONFIG = 'Hardware configuration saved'
@@ -25,6 +32,7 @@ class Config:
             MqttFileAccess if the access to the mqtt configuration file fail.
             HardwareFileAccess if the access to the hardware configuration
             file fail.
+            InvalidConfig if a configuration file is invalid.
         """
         self.logger = logger.getLogger('CONFIG')
 
@@ -35,6 +43,7 @@ class Config:
                 self.mqttConfig = json.loads(mqttConfig.read())
         except OSError:
             raise MqttFileAccess('unable to access mqtt configuraion file')
+        validateMqtt(self.mqttConfig)
 
         try:
             self.logger.info('Opening hardware configuration')
@@ -44,6 +53,7 @@ class Config:
         except OSError:
             raise HardwareFileAccess('unable to access hardware '
                                      'configuraion file')
+        validateHardware(self.hwConfig)
 
     def getBrokerHostname(self):
         """
@@ -117,6 +127,55 @@ class Config:
         """
         self.mqttConfig['user']['password'] = password
 
+    def getGatewayTopic(self):
+        """
+        Get the gateway topic, the root of the topics that are not bound to
+        a single device.
+
+        Return:
+            The gateway topic.
+        """
+        return self.mqttConfig.get('gatewayTopic', self.DEFAULT_GATEWAY_TOPIC)
+
+    def getMqttProtocol(self):
+        """
+        Get the MQTT protocol version of the device clients.
+
+        Return:
+            The MQTT protocol version, 4 (v3.1.1) or 5 (v5).
+        """
+        return self.mqttConfig.get('protocol', self.DEFAULT_MQTT_PROTOCOL)
+
+    def getStatusInterval(self):
+        """
+        Get the minimum time between two publications of the aggregated
+        device status.
+
+        Return:
+            The status interval in seconds.
+        """
+        return self.mqttConfig.get('statusInterval',
+                                   self.DEFAULT_STATUS_INTERVAL)
+
+    def getDiscoveryPrefix(self):
+        """
+        Get the Home Assistant discovery prefix.
+
+        Return:
+            The discovery prefix, None when the discovery is disabled.
+        """
+        return self.mqttConfig.get('discoveryPrefix')
+
+    def getMetricsInterval(self):
+        """
+        Get the time between two publications of the metrics summary.
+
+        Return:
+            The metrics interval in seconds, None when the publications are
+            disabled.
+        """
+        return self.mqttConfig.get('metricsInterval')
+
     def getMqttConfig(self):
         """
         Get the full MQTT configuration.
@@ -128,12 +187,15 @@ class Config:
 
     def setMqttConfig(self, config):
         """
-        TODO: validate struct??
         Set the full MQTT configuration.
 
         Params:
             config:         The new MQTT configuration.
+
+        Raise:
+            InvalidConfig if the configuration is invalid.
         """
+        validateMqtt(config)
         self.mqttConfig = config
 
     def saveMqttConfig(self):
@@ -235,6 +297,34 @@ class Config:
         """
         self.hwConfig['out'][ouputIdx]['gpioId'] = newGpioId
 
+    def getShardCount(self):
+        """
+        Get the number of worker processes running the devices.
+
+        Return:
+            The shard count (0 when the devices run in the main process).
+        """
+        return self.hwConfig.get('shards', 0)
+
+    def getRateLimit(self):
+        """
+        Get the global command rate limit.
+
+        Return:
+            The rate limit {rate, burst}, None when unlimited.
+        """
+        return self.hwConfig.get('rateLimit')
+
+    def getOutputRateLimits(self):
+        """
+        Get the command rate limits of the outputs.
+
+        Return:
+            The rate limits {rate, burst}, by output name.
+        """
+        return {output['name']: output['rateLimit']
+                for output in self.hwConfig['out'] if 'rateLimit' in output}
+
     def getHwConfig(self):
         """
         Get the full hardware configuration.
@@ -243,11 +333,44 @@ class Config:
 
     def setHwConfig(self, newConfig):
         """
-        TODO: validate struct??
         Set the full hardware configuration.
+
+        Params:
+            newConfig:      The new hardware configuration.
+
+        Raise:
+            InvalidConfig if the configuration is invalid.
         """
+        validateHardware(newConfig)
         self.hwConfig = newConfig
 
+    def validateDeviceConfig(self, devConfig):
+        """
+        Validate a device configuration against its schema and the hardware
+        configuration: the linked emitter must be an output and the device
+        GPIOs must be the ones of the linked emitter and of the input.
+
+        Params:
+            devConfig:      The raw device configuration.
+
+        Raise:
+            InvalidDeviceConfig if the configuration is invalid.
+        """
+        validateDevice(devConfig)
+        outputs = {output['name']: output['gpioId']
+                   for output in self.hwConfig['out']}
+        linkedEmitter = devConfig['linkedEmitter']
+        if linkedEmitter not in outputs:
+            raise InvalidDeviceConfig('linkedEmitter',
+                                      f"unknown output {linkedEmitter}")
+        if devConfig['commandSet']['emitterGpio'] != outputs[linkedEmitter]:
+            raise InvalidDeviceConfig('commandSet.emitterGpio',
+                                      f"not the GPIO of {linkedEmitter}")
+        if devConfig['commandSet']['receiverGpio'] != \
+                self.hwConfig['in']['gpioId']:
+            raise InvalidDeviceConfig('commandSet.receiverGpio',
+                                      'not the GPIO of the input')
+
     def saveHwConfig(self):
         """
         Save the hardware configuration.
@@ -0,0 +1,255 @@
+import itertools
+
+from exceptions import InvalidConfig, InvalidDeviceConfig
+
+
+class Optional:
+    """
+    Schema marker for an optional entry.
+    """
+    __slots__ = ('schema',)
+
+    def __init__(self, schema):
+        """
+        Constructor.
+
+        Params:
+            schema:         The schema of the entry when present.
+        """
+        self.schema = schema
+
+
+class Minimum:
+    """
+    Schema marker for a number with a lower bound.
+    """
+    __slots__ = ('schema', 'minimum', 'exclusive')
+
+    def __init__(self, schema, minimum, exclusive=False):
+        """
+        Constructor.
+
+        Params:
+            schema:         The schema of the number, a type or a tuple of
+                            types.
+            minimum:        The lower bound.
+            exclusive:      The flag excluding the bound itself (optional).
+        """
+        self.schema = schema
+        self.minimum = minimum
+        self.exclusive = exclusive
+
+
+RATE_LIMIT_SCHEMA = {
+    'rate': Minimum((int, float), 0, exclusive=True),
+    'burst': Minimum(int, 1),
+}
+
+# A schema is a dict (object with the given entries), a single item list
+# (list of items matching the item schema), a type, a tuple of types or a
+# bounded number (Minimum).
+DEVICE_SCHEMA = {
+    'name': str,
+    'location': str,
+    'linkedEmitter': str,
+    'commandSet': {
+        'model': str,
+        'manufacturer': str,
+        'description': str,
+        'emitterGpio': int,
+        'receiverGpio': int,
+        'packetGap': (int, float),
+    },
+    'topicPrefix': str,
+    'lastWill': {
+        'qos': int,
+        'retain': bool,
+    },
+    'coalesce': Optional({
+        'window': (int, float),
+        'maxRepeat': Optional(int),
+    }),
+    'rateLimit': Optional(RATE_LIMIT_SCHEMA),
+}
+
+MQTT_SCHEMA = {
+    'broker': {
+        'hostname': str,
+        'port': int,
+    },
+    'user': {
+        'name': str,
+        'password': str,
+    },
+    'gatewayTopic': Optional(str),
+    'protocol': Optional(int),
+    'statusInterval': Optional((int, float)),
+    'discoveryPrefix': Optional(str),
+    'metricsInterval': Optional((int, float)),
+}
+
+HW_SCHEMA = {
+    'out': [{
+        'name': str,
+        'gpioId': int,
+        'rateLimit': Optional(RATE_LIMIT_SCHEMA),
+    }],
+    'in': {
+        'name': str,
+        'gpioId': int,
+    },
+    'shards': Optional(int),
+    'rateLimit': Optional(RATE_LIMIT_SCHEMA),
+}
+
+SCENES_SCHEMA = [{
+    'name': str,
+    'steps': [{
+        'device': str,
+        'command': str,
+        'repeat': Optional(Minimum(int, 1)),
+        'delay': Optional(Minimum((int, float), 0)),
+    }],
+}]
+
+GROUPS_SCHEMA = [{
+    'name': str,
+    'devices': [str],
+}]
+
+SCHEDULE_SCHEMA = {
+    'id': Optional(str),
+    'device': Optional(str),
+    'command': Optional(str),
+    'scene': Optional(str),
+    'at': Optional((int, float)),
+    'delay': Optional((int, float)),
+    'interval': Optional((int, float)),
+    'start': Optional((int, float)),
+    'time': Optional(str),
+    'days': Optional([int]),
+}
+
+STATE_SCHEMAS = {
+    'toggle': {
+        'type': str,
+        'command': str,
+        'values': [str],
+    },
+    'discrete': {
+        'type': str,
+        'commands': dict,
+    },
+    'relative': {
+        'type': str,
+        'up': str,
+        'down': str,
+        'min': int,
+        'max': int,
+        'step': Optional(int),
+    },
+}
+
+
+def _generate(schema, var, path, indent, lines, names):
+    """
+    Generate the validation source code of a schema node.
+
+    Params:
+        schema:         The schema node.
+        var:            The name of the variable holding the value.
+        path:           The path of the value, for error reporting.
+        indent:         The indentation level.
+        lines:          The generated source lines.
+        names:          The variable name generator.
+    """
+    pad = '    ' * indent
+    if isinstance(schema, dict):
+        lines.append(f"{pad}if type({var}) is not dict:")
+        lines.append(f"{pad}    raise error({path or 'config'!r}, "
+                     f"'expected object')")
+        for key, entry in schema.items():
+            entryVar = next(names)
+            entryPath = f"{path}.{key}" if path else key
+            if isinstance(entry, Optional):
+                lines.append(f"{pad}if {key!r} in {var}:")
+                lines.append(f"{pad}    {entryVar} = {var}[{key!r}]")
+                _generate(entry.schema, entryVar, entryPath, indent + 1,
+                          lines, names)
+            else:
+                lines.append(f"{pad}try:")
+                lines.append(f"{pad}    {entryVar} = {var}[{key!r}]")
+                lines.append(f"{pad}except KeyError:")
+                lines.append(f"{pad}    raise error({entryPath!r}, "
+                             f"'missing')")
+                _generate(entry, entryVar, entryPath, indent, lines, names)
+    elif isinstance(schema, list):
+        itemVar = next(names)
+        lines.append(f"{pad}if type({var}) is not list:")
+        lines.append(f"{pad}    raise error({path or 'config'!r}, "
+                     f"'expected list')")
+        lines.append(f"{pad}for {itemVar} in {var}:")
+        _generate(schema[0], itemVar, f"{path}[]", indent + 1, lines, names)
+    elif isinstance(schema, Minimum):
+        _generate(schema.schema, var, path, indent, lines, names)
+        operator = '<=' if schema.exclusive else '<'
+        expected = '>' if schema.exclusive else '>='
+        lines.append(f"{pad}if {var} {operator} {schema.minimum!r}:")
+        lines.append(f"{pad}    raise error({path!r}, "
+                     f"'expected {expected} {schema.minimum!r}')")
+    else:
+        types = schema if isinstance(schema, tuple) else (schema,)
+        check = ' and '.join(f"type({var}) is not {fieldType.__name__}"
+                             for fieldType in types)
+        expected = ' or '.join(fieldType.__name__ for fieldType in types)
+        lines.append(f"{pad}if {check}:")
+        lines.append(f"{pad}    raise error({path!r}, "
+                     f"'expected {expected}')")
+
+
+def compileValidator(name, schema, error):
+    """
+    Compile the validator of a schema. The schema is translated once to
+    straight line Python code, so the validation does not walk the schema
+    on each call.
+
+    Params:
+        name:           The validator name.
+        schema:         The schema.
+        error:          The factory of the error raised on invalid values,
+                        called with the field path and the reason.
+
+    Return:
+        The validator, raising the error on invalid values.
+    """
+    lines = [f"def {name}(value):"]
+    names = (f"v{idx}" for idx in itertools.count())
+    _generate(schema, 'value', '', 1, lines, names)
+    namespace = {'error': error}
+    exec(compile('\n'.join(lines), f"<schema {name}>", 'exec'), namespace)
+    return namespace[name]
+
+
+validateDevice = compileValidator('validateDevice', DEVICE_SCHEMA,
+                                  InvalidDeviceConfig)
+validateDevices = compileValidator('validateDevices', [DEVICE_SCHEMA],
+                                   InvalidDeviceConfig)
+validateMqtt = compileValidator('validateMqtt', MQTT_SCHEMA,
+                                lambda field, reason:
+                                InvalidConfig('MQTT', field, reason))
+validateHardware = compileValidator('validateHardware', HW_SCHEMA,
+                                    lambda field, reason:
+                                    InvalidConfig('hardware', field, reason))
+validateScenes = compileValidator('validateScenes', SCENES_SCHEMA,
+                                  lambda field, reason:
+                                  InvalidConfig('scenes', field, reason))
+validateGroups = compileValidator('validateGroups', GROUPS_SCHEMA,
+                                  lambda field, reason:
+                                  InvalidConfig('groups', field, reason))
+validateSchedule = compileValidator('validateSchedule', SCHEDULE_SCHEMA,
+                                    lambda field, reason:
+                                    InvalidConfig('schedule', field, reason))
+stateValidators = {stateType: compileValidator(
+    f"validate{stateType.capitalize()}State", schema,
+    lambda field, reason: InvalidConfig('state', field, reason))
+    for stateType, schema in STATE_SCHEMAS.items()}
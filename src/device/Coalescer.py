@@ -0,0 +1,229 @@
+import threading
+
+from .StateModel import StateModel
+from .Transmitter import Transmitter
+
+
+class Coalescer:
+    """
+    The command coalescing class. The rapid repeats of a command (a held
+    volume slider) are merged, inside a window opened by the first one,
+    into a single transmission with a higher repeat count. The state
+    requests being absolute, the latest request of a state wins. The window
+    is never extended, so the latency stays bounded by the window however
+    fast the commands arrive. The windows are timed on the shared network
+    loop when available, a timer thread per window otherwise.
+    """
+    DEFAULT_MAX_REPEAT = 10
+
+    def __init__(self, send, window=0, maxRepeat=DEFAULT_MAX_REPEAT,
+                 netLoop=None):
+        """
+        Constructor.
+
+        Params:
+            send:           The function sending a command, called with the
+                            command, its repeat count, the callback of its
+                            result (None when not needed), its priority,
+                            its deadline and the list of its requests.
+            window:         The coalescing window in seconds (optional), 0
+                            disables the coalescing.
+            maxRepeat:      The repeat count sending the merged command
+                            before the end of the window (optional).
+            netLoop:        The shared network loop timing the windows
+                            (optional).
+        """
+        self.send = send
+        self.netLoop = netLoop
+        self.window = window
+        self.maxRepeat = maxRepeat
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def setWindow(self, window, maxRepeat=DEFAULT_MAX_REPEAT):
+        """
+        Set the coalescing window.
+
+        Params:
+            window:         The coalescing window in seconds, 0 disables
+                            the coalescing.
+            maxRepeat:      The repeat count sending the merged command
+                            before the end of the window (optional).
+        """
+        with self.lock:
+            self.window = window
+            self.maxRepeat = maxRepeat
+
+    def _getKey(self, command):
+        """
+        Get the coalescing key of a command: the state name for the state
+        requests (latest wins), the command otherwise (repeats merged).
+
+        Params:
+            command:        The command name or state request.
+
+        Return:
+            The coalescing key.
+        """
+        if StateModel.isRequest(command):
+            return command.split(StateModel.REQUEST_SEP, 1)[0] \
+                + StateModel.REQUEST_SEP
+        return command
+
+    def submit(self, command, callback=None, priority=None, deadline=None,
+               request=None):
+        """
+        Submit a command, sent once its window closes. A merged command
+        keeps the highest priority class and the latest deadline of the
+        merged commands, and the requests of all of them, each getting its
+        result.
+
+        Params:
+            command:        The command name or state request.
+            callback:       The function called with the transmission
+                            result (optional).
+            priority:       The priority class (optional).
+            deadline:       The transmission deadline (optional).
+            request:        The command request (optional).
+        """
+        key = self._getKey(command)
+        requests = [request] if request is not None else []
+        with self.lock:
+            if self.window <= 0:
+                entry = None
+            else:
+                entry = self.pending.get(key)
+                if entry is None:
+                    entry = [command, 1, [], None, priority, deadline, []]
+                    self.pending[key] = entry
+                    self._startTimer(key, entry)
+                else:
+                    self._merge(entry, command, priority, deadline)
+                entry[6].extend(requests)
+                if callback is not None:
+                    entry[2].append(callback)
+                if entry[1] < self.maxRepeat:
+                    return
+                self._cancelTimer(entry)
+                del self.pending[key]
+        if entry is None:
+            self.send(command, 1, callback, priority, deadline, requests)
+        else:
+            self._send(entry)
+
+    def _merge(self, entry, command, priority, deadline):
+        """
+        Merge a command into a pending entry: a repeat increments the
+        repeat count, a state request replaces the pending one. The entry
+        keeps the highest priority class and the latest deadline, no
+        deadline being the latest.
+
+        Params:
+            entry:          The pending entry.
+            command:        The command name or state request.
+            priority:       The priority class.
+            deadline:       The transmission deadline.
+        """
+        if StateModel.isRequest(command):
+            entry[0] = command
+        else:
+            entry[1] += 1
+        entry[4] = min(entry[4], priority, key=self._getRank)
+        if entry[5] is None or deadline is None:
+            entry[5] = None
+        else:
+            entry[5] = max(entry[5], deadline)
+
+    def _getRank(self, priority):
+        """
+        Get the rank of a priority class, the lower the higher.
+
+        Params:
+            priority:       The priority class, None for the normal class.
+
+        Return:
+            The rank of the priority class.
+        """
+        return Transmitter.PRIORITIES[priority or Transmitter.PRIORITY_NORMAL]
+
+    def _startTimer(self, key, entry):
+        """
+        Start the window timer of a pending entry.
+
+        Params:
+            key:            The coalescing key.
+            entry:          The pending entry.
+        """
+        if self.netLoop is not None:
+            self.netLoop.callLater(self.window, self._flushKey, key, entry)
+            return
+        timer = threading.Timer(self.window, self._flushKey,
+                                args=(key, entry))
+        timer.daemon = True
+        entry[3] = timer
+        timer.start()
+
+    def _cancelTimer(self, entry):
+        """
+        Cancel the window timer of an entry, if it has its own timer thread.
+        The network loop timers of the entries sent early fire for nothing.
+
+        Params:
+            entry:          The pending entry.
+        """
+        if entry[3] is not None:
+            entry[3].cancel()
+
+    def _send(self, entry):
+        """
+        Send a coalesced command.
+
+        Params:
+            entry:          The [command, repeat, callbacks, timer (None
+                            on the network loop), priority, deadline,
+                            requests] entry.
+        """
+        command, repeat, callbacks, timer, priority, deadline, requests = \
+            entry
+        onResult = None
+        if callbacks:
+            def onResult(success):
+                for callback in callbacks:
+                    callback(success)
+        self.send(command, repeat, onResult, priority, deadline, requests)
+
+    def _flushKey(self, key, entry):
+        """
+        Send the coalesced command of a key when its window closes (timer
+        or network loop thread), unless it was already sent.
+
+        Params:
+            key:            The coalescing key.
+            entry:          The pending entry of the window.
+        """
+        with self.lock:
+            if self.pending.get(key) is not entry:
+                return
+            del self.pending[key]
+        self._send(entry)
+
+    def flush(self):
+        """
+        Send the pending commands right away.
+        """
+        with self.lock:
+            entries = list(self.pending.values())
+            self.pending = {}
+        for entry in entries:
+            self._cancelTimer(entry)
+            self._send(entry)
+
+    def getPendingCount(self):
+        """
+        Get the number of commands waiting for their window to close.
+
+        Return:
+            The pending command count.
+        """
+        with self.lock:
+            return len(self.pending)
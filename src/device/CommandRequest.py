@@ -0,0 +1,87 @@
+import time
+import uuid
+
+
+class CommandRequest:
+    """
+    The command request record, correlating a command with its result. The
+    stages of the request are timed: receive to dequeue (queued), dequeue to
+    transmission start (ready) and transmission (transmit). The plain
+    command messages are tracked too, their result staying a bare string.
+    Each request has a trace ID and collects the spans of the finer stages
+    (message handling, IR packets, result publication) for the tracer.
+    """
+    __slots__ = ('requestId', 'command', 'responseTopic', 'correlation',
+                 'structured', 'traceId', 'spans', 'received', 'dequeued',
+                 'ready', 'done')
+
+    def __init__(self, requestId, command, responseTopic=None,
+                 correlation=None, structured=True):
+        """
+        Constructor, the request being received.
+
+        Params:
+            requestId:      The request ID (None if not provided).
+            command:        The command name or state request.
+            responseTopic:  The MQTT v5 response topic (optional).
+            correlation:    The MQTT v5 correlation data (optional).
+            structured:     The flag indicating a structured result
+                            (optional).
+        """
+        self.requestId = requestId
+        self.command = command
+        self.responseTopic = responseTopic
+        self.correlation = correlation
+        self.structured = structured
+        self.traceId = uuid.uuid4().hex
+        self.spans = []
+        self.received = time.monotonic()
+        self.dequeued = None
+        self.ready = None
+        self.done = None
+
+    def getTimings(self):
+        """
+        Get the durations of the request stages.
+
+        Return:
+            The queued, ready and transmit durations and the total duration,
+            in seconds (None for the stages not reached).
+        """
+        stages = (('queued', self.received, self.dequeued),
+                  ('ready', self.dequeued, self.ready),
+                  ('transmit', self.ready, self.done),
+                  ('total', self.received, self.done))
+        return {name: end - start if start is not None and end is not None
+                else None for name, start, end in stages}
+
+    def addSpan(self, name, start, end=None):
+        """
+        Add a stage span to the request trace.
+
+        Params:
+            name:           The span name.
+            start:          The span start (time.monotonic).
+            end:            The span end (optional), now by default.
+        """
+        self.spans.append((name, start,
+                           end if end is not None else time.monotonic()))
+
+    def toResult(self, result):
+        """
+        Build the structured result of the request.
+
+        Params:
+            result:         The result message.
+
+        Return:
+            The request result, with its ID, trace ID, command and stage
+            timings.
+        """
+        return {
+            'id': self.requestId,
+            'trace': self.traceId,
+            'command': self.command,
+            'result': result,
+            'timings': self.getTimings(),
+        }
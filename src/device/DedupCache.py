@@ -0,0 +1,93 @@
+import threading
+import time
+
+
+class DedupCache:
+    """
+    The request deduplication cache class. The IDs of the recent requests
+    are kept in a ring buffer, bounding the memory, and indexed by a dict
+    holding their time and result, so a redelivered request is detected in
+    O(1) and answered with the cached result instead of being retransmitted.
+    The entries expire after the dedup window.
+    """
+    DEFAULT_CAPACITY = 256
+    DEFAULT_WINDOW = 300.0
+
+    PENDING = object()
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, window=DEFAULT_WINDOW):
+        """
+        Constructor.
+
+        Params:
+            capacity:       The maximum number of cached requests (optional).
+            window:         The time, in seconds, during which a request is
+                            a duplicate (optional).
+        """
+        self.window = window
+        self.ring = [None] * capacity
+        self.pos = 0
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.duplicates = 0
+
+    def claim(self, requestId):
+        """
+        Claim a request: a new request is cached as pending, a duplicate
+        gets the cached result.
+
+        Params:
+            requestId:      The request ID.
+
+        Return:
+            None for a new request, otherwise the cached result (PENDING
+            while the original request is in progress).
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(requestId)
+            if entry is not None and now - entry[0] <= self.window:
+                self.duplicates += 1
+                return entry[1]
+            evicted = self.ring[self.pos]
+            if evicted is not None \
+                    and self.entries.get(evicted, (0, 0, -1))[2] == self.pos:
+                del self.entries[evicted]
+            self.ring[self.pos] = requestId
+            self.entries[requestId] = [now, self.PENDING, self.pos]
+            self.pos = (self.pos + 1) % len(self.ring)
+            return None
+
+    def complete(self, requestId, result):
+        """
+        Cache the result of a request.
+
+        Params:
+            requestId:      The request ID.
+            result:         The request result.
+        """
+        with self.lock:
+            entry = self.entries.get(requestId)
+            if entry is not None:
+                entry[1] = result
+
+    def release(self, requestId):
+        """
+        Release the claim of a request without caching its result, so a
+        redelivery of the request is processed again.
+
+        Params:
+            requestId:      The request ID.
+        """
+        with self.lock:
+            self.entries.pop(requestId, None)
+
+    def getDuplicateCount(self):
+        """
+        Get the number of suppressed duplicates.
+
+        Return:
+            The duplicate count.
+        """
+        with self.lock:
+            return self.duplicates
@@ -1,14 +1,48 @@
 from logging import Logger
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 from ircodec.command import CommandSet
 
+import json
 import os
+import time
 
 from exceptions import CommandNotFound, \
-    CommandFileAccess
+    CommandFileAccess, InvalidConfig
+from .Coalescer import Coalescer
+from .CommandRequest import CommandRequest
+from .DedupCache import DedupCache
+from .DeviceConfig import DeviceConfig
+from .Metrics import registry
+from .MqttLogBridge import MqttLogBridge
+from .Outbox import Outbox
+from .StateModel import StateModel
+from .Tracer import tracer
+from .Transmitter import Refusal, Transmitter
+from .ViewCache import ViewCache
+
+
+COMMANDS = registry.counter('piir_commands_total',
+                            'The MQTT command results, by result.')
+RECEIVE_TO_TRANSMIT = registry.histogram(
+    'piir_receive_to_transmit_seconds',
+    'The time from the MQTT command reception to its transmission start.')
+TRANSMIT_TIME = registry.histogram(
+    'piir_transmit_seconds',
+    'The command transmission time (wave build and packet repeats), by '
+    'output.')
+FILE_IO_TIME = registry.histogram('piir_file_io_seconds',
+                                  'The file access durations, by operation.')
 
 
 class Device():
+    __slots__ = ('config', 'netLoop', 'transmitter', 'logger', 'timings',
+                 '_connectStart', 'commandSet', 'baseTopic', 'client',
+                 'status', 'lastResult', 'eventCallback', 'views', 'states',
+                 'coalescer', 'priorities', 'dedup', 'mqttV5', 'outbox',
+                 'logBridge')
+
     # Constants
     STATUS_TOPIC = 'status'
     CMD_TOPIC = 'command'
@@ -17,44 +51,83 @@ class Device():
     ONLINE_MSG = 'ONLINE'
     OFFLINE_MSG = 'OFFLINE'
     SUCCESS_MSG = 'done'
+    ASSUMED_MSG = 'assumed'
     ERROR_MSG = 'unsupported'
 
-    def __init__(self, logger, appConfig, devConfig, isNew=False):
+    EVT_STATUS = 'status'
+    EVT_RESULT = 'result'
+    EVT_CONFIG = 'config'
+
+    PACKET_COUNT = 4
+
+    META_KEYS = ('states', 'priorities')
+
+    def __init__(self, logger, appConfig, devConfig, isNew=False,
+                 netLoop=None, transmitter=None):
         """
         Constructor.
 
         Params:
             logger:         The logger.
             appConfig:      The application configuration.
-            devConfig:      The device configuration.
+            devConfig:      The device configuration (raw or record).
             isNew:          The flag indicating if the device is a new one,
                             or an existing commande set exists.
-        """
-        self.config = devConfig
-        self.logger = logger.getLogger(f"{devConfig['location']}."
-                                       f"{devConfig['name']}")
+            netLoop:        The shared network loop (optional). When not
+                            provided, the client runs its own loop thread.
+            transmitter:    The shared transmit scheduler (optional). When
+                            not provided, the commands are transmitted
+                            from the network thread.
 
+        Raise:
+            InvalidDeviceConfig if the device configuration is invalid.
+            CommandFileAccess if the command set loading fails.
+        """
+        self.config = DeviceConfig.parse(devConfig)
+        self.netLoop = netLoop
+        self.transmitter = transmitter
+        self.logger = logger.getLogger(self.config.clientId)
+        self.logBridge = MqttLogBridge.install(logger)
+        self.timings = {}
+        self._connectStart = None
+        self.status = self.OFFLINE_MSG
+        self.lastResult = None
+        self.eventCallback = None
+        self.views = ViewCache()
+        self.coalescer = Coalescer(self._dispatch, netLoop=netLoop)
+        self.dedup = DedupCache()
+        self._setCoalescing()
+
+        loadStart = time.monotonic()
         if isNew:
             self.logger.info('Creating new device')
-            name = self.config['commandSet']['model']
-            emitter = self.config['commandSet']['emitterGpio']
-            receiver = self.config['commandSet']['receiverGpio']
-            description = self.config['commandSet']['description']
+            name = self.config.commandSet.model
+            emitter = self.config.commandSet.emitterGpio
+            receiver = self.config.commandSet.receiverGpio
+            description = self.config.commandSet.description
             self.commandSet = CommandSet(name, emitter_gpio=emitter,
                                          receiver_gpio=receiver,
                                          description=description)
+            self.states = StateModel()
+            self.priorities = {}
         else:
             self.logger.info('Loading existing device')
-            manufacturer = self.config['commandSet']['manufacturer']
-            model = self.config['commandSet']['model']
+            manufacturer = self.config.commandSet.manufacturer
+            model = self.config.commandSet.model
             try:
                 self.commandSet = CommandSet.load(os.path.join('./commandSets',
                                                   manufacturer, f"{model}."
                                                   f"json"))
             except Exception:
                 raise CommandFileAccess('unable to access the command file.')
+            self._setMeta(self._loadMeta(os.path.join('./commandSets',
+                                         manufacturer, f"{model}.json")))
+            FILE_IO_TIME.observe(time.monotonic() - loadStart,
+                                 op='loadCommandSet')
+        self.timings['commandSet'] = time.monotonic() - loadStart
 
-        self.baseTopic = f"{self.config['topicPrefix']}/{self.config['location']}/{self.config['name']}/"   # noqa: E501
+        self.baseTopic = self.config.baseTopic
+        self.mqttV5 = appConfig.getMqttProtocol() == mqtt.MQTTv5
 
         self._initMqttClient(appConfig.getUserName(),
                              appConfig.getUserPassword(),
@@ -64,7 +137,9 @@ class Device():
     def _initMqttClient(self, userName, userPassword,
                         brokerIp, brokerPort):
         """
-        Initialize the MQTT client.
+        Initialize the MQTT client. The connection itself is only
+        established once the network loop is started so the constructor
+        never blocks on the broker.
 
         Params:
             userName:           The user name for connecting to the broker.
@@ -72,19 +147,24 @@ class Device():
             brokerHostname:     The broker hostname.
             brokerPort:         The broker port.
         """
-        self.client = mqtt.Client(client_id=f"{self.config['location']}."
-                                  f"{self.config['name']}")
+        if self.mqttV5:
+            self.client = mqtt.Client(client_id=self.config.clientId,
+                                      protocol=mqtt.MQTTv5)
+        else:
+            self.client = mqtt.Client(client_id=self.config.clientId)
+        self.outbox = Outbox(self.client)
         self.client.on_connect = self._on_connect
         self.client.on_disconnect = self._on_disconnect
         self.client.on_message = self._on_message
         self.client.on_publish = self._on_publish
         self.client.on_subscribe = self._on_subscribe
-        self.client.on_log = self._on_log
+        self.logBridge.attach(self.client, self.config.clientId,
+                              self.netLoop)
 
         willTopic = self.baseTopic + self.STATUS_TOPIC
         self.client.will_set(willTopic, self.OFFLINE_MSG,
-                             self.config['lastWill']['qos'],
-                             self.config['lastWill']['retain'])
+                             self.config.lastWill.qos,
+                             self.config.lastWill.retain)
         self.client.username_pw_set(userName, userPassword)
         # TODO: Implement switch for secure or not.
         # self.client.tls_set()
@@ -93,77 +173,246 @@ class Device():
         self.logger.info(f"Connecting to {brokerIp}:{brokerPort}")
         self.logger.debug(f"Connecting as {userName} with password "
                           f"{userPassword}")
-        self.client.connect(brokerIp, port=brokerPort)
+        self.client.connect_async(brokerIp, port=brokerPort)
 
-    def _publishCmdResult(self, success):
+    @staticmethod
+    def _loadMeta(path):
         """
-        Publish a command result.
+        Load the entries a command set file adds to the ircodec command set
+        (state declarations and command priorities).
 
         Params:
-            success:            The flag indicating to send success
-                                or fail result.
+            path:               The command set file path.
+
+        Return:
+            The command set entries, empty if the file cannot be read.
+        """
+        try:
+            with open(path) as cmdSetFile:
+                cmdSet = json.loads(cmdSetFile.read())
+            return {key: cmdSet[key] for key in Device.META_KEYS
+                    if key in cmdSet}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _setMeta(self, meta):
+        """
+        Set the state model and command priorities of the command set.
+
+        Params:
+            meta:               The command set entries.
+
+        Raise:
+            InvalidConfig if an entry is invalid.
+        """
+        self.states = StateModel(meta.get('states'))
+        priorities = meta.get('priorities', {})
+        if type(priorities) is not dict or any(
+                priority not in Transmitter.PRIORITIES
+                for priority in priorities.values()):
+            raise InvalidConfig('command set', 'priorities', 'expected '
+                                f"{', '.join(Transmitter.PRIORITIES)}")
+        self.priorities = priorities
+
+    @classmethod
+    def getResultMsg(cls, result):
+        """
+        Get the message of a transmission result.
+
+        Params:
+            result:             The transmission result.
+
+        Return:
+            The success message, the message of a success with an assumed
+            state, the refusal reason of a refused command or the error
+            message.
+        """
+        if isinstance(result, str):
+            return str(result)
+        if result:
+            return cls.SUCCESS_MSG
+        return cls.ERROR_MSG
+
+    def _publishCmdResult(self, success, cmdRequest=None):
+        """
+        Publish a command result. The result of a command request is
+        structured (ID, command, result and stage timings) and published on
+        its MQTT v5 response topic, with its correlation data, if any. The
+        trace of a command request is handed to the tracer.
+
+        Params:
+            success:            The transmission result: success, failure
+                                or refusal of the transmit scheduler.
+            cmdRequest:         The command request (optional).
         """
         resultTopic = self.baseTopic + self.RESULT_TOPIC
+        self.lastResult = self.getResultMsg(success)
         if success:
             self.logger.info('Command sent')
-            self.client.publish(resultTopic, payload=self.SUCCESS_MSG)
         else:
-            self.logger.warning('Command unsupported')
-            self.client.publish(resultTopic, payload=self.ERROR_MSG)
+            self.logger.warning('Command %s', self.lastResult)
+        if cmdRequest is not None and cmdRequest.ready is not None:
+            RECEIVE_TO_TRANSMIT.observe(cmdRequest.ready - cmdRequest.received)
+        COMMANDS.inc(result=self.lastResult)
+        publishStart = time.monotonic()
+        if cmdRequest is None or not cmdRequest.structured:
+            self.outbox.publish(resultTopic, self.lastResult)
+        elif cmdRequest.responseTopic is None:
+            self.outbox.publish(resultTopic, json.dumps(
+                cmdRequest.toResult(self.lastResult)))
+        else:
+            properties = Properties(PacketTypes.PUBLISH)
+            if cmdRequest.correlation is not None:
+                properties.CorrelationData = cmdRequest.correlation
+            self.outbox.publish(cmdRequest.responseTopic,
+                                json.dumps(cmdRequest.toResult(
+                                    self.lastResult)), properties)
+        if cmdRequest is not None:
+            cmdRequest.addSpan('publish', publishStart)
+            tracer.finish(cmdRequest, f"{self.config.location}."
+                          f"{self.config.name}", self.lastResult)
+        self._notify(self.EVT_RESULT, {'lastResult': self.lastResult})
+
+    def _notify(self, event, data):
+        """
+        Notify a device event to the event callback, if any.
+
+        Params:
+            event:              The event type.
+            data:               The event data.
+        """
+        if self.eventCallback is not None:
+            self.eventCallback(self, event, data)
 
-    def _on_connect(self, client, usrData, flags, rc):
+    def _on_connect(self, client, usrData, flags, rc, properties=None):
         """
-        The on connect callback.
+        The on connect callback. A connection refused by the broker is
+        left to the reconnection, the client being about to be closed.
 
         Params:
             client:         The mqtt client.
             usrData:        User data.
             flags:          The connection flags.
             rc:             The connection result.
+            properties:     The MQTT v5 properties (optional).
         """
-        self.logger.info('Connected')
         self.logger.debug(f"rc {rc}")
+        if self.netLoop is not None:
+            self.netLoop.onConnAck(rc)
+        if rc != 0:
+            self.logger.warning(f"Connection refused (rc {rc})")
+            return
+        self.logger.info('Connected')
+        if self._connectStart is not None and 'connect' not in self.timings:
+            self.timings['connect'] = time.monotonic() - self._connectStart
         statusTopic = self.baseTopic + self.STATUS_TOPIC
         self.client.publish(statusTopic, payload=self.ONLINE_MSG,
                             qos=1, retain=True)
+        self.status = self.ONLINE_MSG
+        self._notify(self.EVT_STATUS, {'status': self.status})
 
         cmdTopic = self.baseTopic + self.CMD_TOPIC
         self.client.subscribe(cmdTopic)
+        self.outbox.flush()
 
-    def _on_disconnect(self, client, usrData, rc):
+    def _on_disconnect(self, client, usrData, rc, properties=None):
         """
         The on disconnect callback.
 
         Params:
             client:         The mqtt client.
             usrData:        User data.
-            flags:          The connection flags.
-            rc:             The connection result.
+            rc:             The disconnection reason.
+            properties:     The MQTT v5 properties (optional).
         """
         self.logger.info('Disconnected')
         self.logger.debug(f"rc {rc}")
+        self.status = self.OFFLINE_MSG
+        self._notify(self.EVT_STATUS, {'status': self.status})
+
+    @staticmethod
+    def _parseRequest(receivedMsg):
+        """
+        Parse a JSON command request.
+
+        Params:
+            receivedMsg:        The message payload.
+
+        Return:
+            The command, request ID, priority and time to live of the
+            request (None when not provided).
+
+        Raise:
+            ValueError, KeyError or TypeError if the request is invalid.
+        """
+        request = json.loads(receivedMsg)
+        command = request['command']
+        requestId = request.get('id')
+        priority = request.get('priority')
+        ttl = request.get('ttl')
+        if type(command) is not str \
+                or (requestId is not None and type(requestId) is not str) \
+                or (priority is not None
+                    and priority not in Transmitter.PRIORITIES) \
+                or (ttl is not None and type(ttl) not in (int, float)):
+            raise ValueError('invalid command request')
+        return command, requestId, priority, ttl
 
     def _on_message(self, client, usrData, msg):
         """
-        The on message callback.
+        The on message callback. The payload is the command name or a JSON
+        request {command, id, priority, ttl}: the requests with an ID
+        redelivered by the broker are not retransmitted, the cached result
+        is published again. The JSON requests, and the MQTT v5 messages with
+        a response topic, get a structured result.
 
         Params:
             client:         The mqtt client.
             usrData:        User data.
             msg:            The message data.
         """
-        reuslt = True
+        start = time.monotonic()
         receivedMsg = msg.payload.decode('utf-8')
-        self.logger.info(f"Message recieved {receivedMsg}")
+        self.logger.info('Message received %s', receivedMsg)
+        responseTopic = None
+        correlation = None
+        if self.mqttV5 and getattr(msg, 'properties', None) is not None:
+            responseTopic = getattr(msg.properties, 'ResponseTopic', None)
+            correlation = getattr(msg.properties, 'CorrelationData', None)
+        if not receivedMsg.startswith('{'):
+            cmdRequest = CommandRequest(None, receivedMsg, responseTopic,
+                                        correlation,
+                                        responseTopic is not None)
+            cmdRequest.addSpan('receive', start, cmdRequest.received)
+            self.sendCommand(receivedMsg, cmdRequest=cmdRequest)
+            return
         try:
-            for i in range(0, 4):
-                self.logger.debug(f"Sending packet #{i}")
-                gap = self.config['commandSet']['packetGap']
-                self.commandSet.emit(receivedMsg, emit_gap=gap)
-        except KeyError as e:
+            command, requestId, priority, ttl = \
+                self._parseRequest(receivedMsg)
+        except (ValueError, KeyError, TypeError) as e:
             self.logger.warning(str(e))
-            reuslt = False
-        self._publishCmdResult(reuslt)
+            self._publishCmdResult(False)
+            return
+        cmdRequest = CommandRequest(requestId, command, responseTopic,
+                                    correlation)
+        cmdRequest.addSpan('receive', start, cmdRequest.received)
+        callback = None
+        if requestId is not None:
+            cached = self.dedup.claim(requestId)
+            if cached is DedupCache.PENDING:
+                self.logger.info('Request %s already in progress', requestId)
+                return
+            if cached is not None:
+                self.logger.info('Request %s already done', requestId)
+                self._publishCmdResult(cached, cmdRequest)
+                return
+
+            def callback(result):
+                if isinstance(result, Refusal):
+                    self.dedup.release(requestId)
+                else:
+                    self.dedup.complete(requestId, result)
+        self.sendCommand(command, callback, priority, ttl, cmdRequest)
 
     def _on_publish(self, client, usrData, mid):
         """
@@ -174,10 +423,10 @@ class Device():
             usrData:        User data.
             mid:            The message ID that have been published.
         """
-        self.logger.info('Message published')
-        self.logger.debug(f"mid {mid}")
+        self.logger.debug('Message published (mid %s)', mid)
 
-    def _on_subscribe(self, client, usrData, mid, grantedQoS):
+    def _on_subscribe(self, client, usrData, mid, grantedQoS,
+                      properties=None):
         """
         The on subscribe callback.
 
@@ -186,42 +435,319 @@ class Device():
             usrData:        User data.
             mid:            The message ID that have been published.
             grantedQoS:     The granted QoS for the subcription.
+            properties:     The MQTT v5 properties (optional).
         """
-        self.logger.info(f"Subscibed with QoS {grantedQoS}")
-        self.logger.debug(f"mid {mid}")
+        self.logger.info('Subscribed with QoS %s', grantedQoS)
+        self.logger.debug('mid %s', mid)
 
-    def _on_log(self, client, usrData, logLevel, logMsg):
+    def _emit(self, command, repeat, cmdRequest):
         """
-        The on log callback.
+        Emit the packets of a command. This call blocks until the packets
+        are sent.
 
         Params:
-            client:         The mqtt client.
-            usrData:        User data.
-            logLevel:       The level of the log message.
-            logMsg:         The log message.
-        """
-        switcher = {
-            mqtt.MQTT_LOG_INFO: self.logger.info,
-            mqtt.MQTT_LOG_NOTICE: self.logger.info,
-            mqtt.MQTT_LOG_WARNING: self.logger.warning,
-            mqtt.MQTT_LOG_ERR: self.logger.error,
-            mqtt.MQTT_LOG_DEBUG: self.logger.debug,
-        }
-        switcher[logLevel](logMsg)
+            command:            The command name.
+            repeat:             The repeat count of the command, its
+                                packets being sent in one burst.
+            cmdRequest:         The command request, getting a span per
+                                packet (None if not provided).
+
+        Return:
+            True if the command was emitted, False if it is unsupported.
+        """
+        start = time.monotonic()
+        try:
+            for i in range(0, self.PACKET_COUNT * repeat):
+                self.logger.debug('Sending packet #%d', i)
+                gap = self.config.commandSet.packetGap
+                packetStart = time.monotonic()
+                self.commandSet.emit(command, emit_gap=gap)
+                if cmdRequest is not None:
+                    cmdRequest.addSpan(f"packet {i}", packetStart)
+        except KeyError as e:
+            self.logger.warning(str(e))
+            return False
+        TRANSMIT_TIME.observe(time.monotonic() - start,
+                              output=self.config.linkedEmitter)
+        return True
+
+    def _transmitStateRequest(self, request, cmdRequest):
+        """
+        Transmit a state request (<state>=<value>) as the minimal command
+        sequence reaching the requested state, planned from the predicted
+        state right before the transmission. The predicted state gets the
+        value actually reached, unknown after a failure. After a blind press
+        of an unknown toggle state, the requested value is assumed.
+
+        Params:
+            request:            The state request.
+            cmdRequest:         The command request (None if not provided).
+
+        Return:
+            True if the state was reached, ASSUMED_MSG if it is assumed
+            after a blind press, False if the request or one of its
+            commands is unsupported.
+        """
+        try:
+            commands, reached, assumed = self.states.plan(request)
+        except CommandNotFound as e:
+            self.logger.warning(str(e))
+            return False
+        self.logger.debug('State request %s: %s', request, commands)
+        name = request.split(StateModel.REQUEST_SEP, 1)[0]
+        for command in commands:
+            if not self._emit(command, 1, cmdRequest):
+                self.states.setValue(name, None)
+                return False
+        self.states.setValue(name, reached)
+        return self.ASSUMED_MSG if assumed else True
+
+    def transmit(self, command, repeat=1, cmdRequest=None):
+        """
+        Transmit a command or a state request. This call blocks until the
+        command packets are sent.
+
+        Params:
+            command:            The command name or state request.
+            repeat:             The repeat count of the command, its
+                                packets being sent in one burst (optional).
+            cmdRequest:         The command request, getting a span per
+                                packet (optional).
+
+        Return:
+            True if the command was transmitted, ASSUMED_MSG if a state
+            request reached an assumed state, False if it is unsupported.
+        """
+        if StateModel.isRequest(command):
+            return self._transmitStateRequest(command, cmdRequest)
+        if not self._emit(command, repeat, cmdRequest):
+            return False
+        for i in range(0, repeat):
+            self.states.onTransmit(command)
+        return True
+
+    def getCommandJob(self, command, callback=None, cmdRequest=None):
+        """
+        Get the transmit job of a command, publishing its result.
+
+        Params:
+            command:            The command name.
+            callback:           The function called with the transmission
+                                result, once published (optional).
+            cmdRequest:         The command request (optional).
+
+        Return:
+            The (device, command, callback) transmit job.
+        """
+        onResult = self._publishCmdResult
+        if callback is not None or cmdRequest is not None:
+            def onResult(success):
+                self._publishCmdResult(success, cmdRequest)
+                if callback is not None:
+                    callback(success)
+        return self, command, onResult
+
+    def _stampRequest(self, cmdRequest, done=False):
+        """
+        Stamp a command request transmitted right away (no transmit
+        scheduler).
+
+        Params:
+            cmdRequest:         The command request (None if not provided).
+            done:               The flag indicating the end of the
+                                transmission (optional).
+        """
+        if cmdRequest is None:
+            return
+        now = time.monotonic()
+        if done:
+            cmdRequest.done = now
+        else:
+            cmdRequest.dequeued = now
+            cmdRequest.ready = now
+
+    def _dispatch(self, command, repeat, callback, priority, deadline,
+                  cmdRequests):
+        """
+        Dispatch a command and publish its result. The command is queued in
+        the transmit scheduler when available, otherwise it is transmitted
+        right away. The state requests (<state>=<value>) are turned into
+        commands by the device state model when transmitted. A coalesced
+        command publishes the result of each merged request, the first one
+        being timed and traced through the transmission.
+
+        Params:
+            command:            The command name or state request.
+            repeat:             The repeat count of the command.
+            callback:           The function called with the transmission
+                                result, once published (None if not needed).
+            priority:           The priority class.
+            deadline:           The transmission deadline (time.monotonic).
+            cmdRequests:        The command requests (empty if not
+                                provided).
+        """
+        cmdRequest = cmdRequests[0] if cmdRequests else None
+        device, command, onResult = self.getCommandJob(command, callback,
+                                                       cmdRequest)
+        if len(cmdRequests) > 1:
+            onFirstResult = onResult
+
+            def onResult(success):
+                for merged in cmdRequests[1:]:
+                    merged.dequeued = cmdRequest.dequeued
+                    merged.ready = cmdRequest.ready
+                    merged.done = cmdRequest.done
+                    self._publishCmdResult(success, merged)
+                onFirstResult(success)
+        if self.transmitter is not None:
+            self.transmitter.submit(self, command, onResult, repeat,
+                                    priority, deadline, cmdRequest)
+        else:
+            self._stampRequest(cmdRequest)
+            success = self.transmit(command, repeat, cmdRequest)
+            self._stampRequest(cmdRequest, True)
+            onResult(success)
+
+    def _setCoalescing(self):
+        """
+        Set the command coalescing from the device configuration (coalesce
+        entry, with the window in seconds and an optional maxRepeat).
+        """
+        coalesce = self.config.extra.get('coalesce', {})
+        self.coalescer.setWindow(coalesce.get('window', 0),
+                                 coalesce.get('maxRepeat',
+                                              Coalescer.DEFAULT_MAX_REPEAT))
+
+    def getPriority(self, command):
+        """
+        Get the priority class of a command, set in the command set
+        (priorities entry).
+
+        Params:
+            command:            The command name or state request.
+
+        Return:
+            The priority class of the command.
+        """
+        if StateModel.isRequest(command):
+            command = command.split(StateModel.REQUEST_SEP, 1)[0]
+        return self.priorities.get(command, Transmitter.PRIORITY_NORMAL)
+
+    def sendCommand(self, command, callback=None, priority=None, ttl=None,
+                    cmdRequest=None):
+        """
+        Send a command and publish its result. When the device coalesces
+        its commands, the rapid repeats are merged and sent once the
+        coalescing window closes.
+
+        Params:
+            command:            The command name or state request.
+            callback:           The function called with the transmission
+                                result, once published (optional).
+            priority:           The priority class (optional), the command
+                                set one by default.
+            ttl:                The time in seconds after which the command
+                                is dropped instead of sent late (optional),
+                                the transmitter one by default.
+            cmdRequest:         The command request correlating the result
+                                (optional).
+        """
+        if priority is None:
+            priority = self.getPriority(command)
+        deadline = time.monotonic() + ttl if ttl is not None else None
+        self.coalescer.submit(command, callback, priority, deadline,
+                              cmdRequest)
 
     def startLoop(self):
         """
-        Start the network loop.
+        Start the network loop (and the connection to the broker).
         """
-        self.client.loop_start()
+        self._connectStart = time.monotonic()
+        if self.netLoop is not None:
+            self.netLoop.addClient(self.client)
+        else:
+            self.client.loop_start()
 
     def stopLoop(self):
         """
-        Stop the network loop.
+        Stop the network loop, once the coalesced commands are sent.
         """
-        self.client.loop_stop()
+        self.coalescer.flush()
+        if self.netLoop is not None:
+            self.netLoop.removeClient(self.client)
+        else:
+            self.client.loop_stop()
         self.client.disconnect()
 
+    def getStartupTimings(self):
+        """
+        Get the device startup phase timings.
+
+        Return:
+            The duration, in seconds, of each startup phase completed so far
+            (commandSet, connect).
+        """
+        return self.timings.copy()
+
+    def setEventCallback(self, callback):
+        """
+        Set the device event callback, called with the device, the event
+        type (status, result or config) and the event data.
+
+        Params:
+            callback:           The event callback (None to remove it).
+        """
+        self.eventCallback = callback
+
+    def getState(self):
+        """
+        Get the device state.
+
+        Return:
+            The device status and last command result.
+        """
+        return {'status': self.status, 'lastResult': self.lastResult}
+
+    def getQueueDepth(self):
+        """
+        Get the number of commands of the device waiting to be sent, in its
+        coalescing window or in the transmit queue.
+
+        Return:
+            The queued command count.
+        """
+        depth = self.coalescer.getPendingCount()
+        if self.transmitter is not None:
+            depth += self.transmitter.getDeviceDepth(self)
+        return depth
+
+    def getOutboxStats(self):
+        """
+        Get the metrics of the device outbox.
+
+        Return:
+            The buffered and dropped message counts.
+        """
+        return self.outbox.getStats()
+
+    def getStates(self):
+        """
+        Get the state declarations of the device command set.
+
+        Return:
+            The state declarations, by state name.
+        """
+        return self.states.states
+
+    def getPredictedState(self):
+        """
+        Get the device state predicted from the transmitted commands.
+
+        Return:
+            The predicted state values, by state name (None when unknown).
+        """
+        return self.states.getValues()
+
     def getName(self):
         """
         Get the device name.
@@ -229,7 +755,7 @@ class Device():
         Return:
             The device name.
         """
-        return self.config['name']
+        return self.config.name
 
     def getLocation(self):
         """
@@ -238,16 +764,25 @@ class Device():
         Return:
             The device location.
         """
-        return self.config['location']
+        return self.config.location
 
     def getConfig(self):
         """
         Get the device configuration.
 
         Return:
-            The device configuration.
+            A copy of the raw device configuration.
         """
         self.logger.debug('Getting device config')
+        return self.config.toDict()
+
+    def getConfigRecord(self):
+        """
+        Get the device configuration record.
+
+        Return:
+            The device configuration record.
+        """
         return self.config
 
     def setConfig(self, config):
@@ -255,21 +790,46 @@ class Device():
         Set the device configuration.
 
         Params:
-            config:         The device configuration.
+            config:         The device configuration (raw or record).
+
+        Raise:
+            InvalidDeviceConfig if the configuration is invalid.
         """
         self.logger.debug(f"Setting device config to {config}")
-        self.config = config
+        self.config = DeviceConfig.parse(config)
+        self._setCoalescing()
+        self.views.invalidate()
+        self._notify(self.EVT_CONFIG, self.getConfig())
+
+    def _buildCommandList(self):
+        """
+        Build the device command list.
+
+        Return:
+            The device command list.
+        """
+        self.logger.debug('Building command list')
+        return list(self.commandSet.commands)
 
     def getCommandList(self):
         """
-        Get the device command list.
+        Get the device command list. The list is cached until the next
+        command set change and must not be modified.
 
         Return:
             The device command list.
         """
-        self.logger.debug('Getting command list')
-        cmdSetJson = self.commandSet.to_json()
-        return cmdSetJson['commands'].keys()
+        return self.views.get('commands', self._buildCommandList)
+
+    def getGeneration(self):
+        """
+        Get the device generation, incremented on each configuration or
+        command set change.
+
+        Return:
+            The device generation.
+        """
+        return self.views.getGeneration()
 
     def addCommand(self, command, description):
         """"
@@ -281,6 +841,7 @@ class Device():
         """
         self.logger.debug(f"Adding command {command} to command set")
         self.commandSet.add(command, description=description)
+        self.views.invalidate()
 
     def deleteCommand(self, command):
         """
@@ -297,6 +858,25 @@ class Device():
             self.commandSet.remove(command)
         except KeyError:
             raise CommandNotFound(command)
+        self.views.invalidate()
+
+    def _saveMeta(self, path):
+        """
+        Add the state declarations and command priorities to a saved
+        command set file, the ircodec command set dropping them.
+
+        Params:
+            path:               The command set file path.
+        """
+        meta = {'states': self.states.states, 'priorities': self.priorities}
+        meta = {key: value for key, value in meta.items() if value}
+        if not meta:
+            return
+        with open(path) as cmdSetFile:
+            cmdSet = json.loads(cmdSetFile.read())
+        cmdSet.update(meta)
+        with open(path, 'w') as cmdSetFile:
+            cmdSetFile.write(json.dumps(cmdSet))
 
     def saveCommandSet(self):
         """
@@ -305,10 +885,13 @@ class Device():
         Raise:
             CommandFileAccess if the save operation fail.
         """
+        path = os.path.join('./commandSets',
+                            self.config.commandSet.manufacturer,
+                            f"{self.config.commandSet.model}.json")
+        start = time.monotonic()
         try:
-            self.commandSet.save_as(os.path.join('./commandSets',
-                                    self.config['commandSet']['manufacturer'],
-                                    f"{self.config['commandSet']['model']}"
-                                    f".json"))
+            self.commandSet.save_as(path)
+            self._saveMeta(path)
         except Exception:
             raise CommandFileAccess('unable to access the command file.')
+        FILE_IO_TIME.observe(time.monotonic() - start, op='saveCommandSet')
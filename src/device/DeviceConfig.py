@@ -0,0 +1,216 @@
+import json
+
+from config.schema import validateDevice
+
+
+class CommandSetRef:
+    """
+    The command set reference record of a device configuration.
+    """
+    __slots__ = ('model', 'manufacturer', 'description', 'emitterGpio',
+                 'receiverGpio', 'packetGap')
+
+    def __init__(self, model, manufacturer, description, emitterGpio,
+                 receiverGpio, packetGap):
+        """
+        Constructor.
+
+        Params:
+            model:          The command set model.
+            manufacturer:   The command set manufacturer.
+            description:    The command set description.
+            emitterGpio:    The IR emitter GPIO.
+            receiverGpio:   The IR receiver GPIO.
+            packetGap:      The gap between the command packets in seconds.
+        """
+        self.model = model
+        self.manufacturer = manufacturer
+        self.description = description
+        self.emitterGpio = emitterGpio
+        self.receiverGpio = receiverGpio
+        self.packetGap = packetGap
+
+    @classmethod
+    def fromDict(cls, config):
+        """
+        Build the record of a validated raw command set reference.
+
+        Params:
+            config:         The raw command set reference.
+
+        Return:
+            The command set reference record.
+        """
+        return cls(config['model'], config['manufacturer'],
+                   config['description'], config['emitterGpio'],
+                   config['receiverGpio'], float(config['packetGap']))
+
+    def toDict(self):
+        """
+        Serialize the command set reference.
+
+        Return:
+            The raw command set reference.
+        """
+        return {
+            'model': self.model,
+            'manufacturer': self.manufacturer,
+            'description': self.description,
+            'emitterGpio': self.emitterGpio,
+            'receiverGpio': self.receiverGpio,
+            'packetGap': self.packetGap,
+        }
+
+
+class LastWillConfig:
+    """
+    The last will record of a device configuration.
+    """
+    __slots__ = ('qos', 'retain')
+
+    def __init__(self, qos, retain):
+        """
+        Constructor.
+
+        Params:
+            qos:            The last will QoS.
+            retain:         The last will retain flag.
+        """
+        self.qos = qos
+        self.retain = retain
+
+    @classmethod
+    def fromDict(cls, config):
+        """
+        Build the record of a validated raw last will configuration.
+
+        Params:
+            config:         The raw last will configuration.
+
+        Return:
+            The last will record.
+        """
+        return cls(config['qos'], config['retain'])
+
+    def toDict(self):
+        """
+        Serialize the last will configuration.
+
+        Return:
+            The raw last will configuration.
+        """
+        return {
+            'qos': self.qos,
+            'retain': self.retain,
+        }
+
+
+class DeviceConfig:
+    """
+    The device configuration record. The raw configuration is parsed and
+    validated once, the records are then treated as immutable: a new
+    configuration means a new record.
+    """
+    __slots__ = ('name', 'location', 'linkedEmitter', 'commandSet',
+                 'topicPrefix', 'lastWill', 'extra', 'baseTopic', 'clientId',
+                 '_json')
+
+    KEYS = ('name', 'location', 'linkedEmitter', 'commandSet', 'topicPrefix',
+            'lastWill')
+
+    def __init__(self, name, location, linkedEmitter, commandSet,
+                 topicPrefix, lastWill, extra=None):
+        """
+        Constructor.
+
+        Params:
+            name:           The device name.
+            location:       The device location.
+            linkedEmitter:  The name of the emitter output.
+            commandSet:     The command set reference record.
+            topicPrefix:    The device topic prefix.
+            lastWill:       The last will record.
+            extra:          The optional configuration entries (optional).
+        """
+        self.name = name
+        self.location = location
+        self.linkedEmitter = linkedEmitter
+        self.commandSet = commandSet
+        self.topicPrefix = topicPrefix
+        self.lastWill = lastWill
+        self.extra = extra if extra is not None else {}
+        self.baseTopic = f"{topicPrefix}/{location}/{name}/"
+        self.clientId = f"{location}.{name}"
+        self._json = None
+
+    @classmethod
+    def fromDict(cls, config):
+        """
+        Parse a raw device configuration.
+
+        Params:
+            config:         The raw device configuration.
+
+        Return:
+            The device configuration record.
+
+        Raise:
+            InvalidDeviceConfig if the configuration is invalid.
+        """
+        validateDevice(config)
+        return cls(config['name'], config['location'],
+                   config['linkedEmitter'],
+                   CommandSetRef.fromDict(config['commandSet']),
+                   config['topicPrefix'],
+                   LastWillConfig.fromDict(config['lastWill']),
+                   {key: value for key, value in config.items()
+                    if key not in cls.KEYS})
+
+    @classmethod
+    def parse(cls, config):
+        """
+        Get the record of a device configuration, parsing it if needed.
+
+        Params:
+            config:         The raw device configuration or its record.
+
+        Return:
+            The device configuration record.
+
+        Raise:
+            InvalidDeviceConfig if the configuration is invalid.
+        """
+        if isinstance(config, cls):
+            return config
+        return cls.fromDict(config)
+
+    def toDict(self):
+        """
+        Serialize the device configuration. A new raw configuration is
+        returned on each call, so the record cannot be altered through it.
+
+        Return:
+            The raw device configuration.
+        """
+        config = {
+            'name': self.name,
+            'location': self.location,
+            'linkedEmitter': self.linkedEmitter,
+            'commandSet': self.commandSet.toDict(),
+            'topicPrefix': self.topicPrefix,
+            'lastWill': self.lastWill.toDict(),
+        }
+        config.update(self.extra)
+        return config
+
+    def toJson(self):
+        """
+        Serialize the device configuration to JSON. The serialization is
+        cached in the record.
+
+        Return:
+            The JSON device configuration.
+        """
+        if self._json is None:
+            self._json = json.dumps(self.toDict(), sort_keys=True)
+        return self._json
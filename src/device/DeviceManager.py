@@ -1,8 +1,16 @@
 import os
 import json
+import threading
+import time
 
-from .Device import Device
-from exceptions import DeviceFileAccess, DeviceNotFound, DeviceExists
+from config.schema import validateDevices
+from .Device import Device, FILE_IO_TIME
+from .ShardManager import ShardManager
+from .StateModel import StateModel
+from .Transmitter import Transmitter
+from .ViewCache import ViewCache
+from exceptions import DeviceFileAccess, DeviceNotFound, DeviceExists, \
+    InvalidCommandBatch
 
 
 class DeviceManager:
@@ -10,13 +18,18 @@ class DeviceManager:
     The device manager class.
     """
     DEVICES_FILE = './config/components/devices.json'
+    DELTA_ADD = 'add'
+    DELTA_UPDATE = 'update'
+    DELTA_REMOVE = 'remove'
+    DELTA_STATE = 'state'
+
     SAVE_DEVS = 'Devices saved.'
     ERR_SAVE_DEVS = 'Error accessing devices file!!'
 
     DEFAULT_CONFIG = {
         'name': 'myDevice',
         'location': 'myDevLocation',
-        'linkedEmitter': 'OUT0',
+        'linkedEmitter': 'OUT3',
         'commandSet': {
             'model': 'rm-s103',
             'manufacturer': 'sony',
@@ -33,38 +46,79 @@ class DeviceManager:
     }
 
     # Contructor
-    def __init__(self, logger, appConfig):
+    def __init__(self, logger, appConfig, netLoop=None, transmitter=None,
+                 shardCount=0):
         """
         Constructor.
 
         Params:
-            logger:     The logging instance.
-            appConfig:  The application configuration.
+            logger:         The logging instance.
+            appConfig:      The application configuration.
+            netLoop:        The shared network loop (optional).
+            transmitter:    The shared transmit scheduler (optional).
+            shardCount:     The number of worker processes running the
+                            devices (0 to run them in this process).
 
         Raise:
             DeviceFileAccess if the access to the device configurations file
             failed.
+            InvalidDeviceConfig if a device configuration is invalid or does
+            not match the hardware configuration.
         """
         devsConfig = None
         self.appConfig = appConfig
+        self.loggerFactory = logger
+        self.netLoop = netLoop
+        self.transmitter = transmitter
+        self.shardMngr = None
         self.logger = logger.getLogger('DeviceManager')
         self.logger.info('Loading devices')
         self.devices = []
-
+        self.timings = {}
+        self.version = 0
+        self.listeners = []
+        self.deltaLock = threading.Lock()
+        self.views = ViewCache()
+        self.catalog = ViewCache()
+
+        phaseStart = time.monotonic()
         try:
             with open(self.DEVICES_FILE) as devicesFile:
                 devsConfig = json.loads(devicesFile.read())
         except Exception:
             raise DeviceFileAccess('unable to access device configuraion file')
-
+        validateDevices(devsConfig)
         for devConfig in devsConfig:
-            self.devices.append(Device(logger, appConfig, devConfig))
+            appConfig.validateDeviceConfig(devConfig)
+        self.timings['configLoad'] = time.monotonic() - phaseStart
+
+        phaseStart = time.monotonic()
+        if shardCount > 0:
+            self.shardMngr = ShardManager(logger, appConfig, devsConfig,
+                                          shardCount)
+            self.shardMngr.start()
+            self.devices = self.shardMngr.getDevices()
+            if transmitter is not None:
+                transmitter.setEmitLock(self.shardMngr.emitLock)
+        else:
+            for devConfig in devsConfig:
+                self.devices.append(Device(logger, appConfig, devConfig,
+                                           netLoop=netLoop,
+                                           transmitter=transmitter))
+        self.timings['devicesInit'] = time.monotonic() - phaseStart
+        for device in self.devices:
+            device.setEventCallback(self._onDeviceEvent)
+        self.logger.info(f"Loaded {len(self.devices)} devices (config load: "
+                         f"{self.timings['configLoad']:.3f}s, devices init: "
+                         f"{self.timings['devicesInit']:.3f}s)")
 
     def startLoops(self):
         """
         Start all the device loops.
         """
         self.logger.info('Starting device loops.')
+        if self.shardMngr is not None:
+            self.shardMngr.startLoops()
         for device in self.devices:
             self.logger.debug(f"{device.getLocation()}.{device.getName()}: "
                               f"starting loop")
@@ -79,6 +133,222 @@ class DeviceManager:
             self.logger.debug(f"{device.getLocation()}.{device.getName()}: "
                               f"stopping loop")
             device.stopLoop()
+        if self.shardMngr is not None:
+            self.shardMngr.stopLoops()
+            self.shardMngr.stop()
+
+    def getShardStats(self):
+        """
+        Get the metrics of each shard.
+
+        Return:
+            The list of shard metrics, empty when the devices are not sharded.
+        """
+        if self.shardMngr is None:
+            return []
+        return self.shardMngr.getShardStats()
+
+    def getShardMetrics(self):
+        """
+        Get the metrics registry snapshot of each shard, the snapshot source
+        of the metrics registry.
+
+        Return:
+            The list of (labels, snapshot) of the shards, empty when the
+            devices are not sharded.
+        """
+        if self.shardMngr is None:
+            return []
+        return self.shardMngr.getMetricsSnapshots()
+
+    def getShardTraces(self, traceId=None):
+        """
+        Get the command traces recorded in the shards, the trace source of
+        the tracer.
+
+        Params:
+            traceId:        The ID of the trace to get (optional).
+
+        Return:
+            The traces of the shards, empty when the devices are not
+            sharded.
+        """
+        if self.shardMngr is None:
+            return []
+        return self.shardMngr.getTraces(traceId)
+
+    def collectMetrics(self):
+        """
+        Collect the device metrics of the metrics registry.
+
+        Return:
+            The device count by status, the outbox message counts of the
+            in-process devices and the queue depth of each shard.
+        """
+        summary = self.getStatusSummary()
+        online = sum(1 for status in summary.values() if status['online'])
+        metrics = [('piir_devices', 'gauge', 'The devices, by status.',
+                    [({'status': 'online'}, online),
+                     ({'status': 'offline'}, len(summary) - online)])]
+        if self.shardMngr is None:
+            buffered = 0
+            dropped = 0
+            for device in list(self.devices):
+                stats = device.getOutboxStats()
+                buffered += stats['buffered']
+                dropped += stats['dropped']
+            metrics.extend([
+                ('piir_outbox_buffered', 'gauge',
+                 'The device messages buffered while disconnected.',
+                 [({}, buffered)]),
+                ('piir_outbox_dropped_total', 'counter',
+                 'The device messages dropped by a full outbox.',
+                 [({}, dropped)]),
+            ])
+        else:
+            metrics.append(('piir_shard_queue_depth', 'gauge',
+                            'The commands waiting for transmission, by '
+                            'shard.',
+                            [({'shard': stats['shard']}, stats['queueDepth'])
+                             for stats in self.getShardStats()]))
+        return metrics
+
+    def _getDeviceSnapshot(self, device):
+        """
+        Get the snapshot of a device.
+
+        Params:
+            device:         The device.
+
+        Return:
+            The device configuration and its state.
+        """
+        return {'config': device.getConfig(), 'state': device.getState()}
+
+    def _publishDelta(self, op, devId, data=None):
+        """
+        Publish a device list delta to the listeners.
+
+        Params:
+            op:             The delta operation (add, update, remove, state).
+            devId:          The ID of the device (location.name).
+            data:           The delta data (optional).
+        """
+        with self.deltaLock:
+            self.version += 1
+            delta = {'version': self.version, 'op': op, 'id': devId}
+            if data is not None:
+                delta['data'] = data
+            for listener in self.listeners:
+                listener(delta)
+
+    def _onDeviceEvent(self, device, event, data):
+        """
+        The device event callback.
+
+        Params:
+            device:         The device generating the event.
+            event:          The event type.
+            data:           The event data.
+        """
+        devId = f"{device.getLocation()}.{device.getName()}"
+        if event == Device.EVT_CONFIG:
+            self.views.invalidate()
+            self._publishDelta(self.DELTA_UPDATE, devId, data)
+        else:
+            self._publishDelta(self.DELTA_STATE, devId, data)
+
+    def addListener(self, listener):
+        """
+        Add a device list listener. The listener is called with each delta
+        (version, op, id and data) from the thread generating it.
+
+        Params:
+            listener:       The listener.
+        """
+        with self.deltaLock:
+            self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        """
+        Remove a device list listener.
+
+        Params:
+            listener:       The listener.
+        """
+        with self.deltaLock:
+            self.listeners.remove(listener)
+
+    def getDevicesSnapshot(self):
+        """
+        Get a versioned snapshot of the device list. The deltas with a
+        version lower or equal to the snapshot version are already applied.
+
+        Return:
+            The snapshot version and the device configurations and states.
+        """
+        with self.deltaLock:
+            return {
+                'version': self.version,
+                'devices': [self._getDeviceSnapshot(device)
+                            for device in self.devices],
+            }
+
+    def getStatusSummary(self):
+        """
+        Get the aggregated status of the devices, the sharded devices being
+        queried with one request per shard.
+
+        Return:
+            The online flag, last command result and queued command count,
+            by device (location.name).
+        """
+        states = {}
+        if self.shardMngr is not None:
+            states = self.shardMngr.getDeviceStates()
+        summary = {}
+        for device in list(self.devices):
+            if device in states:
+                state, queueDepth = states[device]
+            else:
+                state, queueDepth = device.getState(), device.getQueueDepth()
+            summary[f"{device.getLocation()}.{device.getName()}"] = {
+                'online': state['status'] == Device.ONLINE_MSG,
+                'lastResult': state['lastResult'],
+                'queueDepth': queueDepth,
+            }
+        return summary
+
+    def getGeneration(self):
+        """
+        Get the device list generation, incremented on each device addition,
+        removal or configuration change.
+
+        Return:
+            The device list generation.
+        """
+        return self.views.getGeneration()
+
+    def getStartupTimings(self):
+        """
+        Get the startup phase timings. The devices connect concurrently
+        in their network loop, so the connect phase is the slowest device
+        connection and the command set load phase is the sum of the device
+        command set loads.
+
+        Return:
+            The duration, in seconds, of each startup phase completed so far
+            (configLoad, devicesInit, commandSetLoad, connect).
+        """
+        timings = self.timings.copy()
+        devsTimings = [device.getStartupTimings() for device in self.devices]
+        timings['commandSetLoad'] = sum(devTimings.get('commandSet', 0.0)
+                                        for devTimings in devsTimings)
+        connectTimings = [devTimings['connect'] for devTimings in devsTimings
+                          if 'connect' in devTimings]
+        if connectTimings and len(connectTimings) == len(devsTimings):
+            timings['connect'] = max(connectTimings)
+        return timings
 
     def getDefaultConfig(self):
         """
@@ -100,9 +370,9 @@ class DeviceManager:
         Raise:
             LookupError if the device does not exist.
         """
-        filteredDev = filter(lambda device: device.getConfig()['name'] == name
-                             and device.getConfig()['location']
-                             == location, self.devices)
+        filteredDev = filter(lambda device: device.getName() == name
+                             and device.getLocation() == location,
+                             self.devices)
         try:
             return next(filteredDev)
         except Exception:
@@ -143,7 +413,8 @@ class DeviceManager:
 
     def addDevice(self, newDevConfig):
         """
-        Add a device to the active device list.
+        Add a device to the active device list. In sharded mode, the new
+        device runs in the coordinator until the next restart.
 
         Params:
             newDevConfig:   The configuration of the new device.
@@ -151,6 +422,7 @@ class DeviceManager:
         Raise:
             DeviceExists if there is already a device with the same
             name and location.
+            InvalidDeviceConfig if the device configuration is invalid.
         """
         for device in self.devices:
             if device.getName() == newDevConfig['name'] \
@@ -158,12 +430,37 @@ class DeviceManager:
                 raise DeviceExists(newDevConfig['name'],
                                    newDevConfig['location'])
 
-        self.devices.append(Device(self.logger, self.appConfig,
-                            newDevConfig, isNew=True))
+        device = Device(self.loggerFactory, self.appConfig, newDevConfig,
+                        isNew=True, netLoop=self.netLoop,
+                        transmitter=self.transmitter)
+        device.setEventCallback(self._onDeviceEvent)
+        self.devices.append(device)
+        self.views.invalidate()
+        self._publishDelta(self.DELTA_ADD, f"{device.getLocation()}."
+                           f"{device.getName()}",
+                           self._getDeviceSnapshot(device))
+
+    def removeDevice(self, name, location):
+        """
+        Remove a device from the active device list and disconnect it.
 
-    def getDevsConfigList(self):
+        Params:
+            name:       The device name.
+            location:   The device location.
+
+        Raise:
+            DeviceNotFound if the device does not exist.
         """
-        Get the active device configuration list.
+        device = self.getDeviceByName(name, location)
+        device.stopLoop()
+        device.setEventCallback(None)
+        self.devices.remove(device)
+        self.views.invalidate()
+        self._publishDelta(self.DELTA_REMOVE, f"{location}.{name}")
+
+    def _buildDevsConfigList(self):
+        """
+        Build the active device configuration list.
 
         Return:
             The list of active device configurations.
@@ -175,6 +472,159 @@ class DeviceManager:
 
         return devsConfigList
 
+    def getDevsConfigList(self):
+        """
+        Get the active device configuration list. The list is cached until
+        the next device list or configuration change and must not be
+        modified.
+
+        Return:
+            The list of active device configurations.
+        """
+        return self.views.get('devices', self._buildDevsConfigList)
+
+    def _validateBatch(self, batch):
+        """
+        Validate a command batch and resolve its devices.
+
+        Params:
+            batch:          The command batch, a list of {device, command}
+                            items where the device is location.name and
+                            the command a command name or a state request.
+
+        Return:
+            The list of (device, command) of the batch.
+
+        Raise:
+            InvalidCommandBatch if an item of the batch is invalid.
+        """
+        if type(batch) is not list or not batch:
+            raise InvalidCommandBatch(0, 'expected a non empty list')
+        devices = {f"{device.getLocation()}.{device.getName()}": device
+                   for device in self.devices}
+        jobs = []
+        for idx, item in enumerate(batch):
+            if type(item) is not dict or type(item.get('device')) is not str \
+                    or type(item.get('command')) is not str:
+                raise InvalidCommandBatch(idx, 'expected {device, command}')
+            device = devices.get(item['device'])
+            if device is None:
+                raise InvalidCommandBatch(idx, f"device {item['device']} "
+                                          f"not found")
+            if not self._isSupported(device, item['command']):
+                raise InvalidCommandBatch(idx, f"command {item['command']} "
+                                          f"not supported")
+            jobs.append((device, item['command']))
+        return jobs
+
+    def _isSupported(self, device, command):
+        """
+        Check if a device supports a command, from its cached command list
+        and state declarations.
+
+        Params:
+            device:         The device.
+            command:        The command name or state request.
+
+        Return:
+            True if the device supports the command, False otherwise.
+        """
+        if StateModel.isRequest(command):
+            return command.split(StateModel.REQUEST_SEP, 1)[0] \
+                in device.getStates()
+        return command in device.getCommandList()
+
+    def _getBatchResult(self, batch, results, elapsed):
+        """
+        Build the aggregate result of a command batch.
+
+        Params:
+            batch:          The command batch.
+            results:        The (result, duration) of each batch item.
+            elapsed:        The batch duration in seconds.
+
+        Return:
+            The aggregate result with the result and duration of each item.
+        """
+        items = []
+        for item, (success, duration) in zip(batch, results):
+            items.append({
+                'device': item['device'],
+                'command': item['command'],
+                'result': Device.getResultMsg(success),
+                'elapsed': duration,
+            })
+        success = all(success for success, duration in results)
+        return {
+            'result': Device.SUCCESS_MSG if success else Device.ERROR_MSG,
+            'elapsed': elapsed,
+            'items': items,
+        }
+
+    def sendCommands(self, batch, callback):
+        """
+        Send a command batch. The whole batch is validated before any
+        transmission, then sent as a unit (see sendJobs). The device
+        results are still published by each device.
+
+        Params:
+            batch:          The command batch, a list of {device, command}
+                            items where the device is location.name.
+            callback:       The function called with the aggregate result.
+
+        Raise:
+            InvalidCommandBatch if an item of the batch is invalid.
+        """
+        start = time.monotonic()
+        self.sendJobs(self._validateBatch(batch),
+                      lambda results: callback(self._getBatchResult(
+                          batch, results, time.monotonic() - start)))
+
+    def sendJobs(self, jobs, callback):
+        """
+        Send a list of resolved commands as a unit. The commands are handed
+        to the transmit scheduler as a batch when the devices share it, with
+        the highest priority class of its commands, otherwise they are sent
+        one after the other, each once the previous one is done, without
+        blocking the caller.
+
+        Params:
+            jobs:           The list of (device, command) to send.
+            callback:       The function called with the (result, duration)
+                            of each command.
+        """
+        if self.transmitter is not None and self.shardMngr is None:
+            priority = min((device.getPriority(command)
+                            for device, command in jobs),
+                           key=Transmitter.PRIORITIES.get)
+            self.transmitter.submitBatch([device.getCommandJob(command)
+                                          for device, command in jobs],
+                                         callback, priority)
+            return
+        self._sendNextJob(jobs, [], callback)
+
+    def _sendNextJob(self, jobs, results, callback):
+        """
+        Send the next command of a job list, from the result callback of
+        the previous one.
+
+        Params:
+            jobs:           The list of (device, command) to send.
+            results:        The (result, duration) of the commands done.
+            callback:       The function called with the (result, duration)
+                            of each command, once all done.
+        """
+        if len(results) == len(jobs):
+            callback(results)
+            return
+        device, command = jobs[len(results)]
+        itemStart = time.monotonic()
+
+        def onResult(success):
+            results.append((success, time.monotonic() - itemStart))
+            self._sendNextJob(jobs, results, callback)
+        device.sendCommand(command, onResult)
+
     def saveDevices(self):
         """
         Save the active device configurations.
@@ -186,16 +636,34 @@ class DeviceManager:
         devsConfig = self.getDevsConfigList()
 
         self.logger.info('Saving devices')
+        start = time.monotonic()
         try:
             with open(self.DEVICES_FILE) as devicesFile:
                 newContent = json.dumps(devsConfig, sort_keys=True, indent=2)
                 devicesFile.write(newContent)
         except Exception:
             raise DeviceFileAccess('unable to access device configuraion file')
+        FILE_IO_TIME.observe(time.monotonic() - start, op='saveDevices')
+
+    def invalidateCatalog(self):
+        """
+        Drop the cached command set catalog, after a command set is saved.
+        """
+        self.catalog.invalidate()
 
     def listManufacturer(self):
         """
-        Get the list of currenty supported manufacturer.
+        Get the list of currenty supported manufacturer. The list is cached
+        until the catalog is invalidated and must not be modified.
+
+        Return:
+            The list of currently supported manufacturer.
+        """
+        return self.catalog.get('manufacturers', self._walkManufacturers)
+
+    def _walkManufacturers(self):
+        """
+        Walk the command sets directory for the supported manufacturers.
 
         Return:
             The list of currently supported manufacturer.
@@ -209,6 +677,26 @@ class DeviceManager:
     def listCommandSets(self, manufacturer):
         """
         Get the list of currently supported command set for a manufacturer.
+        The list is cached until the catalog is invalidated and must not be
+        modified. An unknown manufacturer has no command set.
+
+        Params:
+            manufacturer:   The manufacturer.
+
+        Return:
+            The list of currently supported command set for the manufacturer.
+        """
+        if manufacturer not in self.listManufacturer():
+            return []
+        return self.catalog.get(('commandSets', manufacturer),
+                                lambda: self._walkCommandSets(manufacturer))
+
+    def _walkCommandSets(self, manufacturer):
+        """
+        Walk a manufacturer directory for its supported command sets.
+
+        Params:
+            manufacturer:   The manufacturer.
 
         Return:
             The list of currently supported command set for the manufacturer.
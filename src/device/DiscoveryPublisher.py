@@ -0,0 +1,260 @@
+import json
+import re
+import threading
+
+from .Device import Device
+from .DeviceManager import DeviceManager
+from .StateModel import StateModel
+
+
+class DiscoveryPublisher:
+    """
+    The Home Assistant MQTT discovery publisher class. The discovery configs
+    are generated from the device configurations and command sets: a button
+    per command, a switch, select or number per declared state and a
+    climate entity for the mode and temperature states of an air
+    conditioner. The configs are cached per device generation and only the
+    new or changed ones are published (retained), the configs of the
+    removed entities being cleared.
+    """
+    BUTTON = 'button'
+    SWITCH = 'switch'
+    SELECT = 'select'
+    NUMBER = 'number'
+    CLIMATE = 'climate'
+
+    SWITCH_VALUES = {'on', 'off'}
+    CLIMATE_MODES = {'off', 'auto', 'cool', 'heat', 'dry', 'fan_only'}
+    MODE_STATE = 'mode'
+    TEMPERATURE_STATE = 'temperature'
+
+    def __init__(self, logger, devManager, prefix):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            devManager:     The device manager.
+            prefix:         The discovery prefix, None disables the
+                            discovery.
+        """
+        self.logger = logger.getLogger('DiscoveryPublisher')
+        self.devManager = devManager
+        self.prefix = prefix
+        self.gateway = None
+        self.cache = {}
+        self.published = {}
+        self.lock = threading.Lock()
+
+    def _getId(self, *parts):
+        """
+        Get a discovery ID, the characters not allowed by Home Assistant
+        being replaced.
+
+        Params:
+            parts:          The ID parts.
+
+        Return:
+            The discovery ID.
+        """
+        return re.sub(r'[^a-zA-Z0-9_-]', '_', '_'.join(parts))
+
+    def _getStateConfigs(self, name, state, cmdTopic):
+        """
+        Get the entity config of a state: a switch for an on/off state, a
+        select for the other toggle and discrete states, a number for a
+        relative state.
+
+        Params:
+            name:           The state name.
+            state:          The state declaration.
+            cmdTopic:       The device command topic.
+
+        Return:
+            The (component, config) of the state entity.
+        """
+        config = {'name': name, 'command_topic': cmdTopic,
+                  'optimistic': True}
+        request = f"{name}{StateModel.REQUEST_SEP}"
+        if state['type'] == StateModel.RELATIVE:
+            config.update({
+                'min': state['min'],
+                'max': state['max'],
+                'step': state.get('step', 1),
+                'command_template': f"{request}{{{{ value | int }}}}",
+            })
+            return self.NUMBER, config
+        values = state['values'] if state['type'] == StateModel.TOGGLE \
+            else list(state['commands'])
+        if set(values) == self.SWITCH_VALUES:
+            config.update({'payload_on': f"{request}on",
+                           'payload_off': f"{request}off"})
+            return self.SWITCH, config
+        config.update({'options': values,
+                       'command_template': f"{request}{{{{ value }}}}"})
+        return self.SELECT, config
+
+    def _getClimateConfig(self, states, cmdTopic):
+        """
+        Get the climate entity config of the mode and temperature states,
+        when the mode values are Home Assistant climate modes.
+
+        Params:
+            states:         The state declarations.
+            cmdTopic:       The device command topic.
+
+        Return:
+            The climate config, None if the states do not describe a
+            climate device.
+        """
+        mode = states.get(self.MODE_STATE)
+        temperature = states.get(self.TEMPERATURE_STATE)
+        if mode is None or temperature is None \
+                or mode['type'] == StateModel.RELATIVE \
+                or temperature['type'] != StateModel.RELATIVE:
+            return None
+        modes = mode['values'] if mode['type'] == StateModel.TOGGLE \
+            else list(mode['commands'])
+        if not set(modes) <= self.CLIMATE_MODES:
+            return None
+        sep = StateModel.REQUEST_SEP
+        return {
+            'name': self.CLIMATE,
+            'modes': modes,
+            'mode_command_topic': cmdTopic,
+            'mode_command_template':
+                f"{self.MODE_STATE}{sep}{{{{ value }}}}",
+            'temperature_command_topic': cmdTopic,
+            'temperature_command_template':
+                f"{self.TEMPERATURE_STATE}{sep}{{{{ value | int }}}}",
+            'min_temp': temperature['min'],
+            'max_temp': temperature['max'],
+            'temp_step': temperature.get('step', 1),
+            'optimistic': True,
+        }
+
+    def _buildDeviceConfigs(self, device):
+        """
+        Build the discovery configs of a device.
+
+        Params:
+            device:         The device.
+
+        Return:
+            The JSON discovery configs, by discovery topic.
+        """
+        devConfig = device.getConfig()
+        baseTopic = f"{devConfig['topicPrefix']}/{devConfig['location']}/" \
+            f"{devConfig['name']}/"
+        cmdTopic = baseTopic + Device.CMD_TOPIC
+        nodeId = self._getId(devConfig['location'], devConfig['name'])
+        common = {
+            'availability_topic': baseTopic + Device.STATUS_TOPIC,
+            'payload_available': Device.ONLINE_MSG,
+            'payload_not_available': Device.OFFLINE_MSG,
+            'device': {
+                'identifiers': [f"{devConfig['location']}."
+                                f"{devConfig['name']}"],
+                'name': f"{devConfig['location']} {devConfig['name']}",
+                'manufacturer': devConfig['commandSet']['manufacturer'],
+                'model': devConfig['commandSet']['model'],
+            },
+        }
+        entities = [(self.BUTTON, command, {'name': command,
+                                            'command_topic': cmdTopic,
+                                            'payload_press': command})
+                    for command in device.getCommandList()]
+        states = dict(device.getStates())
+        climate = self._getClimateConfig(states, cmdTopic)
+        if climate is not None:
+            entities.append((self.CLIMATE, self.CLIMATE, climate))
+            del states[self.MODE_STATE]
+            del states[self.TEMPERATURE_STATE]
+        for name, state in states.items():
+            component, config = self._getStateConfigs(name, state, cmdTopic)
+            entities.append((component, f"state_{name}", config))
+        configs = {}
+        for component, objectId, config in entities:
+            objectId = self._getId(objectId)
+            config.update(common, unique_id=f"{nodeId}_{objectId}")
+            configs[f"{self.prefix}/{component}/{nodeId}/{objectId}/"
+                    f"config"] = json.dumps(config, sort_keys=True)
+        return configs
+
+    def _getDeviceConfigs(self, device):
+        """
+        Get the discovery configs of a device, rebuilt only when the device
+        generation changed.
+
+        Params:
+            device:         The device.
+
+        Return:
+            The (device, generation, configs) cache entry, the configs
+            being the JSON discovery configs by discovery topic.
+        """
+        generation = device.getGeneration()
+        entry = self.cache.get(id(device))
+        if entry is None or entry[0] is not device \
+                or entry[1] != generation:
+            entry = (device, generation, self._buildDeviceConfigs(device))
+        return entry
+
+    def sync(self):
+        """
+        Publish the new and changed discovery configs and clear the configs
+        of the removed entities. Nothing is published while the gateway is
+        disconnected, the sync being done again on connection.
+
+        Return:
+            The number of published and cleared configs.
+        """
+        if self.gateway is None or not self.gateway.isConnected():
+            return 0
+        with self.lock:
+            cache = {}
+            configs = {}
+            for device in self.devManager.getDevices():
+                entry = self._getDeviceConfigs(device)
+                cache[id(device)] = entry
+                configs.update(entry[2])
+            self.cache = cache
+            changed = [(topic, config) for topic, config in configs.items()
+                       if self.published.get(topic) != config]
+            removed = [topic for topic in self.published
+                       if topic not in configs]
+            for topic, config in changed:
+                self.gateway.publishRetained(topic, config)
+            for topic in removed:
+                self.gateway.publishRetained(topic, '')
+            self.published = configs
+        if changed or removed:
+            self.logger.info(f"Published {len(changed)} discovery configs, "
+                             f"cleared {len(removed)}")
+        return len(changed) + len(removed)
+
+    def _onDelta(self, delta):
+        """
+        The device list listener, syncing the discovery configs of the
+        added, updated and removed devices.
+
+        Params:
+            delta:          The device list delta.
+        """
+        if delta['op'] != DeviceManager.DELTA_STATE:
+            self.sync()
+
+    def registerTopics(self, gateway):
+        """
+        Publish the discovery configs on the gateway connection and on the
+        device list changes. Nothing is registered when the discovery is
+        disabled.
+
+        Params:
+            gateway:        The gateway.
+        """
+        if self.prefix is None:
+            return
+        self.gateway = gateway
+        gateway.addConnectHandler(self.sync)
+        self.devManager.addListener(self._onDelta)
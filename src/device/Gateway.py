@@ -0,0 +1,262 @@
+import json
+
+import paho.mqtt.client as mqtt
+
+from exceptions import InvalidCommandBatch
+from .Outbox import Outbox
+
+
+class Gateway:
+    """
+    The gateway class. The manager level MQTT client, serving the topics
+    that are not bound to a single device under the gateway topic.
+    """
+    STATUS_TOPIC = 'status'
+    CMDS_TOPIC = 'commands'
+    RESULT_TOPIC = 'result'
+
+    ONLINE_MSG = 'ONLINE'
+    OFFLINE_MSG = 'OFFLINE'
+    INVALID_MSG = 'invalid'
+
+    def __init__(self, logger, appConfig, devManager, netLoop=None):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            appConfig:      The application configuration.
+            devManager:     The device manager.
+            netLoop:        The shared network loop (optional). When not
+                            provided, the client runs its own loop thread.
+        """
+        self.logger = logger.getLogger('Gateway')
+        self.devManager = devManager
+        self.netLoop = netLoop
+        self.baseTopic = f"{appConfig.getGatewayTopic()}/"
+        self.handlers = {}
+        self.topicHandlers = {}
+        self.connectHandlers = []
+        self.addHandler(self.CMDS_TOPIC, self._onCommands)
+
+        self.client = mqtt.Client(client_id=appConfig.getGatewayTopic())
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.outbox = Outbox(self.client)
+        self.client.will_set(self.baseTopic + self.STATUS_TOPIC,
+                             self.OFFLINE_MSG, 1, True)
+        self.client.username_pw_set(appConfig.getUserName(),
+                                    appConfig.getUserPassword())
+        self.logger.info(f"Connecting to {appConfig.getBrokerHostname()}:"
+                         f"{appConfig.getBrokerPort()}")
+        self.client.connect_async(appConfig.getBrokerHostname(),
+                                  port=appConfig.getBrokerPort())
+
+    def _on_connect(self, client, usrData, flags, rc):
+        """
+        The on connect callback. A connection refused by the broker is
+        left to the reconnection, the client being about to be closed.
+
+        Params:
+            client:         The mqtt client.
+            usrData:        User data.
+            flags:          The connection flags.
+            rc:             The connection result.
+        """
+        self.logger.debug(f"rc {rc}")
+        if self.netLoop is not None:
+            self.netLoop.onConnAck(rc)
+        if rc != 0:
+            self.logger.warning(f"Connection refused (rc {rc})")
+            return
+        self.logger.info('Connected')
+        self.client.publish(self.baseTopic + self.STATUS_TOPIC,
+                            payload=self.ONLINE_MSG, qos=1, retain=True)
+        for topic in self.handlers:
+            self.client.subscribe(topic)
+        for topicFilter in list(self.topicHandlers):
+            self.client.subscribe(topicFilter)
+        self.outbox.flush()
+        for handler in self.connectHandlers:
+            handler()
+
+    def _on_disconnect(self, client, usrData, rc):
+        """
+        The on disconnect callback.
+
+        Params:
+            client:         The mqtt client.
+            usrData:        User data.
+            rc:             The connection result.
+        """
+        self.logger.info('Disconnected')
+        self.logger.debug(f"rc {rc}")
+
+    def _on_message(self, client, usrData, msg):
+        """
+        The on message callback.
+
+        Params:
+            client:         The mqtt client.
+            usrData:        User data.
+            msg:            The message data.
+        """
+        handler = self.handlers.get(msg.topic)
+        if handler is not None:
+            handler(msg.payload.decode('utf-8'))
+            return
+        for topicFilter, handler in list(self.topicHandlers.items()):
+            if mqtt.topic_matches_sub(topicFilter, msg.topic):
+                handler(msg.topic, msg.payload.decode('utf-8'))
+                return
+        self.logger.warning(f"No handler for {msg.topic}")
+
+    def publishResult(self, subTopic, result):
+        """
+        Publish the result of a request.
+
+        Params:
+            subTopic:       The request sub-topic.
+            result:         The result.
+        """
+        self.outbox.publish(f"{self.baseTopic}{subTopic}/"
+                            f"{self.RESULT_TOPIC}", json.dumps(result))
+
+    def publishTo(self, topic, result):
+        """
+        Publish the result of a request outside the gateway topic.
+
+        Params:
+            topic:          The result topic.
+            result:         The result.
+        """
+        self.outbox.publish(topic, json.dumps(result))
+
+    def _onCommands(self, payload):
+        """
+        Handle a command batch, a JSON list of {device, command} items.
+
+        Params:
+            payload:        The message payload.
+        """
+        self.logger.info('Command batch received')
+        try:
+            batch = json.loads(payload)
+            self.devManager.sendCommands(batch, lambda result:
+                                         self.publishResult(self.CMDS_TOPIC,
+                                                            result))
+        except (ValueError, InvalidCommandBatch) as e:
+            self.logger.warning(str(e))
+            self.publishResult(self.CMDS_TOPIC, {'result': self.INVALID_MSG,
+                                                 'message': str(e)})
+
+    def addHandler(self, subTopic, handler):
+        """
+        Add a handler for a sub-topic of the gateway topic. The handlers
+        must be added before the loop is started.
+
+        Params:
+            subTopic:       The sub-topic.
+            handler:        The function called with the message payload.
+        """
+        self.handlers[self.baseTopic + subTopic] = handler
+
+    def addTopicHandler(self, topicFilter, handler):
+        """
+        Add a handler for a topic filter, wildcards allowed, outside the
+        gateway topic. The filter is subscribed right away when the client
+        is already connected.
+
+        Params:
+            topicFilter:    The topic filter.
+            handler:        The function called with the message topic and
+                            payload.
+        """
+        if topicFilter in self.topicHandlers:
+            return
+        self.topicHandlers[topicFilter] = handler
+        if self.client.is_connected():
+            self.client.subscribe(topicFilter)
+
+    def addConnectHandler(self, handler):
+        """
+        Add a handler called on each connection to the broker, from the
+        network loop thread.
+
+        Params:
+            handler:        The function called without argument.
+        """
+        self.connectHandlers.append(handler)
+
+    def isConnected(self):
+        """
+        Check if the gateway is connected to the broker.
+
+        Return:
+            True if connected, False otherwise.
+        """
+        return self.client.is_connected()
+
+    def collectMetrics(self):
+        """
+        Collect the gateway metrics of the metrics registry.
+
+        Return:
+            The connection flag and the outbox message counts.
+        """
+        stats = self.outbox.getStats()
+        return [
+            ('piir_gateway_connected', 'gauge',
+             'The gateway connection flag.',
+             [({}, int(self.isConnected()))]),
+            ('piir_gateway_outbox_buffered', 'gauge',
+             'The gateway messages buffered while disconnected.',
+             [({}, stats['buffered'])]),
+            ('piir_gateway_outbox_dropped_total', 'counter',
+             'The gateway messages dropped by a full outbox.',
+             [({}, stats['dropped'])]),
+        ]
+
+    def publishRetained(self, topic, payload):
+        """
+        Publish a retained QoS 1 message outside the gateway topic, an empty
+        payload clearing the retained message.
+
+        Params:
+            topic:          The message topic.
+            payload:        The message payload.
+        """
+        self.client.publish(topic, payload=payload, qos=1, retain=True)
+
+    def publish(self, subTopic, payload, qos=0, retain=False):
+        """
+        Publish a message under the gateway topic.
+
+        Params:
+            subTopic:       The sub-topic.
+            payload:        The message payload.
+            qos:            The message QoS (optional).
+            retain:         The message retain flag (optional).
+        """
+        self.client.publish(self.baseTopic + subTopic, payload=payload,
+                            qos=qos, retain=retain)
+
+    def startLoop(self):
+        """
+        Start the network loop (and the connection to the broker).
+        """
+        if self.netLoop is not None:
+            self.netLoop.addClient(self.client)
+        else:
+            self.client.loop_start()
+
+    def stopLoop(self):
+        """
+        Stop the network loop.
+        """
+        if self.netLoop is not None:
+            self.netLoop.removeClient(self.client)
+        else:
+            self.client.loop_stop()
+        self.client.disconnect()
@@ -0,0 +1,242 @@
+import json
+import threading
+import time
+
+from config.schema import validateGroups
+from exceptions import GroupFileAccess
+from .Device import Device
+
+
+class GroupManager:
+    """
+    The group manager class. A command published on a group topic is fanned
+    out to the devices of the group and handed to the transmit scheduler as
+    a single batch. Each location has its group,
+    <topicPrefix>/<location>/all/command, and the named groups of the
+    group file are served on <gatewayTopic>/group/<name>/command. The group
+    topics are resolved through a topic to device list index, holding the
+    commands supported by each device and rebuilt only when the device list
+    or a device command set changes, so no device is queried per message.
+    """
+    GROUPS_FILE = './config/components/groups.json'
+    GROUP_TOPIC = 'group'
+    ALL_GROUP = 'all'
+    CMD_TOPIC = 'command'
+    RESULT_TOPIC = 'result'
+
+    def __init__(self, logger, devManager):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            devManager:     The device manager.
+
+        Raise:
+            GroupFileAccess if the access to the group file failed.
+            InvalidConfig if the groups are invalid.
+        """
+        self.logger = logger.getLogger('GroupManager')
+        self.devManager = devManager
+        self.gateway = None
+        self.index = None
+        self.generation = None
+        self.prefixes = set()
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.GROUPS_FILE) as groupsFile:
+                groups = json.loads(groupsFile.read())
+        except FileNotFoundError:
+            groups = []
+        except (OSError, ValueError):
+            raise GroupFileAccess('unable to access group file')
+        validateGroups(groups)
+        self.groups = {group['name']: group['devices'] for group in groups}
+        self.logger.info(f"Loaded {len(self.groups)} groups")
+
+    def _getGroupTopic(self, name):
+        """
+        Get the command topic of a named group.
+
+        Params:
+            name:           The group name.
+
+        Return:
+            The group command topic.
+        """
+        return f"{self.gateway.baseTopic}{self.GROUP_TOPIC}/{name}/" \
+            f"{self.CMD_TOPIC}"
+
+    def _buildIndex(self, devices):
+        """
+        Build the group topic index.
+
+        Params:
+            devices:        The device list.
+
+        Return:
+            The (location.name, device, supported commands) lists, by group
+            command topic.
+        """
+        index = {}
+        members = {}
+        for device in devices:
+            devId = f"{device.getLocation()}.{device.getName()}"
+            member = (devId, device, frozenset(device.getCommandList()))
+            members[devId] = member
+            topic = f"{device.getConfig()['topicPrefix']}/" \
+                f"{device.getLocation()}/{self.ALL_GROUP}/{self.CMD_TOPIC}"
+            index.setdefault(topic, []).append(member)
+        for name, devIds in self.groups.items():
+            group = []
+            for devId in devIds:
+                if devId not in members:
+                    self.logger.warning(f"Group {name}: device {devId} "
+                                        f"not found")
+                    continue
+                group.append(members[devId])
+            index[self._getGroupTopic(name)] = group
+        return index
+
+    def getIndex(self):
+        """
+        Get the group topic index, rebuilding it if the device list or a
+        device command set changed since it was built.
+
+        Return:
+            The (location.name, device, supported commands) lists, by group
+            command topic.
+        """
+        with self.lock:
+            devices = self.devManager.getDevices()
+            generation = (self.devManager.getGeneration(),
+                          tuple(device.getGeneration()
+                                for device in devices))
+            if self.index is None or self.generation != generation:
+                self.logger.debug('Building the group index')
+                self.index = self._buildIndex(devices)
+                self.generation = generation
+            return self.index
+
+    def _onResult(self, topic, members, command, results, start):
+        """
+        Publish the aggregate result of a group command.
+
+        Params:
+            topic:          The group command topic.
+            members:        The (location.name, device) sent the command.
+            command:        The command name.
+            results:        The (result, duration) of each device.
+            start:          The time the group command was received.
+        """
+        items = []
+        for (devId, device), (success, duration) in zip(members, results):
+            items.append({
+                'device': devId,
+                'command': command,
+                'result': Device.getResultMsg(success),
+                'elapsed': duration,
+            })
+        success = all(success for success, duration in results)
+        self.gateway.publishTo(self._getResultTopic(topic), {
+            'result': Device.SUCCESS_MSG if success else Device.ERROR_MSG,
+            'elapsed': time.monotonic() - start,
+            'items': items,
+        })
+
+    def _getResultTopic(self, topic):
+        """
+        Get the result topic of a group command topic.
+
+        Params:
+            topic:          The group command topic.
+
+        Return:
+            The group result topic.
+        """
+        return topic[:-len(self.CMD_TOPIC)] + self.RESULT_TOPIC
+
+    def sendGroupCommand(self, topic, command, callback):
+        """
+        Send a command to the devices of a group, the devices not supporting
+        the command being skipped.
+
+        Params:
+            topic:          The group command topic.
+            command:        The command name.
+            callback:       The function called with the (location.name,
+                            device) sent the command and the (result,
+                            duration) of each.
+
+        Return:
+            The number of devices sent the command, 0 if the group is
+            unknown or none of its devices supports the command.
+        """
+        members = [(devId, device) for devId, device, commands
+                   in self.getIndex().get(topic, ())
+                   if command in commands]
+        if not members:
+            return 0
+        self.devManager.sendJobs([(device, command)
+                                  for devId, device in members],
+                                 lambda results: callback(members, results))
+        return len(members)
+
+    def _onGroupMessage(self, topic, payload):
+        """
+        Handle a group command, the payload being the command name.
+
+        Params:
+            topic:          The group command topic.
+            payload:        The message payload.
+        """
+        start = time.monotonic()
+        command = payload.strip()
+        self.logger.info('Group command %s received on %s', command, topic)
+        count = self.sendGroupCommand(
+            topic, command, lambda members, results:
+            self._onResult(topic, members, command, results, start))
+        if not count:
+            self.logger.warning(f"No device of {topic} supports {command}")
+            self.gateway.publishTo(self._getResultTopic(topic),
+                                   {'result': self.gateway.INVALID_MSG,
+                                    'message': f"no device supports "
+                                               f"command {command}"})
+
+    def _registerPrefixes(self):
+        """
+        Serve the location groups of the device topic prefixes not served
+        yet.
+        """
+        for device in self.devManager.getDevices():
+            prefix = device.getConfig()['topicPrefix']
+            if prefix not in self.prefixes:
+                self.prefixes.add(prefix)
+                self.gateway.addTopicHandler(
+                    f"{prefix}/+/{self.ALL_GROUP}/{self.CMD_TOPIC}",
+                    self._onGroupMessage)
+
+    def _onDelta(self, delta):
+        """
+        The device list listener, serving the topic prefix of the added or
+        updated devices.
+
+        Params:
+            delta:          The device list delta.
+        """
+        if delta['op'] in ('add', 'update'):
+            self._registerPrefixes()
+
+    def registerTopics(self, gateway):
+        """
+        Serve the group topics on the gateway.
+
+        Params:
+            gateway:        The gateway.
+        """
+        self.gateway = gateway
+        gateway.addTopicHandler(self._getGroupTopic('+'),
+                                self._onGroupMessage)
+        self._registerPrefixes()
+        self.devManager.addListener(self._onDelta)
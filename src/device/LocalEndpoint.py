@@ -0,0 +1,235 @@
+import http.server
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+
+from exceptions import DeviceNotFound
+from .Device import Device
+from .Metrics import registry
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+    """
+    The HTTP server class over a Unix domain socket.
+    """
+    daemon_threads = True
+
+
+class _LoopbackHTTPServer(http.server.ThreadingHTTPServer):
+    """
+    The HTTP server class over the loopback interface.
+    """
+    pass
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    The local endpoint request handler class.
+    """
+    # The socket timeout of the request reads and reply writes.
+    timeout = 30.0
+
+    def address_string(self):
+        """
+        Get the client address, Unix socket clients have none.
+
+        Return:
+            The client address.
+        """
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        """
+        Log the requests with the endpoint logger.
+        """
+        self.server.endpoint.logger.debug('%s ' + format,
+                                          self.address_string(), *args)
+
+    def _send(self, code, contentType, body):
+        """
+        Send a reply.
+
+        Params:
+            code:           The HTTP status code.
+            contentType:    The reply content type.
+            body:           The reply body.
+        """
+        self.send_response(code)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply(self, code, payload):
+        """
+        Send a JSON reply.
+
+        Params:
+            code:           The HTTP status code.
+            payload:        The reply payload.
+        """
+        self._send(code, 'application/json',
+                   json.dumps(payload).encode('utf-8'))
+
+    def do_GET(self):
+        """
+        Handle the metrics requests: GET /metrics, in the Prometheus text
+        format.
+        """
+        if self.path.strip('/') != LocalEndpoint.METRICS_PATH:
+            self._reply(404, {'message': 'unknown path'})
+            return
+        self._send(200, LocalEndpoint.METRICS_TYPE,
+                   registry.render().encode('utf-8'))
+
+    def do_POST(self):
+        """
+        Handle the command requests: POST /devices/<location>/<name>/command
+        with the command name in the JSON body ({"command": "power"}).
+        """
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 4 or parts[0] != 'devices' \
+                or parts[3] != LocalEndpoint.CMD_PATH:
+            self._reply(404, {'message': 'unknown path'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            command = json.loads(self.rfile.read(length))['command']
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {'message': 'expected {"command": <name>}'})
+            return
+        code, payload = self.server.endpoint.executeCommand(parts[1],
+                                                            parts[2],
+                                                            command)
+        self._reply(code, payload)
+
+
+class LocalEndpoint:
+    """
+    The local command endpoint class. Serve the IR commands of the local
+    scripts and add-ons over a Unix domain socket and loopback HTTP, without
+    the broker round trips. The commands go through the same dispatch path
+    as the MQTT ones and the reply carries the transmission result. The
+    metrics are served on GET /metrics for a Prometheus scraper. There is
+    no authentication: the Unix socket is only accessible to the user
+    running the app.
+    """
+    CMD_PATH = 'command'
+    METRICS_PATH = 'metrics'
+    METRICS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    CMD_TIMEOUT = 10.0
+
+    def __init__(self, logger, devManager, socketPath=None, httpPort=None):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            devManager:     The device manager.
+            socketPath:     The Unix domain socket path (None to disable).
+            httpPort:       The loopback HTTP port (None to disable).
+        """
+        self.logger = logger.getLogger('LocalEndpoint')
+        self.devManager = devManager
+        self.socketPath = socketPath
+        self.httpPort = httpPort
+        self.servers = []
+        self.threads = []
+
+    def _serve(self, server, name):
+        """
+        Serve the requests of a server on its own thread.
+
+        Params:
+            server:         The server.
+            name:           The server thread name.
+        """
+        server.endpoint = self
+        self.servers.append(server)
+        thread = threading.Thread(target=server.serve_forever, name=name,
+                                  daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def start(self):
+        """
+        Start the enabled servers.
+        """
+        if self.socketPath is not None:
+            if os.path.exists(self.socketPath):
+                os.unlink(self.socketPath)
+            self.logger.info(f"Serving commands on {self.socketPath}")
+            server = _UnixHTTPServer(self.socketPath, _RequestHandler)
+            os.chmod(self.socketPath, 0o600)
+            self._serve(server, 'LocalEndpointUnix')
+        if self.httpPort is not None:
+            self.logger.info(f"Serving commands on 127.0.0.1:"
+                             f"{self.httpPort}")
+            self._serve(_LoopbackHTTPServer(('127.0.0.1', self.httpPort),
+                                            _RequestHandler),
+                        'LocalEndpointHttp')
+
+    def stop(self):
+        """
+        Stop the servers.
+        """
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        for thread in self.threads:
+            thread.join()
+        self.servers = []
+        self.threads = []
+        if self.socketPath is not None and os.path.exists(self.socketPath):
+            os.unlink(self.socketPath)
+
+    def getHttpPort(self):
+        """
+        Get the port of the loopback HTTP server, once started.
+
+        Return:
+            The HTTP port, None when disabled.
+        """
+        for server in self.servers:
+            if isinstance(server, _LoopbackHTTPServer):
+                return server.server_address[1]
+        return self.httpPort
+
+    def executeCommand(self, location, name, command):
+        """
+        Send a command to a device and wait for its transmission result.
+
+        Params:
+            location:       The device location.
+            name:           The device name.
+            command:        The command name.
+
+        Return:
+            The HTTP status code and the reply payload (result and elapsed
+            time in seconds).
+        """
+        start = time.monotonic()
+        try:
+            device = self.devManager.getDeviceByName(name, location)
+        except DeviceNotFound as e:
+            return 404, {'message': str(e)}
+        results = queue.Queue()
+        device.sendCommand(command, results.put)
+        try:
+            success = results.get(timeout=self.CMD_TIMEOUT)
+        except queue.Empty:
+            return 504, {'message': 'transmission timed out',
+                         'elapsed': time.monotonic() - start}
+        elapsed = time.monotonic() - start
+        self.logger.debug('%s.%s %s: %s (%.1fms)', location, name, command,
+                          success, elapsed * 1000)
+        return 200, {
+            'result': Device.getResultMsg(success),
+            'elapsed': elapsed,
+        }
@@ -0,0 +1,461 @@
+import math
+import threading
+
+
+class Counter:
+    """
+    The counter metric class, a monotonic value per label set.
+    """
+    def __init__(self, name, description):
+        """
+        Constructor.
+
+        Params:
+            name:           The metric name.
+            description:    The metric description.
+        """
+        self.name = name
+        self.description = description
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        """
+        Increment the counter.
+
+        Params:
+            value:          The increment (optional).
+            labels:         The labels of the counter (optional).
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def getSamples(self):
+        """
+        Get the counter values.
+
+        Return:
+            The (labels, value) of each label set.
+        """
+        with self.lock:
+            return [(dict(key), value) for key, value in self.values.items()]
+
+    def clear(self):
+        """
+        Drop the counter values.
+        """
+        with self.lock:
+            self.values = {}
+
+
+class HistogramBuckets:
+    """
+    The HDR-style bucket record of a histogram: log-linear buckets, each
+    power of 2 being split in SUB_BUCKETS, so a value is recorded in O(1)
+    with a bounded relative error (about 19%) over the whole range.
+    """
+    __slots__ = ('counts', 'count', 'sum')
+
+    MIN_VALUE = 1e-5
+    SUB_BUCKETS = 4
+    OCTAVES = 24
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.counts = [0] * (self.OCTAVES * self.SUB_BUCKETS + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    @classmethod
+    def getBound(cls, idx):
+        """
+        Get the upper bound of a bucket.
+
+        Params:
+            idx:            The bucket index.
+
+        Return:
+            The bucket upper bound.
+        """
+        return cls.MIN_VALUE * 2 ** (idx / cls.SUB_BUCKETS)
+
+    def record(self, value):
+        """
+        Record a value.
+
+        Params:
+            value:          The value.
+        """
+        if value <= self.MIN_VALUE:
+            idx = 0
+        else:
+            idx = min(math.ceil(math.log2(value / self.MIN_VALUE)
+                                * self.SUB_BUCKETS), len(self.counts) - 1)
+        self.counts[idx] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self):
+        """
+        Copy the bucket record.
+
+        Return:
+            The bucket record copy.
+        """
+        copy = HistogramBuckets()
+        copy.counts = list(self.counts)
+        copy.count = self.count
+        copy.sum = self.sum
+        return copy
+
+    def getSummary(self, quantiles):
+        """
+        Get the count, sum and quantiles of the record.
+
+        Params:
+            quantiles:      The quantiles, from 0 to 1.
+
+        Return:
+            The count, sum and quantile values (p50, ...).
+        """
+        summary = {'count': self.count, 'sum': self.sum}
+        for quantile in quantiles:
+            summary[f"p{int(quantile * 100)}"] = self.getQuantile(quantile)
+        return summary
+
+    def getQuantile(self, quantile):
+        """
+        Get the upper bound of the bucket holding a quantile.
+
+        Params:
+            quantile:       The quantile, from 0 to 1.
+
+        Return:
+            The quantile value, None when empty.
+        """
+        if not self.count:
+            return None
+        rank = quantile * self.count
+        total = 0
+        for idx, count in enumerate(self.counts):
+            total += count
+            if total >= rank and count:
+                return self.getBound(idx)
+        return self.getBound(len(self.counts) - 1)
+
+
+class Histogram:
+    """
+    The histogram metric class, a value distribution per label set.
+    """
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, name, description):
+        """
+        Constructor.
+
+        Params:
+            name:           The metric name.
+            description:    The metric description.
+        """
+        self.name = name
+        self.description = description
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record a value.
+
+        Params:
+            value:          The value.
+            labels:         The labels of the value (optional).
+        """
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            buckets = self.buckets.get(key)
+            if buckets is None:
+                buckets = HistogramBuckets()
+                self.buckets[key] = buckets
+            buckets.record(value)
+
+    def getBuckets(self):
+        """
+        Get a copy of the bucket record of each label set.
+
+        Return:
+            The (labels, bucket record) of each label set.
+        """
+        with self.lock:
+            return [(dict(key), buckets.copy())
+                    for key, buckets in self.buckets.items()]
+
+    def getSummary(self):
+        """
+        Get the count, sum and quantiles of each label set.
+
+        Return:
+            The (labels, summary) of each label set.
+        """
+        return [(labels, buckets.getSummary(self.QUANTILES))
+                for labels, buckets in self.getBuckets()]
+
+    def clear(self):
+        """
+        Drop the recorded values.
+        """
+        with self.lock:
+            self.buckets = {}
+
+
+def _renderBuckets(name, labels, buckets, lines):
+    """
+    Render a histogram bucket record in the Prometheus text format, the
+    buckets being exported at each power of 2.
+
+    Params:
+        name:               The histogram name.
+        labels:             The labels of the record.
+        buckets:            The bucket record.
+        lines:              The output lines, updated.
+    """
+    total = 0
+    for idx, count in enumerate(buckets.counts):
+        total += count
+        if idx % HistogramBuckets.SUB_BUCKETS == 0:
+            lines.append(_formatSample(f"{name}_bucket", dict(
+                labels, le=repr(HistogramBuckets.getBound(idx))), total))
+    lines.append(_formatSample(f"{name}_bucket", dict(labels, le='+Inf'),
+                               buckets.count))
+    lines.append(_formatSample(f"{name}_count", labels, buckets.count))
+    lines.append(_formatSample(f"{name}_sum", labels, buckets.sum))
+
+
+def _formatSample(name, labels, value):
+    """
+    Format a sample in the Prometheus text format.
+
+    Params:
+        name:               The sample name.
+        labels:             The sample labels.
+        value:              The sample value.
+
+    Return:
+        The sample line.
+    """
+    if not labels:
+        return f"{name} {value}"
+    labelStr = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    return f"{name}{{{labelStr}}} {value}"
+
+
+class Registry:
+    """
+    The metrics registry class. The counters and histograms are updated on
+    the hot paths, the component statistics (queue depths, throttling,
+    outbox, ...) are read from their collectors when the metrics are
+    exported. The counters and histograms of the other processes (shards)
+    are read from their snapshot sources and exported with the labels of
+    their process.
+    """
+    COUNTER = 'counter'
+    GAUGE = 'gauge'
+    HISTOGRAM = 'histogram'
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.metrics = {}
+        self.collectors = []
+        self.sources = []
+        self.lock = threading.Lock()
+
+    def _getMetric(self, cls, name, description):
+        """
+        Get a metric, created on first use.
+
+        Params:
+            cls:            The metric class.
+            name:           The metric name.
+            description:    The metric description.
+
+        Return:
+            The metric.
+        """
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, description)
+                self.metrics[name] = metric
+            return metric
+
+    def counter(self, name, description):
+        """
+        Get a counter, created on first use.
+
+        Params:
+            name:           The metric name.
+            description:    The metric description.
+
+        Return:
+            The counter.
+        """
+        return self._getMetric(Counter, name, description)
+
+    def histogram(self, name, description):
+        """
+        Get a histogram, created on first use.
+
+        Params:
+            name:           The metric name.
+            description:    The metric description.
+
+        Return:
+            The histogram.
+        """
+        return self._getMetric(Histogram, name, description)
+
+    def addCollector(self, collector):
+        """
+        Add a collector, called on each export.
+
+        Params:
+            collector:      The function returning the list of (name, type,
+                            description, samples) of its metrics, the
+                            samples being (labels, value) tuples.
+        """
+        with self.lock:
+            self.collectors.append(collector)
+
+    def addSource(self, source):
+        """
+        Add a snapshot source, called on each export.
+
+        Params:
+            source:         The function returning the list of (labels,
+                            snapshot) of other processes, the labels being
+                            added to the samples of their snapshot.
+        """
+        with self.lock:
+            self.sources.append(source)
+
+    def clear(self):
+        """
+        Drop the recorded values, the collectors and the snapshot sources,
+        a forked process starting from an empty registry.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+            self.collectors = []
+            self.sources = []
+        for metric in metrics:
+            metric.clear()
+
+    def getSnapshot(self):
+        """
+        Get a snapshot of the counters and histograms, exported by another
+        process.
+
+        Return:
+            The (type, description, samples) of each metric, by metric name,
+            the histogram samples being (labels, bucket record) tuples.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        snapshot = {}
+        for metric in metrics:
+            if isinstance(metric, Counter):
+                snapshot[metric.name] = (self.COUNTER, metric.description,
+                                         metric.getSamples())
+            else:
+                snapshot[metric.name] = (self.HISTOGRAM, metric.description,
+                                         metric.getBuckets())
+        return snapshot
+
+    def _getFamilies(self):
+        """
+        Get the counters and histograms of the process, merged with the
+        ones of the snapshot sources.
+
+        Return:
+            The (type, description, samples) of each metric, by metric name.
+        """
+        families = self.getSnapshot()
+        with self.lock:
+            sources = list(self.sources)
+        for source in sources:
+            for labels, snapshot in source():
+                for name, (metricType, description, samples) \
+                        in snapshot.items():
+                    family = families.setdefault(
+                        name, (metricType, description, []))
+                    family[2].extend((dict(sampleLabels, **labels), value)
+                                     for sampleLabels, value in samples)
+        return families
+
+    def _collect(self):
+        """
+        Read the metrics of the collectors.
+
+        Return:
+            The (name, type, description, samples) of the collected metrics.
+        """
+        with self.lock:
+            collectors = list(self.collectors)
+        collected = []
+        for collector in collectors:
+            collected.extend(collector())
+        return collected
+
+    def render(self):
+        """
+        Render the metrics in the Prometheus text format.
+
+        Return:
+            The metrics text.
+        """
+        lines = []
+        for name, (metricType, description, samples) \
+                in self._getFamilies().items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metricType}")
+            for labels, value in samples:
+                if metricType == self.COUNTER:
+                    lines.append(_formatSample(name, labels, value))
+                else:
+                    _renderBuckets(name, labels, value, lines)
+        for name, metricType, description, samples in self._collect():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metricType}")
+            lines.extend(_formatSample(name, labels, value)
+                         for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def getSummary(self):
+        """
+        Get a JSON friendly summary of the metrics, the histograms being
+        summarized by their count, sum and quantiles.
+
+        Return:
+            The samples of each metric, by metric name.
+        """
+        summary = {}
+        for name, (metricType, description, samples) \
+                in self._getFamilies().items():
+            if metricType == self.HISTOGRAM:
+                samples = [(labels, buckets.getSummary(Histogram.QUANTILES))
+                           for labels, buckets in samples]
+            summary[name] = [{'labels': labels, 'value': value}
+                             for labels, value in samples]
+        for name, metricType, description, samples in self._collect():
+            summary[name] = [{'labels': labels, 'value': value}
+                             for labels, value in samples]
+        return summary
+
+
+# The registry of the process.
+registry = Registry()
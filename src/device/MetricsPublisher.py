@@ -0,0 +1,82 @@
+import json
+
+from .Metrics import registry
+
+
+class MetricsPublisher:
+    """
+    The metrics publisher class. For the setups without a Prometheus
+    scraper, a summary of the metrics registry (counters, histogram
+    quantiles and collected statistics) is published as JSON on the gateway
+    metrics topic once per interval, from the shared network loop. The
+    publisher is disabled when no interval is configured.
+    """
+    METRICS_TOPIC = 'metrics'
+
+    def __init__(self, logger, netLoop, interval=None):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            netLoop:        The shared network loop running the publications.
+            interval:       The time, in seconds, between two publications
+                            (optional), None disables the publications.
+        """
+        self.logger = logger.getLogger('MetricsPublisher')
+        self.netLoop = netLoop
+        self.interval = interval
+        self.gateway = None
+        self.tickId = None
+
+    def publish(self):
+        """
+        Publish the metrics summary.
+        """
+        self.gateway.publish(self.METRICS_TOPIC,
+                             json.dumps(registry.getSummary(),
+                                        sort_keys=True))
+
+    def _tick(self, tickId):
+        """
+        Publish the metrics summary once per interval (network loop
+        thread).
+
+        Params:
+            tickId:         The ID of the run the tick belongs to.
+        """
+        if tickId is not self.tickId:
+            return
+        try:
+            self.publish()
+        except Exception as e:
+            self.logger.error(f"Metrics publication failed: {e}")
+        self.netLoop.callLater(self.interval, self._tick, tickId)
+
+    def start(self):
+        """
+        Start the periodic publications, if they are enabled.
+        """
+        if self.interval is None:
+            return
+        self.logger.info('Starting metrics publisher')
+        self.tickId = object()
+        self.netLoop.callLater(self.interval, self._tick, self.tickId)
+
+    def stop(self):
+        """
+        Stop the periodic publications, the pending tick being ignored.
+        """
+        if self.tickId is None:
+            return
+        self.logger.info('Stopping metrics publisher')
+        self.tickId = None
+
+    def registerTopics(self, gateway):
+        """
+        Publish the metrics summary on the gateway.
+
+        Params:
+            gateway:        The gateway.
+        """
+        self.gateway = gateway
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+import weakref
+
+import paho.mqtt.client as mqtt
+
+
+class MqttLogBridge:
+    """
+    The paho log bridge class, shared by all the MQTT clients. Unless the
+    debug level is enabled, paho logs to a standard logger so the messages
+    are only formatted when emitted. At the debug level, the repetitive
+    messages (PINGREQ, PUBLISH, ...) are sampled: the first one of a kind
+    is logged for each client and summary interval, the others are counted
+    and reported in a periodic summary per client, flushed from the network
+    loop when there is one.
+    """
+    DEFAULT_INTERVAL = 60.0
+
+    LEVELS = {
+        mqtt.MQTT_LOG_INFO: logging.INFO,
+        mqtt.MQTT_LOG_NOTICE: logging.INFO,
+        mqtt.MQTT_LOG_WARNING: logging.WARNING,
+        mqtt.MQTT_LOG_ERR: logging.ERROR,
+        mqtt.MQTT_LOG_DEBUG: logging.DEBUG,
+    }
+
+    _instance = None
+    _instanceLock = threading.Lock()
+
+    def __init__(self, logger, interval=DEFAULT_INTERVAL):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            interval:       The summary interval in seconds (optional).
+        """
+        self.logger = logger.getLogger('paho')
+        self.interval = interval
+        self.names = weakref.WeakKeyDictionary()
+        self.counts = {}
+        self.lastSummary = time.monotonic()
+        self.lock = threading.Lock()
+        self.netLoop = None
+
+    @classmethod
+    def install(cls, logger):
+        """
+        Get the bridge shared by all the clients, created on first use.
+
+        Params:
+            logger:         The logging instance.
+
+        Return:
+            The log bridge.
+        """
+        with cls._instanceLock:
+            if cls._instance is None:
+                cls._instance = cls(logger)
+            return cls._instance
+
+    def attach(self, client, name, netLoop=None):
+        """
+        Forward the paho messages of a client.
+
+        Params:
+            client:         The MQTT client.
+            name:           The client name used in the logs.
+            netLoop:        The shared network loop (optional), ticking the
+                            debug summaries.
+        """
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            client.enable_logger(ClientLogger(self.logger, name))
+            return
+        self.names[client] = name
+        client.on_log = self.onLog
+        if netLoop is not None and netLoop is not self.netLoop:
+            self.netLoop = netLoop
+            netLoop.callLater(self.interval, self._tick, netLoop)
+
+    def _tick(self, netLoop):
+        """
+        Flush the summary once per interval (network loop thread).
+
+        Params:
+            netLoop:        The network loop the tick runs on.
+        """
+        if netLoop is not self.netLoop:
+            return
+        self.flush()
+        netLoop.callLater(self.interval, self._tick, netLoop)
+
+    def _getKind(self, logMsg):
+        """
+        Get the kind of a paho message, its first two words (Sending
+        PINGREQ, Received PUBLISH, ...).
+
+        Params:
+            logMsg:         The log message.
+
+        Return:
+            The message kind.
+        """
+        return ' '.join(logMsg.split(' ', 2)[:2])
+
+    def onLog(self, client, usrData, logLevel, logMsg):
+        """
+        The on log callback of the clients.
+
+        Params:
+            client:         The mqtt client.
+            usrData:        User data.
+            logLevel:       The paho level of the log message.
+            logMsg:         The log message.
+        """
+        level = self.LEVELS.get(logLevel, logging.DEBUG)
+        if not self.logger.isEnabledFor(level):
+            return
+        name = self.names.get(client, '?')
+        if level > logging.DEBUG:
+            self.logger.log(level, '%s: %s', name, logMsg)
+            return
+        key = (name, self._getKind(logMsg))
+        now = time.monotonic()
+        with self.lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+            summary = None
+            if now - self.lastSummary >= self.interval:
+                summary = self.counts
+                self.counts = {}
+                self.lastSummary = now
+        if not count:
+            self.logger.debug('%s: %s', name, logMsg)
+        if summary is not None:
+            self._logSummary(summary)
+
+    def _logSummary(self, counts):
+        """
+        Log the message counts of each client.
+
+        Params:
+            counts:         The message counts, by (client name, kind).
+        """
+        clients = {}
+        for (name, kind), count in counts.items():
+            clients.setdefault(name, []).append(f"{count} {kind}")
+        for name, kinds in clients.items():
+            self.logger.debug('%s: %s in %.0fs', name, ', '.join(kinds),
+                              self.interval)
+
+    def flush(self):
+        """
+        Log the summary of the messages counted so far.
+        """
+        with self.lock:
+            counts = self.counts
+            self.counts = {}
+            self.lastSummary = time.monotonic()
+        if counts:
+            self._logSummary(counts)
+
+
+class ClientLogger(logging.LoggerAdapter):
+    """
+    The client logger class, prefixing the paho messages of a client with
+    its name. The message is only formatted when the level is enabled.
+    """
+    def __init__(self, logger, name):
+        """
+        Constructor.
+
+        Params:
+            logger:         The paho logger.
+            name:           The client name used in the logs.
+        """
+        super().__init__(logger, {})
+        self.clientName = name
+
+    def process(self, msg, kwargs):
+        """
+        Prefix a message with the client name.
+
+        Params:
+            msg:            The message format.
+            kwargs:         The logging call keyword arguments.
+
+        Return:
+            The prefixed message format and the keyword arguments.
+        """
+        return f"{self.clientName}: {msg}", kwargs
@@ -0,0 +1,306 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .Metrics import registry
+
+
+CONNECTS = registry.counter('piir_mqtt_connects_total',
+                            'The MQTT (re)connection attempts, by result.')
+
+
+class NetworkLoop:
+    """
+    The network loop class. Drive the network I/O of every MQTT client from
+    a single asyncio event loop, so the thread count stays constant however
+    many devices are active. The reconnections follow a jittered exponential
+    backoff shared by all the clients: the whole fleet backs off while the
+    broker is away and the reconnections are spread once it is back. The
+    failed connections and the closed sockets count as failures, only a
+    connection accepted by the broker (CONNACK) resets the backoff.
+    """
+    MISC_PERIOD = 1.0
+    RECONNECT_MIN = 1.0
+    RECONNECT_MAX = 60.0
+    STOP_GRACE = 0.1
+    CONNECT_WORKERS = 4
+
+    def __init__(self, logger):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logger.
+        """
+        self.logger = logger.getLogger('NetworkLoop')
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(
+            max_workers=self.CONNECT_WORKERS, thread_name_prefix='connect'))
+        self.clients = set()
+        self.failures = 0
+        self.thread = None
+        self._threadId = None
+
+    def _run(self):
+        """
+        Run the event loop (network loop thread).
+        """
+        asyncio.set_event_loop(self.loop)
+        self._threadId = threading.get_ident()
+        self.loop.call_soon(self._miscLoop)
+        self.loop.run_forever()
+
+    def _inLoop(self):
+        """
+        Check if the caller is running in the network loop thread.
+
+        Return:
+            True if called from the network loop thread, False otherwise.
+        """
+        return threading.get_ident() == self._threadId
+
+    def _miscLoop(self):
+        """
+        Process the periodic network events (keepalive, retries) of all
+        the clients.
+        """
+        for client in self.clients:
+            client.loop_misc()
+        self.loop.call_later(self.MISC_PERIOD, self._miscLoop)
+
+    def getReconnectDelay(self):
+        """
+        Get the delay before the next reconnection: an exponential backoff
+        on the consecutive connection failures of all the clients, half of
+        it being random.
+
+        Return:
+            The reconnection delay in seconds.
+        """
+        delay = min(self.RECONNECT_MAX,
+                    self.RECONNECT_MIN * 2 ** min(self.failures, 16))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _connect(self, client):
+        """
+        Connect a client to its broker. The blocking connection is
+        delegated to the bounded connect executor.
+
+        Params:
+            client:         The MQTT client.
+        """
+        if client not in self.clients:
+            return
+        future = self.loop.run_in_executor(None, client.reconnect)
+        future.add_done_callback(lambda f: self._onConnectDone(client, f))
+
+    def _onConnectDone(self, client, future):
+        """
+        The connect done callback.
+
+        Params:
+            client:         The MQTT client.
+            future:         The connection future.
+        """
+        error = future.exception()
+        if error is None:
+            return
+        CONNECTS.inc(result='failed')
+        self.failures += 1
+        delay = self.getReconnectDelay()
+        self.logger.warning(f"Connection failed ({error}), retrying in "
+                            f"{delay:.1f}s")
+        self.loop.call_later(delay, self._connect, client)
+
+    def onConnAck(self, rc):
+        """
+        Report the broker answer to a connection, from the on connect
+        callback of a client. An accepted connection resets the backoff, a
+        refused one is counted as a failure when its socket is closed.
+
+        Params:
+            rc:             The connection result.
+        """
+        if rc == 0:
+            CONNECTS.inc(result='connected')
+            self.failures = 0
+        else:
+            CONNECTS.inc(result='refused')
+
+    def _addWriter(self, client, sock):
+        """
+        Watch a client socket for write readiness.
+
+        Params:
+            client:         The MQTT client.
+            sock:           The client socket.
+        """
+        try:
+            self.loop.add_writer(sock, client.loop_write)
+        except ValueError:
+            # The socket was closed before the writer was registered.
+            pass
+
+    def _removeWriter(self, fd):
+        """
+        Stop watching a client socket for write readiness.
+
+        Params:
+            fd:             The file descriptor of the client socket.
+        """
+        try:
+            self.loop.remove_writer(fd)
+        except OSError:
+            # The socket was already closed by another thread.
+            pass
+
+    def _removeSocket(self, client, fd):
+        """
+        Stop watching a closed client socket and schedule the reconnection.
+
+        Params:
+            client:         The MQTT client.
+            fd:             The file descriptor of the closed socket.
+        """
+        self._removeWriter(fd)
+        try:
+            self.loop.remove_reader(fd)
+        except OSError:
+            pass
+        if client in self.clients:
+            self.failures += 1
+            self.loop.call_later(self.getReconnectDelay(), self._connect,
+                                 client)
+
+    def _on_socket_open(self, client, usrData, sock):
+        """
+        The on socket open callback.
+
+        Params:
+            client:         The MQTT client.
+            usrData:        User data.
+            sock:           The opened socket.
+        """
+        self.loop.call_soon_threadsafe(self.loop.add_reader, sock,
+                                       client.loop_read)
+
+    def _on_socket_close(self, client, usrData, sock):
+        """
+        The on socket close callback.
+
+        Params:
+            client:         The MQTT client.
+            usrData:        User data.
+            sock:           The socket about to be closed.
+        """
+        fd = sock.fileno()
+        if self._inLoop():
+            self._removeSocket(client, fd)
+        else:
+            self.loop.call_soon_threadsafe(self._removeSocket, client, fd)
+
+    def _on_socket_register_write(self, client, usrData, sock):
+        """
+        The on socket register write callback.
+
+        Params:
+            client:         The MQTT client.
+            usrData:        User data.
+            sock:           The socket with pending data.
+        """
+        self.loop.call_soon_threadsafe(self._addWriter, client, sock)
+
+    def _on_socket_unregister_write(self, client, usrData, sock):
+        """
+        The on socket unregister write callback.
+
+        Params:
+            client:         The MQTT client.
+            usrData:        User data.
+            sock:           The socket without pending data.
+        """
+        fd = sock.fileno()
+        if self._inLoop():
+            self._removeWriter(fd)
+        else:
+            self.loop.call_soon_threadsafe(self._removeWriter, fd)
+
+    def start(self):
+        """
+        Start the network loop thread.
+        """
+        self.logger.info('Starting network loop')
+        self.thread = threading.Thread(target=self._run, name='NetworkLoop',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the network loop thread. Pending writes (disconnections) get
+        a short grace period to be flushed.
+        """
+        if self.thread is None:
+            return
+        self.logger.info('Stopping network loop')
+        self.loop.call_soon_threadsafe(self.loop.call_later, self.STOP_GRACE,
+                                       self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+    def callSoon(self, callback, *args):
+        """
+        Schedule a callback on the network loop from any thread.
+
+        Params:
+            callback:       The callback.
+            args:           The callback arguments.
+        """
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def callLater(self, delay, callback, *args):
+        """
+        Schedule a callback on the network loop after a delay, from any
+        thread.
+
+        Params:
+            delay:          The delay in seconds.
+            callback:       The callback.
+            args:           The callback arguments.
+        """
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay,
+                                       callback, *args)
+
+    def addClient(self, client):
+        """
+        Add a client to the network loop and connect it. The client must
+        have been configured with connect_async.
+
+        Params:
+            client:         The MQTT client.
+        """
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        self.loop.call_soon_threadsafe(self.clients.add, client)
+        self.loop.call_soon_threadsafe(self._connect, client)
+
+    def removeClient(self, client):
+        """
+        Remove a client from the network loop. The client is not reconnected
+        anymore, its socket is released once closed.
+
+        Params:
+            client:         The MQTT client.
+        """
+        self.loop.call_soon_threadsafe(self.clients.discard, client)
+
+    def getClientCount(self):
+        """
+        Get the number of clients handled by the network loop.
+
+        Return:
+            The number of clients.
+        """
+        return len(self.clients)
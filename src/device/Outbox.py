@@ -0,0 +1,70 @@
+import collections
+import threading
+
+import paho.mqtt.client as mqtt
+
+
+class Outbox:
+    """
+    The outbound message buffer class. The QoS 0 messages published while
+    the client is disconnected are dropped by paho, so they are buffered,
+    up to the outbox capacity (the oldest ones are dropped first), and
+    flushed in order once reconnected. The QoS 1 and 2 messages are kept
+    by paho itself, its queue being bounded to the same capacity.
+    """
+    DEFAULT_CAPACITY = 100
+
+    def __init__(self, client, capacity=DEFAULT_CAPACITY):
+        """
+        Constructor.
+
+        Params:
+            client:         The MQTT client.
+            capacity:       The maximum number of buffered messages
+                            (optional).
+        """
+        self.client = client
+        self.messages = collections.deque(maxlen=capacity)
+        self.dropped = 0
+        self.lock = threading.Lock()
+        client.max_queued_messages_set(capacity)
+
+    def publish(self, topic, payload, properties=None):
+        """
+        Publish a QoS 0 message, buffered if the client is disconnected.
+
+        Params:
+            topic:          The message topic.
+            payload:        The message payload.
+            properties:     The MQTT v5 properties (optional).
+        """
+        if properties is None:
+            info = self.client.publish(topic, payload=payload)
+        else:
+            info = self.client.publish(topic, payload=payload,
+                                       properties=properties)
+        if info.rc == mqtt.MQTT_ERR_NO_CONN:
+            with self.lock:
+                if len(self.messages) == self.messages.maxlen:
+                    self.dropped += 1
+                self.messages.append((topic, payload, properties))
+
+    def flush(self):
+        """
+        Publish the buffered messages in order, once reconnected.
+        """
+        with self.lock:
+            messages = list(self.messages)
+            self.messages.clear()
+        for topic, payload, properties in messages:
+            self.publish(topic, payload, properties)
+
+    def getStats(self):
+        """
+        Get the outbox metrics.
+
+        Return:
+            The buffered and dropped message counts.
+        """
+        with self.lock:
+            return {'buffered': len(self.messages), 'dropped': self.dropped}
@@ -0,0 +1,160 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    The token bucket record of a rate limit: the bucket holds up to burst
+    tokens and refills at rate tokens per second, each command taking one.
+    """
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate, burst, now):
+        """
+        Constructor.
+
+        Params:
+            rate:           The refill rate in tokens per second.
+            burst:          The bucket capacity.
+            now:            The current time (time.monotonic).
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = now
+
+    def refill(self, now):
+        """
+        Refill the bucket for the time elapsed since the last refill.
+
+        Params:
+            now:            The current time (time.monotonic).
+        """
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+
+class RateLimiter:
+    """
+    The rate limiter class. The commands are limited by token buckets per
+    device, per output and globally, before they enter the transmit queue,
+    so a flooded device cannot monopolize its output or the pigpio daemon.
+    A command is admitted only if all its buckets have a token. A batch
+    larger than a bucket is charged the whole bucket, so it is admitted
+    once the bucket is full instead of being throttled forever.
+    """
+    SCOPE_GLOBAL = 'global'
+    SCOPE_OUTPUT = 'outputs'
+    SCOPE_DEVICE = 'devices'
+
+    def __init__(self, globalLimit=None, outputLimits=None):
+        """
+        Constructor.
+
+        Params:
+            globalLimit:    The global limit {rate, burst} (optional).
+            outputLimits:   The limits {rate, burst}, by output name
+                            (optional).
+        """
+        self.globalLimit = globalLimit
+        self.outputLimits = outputLimits if outputLimits is not None else {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.throttled = {self.SCOPE_GLOBAL: 0, self.SCOPE_OUTPUT: {},
+                          self.SCOPE_DEVICE: {}}
+
+    @classmethod
+    def fromConfig(cls, appConfig):
+        """
+        Build the rate limiter of the hardware configuration.
+
+        Params:
+            appConfig:      The application configuration.
+
+        Return:
+            The rate limiter.
+        """
+        return cls(appConfig.getRateLimit(), appConfig.getOutputRateLimits())
+
+    def _getBucket(self, key, limit, now):
+        """
+        Get the bucket of a limit, (re)created when the limit changes.
+
+        Params:
+            key:            The bucket key, (scope, name).
+            limit:          The limit {rate, burst}, None when unlimited.
+            now:            The current time (time.monotonic).
+
+        Return:
+            The token bucket, None when unlimited.
+        """
+        if limit is None:
+            self.buckets.pop(key, None)
+            return None
+        bucket = self.buckets.get(key)
+        if bucket is None or bucket.rate != limit['rate'] \
+                or bucket.burst != limit['burst']:
+            bucket = TokenBucket(limit['rate'], limit['burst'], now)
+            self.buckets[key] = bucket
+        else:
+            bucket.refill(now)
+        return bucket
+
+    def acquire(self, devices):
+        """
+        Take the tokens of the commands of a transmit queue entry, all or
+        none.
+
+        Params:
+            devices:        The device of each command.
+
+        Return:
+            True if the commands are admitted, False if they are throttled.
+        """
+        now = time.monotonic()
+        with self.lock:
+            needed = {}
+            for device in devices:
+                config = device.config
+                for key, limit in (
+                        ((self.SCOPE_GLOBAL, None), self.globalLimit),
+                        ((self.SCOPE_OUTPUT, config.linkedEmitter),
+                         self.outputLimits.get(config.linkedEmitter)),
+                        ((self.SCOPE_DEVICE, config.clientId),
+                         config.extra.get('rateLimit'))):
+                    if key not in needed:
+                        bucket = self._getBucket(key, limit, now)
+                        if bucket is None:
+                            continue
+                        needed[key] = [bucket, 0]
+                    needed[key][1] += 1
+            for entry in needed.values():
+                entry[1] = min(entry[1], entry[0].burst)
+            throttled = [key for key, (bucket, count) in needed.items()
+                         if bucket.tokens < count]
+            if not throttled:
+                for bucket, count in needed.values():
+                    bucket.tokens -= count
+                return True
+            for scope, name in throttled:
+                if scope == self.SCOPE_GLOBAL:
+                    self.throttled[scope] += 1
+                else:
+                    self.throttled[scope][name] = \
+                        self.throttled[scope].get(name, 0) + 1
+            return False
+
+    def getStats(self):
+        """
+        Get the throttle counters.
+
+        Return:
+            The throttled entry count, globally, by output and by device.
+        """
+        with self.lock:
+            return {
+                self.SCOPE_GLOBAL: self.throttled[self.SCOPE_GLOBAL],
+                self.SCOPE_OUTPUT: dict(self.throttled[self.SCOPE_OUTPUT]),
+                self.SCOPE_DEVICE: dict(self.throttled[self.SCOPE_DEVICE]),
+            }
@@ -0,0 +1,344 @@
+import json
+import threading
+import time
+
+from config.schema import validateScenes
+from exceptions import InvalidConfig, SceneFileAccess, SceneNotFound
+from .Device import Device
+
+
+class PlanChain:
+    """
+    The chain record of a transmission plan: commands transmitted back to
+    back on one output, followed by a delay.
+    """
+    __slots__ = ('jobs', 'steps', 'delay')
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.jobs = []
+        self.steps = []
+        self.delay = 0
+
+
+class ScenePlan:
+    """
+    The compiled transmission plan of a scene. The steps are grouped in
+    lanes, one per output: the lanes run in parallel, the chains of a lane
+    run in order.
+    """
+    __slots__ = ('name', 'steps', 'lanes', 'generation', 'devices')
+
+    def __init__(self, name, steps, lanes, generation, devices):
+        """
+        Constructor.
+
+        Params:
+            name:           The scene name.
+            steps:          The scene steps.
+            lanes:          The chain lists, by output.
+            generation:     The device list generation at compilation.
+            devices:        The (device, generation) used by the plan.
+        """
+        self.name = name
+        self.steps = steps
+        self.lanes = lanes
+        self.generation = generation
+        self.devices = devices
+
+
+class SceneRun:
+    """
+    The record of a running scene: the results of its steps and the number
+    of its lanes still running.
+    """
+    __slots__ = ('plan', 'callback', 'start', 'results', 'lanes', 'lock')
+
+    def __init__(self, plan, callback):
+        """
+        Constructor, the scene being started.
+
+        Params:
+            plan:           The scene plan.
+            callback:       The function called with the scene result.
+        """
+        self.plan = plan
+        self.callback = callback
+        self.start = time.monotonic()
+        self.results = [(True, 0)] * len(plan.steps)
+        self.lanes = len(plan.lanes)
+        self.lock = threading.Lock()
+
+
+class SceneManager:
+    """
+    The scene manager class. The scenes are named lists of steps (device,
+    command, repeat and delay), compiled once into transmission plans and
+    triggered with a single message. A running scene holds no thread: each
+    chain is sent from the completion of the previous one, the delays being
+    timed on the shared network loop.
+    """
+    SCENES_FILE = './config/components/scenes.json'
+    SCENE_TOPIC = 'scene'
+
+    def __init__(self, logger, devManager, netLoop=None):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            devManager:     The device manager.
+            netLoop:        The shared network loop timing the step delays
+                            (optional). When not provided, a timer thread
+                            times each delay.
+
+        Raise:
+            SceneFileAccess if the access to the scene file failed.
+            InvalidConfig if the scenes are invalid.
+        """
+        self.logger = logger.getLogger('SceneManager')
+        self.devManager = devManager
+        self.netLoop = netLoop
+        self.gateway = None
+        self.plans = {}
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.SCENES_FILE) as scenesFile:
+                scenes = json.loads(scenesFile.read())
+        except FileNotFoundError:
+            scenes = []
+        except (OSError, ValueError):
+            raise SceneFileAccess('unable to access scene file')
+        validateScenes(scenes)
+        self.scenes = {scene['name']: scene['steps'] for scene in scenes}
+        self.logger.info(f"Loaded {len(self.scenes)} scenes")
+
+    def _compile(self, name):
+        """
+        Compile a scene into its transmission plan. The consecutive steps of
+        an output are chained until a step has a delay.
+
+        Params:
+            name:           The scene name.
+
+        Return:
+            The scene plan.
+
+        Raise:
+            SceneNotFound if the scene does not exist.
+            InvalidConfig if a scene step is invalid.
+        """
+        if name not in self.scenes:
+            raise SceneNotFound(name)
+        steps = self.scenes[name]
+        generation = self.devManager.getGeneration()
+        devices = {f"{device.getLocation()}.{device.getName()}": device
+                   for device in self.devManager.getDevices()}
+        lanes = {}
+        used = {}
+        for idx, step in enumerate(steps):
+            device = devices.get(step['device'])
+            if device is None:
+                raise InvalidConfig('scenes', f"{name}.steps[{idx}].device",
+                                    f"device {step['device']} not found")
+            if step['command'] not in device.getCommandList():
+                raise InvalidConfig('scenes', f"{name}.steps[{idx}].command",
+                                    f"command {step['command']} not "
+                                    f"supported")
+            used[step['device']] = (device, device.getGeneration())
+            lane = lanes.setdefault(device.getConfig()['linkedEmitter'], [])
+            if not lane or lane[-1].delay:
+                lane.append(PlanChain())
+            repeat = step.get('repeat', 1)
+            lane[-1].jobs.extend([(device, step['command'])] * repeat)
+            lane[-1].steps.extend([idx] * repeat)
+            lane[-1].delay = step.get('delay', 0)
+        return ScenePlan(name, steps, lanes, generation, list(used.values()))
+
+    def _isValid(self, plan):
+        """
+        Check if a plan is still valid: no device was added, removed or
+        changed since its compilation.
+
+        Params:
+            plan:           The scene plan.
+
+        Return:
+            True if the plan is still valid, False otherwise.
+        """
+        return plan.generation == self.devManager.getGeneration() \
+            and all(device.getGeneration() == generation
+                    for device, generation in plan.devices)
+
+    def getPlan(self, name):
+        """
+        Get the transmission plan of a scene, compiling it if needed.
+
+        Params:
+            name:           The scene name.
+
+        Return:
+            The scene plan.
+
+        Raise:
+            SceneNotFound if the scene does not exist.
+            InvalidConfig if a scene step is invalid.
+        """
+        with self.lock:
+            plan = self.plans.get(name)
+            if plan is None or not self._isValid(plan):
+                self.logger.debug(f"Compiling scene {name}")
+                plan = self._compile(name)
+                self.plans[name] = plan
+            return plan
+
+    def _callLater(self, delay, callback, *args):
+        """
+        Call a function after a delay, right away without delay.
+
+        Params:
+            delay:          The delay in seconds.
+            callback:       The function.
+            args:           The function arguments.
+        """
+        if not delay:
+            callback(*args)
+        elif self.netLoop is not None:
+            self.netLoop.callLater(delay, callback, *args)
+        else:
+            timer = threading.Timer(delay, callback, args=args)
+            timer.daemon = True
+            timer.start()
+
+    def _runChain(self, run, lane, idx):
+        """
+        Send a chain of a lane, the next one being sent once it is done and
+        its delay elapsed.
+
+        Params:
+            run:            The scene run.
+            lane:           The chain list.
+            idx:            The chain index, the lane being done past its
+                            last chain.
+        """
+        if idx == len(lane):
+            self._onLaneDone(run)
+            return
+        self.devManager.sendJobs(lane[idx].jobs, lambda chainResults:
+                                 self._onChainDone(run, lane, idx,
+                                                   chainResults))
+
+    def _onChainDone(self, run, lane, idx, chainResults):
+        """
+        Record the results of a chain and run the next one after its delay.
+
+        Params:
+            run:            The scene run.
+            lane:           The chain list.
+            idx:            The chain index.
+            chainResults:   The (result, duration) of each chain command.
+        """
+        chain = lane[idx]
+        with run.lock:
+            for step, (success, duration) in zip(chain.steps, chainResults):
+                stepSuccess, stepDuration = run.results[step]
+                run.results[step] = (stepSuccess and success,
+                                     stepDuration + duration)
+        self._callLater(chain.delay, self._runChain, run, lane, idx + 1)
+
+    def _onLaneDone(self, run):
+        """
+        Report the scene result once its last lane is done.
+
+        Params:
+            run:            The scene run.
+        """
+        with run.lock:
+            run.lanes -= 1
+            if run.lanes > 0:
+                return
+        self._report(run)
+
+    def _report(self, run):
+        """
+        Report the result of a scene run.
+
+        Params:
+            run:            The scene run.
+        """
+        items = []
+        for step, (success, duration) in zip(run.plan.steps, run.results):
+            items.append({
+                'device': step['device'],
+                'command': step['command'],
+                'result': Device.getResultMsg(success),
+                'elapsed': duration,
+            })
+        success = all(success for success, duration in run.results)
+        run.callback({
+            'scene': run.plan.name,
+            'result': Device.SUCCESS_MSG if success else Device.ERROR_MSG,
+            'elapsed': time.monotonic() - run.start,
+            'items': items,
+        })
+
+    def getScenes(self):
+        """
+        Get the scenes.
+
+        Return:
+            The scene steps, by scene name.
+        """
+        return self.scenes
+
+    def runScene(self, name, callback):
+        """
+        Trigger a scene. The scene runs in the background and its result is
+        reported once all its steps are done.
+
+        Params:
+            name:           The scene name.
+            callback:       The function called with the scene result.
+
+        Raise:
+            SceneNotFound if the scene does not exist.
+            InvalidConfig if a scene step is invalid.
+        """
+        self.logger.info(f"Running scene {name}")
+        plan = self.getPlan(name)
+        run = SceneRun(plan, callback)
+        if not plan.lanes:
+            self._report(run)
+        for lane in plan.lanes.values():
+            self._runChain(run, lane, 0)
+
+    def _onSceneMessage(self, payload):
+        """
+        Handle a scene trigger, the payload being the scene name.
+
+        Params:
+            payload:        The message payload.
+        """
+        try:
+            self.runScene(payload.strip(), lambda result:
+                          self.gateway.publishResult(self.SCENE_TOPIC,
+                                                     result))
+        except (SceneNotFound, InvalidConfig) as e:
+            self.logger.warning(str(e))
+            self.gateway.publishResult(self.SCENE_TOPIC,
+                                       {'scene': payload.strip(),
+                                        'result': self.gateway.INVALID_MSG,
+                                        'message': str(e)})
+
+    def registerTopics(self, gateway):
+        """
+        Serve the scene triggers on the gateway scene topic.
+
+        Params:
+            gateway:        The gateway.
+        """
+        self.gateway = gateway
+        gateway.addHandler(self.SCENE_TOPIC, self._onSceneMessage)
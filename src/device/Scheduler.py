@@ -0,0 +1,450 @@
+import datetime
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+
+from config.schema import validateSchedule
+from exceptions import InvalidCommandBatch, InvalidConfig, \
+    SceneNotFound, ScheduleFileAccess
+from .Metrics import registry
+
+
+FILE_IO_TIME = registry.histogram('piir_file_io_seconds',
+                                  'The file access durations, by operation.')
+
+
+class Scheduler:
+    """
+    The command scheduler class. The jobs send a command or trigger a scene
+    once (at a given time or after a delay) or on a recurring basis (at a
+    fixed interval or at a time of day). The interval jobs are anchored to
+    their first fire time (start), saved with the job, so they keep their
+    phase across the restarts. The pending fire times are kept in a heap,
+    so adding a job is O(log n), and the jobs are fired on the shared
+    network loop, by a tick armed for the next due job only.
+    """
+    SCHEDULES_FILE = './config/components/schedules.json'
+    SCHEDULE_TOPIC = 'schedule'
+
+    OP_ADD = 'add'
+    OP_REMOVE = 'remove'
+    OP_LIST = 'list'
+
+    TIMING_KEYS = ('at', 'delay', 'interval', 'time')
+
+    def __init__(self, logger, devManager, netLoop, sceneMngr=None):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            devManager:     The device manager.
+            netLoop:        The shared network loop firing the jobs.
+            sceneMngr:      The scene manager (optional).
+
+        Raise:
+            ScheduleFileAccess if the access to the schedule file failed.
+            InvalidConfig if a job is invalid.
+        """
+        self.logger = logger.getLogger('Scheduler')
+        self.devManager = devManager
+        self.netLoop = netLoop
+        self.sceneMngr = sceneMngr
+        self.gateway = None
+        self.jobs = {}
+        self.heap = []
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.tickId = None
+        self.armedTime = None
+        self.stats = {'fired': 0, 'jitterMax': 0.0, 'jitterTotal': 0.0}
+
+        try:
+            with open(self.SCHEDULES_FILE) as schedulesFile:
+                jobs = json.loads(schedulesFile.read())
+        except FileNotFoundError:
+            jobs = []
+        except (OSError, ValueError):
+            raise ScheduleFileAccess('unable to access schedule file')
+        now = time.time()
+        for job in jobs:
+            self._validateJob(job)
+            self._schedule(dict(job), now)
+        if [entry[0] for entry in self.jobs.values()] != jobs:
+            self._save()
+        self.logger.info(f"Loaded {len(self.jobs)} scheduled jobs")
+
+    def _validateJob(self, job):
+        """
+        Validate a job: one action (device command or scene) and one timing.
+
+        Params:
+            job:            The job.
+
+        Raise:
+            InvalidConfig if the job is invalid.
+        """
+        validateSchedule(job)
+        hasCommand = 'device' in job and 'command' in job
+        if hasCommand == ('scene' in job) \
+                or ('device' in job) != ('command' in job):
+            raise InvalidConfig('schedule', 'action',
+                                'expected device and command, or scene')
+        timings = [key for key in self.TIMING_KEYS if key in job]
+        if len(timings) != 1:
+            raise InvalidConfig('schedule', 'timing', 'expected one of '
+                                f"{', '.join(self.TIMING_KEYS)}")
+        if 'interval' in job and job['interval'] <= 0:
+            raise InvalidConfig('schedule', 'interval', 'expected > 0')
+        if 'start' in job and 'interval' not in job:
+            raise InvalidConfig('schedule', 'start', 'expected with interval')
+        if 'days' in job and 'time' not in job:
+            raise InvalidConfig('schedule', 'days', 'expected with time')
+        if 'time' in job:
+            try:
+                datetime.datetime.strptime(job['time'], '%H:%M')
+            except ValueError:
+                raise InvalidConfig('schedule', 'time', 'expected HH:MM')
+        if 'days' in job and (not job['days'] or any(
+                day not in range(7) for day in job['days'])):
+            raise InvalidConfig('schedule', 'days', 'expected 0 (Monday) '
+                                'to 6 (Sunday)')
+
+    def _getNextTime(self, job, now, fired=None):
+        """
+        Get the next fire time of a job.
+
+        Params:
+            job:            The job.
+            now:            The current time (epoch).
+            fired:          The last fire time (epoch), None before the
+                            first fire.
+
+        Return:
+            The next fire time (epoch), None if the job is done.
+        """
+        if 'at' in job:
+            return job['at'] if fired is None else None
+        if 'interval' in job:
+            elapsed = int((now - job['start']) // job['interval']) + 1
+            return job['start'] + max(elapsed, 0) * job['interval']
+        hour, minute = (int(part) for part in job['time'].split(':'))
+        days = job.get('days', range(7))
+        day = datetime.datetime.fromtimestamp(now)
+        for offset in range(8):
+            fireTime = (day + datetime.timedelta(days=offset)).replace(
+                hour=hour, minute=minute, second=0, microsecond=0)
+            if fireTime.weekday() in days and fireTime.timestamp() > now:
+                return fireTime.timestamp()
+        return None
+
+    def _schedule(self, job, now):
+        """
+        Register a job and push its first fire time. The delays are turned
+        into fire times and the interval jobs are anchored to their first
+        fire time, so they survive the restarts.
+
+        Params:
+            job:            The validated job (a copy the scheduler owns).
+            now:            The current time (epoch).
+
+        Return:
+            The registered job.
+        """
+        if 'delay' in job:
+            job['at'] = now + job.pop('delay')
+        if 'interval' in job:
+            job.setdefault('start', now + job['interval'])
+        job.setdefault('id', uuid.uuid4().hex)
+        self.jobs[job['id']] = [job, None, None]
+        self._push(job['id'], self._getNextTime(job, now))
+        return job
+
+    def _push(self, jobId, fireTime):
+        """
+        Push the next fire time of a job. The heap entries of the previous
+        fire times of the job become stale and are skipped.
+
+        Params:
+            jobId:          The job ID.
+            fireTime:       The next fire time (epoch).
+        """
+        seq = next(self.seq)
+        entry = self.jobs[jobId]
+        entry[1] = fireTime
+        entry[2] = seq
+        heapq.heappush(self.heap, (fireTime, seq, jobId))
+
+    def _save(self):
+        """
+        Save the scheduled jobs.
+        """
+        start = time.monotonic()
+        try:
+            with open(self.SCHEDULES_FILE, 'w') as schedulesFile:
+                schedulesFile.write(json.dumps([entry[0] for entry
+                                                in self.jobs.values()],
+                                               sort_keys=True, indent=2))
+        except OSError as e:
+            self.logger.error(f"Unable to save the schedules: {e}")
+            return
+        FILE_IO_TIME.observe(time.monotonic() - start, op='saveSchedules')
+
+    def _fire(self, job):
+        """
+        Run the action of a job.
+
+        Params:
+            job:            The job.
+        """
+        try:
+            if 'scene' not in job:
+                self.devManager.sendCommands([{'device': job['device'],
+                                               'command': job['command']}],
+                                             self._logResult)
+            elif self.sceneMngr is not None:
+                self.sceneMngr.runScene(job['scene'], self._logResult)
+            else:
+                self.logger.error(f"Job {job['id']} failed: no scenes")
+        except (InvalidCommandBatch, InvalidConfig, SceneNotFound) as e:
+            self.logger.error(f"Job {job['id']} failed: {e}")
+
+    def _logResult(self, result):
+        """
+        Log the result of a job action.
+
+        Params:
+            result:         The action result.
+        """
+        self.logger.debug('Job result: %s', result)
+
+    def _popDueJobs(self, now):
+        """
+        Pop the due jobs and schedule their next fire time (lock held).
+
+        Params:
+            now:            The current time (epoch).
+
+        Return:
+            The list of due jobs.
+        """
+        jobs = []
+        done = False
+        while self.heap and self.heap[0][0] <= now:
+            fireTime, seq, jobId = heapq.heappop(self.heap)
+            entry = self.jobs.get(jobId)
+            if entry is None or entry[2] != seq:
+                continue
+            jitter = now - fireTime
+            self.stats['fired'] += 1
+            self.stats['jitterTotal'] += jitter
+            self.stats['jitterMax'] = max(self.stats['jitterMax'], jitter)
+            self.logger.info(f"Firing job {jobId} (jitter "
+                             f"{jitter * 1000:.1f}ms)")
+            job = entry[0]
+            nextTime = self._getNextTime(job, now, fireTime)
+            if nextTime is None:
+                del self.jobs[jobId]
+                done = True
+            else:
+                self._push(jobId, nextTime)
+            jobs.append(job)
+        if done:
+            self._save()
+        return jobs
+
+    def _arm(self):
+        """
+        Arm the tick of the next due job on the network loop, unless a tick
+        is already armed for it or an earlier job (lock held).
+        """
+        if self.tickId is None or not self.heap:
+            return
+        fireTime = self.heap[0][0]
+        if self.armedTime is not None and self.armedTime <= fireTime:
+            return
+        self.armedTime = fireTime
+        self.netLoop.callLater(max(fireTime - time.time(), 0), self._tick,
+                               self.tickId)
+
+    def _tick(self, tickId):
+        """
+        Fire the due jobs and arm the tick of the next one (network loop
+        thread).
+
+        Params:
+            tickId:         The ID of the run the tick belongs to.
+        """
+        with self.lock:
+            if tickId is not self.tickId:
+                return
+            self.armedTime = None
+            jobs = self._popDueJobs(time.time())
+            self._arm()
+        for job in jobs:
+            self._fire(job)
+
+    def start(self):
+        """
+        Start firing the jobs.
+        """
+        self.logger.info('Starting scheduler')
+        with self.lock:
+            self.tickId = object()
+            self.armedTime = None
+            self._arm()
+
+    def stop(self):
+        """
+        Stop firing the jobs, the armed tick being ignored.
+        """
+        with self.lock:
+            if self.tickId is None:
+                return
+            self.logger.info('Stopping scheduler')
+            self.tickId = None
+
+    def addJob(self, job):
+        """
+        Add a job and save the schedules. A job with the ID of an existing
+        one replaces it.
+
+        Params:
+            job:            The job: device and command or scene, with at
+                            (epoch), delay (seconds), interval (seconds,
+                            with an optional start epoch) or time (HH:MM,
+                            with optional days, 0 is Monday), and an
+                            optional id.
+
+        Return:
+            The scheduled job, with its ID.
+
+        Raise:
+            InvalidConfig if the job is invalid.
+        """
+        self._validateJob(job)
+        with self.lock:
+            job = self._schedule(dict(job), time.time())
+            self._save()
+            self._arm()
+        return job
+
+    def removeJob(self, jobId):
+        """
+        Remove a job and save the schedules.
+
+        Params:
+            jobId:          The job ID.
+
+        Return:
+            True if the job was removed, False if it does not exist.
+        """
+        with self.lock:
+            if self.jobs.pop(jobId, None) is None:
+                return False
+            self._save()
+        return True
+
+    def getJobs(self):
+        """
+        Get the scheduled jobs.
+
+        Return:
+            The list of jobs with their next fire time (next).
+        """
+        with self.lock:
+            return [dict(job, next=fireTime)
+                    for job, fireTime, seq in self.jobs.values()]
+
+    def getStats(self):
+        """
+        Get the scheduler metrics.
+
+        Return:
+            The pending job count, the fired job count and the maximum and
+            average fire time jitter in seconds.
+        """
+        with self.lock:
+            fired = self.stats['fired']
+            return {
+                'pending': len(self.jobs),
+                'fired': fired,
+                'jitterMax': self.stats['jitterMax'],
+                'jitterAvg': self.stats['jitterTotal'] / fired
+                if fired else 0.0,
+            }
+
+    def collectMetrics(self):
+        """
+        Collect the scheduler metrics of the metrics registry.
+
+        Return:
+            The pending and fired job counts and the fire time jitter.
+        """
+        stats = self.getStats()
+        return [
+            ('piir_schedule_pending', 'gauge', 'The scheduled jobs.',
+             [({}, stats['pending'])]),
+            ('piir_schedule_fired_total', 'counter', 'The fired jobs.',
+             [({}, stats['fired'])]),
+            ('piir_schedule_jitter_seconds', 'gauge',
+             'The fire time jitter of the jobs, by statistic.',
+             [({'stat': 'max'}, stats['jitterMax']),
+              ({'stat': 'avg'}, stats['jitterAvg'])]),
+        ]
+
+    def handleRequest(self, request):
+        """
+        Handle a schedule management request.
+
+        Params:
+            request:        The request: {op: add, job}, {op: remove, id}
+                            or {op: list}.
+
+        Return:
+            The request result.
+        """
+        op = request.get('op') if type(request) is dict else None
+        try:
+            if op == self.OP_ADD:
+                return {'op': op, 'result': 'success',
+                        'job': self.addJob(request.get('job'))}
+            if op == self.OP_REMOVE:
+                removed = self.removeJob(request.get('id'))
+                return {'op': op, 'id': request.get('id'),
+                        'result': 'success' if removed else 'failed'}
+            if op == self.OP_LIST:
+                return {'op': op, 'result': 'success',
+                        'jobs': self.getJobs()}
+        except InvalidConfig as e:
+            return {'op': op, 'result': 'invalid', 'message': str(e)}
+        return {'op': op, 'result': 'invalid', 'message': 'unknown op'}
+
+    def _onScheduleMessage(self, payload):
+        """
+        Handle a schedule management request message.
+
+        Params:
+            payload:        The message payload.
+        """
+        try:
+            request = json.loads(payload)
+        except ValueError as e:
+            request = None
+            self.logger.warning(str(e))
+        self.gateway.publishResult(self.SCHEDULE_TOPIC,
+                                   self.handleRequest(request))
+
+    def registerTopics(self, gateway):
+        """
+        Serve the schedule management requests on the gateway schedule
+        topic.
+
+        Params:
+            gateway:        The gateway.
+        """
+        self.gateway = gateway
+        gateway.addHandler(self.SCHEDULE_TOPIC, self._onScheduleMessage)
@@ -0,0 +1,960 @@
+import itertools
+import multiprocessing
+import pickle
+import queue
+import threading
+
+from exceptions import ShardError
+from logger import forwardWorkerLogs, initWorkerLogger
+from .Device import Device
+from .DeviceConfig import DeviceConfig
+from .Metrics import registry
+from .NetworkLoop import NetworkLoop
+from .RateLimiter import RateLimiter
+from .Tracer import tracer
+from .Transmitter import Transmitter
+from .ViewCache import ViewCache
+
+
+def _getPortableError(error):
+    """
+    Get an error that can be sent to the coordinator, the errors that do
+    not survive pickling being replaced by a shard error.
+
+    Params:
+        error:          The error raised by a request.
+
+    Return:
+        The error to send.
+    """
+    try:
+        copy = pickle.loads(pickle.dumps(error))
+    except Exception:
+        copy = None
+    if copy is None or str(copy) != str(error):
+        return ShardError(f"{type(error).__name__}: {error}")
+    return copy
+
+
+class _ShardWorker:
+    """
+    The shard worker class. Serve the coordinator requests in the worker
+    process, each request getting a reply (result or error) carrying its
+    sequence number.
+    """
+    # The device methods the coordinator can call through REQ_CALL.
+    DEVICE_CALLS = frozenset(('getCommandList', 'getState', 'getStates',
+                              'getQueueDepth', 'getPriority',
+                              'getOutboxStats', 'getPredictedState',
+                              'addCommand', 'deleteCommand',
+                              'saveCommandSet'))
+
+    def __init__(self, logger, appConfig, devsConfig, conn, emitLock):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            appConfig:      The application configuration.
+            devsConfig:     The configurations of the shard devices.
+            conn:           The connection to the coordinator.
+            emitLock:       The lock serializing the emissions of all the
+                            shards.
+        """
+        self.logger = logger.getLogger('ShardWorker')
+        self.conn = conn
+        self.sendLock = threading.Lock()
+        self.seq = None
+        self.running = True
+        self.netLoop = NetworkLoop(logger)
+        self.transmitter = Transmitter(
+            logger, emitLock=emitLock,
+            rateLimiter=RateLimiter.fromConfig(appConfig))
+        self.devices = [Device(logger, appConfig, devConfig,
+                               netLoop=self.netLoop,
+                               transmitter=self.transmitter)
+                        for devConfig in devsConfig]
+        for devIdx, device in enumerate(self.devices):
+            device.setEventCallback(
+                lambda device, event, data, devIdx=devIdx:
+                self._onDeviceEvent(devIdx, event, data))
+        self.handlers = {
+            ShardManager.REQ_START_LOOPS: self._startLoops,
+            ShardManager.REQ_STOP_LOOPS: self._stopLoops,
+            ShardManager.REQ_SET_CONFIG: self._setConfig,
+            ShardManager.REQ_SEND_COMMAND: self._sendCommand,
+            ShardManager.REQ_CALL: self._call,
+            ShardManager.REQ_STATS: self._getStats,
+            ShardManager.REQ_STATES: self._getStates,
+            ShardManager.REQ_TRACES: self._getTraces,
+            ShardManager.REQ_EXIT: self._exit,
+        }
+
+    def _send(self, kind, key, payload):
+        """
+        Send a message to the coordinator, from any worker thread.
+
+        Params:
+            kind:           The message kind.
+            key:            The message key (request sequence number or
+                            device index).
+            payload:        The message payload.
+        """
+        with self.sendLock:
+            self.conn.send((kind, key, payload))
+
+    def _reply(self, seq, success, result):
+        """
+        Send the reply of a request.
+
+        Params:
+            seq:            The request sequence number.
+            success:        The flag indicating the request success.
+            result:         The request result, or its error.
+        """
+        self._send(ShardManager.MSG_REPLY, seq, (success, result))
+
+    def _onDeviceEvent(self, devIdx, event, data):
+        """
+        Forward a device event to the coordinator. The configuration
+        changes are reported by the device proxies themselves.
+
+        Params:
+            devIdx:         The device index in the shard.
+            event:          The event type.
+            data:           The event data.
+        """
+        if event == Device.EVT_CONFIG:
+            return
+        try:
+            self._send(ShardManager.MSG_EVENT, devIdx, (event, data))
+        except OSError:
+            pass
+
+    def _startLoops(self):
+        """
+        Start the device loops.
+        """
+        for device in self.devices:
+            device.startLoop()
+
+    def _stopLoops(self):
+        """
+        Stop the device loops.
+        """
+        for device in self.devices:
+            device.stopLoop()
+
+    def _setConfig(self, devIdx, config):
+        """
+        Set a device configuration.
+
+        Params:
+            devIdx:         The device index in the shard.
+            config:         The device configuration.
+        """
+        self.devices[devIdx].setConfig(config)
+
+    def _sendCommand(self, devIdx, command, wait):
+        """
+        Send a command, the reply being sent once it is transmitted when the
+        coordinator waits for its result.
+
+        Params:
+            devIdx:         The device index in the shard.
+            command:        The command name.
+            wait:           The flag requesting the transmission result.
+
+        Return:
+            PENDING when the reply is sent by the command callback.
+        """
+        if not wait:
+            self.devices[devIdx].sendCommand(command)
+            return None
+        seq = self.seq
+        self.devices[devIdx].sendCommand(
+            command, lambda success: self._reply(seq, True, success))
+        return ShardManager.PENDING
+
+    def _call(self, devIdx, method, *args):
+        """
+        Call a device method.
+
+        Params:
+            devIdx:         The device index in the shard.
+            method:         The device method name (DEVICE_CALLS).
+            args:           The method arguments.
+
+        Return:
+            The method result.
+
+        Raise:
+            ShardError if the method cannot be called remotely.
+        """
+        if method not in self.DEVICE_CALLS:
+            raise ShardError(f"unknown device method {method}")
+        return getattr(self.devices[devIdx], method)(*args)
+
+    def _getStats(self):
+        """
+        Get the shard metrics.
+
+        Return:
+            The device count, transmit queue depth, device startup
+            timings and metrics registry snapshot.
+        """
+        return {
+            'devices': len(self.devices),
+            'queueDepth': self.transmitter.getQueueDepth(),
+            'timings': [device.getStartupTimings()
+                        for device in self.devices],
+            'metrics': registry.getSnapshot(),
+        }
+
+    def _getStates(self):
+        """
+        Get the device states.
+
+        Return:
+            The (state, queue depth) of each device.
+        """
+        return [(device.getState(), device.getQueueDepth())
+                for device in self.devices]
+
+    def _getTraces(self, traceId):
+        """
+        Get the command traces recorded in the shard.
+
+        Params:
+            traceId:        The ID of the trace to get, None for all the
+                            traces.
+
+        Return:
+            The traces.
+        """
+        return tracer.getTraces(traceId=traceId)
+
+    def _exit(self):
+        """
+        Stop serving the requests.
+        """
+        self.running = False
+
+    def _handle(self, request, args):
+        """
+        Handle a request, its errors being returned to the coordinator.
+
+        Params:
+            request:        The request ID.
+            args:           The request arguments.
+
+        Return:
+            The success flag and the result (or error) of the request.
+        """
+        handler = self.handlers.get(request)
+        try:
+            if handler is None:
+                raise ShardError(f"unknown request {request}")
+            return True, handler(*args)
+        except Exception as e:
+            self.logger.exception(f"Request {request} failed")
+            return False, _getPortableError(e)
+
+    def run(self):
+        """
+        Serve the coordinator requests until asked to exit or until the
+        coordinator is gone.
+        """
+        self.netLoop.start()
+        self.transmitter.start()
+        while self.running:
+            try:
+                self.seq, request, args = self.conn.recv()
+                success, result = self._handle(request, args)
+                if result is ShardManager.PENDING:
+                    continue
+                try:
+                    self._reply(self.seq, success, result)
+                except (pickle.PicklingError, TypeError,
+                        AttributeError) as e:
+                    self._reply(self.seq, False, ShardError(
+                        f"unable to send the {request} reply: {e}"))
+            except (EOFError, OSError):
+                self.logger.warning('Coordinator gone, exiting')
+                break
+        self.netLoop.stop()
+        self.transmitter.stop()
+        self.conn.close()
+
+
+def _runShard(logger, appConfig, devsConfig, conn, emitLock, logQueue):
+    """
+    Run a shard of devices (worker process). The shard owns its network
+    loop and transmitter and serves the coordinator requests until it is
+    asked to exit. Its log records are written by the coordinator, its
+    metrics and command traces are exported by the coordinator.
+
+    Params:
+        logger:         The logging instance.
+        appConfig:      The application configuration.
+        devsConfig:     The configurations of the shard devices.
+        conn:           The connection to the coordinator.
+        emitLock:       The lock serializing the emissions of all the shards.
+        logQueue:       The queue of the log records sent to the
+                        coordinator.
+    """
+    initWorkerLogger(logQueue)
+    registry.clear()
+    tracer.clear()
+    _ShardWorker(logger, appConfig, devsConfig, conn, emitLock).run()
+
+
+class DeviceProxy:
+    """
+    The device proxy class. Expose a device running in a shard with the
+    Device interface used by the coordinator (API, catalog). The transmit
+    jobs stay in the shard, the command batches are sent command by command.
+    """
+    def __init__(self, shard, devIdx, devConfig):
+        """
+        Constructor.
+
+        Params:
+            shard:          The shard running the device.
+            devIdx:         The device index in its shard.
+            devConfig:      The device configuration.
+        """
+        self.shard = shard
+        self.devIdx = devIdx
+        self.config = devConfig
+        self.record = DeviceConfig.parse(devConfig)
+        self.views = ViewCache()
+        self.eventCallback = None
+
+    def _call(self, method, *args):
+        """
+        Call a method of the device in its shard.
+
+        Params:
+            method:         The device method name.
+            args:           The method arguments.
+
+        Return:
+            The method result.
+
+        Raise:
+            ShardError if the shard fails to reply.
+        """
+        return self.shard.request(ShardManager.REQ_CALL, self.devIdx, method,
+                                  *args)
+
+    def startLoop(self):
+        """
+        The device loops are started by the shard.
+        """
+        pass
+
+    def stopLoop(self):
+        """
+        The device loops are stopped by the shard.
+        """
+        pass
+
+    def getName(self):
+        """
+        Get the device name.
+
+        Return:
+            The device name.
+        """
+        return self.config['name']
+
+    def getLocation(self):
+        """
+        Get the device location.
+
+        Return:
+            The device location.
+        """
+        return self.config['location']
+
+    def getConfig(self):
+        """
+        Get the device configuration.
+
+        Return:
+            The device configuration.
+        """
+        return self.config
+
+    def getConfigRecord(self):
+        """
+        Get the device configuration record.
+
+        Return:
+            The device configuration record.
+        """
+        return self.record
+
+    def setConfig(self, config):
+        """
+        Set the device configuration, in the coordinator and in the shard.
+
+        Params:
+            config:         The device configuration.
+
+        Raise:
+            InvalidDeviceConfig if the configuration is invalid.
+        """
+        record = DeviceConfig.parse(config)
+        config = record.toDict()
+        self.shard.request(ShardManager.REQ_SET_CONFIG, self.devIdx, config)
+        self.config = config
+        self.record = record
+        self.views.invalidate()
+        if self.eventCallback is not None:
+            self.eventCallback(self, Device.EVT_CONFIG, config)
+
+    def setEventCallback(self, callback):
+        """
+        Set the device event callback. The status and result events are
+        forwarded by the shard, the configuration changes are reported by
+        the proxy.
+
+        Params:
+            callback:           The event callback (None to remove it).
+        """
+        self.eventCallback = callback
+
+    def onShardEvent(self, event, data):
+        """
+        Report a device event forwarded by the shard (shard reader thread).
+
+        Params:
+            event:              The event type.
+            data:               The event data.
+        """
+        if self.eventCallback is not None:
+            self.eventCallback(self, event, data)
+
+    def sendCommand(self, command, callback=None):
+        """
+        Send a command through the shard running the device, without
+        waiting for its transmission.
+
+        Params:
+            command:        The command name.
+            callback:       The function called with the transmission
+                            result (optional), from the shard reader thread.
+                            A shard failure is reported as an error.
+        """
+        def onReply(success, result):
+            if callback is not None:
+                callback(result if success else False)
+        try:
+            self.shard.submit(onReply, ShardManager.REQ_SEND_COMMAND,
+                              self.devIdx, command, callback is not None)
+        except ShardError:
+            onReply(False, None)
+
+    def getPriority(self, command):
+        """
+        Get the priority class of a command from the device shard.
+
+        Params:
+            command:        The command name or state request.
+
+        Return:
+            The priority class of the command.
+        """
+        return self._call('getPriority', command)
+
+    def getCommandList(self):
+        """
+        Get the device command list from its shard. The list is cached until
+        the next command set change and must not be modified.
+
+        Return:
+            The device command list.
+        """
+        return self.views.get('commands',
+                              lambda: self._call('getCommandList'))
+
+    def addCommand(self, command, description):
+        """
+        Add a command to the device in its shard.
+
+        Params:
+            command:        The command name.
+            description:    The command description.
+        """
+        self._call('addCommand', command, description)
+        self.views.invalidate()
+
+    def deleteCommand(self, command):
+        """
+        Delete a command from the device in its shard.
+
+        Params:
+            command:        The command name.
+
+        Raise:
+            ShardError if the command is not supported or the shard fails.
+        """
+        self._call('deleteCommand', command)
+        self.views.invalidate()
+
+    def saveCommandSet(self):
+        """
+        Save the device command set from its shard.
+
+        Return:
+            The save result.
+        """
+        return self._call('saveCommandSet')
+
+    def getGeneration(self):
+        """
+        Get the device generation, incremented on each configuration or
+        command set change made through the proxy.
+
+        Return:
+            The device generation.
+        """
+        return self.views.getGeneration()
+
+    def getState(self):
+        """
+        Get the device runtime state from its shard.
+
+        Return:
+            The device status and last command result.
+        """
+        return self._call('getState')
+
+    def getStates(self):
+        """
+        Get the state declarations of the device command set from its
+        shard. The declarations are cached until the next configuration or
+        command set change and must not be modified.
+
+        Return:
+            The state declarations, by state name.
+        """
+        return self.views.get('states', lambda: self._call('getStates'))
+
+    def getPredictedState(self):
+        """
+        Get the device state predicted from the transmitted commands, from
+        its shard.
+
+        Return:
+            The predicted state values, by state name (None when unknown).
+        """
+        return self._call('getPredictedState')
+
+    def getQueueDepth(self):
+        """
+        Get the number of commands of the device waiting to be sent, from
+        its shard.
+
+        Return:
+            The queued command count.
+        """
+        return self._call('getQueueDepth')
+
+    def getOutboxStats(self):
+        """
+        Get the metrics of the device outbox from its shard.
+
+        Return:
+            The buffered and dropped message counts.
+        """
+        return self._call('getOutboxStats')
+
+    def getStartupTimings(self):
+        """
+        Get the device startup phase timings from its shard.
+
+        Return:
+            The device startup phase timings.
+        """
+        return self.shard.request(ShardManager.REQ_STATS)['timings'][
+            self.devIdx]
+
+
+class Shard:
+    """
+    The shard class. Coordinator side handle of a worker process. The
+    requests carry a sequence number and their replies are dispatched by a
+    reader thread, so concurrent requests do not wait for each other and a
+    dead worker fails the pending requests instead of blocking them.
+    """
+    REQUEST_TIMEOUT = 10.0
+
+    def __init__(self, shardId, logger):
+        """
+        Constructor.
+
+        Params:
+            shardId:        The shard ID.
+            logger:         The logger.
+        """
+        self.shardId = shardId
+        self.logger = logger
+        self.devsConfig = []
+        self.proxies = []
+        self.outputs = set()
+        self.conn = None
+        self.process = None
+        self.reader = None
+        self.alive = False
+        self.seqs = itertools.count()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.sendLock = threading.Lock()
+
+    def attach(self, conn, process):
+        """
+        Attach the started worker process and start reading its replies.
+
+        Params:
+            conn:           The connection to the worker.
+            process:        The worker process.
+        """
+        self.conn = conn
+        self.process = process
+        self.alive = True
+        self.reader = threading.Thread(target=self._read,
+                                       name=f"shard{self.shardId}Reader",
+                                       daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        """
+        Read the worker messages until its connection is closed (reader
+        thread).
+        """
+        while True:
+            try:
+                kind, key, payload = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                self._dispatch(kind, key, payload)
+            except Exception:
+                self.logger.exception(f"Shard {self.shardId} {kind} "
+                                      f"handling failed")
+        self._fail(ShardError(f"shard {self.shardId} worker exited"))
+
+    def _dispatch(self, kind, key, payload):
+        """
+        Dispatch a worker message: a request reply to its callback, a device
+        event to its proxy.
+
+        Params:
+            kind:           The message kind.
+            key:            The message key.
+            payload:        The message payload.
+        """
+        if kind == ShardManager.MSG_REPLY:
+            with self.lock:
+                callback = self.pending.pop(key, None)
+            if callback is not None:
+                callback(*payload)
+        elif kind == ShardManager.MSG_EVENT:
+            self.proxies[key].onShardEvent(*payload)
+
+    def _fail(self, error):
+        """
+        Mark the worker as dead and fail its pending requests.
+
+        Params:
+            error:          The error of the pending requests.
+        """
+        with self.lock:
+            self.alive = False
+            pending = self.pending
+            self.pending = {}
+        for callback in pending.values():
+            callback(False, error)
+
+    def submit(self, callback, request, *args):
+        """
+        Send a request to the shard without waiting for its reply.
+
+        Params:
+            callback:       The function called with the success flag and
+                            the result (or error) of the request, from the
+                            reader thread.
+            request:        The request ID.
+            args:           The request arguments.
+
+        Return:
+            The request sequence number.
+
+        Raise:
+            ShardError if the worker is not running.
+        """
+        with self.lock:
+            if not self.alive:
+                raise ShardError(f"shard {self.shardId} is not running")
+            seq = next(self.seqs)
+            self.pending[seq] = callback
+        try:
+            with self.sendLock:
+                self.conn.send((seq, request, args))
+        except (OSError, ValueError) as e:
+            with self.lock:
+                self.pending.pop(seq, None)
+            raise ShardError(f"shard {self.shardId} unreachable: {e}")
+        return seq
+
+    def request(self, request, *args, timeout=REQUEST_TIMEOUT):
+        """
+        Send a request to the shard and wait for its reply.
+
+        Params:
+            request:        The request ID.
+            args:           The request arguments.
+            timeout:        The reply timeout in seconds (optional).
+
+        Return:
+            The shard reply.
+
+        Raise:
+            ShardError if the worker fails to reply in time, the request
+            error if the request failed in the worker.
+        """
+        replies = queue.SimpleQueue()
+        seq = self.submit(lambda success, result:
+                          replies.put((success, result)), request, *args)
+        try:
+            success, result = replies.get(timeout=timeout)
+        except queue.Empty:
+            with self.lock:
+                self.pending.pop(seq, None)
+            raise ShardError(f"shard {self.shardId} request {request} "
+                             f"timed out")
+        if not success:
+            raise result
+        return result
+
+
+class ShardManager:
+    """
+    The shard manager class. Spread the devices over worker processes so
+    their callbacks, JSON handling and logging use all the Pi cores. The
+    devices linked to the same emitter output always share a shard.
+    """
+    REQ_START_LOOPS = 'startLoops'
+    REQ_STOP_LOOPS = 'stopLoops'
+    REQ_SET_CONFIG = 'setConfig'
+    REQ_SEND_COMMAND = 'sendCommand'
+    REQ_CALL = 'call'
+    REQ_STATS = 'stats'
+    REQ_STATES = 'states'
+    REQ_TRACES = 'traces'
+    REQ_EXIT = 'exit'
+
+    MSG_REPLY = 'reply'
+    MSG_EVENT = 'event'
+
+    # The result of a request replied later by the worker.
+    PENDING = object()
+
+    STOP_TIMEOUT = 5.0
+
+    def __init__(self, logger, appConfig, devsConfig, shardCount):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            appConfig:      The application configuration.
+            devsConfig:     The device configurations.
+            shardCount:     The number of worker processes.
+        """
+        self.loggerFactory = logger
+        self.logger = logger.getLogger('ShardManager')
+        self.appConfig = appConfig
+        self.context = multiprocessing.get_context('fork')
+        self.emitLock = self.context.Lock()
+        self.logQueue = None
+        self.logListener = None
+        self.shards = [Shard(shardId, self.logger)
+                       for shardId in range(shardCount)]
+
+        outputs = {}
+        for devIdx, devConfig in enumerate(devsConfig):
+            outputs.setdefault(devConfig['linkedEmitter'], []) \
+                .append(devIdx)
+        proxies = {}
+        for output, devsIdx in sorted(outputs.items(),
+                                      key=lambda item: -len(item[1])):
+            shard = min(self.shards, key=lambda s: len(s.devsConfig))
+            shard.outputs.add(output)
+            for devIdx in devsIdx:
+                proxies[devIdx] = DeviceProxy(shard, len(shard.devsConfig),
+                                              devsConfig[devIdx])
+                shard.proxies.append(proxies[devIdx])
+                shard.devsConfig.append(devsConfig[devIdx])
+        self.devices = [proxies[devIdx] for devIdx in sorted(proxies)]
+        self.shards = [shard for shard in self.shards if shard.devsConfig]
+
+    def start(self):
+        """
+        Start the shard processes. Must be called before the coordinator
+        starts its own threads, the reader threads being started once all
+        the workers are forked. The worker log records are forwarded to the
+        coordinator loggers.
+        """
+        self.logQueue = self.context.Queue()
+        started = []
+        for shard in self.shards:
+            self.logger.info(f"Starting shard {shard.shardId} "
+                             f"({len(shard.devsConfig)} devices on "
+                             f"{', '.join(sorted(shard.outputs))})")
+            conn, workerConn = self.context.Pipe()
+            process = self.context.Process(
+                target=_runShard, name=f"shard{shard.shardId}",
+                args=(self.loggerFactory, self.appConfig, shard.devsConfig,
+                      workerConn, self.emitLock, self.logQueue),
+                daemon=True)
+            process.start()
+            workerConn.close()
+            started.append((shard, conn, process))
+        for shard, conn, process in started:
+            shard.attach(conn, process)
+        self.logListener = forwardWorkerLogs(self.logQueue)
+
+    def stop(self):
+        """
+        Stop the shard processes, the ones not exiting in time being
+        terminated.
+        """
+        for shard in self.shards:
+            if shard.process is None:
+                continue
+            self.logger.info(f"Stopping shard {shard.shardId}")
+            try:
+                shard.request(self.REQ_EXIT, timeout=self.STOP_TIMEOUT)
+            except ShardError as e:
+                self.logger.warning(str(e))
+            shard.process.join(self.STOP_TIMEOUT)
+            if shard.process.is_alive():
+                self.logger.warning(f"Terminating shard {shard.shardId}")
+                shard.process.terminate()
+                shard.process.join()
+            shard.conn.close()
+            shard.process = None
+        if self.logListener is not None:
+            self.logListener.stop()
+            self.logListener = None
+
+    def startLoops(self):
+        """
+        Start the device loops of all the shards.
+        """
+        for shard in self.shards:
+            shard.request(self.REQ_START_LOOPS)
+
+    def stopLoops(self):
+        """
+        Stop the device loops of all the shards.
+        """
+        for shard in self.shards:
+            try:
+                shard.request(self.REQ_STOP_LOOPS)
+            except ShardError as e:
+                self.logger.warning(str(e))
+
+    def getDevices(self):
+        """
+        Get the device proxies, in the device configurations order.
+
+        Return:
+            The device proxy list.
+        """
+        return self.devices
+
+    def getShardStats(self):
+        """
+        Get the metrics of each running shard.
+
+        Return:
+            The list of shard metrics (shard ID, process ID, outputs,
+            device count and transmit queue depth).
+        """
+        shardsStats = []
+        for shard in self.shards:
+            try:
+                stats = shard.request(self.REQ_STATS)
+            except ShardError as e:
+                self.logger.warning(str(e))
+                continue
+            shardsStats.append({
+                'shard': shard.shardId,
+                'pid': shard.process.pid,
+                'outputs': sorted(shard.outputs),
+                'devices': stats['devices'],
+                'queueDepth': stats['queueDepth'],
+            })
+        return shardsStats
+
+    def getMetricsSnapshots(self):
+        """
+        Get the metrics registry snapshot of each running shard.
+
+        Return:
+            The list of (labels, snapshot) of the shards, labelled with
+            their shard ID.
+        """
+        snapshots = []
+        for shard in self.shards:
+            try:
+                stats = shard.request(self.REQ_STATS)
+            except ShardError as e:
+                self.logger.warning(str(e))
+                continue
+            snapshots.append(({'shard': shard.shardId}, stats['metrics']))
+        return snapshots
+
+    def getTraces(self, traceId=None):
+        """
+        Get the command traces recorded in the running shards.
+
+        Params:
+            traceId:        The ID of the trace to get (optional).
+
+        Return:
+            The traces of all the shards.
+        """
+        traces = []
+        for shard in self.shards:
+            try:
+                traces.extend(shard.request(self.REQ_TRACES, traceId))
+            except ShardError as e:
+                self.logger.warning(str(e))
+        return traces
+
+    def getDeviceStates(self):
+        """
+        Get the state and queue depth of every sharded device, with one
+        request per shard. The devices of a failing shard are reported
+        offline.
+
+        Return:
+            The (state, queue depth) of each device proxy, by proxy.
+        """
+        states = {}
+        for shard in self.shards:
+            try:
+                shardStates = shard.request(self.REQ_STATES)
+            except ShardError as e:
+                self.logger.warning(str(e))
+                shardStates = [({'status': Device.OFFLINE_MSG,
+                                 'lastResult': None}, 0)] \
+                    * len(shard.proxies)
+            states.update(zip(shard.proxies, shardStates))
+        return states
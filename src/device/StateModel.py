@@ -0,0 +1,258 @@
+import threading
+
+from config.schema import stateValidators
+from exceptions import CommandNotFound, InvalidConfig
+
+
+class StateModel:
+    """
+    The predicted state model of a device, declared in its command set
+    (states entry). Each state is driven by its commands:
+        - toggle: one command cycling through the state values.
+        - discrete: one command per state value.
+        - relative: up and down commands moving a bounded numeric value.
+    The state is predicted from the transmitted commands, so the state
+    requests (power=on, volume=30) are turned into the minimal command
+    sequence, nothing when the device is already in the requested state.
+    An unknown toggle state is pressed once and assumed to have reached the
+    requested value, so the next requests are planned from it.
+    """
+    TOGGLE = 'toggle'
+    DISCRETE = 'discrete'
+    RELATIVE = 'relative'
+
+    REQUEST_SEP = '='
+
+    def __init__(self, states=None):
+        """
+        Constructor.
+
+        Params:
+            states:         The state declarations, by state name
+                            (optional).
+
+        Raise:
+            InvalidConfig if the state declarations are invalid.
+        """
+        self.states = states if states is not None else {}
+        self._validate()
+        self.values = {name: None for name in self.states}
+        self.lock = threading.Lock()
+        self.planners = {self.TOGGLE: self._planToggle,
+                         self.DISCRETE: self._planDiscrete,
+                         self.RELATIVE: self._planRelative}
+        self.effects = {}
+        for name, state in self.states.items():
+            if state['type'] == self.TOGGLE:
+                self.effects[state['command']] = (name, None)
+            elif state['type'] == self.DISCRETE:
+                for value, command in state['commands'].items():
+                    self.effects[command] = (name, value)
+            else:
+                self.effects[state['up']] = (name, state.get('step', 1))
+                self.effects[state['down']] = (name, -state.get('step', 1))
+
+    def _validate(self):
+        """
+        Validate the state declarations.
+
+        Raise:
+            InvalidConfig if the state declarations are invalid.
+        """
+        if type(self.states) is not dict:
+            raise InvalidConfig('state', 'states', 'expected object')
+        for name, state in self.states.items():
+            validator = stateValidators.get(state.get('type')) \
+                if type(state) is dict else None
+            if validator is None:
+                raise InvalidConfig('state', f"{name}.type",
+                                    'expected toggle, discrete or relative')
+            validator(state)
+            if state['type'] == self.DISCRETE and not all(
+                    type(command) is str
+                    for command in state['commands'].values()):
+                raise InvalidConfig('state', f"{name}.commands",
+                                    'expected command names')
+            if state['type'] == self.TOGGLE and not state['values']:
+                raise InvalidConfig('state', f"{name}.values",
+                                    'expected values')
+            if state['type'] == self.RELATIVE and \
+                    (state['min'] >= state['max'] or
+                     state.get('step', 1) <= 0):
+                raise InvalidConfig('state', name, 'expected min < max '
+                                    'and step > 0')
+
+    @classmethod
+    def isRequest(cls, command):
+        """
+        Check if a command is a state request (<state>=<value>).
+
+        Params:
+            command:        The command.
+
+        Return:
+            True if the command is a state request, False otherwise.
+        """
+        return cls.REQUEST_SEP in command
+
+    def _planToggle(self, state, current, value):
+        """
+        Plan the presses of a toggle state. A blind press (unknown state)
+        is assumed to reach the requested value.
+
+        Params:
+            state:          The state declaration.
+            current:        The current value (None when unknown).
+            value:          The requested value.
+
+        Return:
+            The list of commands to transmit and the value reached.
+
+        Raise:
+            ValueError if the value is not supported.
+        """
+        values = state['values']
+        if value not in values:
+            raise ValueError(value)
+        if current is None:
+            return [state['command']], value
+        presses = (values.index(value) - values.index(current)) \
+            % len(values)
+        return [state['command']] * presses, value
+
+    def _planDiscrete(self, state, current, value):
+        """
+        Plan the value command of a discrete state.
+
+        Params:
+            state:          The state declaration.
+            current:        The current value (None when unknown).
+            value:          The requested value.
+
+        Return:
+            The list of commands to transmit and the value reached.
+
+        Raise:
+            ValueError if the value is not supported.
+        """
+        if value not in state['commands']:
+            raise ValueError(value)
+        if value == current:
+            return [], value
+        return [state['commands'][value]], value
+
+    def _planRelative(self, state, current, value):
+        """
+        Plan the steps of a relative state, an unknown state being first
+        calibrated down to its minimum.
+
+        Params:
+            state:          The state declaration.
+            current:        The current value (None when unknown).
+            value:          The requested value.
+
+        Return:
+            The list of commands to transmit and the value reached, the
+            closest step to the requested value.
+
+        Raise:
+            ValueError if the value is not supported.
+        """
+        value = int(value)
+        if not state['min'] <= value <= state['max']:
+            raise ValueError(value)
+        step = state.get('step', 1)
+        commands = []
+        if current is None:
+            commands = [state['down']] * -(-(state['max'] - state['min'])
+                                           // step)
+            current = state['min']
+        delta = int((value - current) / step)
+        if delta > 0:
+            commands += [state['up']] * delta
+        else:
+            commands += [state['down']] * -delta
+        return commands, current + delta * step
+
+    def plan(self, request):
+        """
+        Plan the commands of a state request, from the current predicted
+        state. The plan must be made right before the transmission, so it
+        accounts for the previous requests.
+
+        Params:
+            request:        The state request (<state>=<value>).
+
+        Return:
+            The list of commands to transmit, empty when the device is
+            already in the requested state, the value reached and the flag
+            indicating a value assumed after a blind toggle press.
+
+        Raise:
+            CommandNotFound if the state or the value is not supported.
+        """
+        name, value = request.split(self.REQUEST_SEP, 1)
+        state = self.states.get(name)
+        if state is None:
+            raise CommandNotFound(request)
+        with self.lock:
+            current = self.values[name]
+            try:
+                commands, reached = self.planners[state['type']](
+                    state, current, value)
+            except ValueError:
+                raise CommandNotFound(request)
+        return commands, reached, \
+            state['type'] == self.TOGGLE and current is None
+
+    def onTransmit(self, command):
+        """
+        Update the predicted state after a command transmission. An
+        unknown toggle or relative state stays unknown.
+
+        Params:
+            command:        The transmitted command.
+        """
+        effect = self.effects.get(command)
+        if effect is None:
+            return
+        name, change = effect
+        state = self.states[name]
+        with self.lock:
+            current = self.values[name]
+            if state['type'] == self.DISCRETE:
+                current = change
+            elif current is None:
+                return
+            elif state['type'] == self.TOGGLE:
+                values = state['values']
+                current = values[(values.index(current) + 1) % len(values)]
+            else:
+                current = min(max(current + change, state['min']),
+                              state['max'])
+            self.values[name] = current
+
+    def setValue(self, name, value):
+        """
+        Set the predicted value of a state, after a state request
+        transmission.
+
+        Params:
+            name:           The state name.
+            value:          The state value, None when unknown.
+        """
+        state = self.states[name]
+        with self.lock:
+            self.values[name] = int(value) \
+                if state['type'] == self.RELATIVE and value is not None \
+                else value
+
+    def getValues(self):
+        """
+        Get the predicted state values.
+
+        Return:
+            The predicted values, by state name (None when unknown).
+        """
+        with self.lock:
+            return dict(self.values)
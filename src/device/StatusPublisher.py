@@ -0,0 +1,107 @@
+import json
+
+
+class StatusPublisher:
+    """
+    The aggregated status publisher class. Next to the per-device status
+    topics, a single retained document with the online flag, last command
+    result and queued command count of every device is published on the
+    gateway devices/status topic. The document is built at a throttled rate,
+    on the shared network loop, and only published when it changed, so a
+    dashboard follows one topic instead of one per device.
+    """
+    STATUS_TOPIC = 'devices/status'
+    DEFAULT_INTERVAL = 5.0
+
+    def __init__(self, logger, devManager, netLoop,
+                 interval=DEFAULT_INTERVAL):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logging instance.
+            devManager:     The device manager.
+            netLoop:        The shared network loop running the publications.
+            interval:       The minimum time, in seconds, between two
+                            publications (optional).
+        """
+        self.logger = logger.getLogger('StatusPublisher')
+        self.devManager = devManager
+        self.netLoop = netLoop
+        self.interval = interval
+        self.gateway = None
+        self.lastPayload = None
+        self.tickId = None
+
+    def getStatus(self):
+        """
+        Get the aggregated status document.
+
+        Return:
+            The online and total device counts and the status of each
+            device (online, lastResult, queueDepth), by location.name.
+        """
+        devices = self.devManager.getStatusSummary()
+        return {
+            'online': sum(1 for status in devices.values()
+                          if status['online']),
+            'total': len(devices),
+            'devices': devices,
+        }
+
+    def publish(self):
+        """
+        Publish the aggregated status if it changed since the last
+        publication.
+
+        Return:
+            True if the status was published, False if it did not change.
+        """
+        payload = json.dumps(self.getStatus(), sort_keys=True)
+        if payload == self.lastPayload:
+            return False
+        self.gateway.publish(self.STATUS_TOPIC, payload, qos=1, retain=True)
+        self.lastPayload = payload
+        return True
+
+    def _tick(self, tickId):
+        """
+        Publish the aggregated status once per interval (network loop
+        thread).
+
+        Params:
+            tickId:         The ID of the run the tick belongs to.
+        """
+        if tickId is not self.tickId:
+            return
+        try:
+            self.publish()
+        except Exception as e:
+            self.logger.error(f"Status publication failed: {e}")
+        self.netLoop.callLater(self.interval, self._tick, tickId)
+
+    def start(self):
+        """
+        Start the periodic publications.
+        """
+        self.logger.info('Starting status publisher')
+        self.tickId = object()
+        self.netLoop.callLater(self.interval, self._tick, self.tickId)
+
+    def stop(self):
+        """
+        Stop the periodic publications, the pending tick being ignored.
+        """
+        if self.tickId is None:
+            return
+        self.logger.info('Stopping status publisher')
+        self.tickId = None
+
+    def registerTopics(self, gateway):
+        """
+        Publish the aggregated status on the gateway.
+
+        Params:
+            gateway:        The gateway.
+        """
+        self.gateway = gateway
@@ -0,0 +1,177 @@
+import collections
+import json
+import os
+import threading
+import time
+
+
+class Tracer:
+    """
+    The command tracer class. Each command request carries a trace ID and
+    collects the spans of its pipeline stages: message handling (receive),
+    transmit queue (queued), emit lock wait (ready), transmission (transmit)
+    with one span per IR packet, and result publication (publish). The
+    finished traces are kept in a ring buffer and can be exported in the
+    Chrome trace event format (chrome://tracing, Perfetto). The traces of
+    the other processes (shards) are read from their trace sources.
+    """
+    DEFAULT_CAPACITY = 200
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Constructor.
+
+        Params:
+            capacity:       The number of kept traces (optional).
+        """
+        self.traces = collections.deque(maxlen=capacity)
+        self.sources = []
+        self.exportPath = None
+        self.lock = threading.Lock()
+        # The wall clock time of the monotonic clock origin.
+        self.origin = time.time() - time.monotonic()
+
+    def setExportPath(self, path):
+        """
+        Set the trace export file.
+
+        Params:
+            path:           The export file path, None disables the export.
+        """
+        self.exportPath = path
+
+    def addSource(self, source):
+        """
+        Add a trace source, called on each trace lookup.
+
+        Params:
+            source:         The function returning the traces of other
+                            processes, called with the ID of the trace to
+                            get (None for all the traces).
+        """
+        with self.lock:
+            self.sources.append(source)
+
+    def clear(self):
+        """
+        Drop the recorded traces and the trace sources, a forked process
+        starting from an empty tracer.
+        """
+        with self.lock:
+            self.traces.clear()
+            self.sources = []
+
+    def finish(self, cmdRequest, device, result):
+        """
+        Record the trace of a finished command request.
+
+        Params:
+            cmdRequest:     The command request.
+            device:         The device name (location.name).
+            result:         The command result message.
+        """
+        spans = [(name, start, end) for name, start, end in (
+            ('queued', cmdRequest.received, cmdRequest.dequeued),
+            ('ready', cmdRequest.dequeued, cmdRequest.ready),
+            ('transmit', cmdRequest.ready, cmdRequest.done))
+            if start is not None and end is not None]
+        spans.extend(cmdRequest.spans)
+        spans.sort(key=lambda span: span[1])
+        start = min(span[1] for span in spans) if spans \
+            else cmdRequest.received
+        end = max(span[2] for span in spans) if spans \
+            else cmdRequest.received
+        trace = {
+            'id': cmdRequest.traceId,
+            'device': device,
+            'command': cmdRequest.command,
+            'result': result,
+            'time': self.origin + start,
+            'duration': end - start,
+            'spans': [{'name': name, 'start': spanStart - start,
+                       'duration': spanEnd - spanStart}
+                      for name, spanStart, spanEnd in spans],
+        }
+        with self.lock:
+            self.traces.append(trace)
+
+    def getTraces(self, limit=None, traceId=None):
+        """
+        Get the recent traces, oldest first, including the ones of the
+        trace sources.
+
+        Params:
+            limit:          The maximum number of traces (optional).
+            traceId:        The ID of the trace to get (optional).
+
+        Return:
+            The traces, the span starts being relative to their trace start,
+            in seconds.
+        """
+        with self.lock:
+            traces = list(self.traces)
+            sources = list(self.sources)
+        if traceId is not None:
+            traces = [trace for trace in traces if trace['id'] == traceId]
+        for source in sources:
+            traces.extend(source(traceId))
+        if sources:
+            traces.sort(key=lambda trace: trace['time'])
+        if limit is not None:
+            traces = traces[-limit:] if limit > 0 else []
+        return traces
+
+    def getTraceEvents(self):
+        """
+        Get the recent traces in the Chrome trace event format, one track
+        per trace.
+
+        Return:
+            The trace event document.
+        """
+        pid = os.getpid()
+        events = []
+        for tid, trace in enumerate(self.getTraces(), 1):
+            start = trace['time'] * 1e6
+            args = {'id': trace['id'], 'device': trace['device'],
+                    'result': trace['result']}
+            name = f"{trace['device']} {trace['command']}"
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': tid, 'args': {'name': name}})
+            events.append({'name': trace['command'], 'cat': 'command',
+                           'ph': 'X', 'ts': start,
+                           'dur': trace['duration'] * 1e6, 'pid': pid,
+                           'tid': tid, 'args': args})
+            events.extend({'name': span['name'], 'cat': 'stage', 'ph': 'X',
+                           'ts': start + span['start'] * 1e6,
+                           'dur': span['duration'] * 1e6, 'pid': pid,
+                           'tid': tid, 'args': {'id': trace['id']}}
+                          for span in trace['spans'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path=None):
+        """
+        Export the recent traces to a file, in the Chrome trace event format.
+
+        Params:
+            path:           The export file path (optional), the configured
+                            one by default.
+
+        Return:
+            The number of exported traces, None if no export file is set.
+
+        Raise:
+            OSError if the file cannot be written.
+        """
+        path = path if path is not None else self.exportPath
+        if path is None:
+            return None
+        document = self.getTraceEvents()
+        with open(path, 'w') as traceFile:
+            traceFile.write(json.dumps(document))
+        return sum(1 for event in document['traceEvents']
+                   if event.get('cat') == 'command')
+
+
+# The tracer of the process.
+tracer = Tracer()
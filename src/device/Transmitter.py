@@ -0,0 +1,374 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class Refusal(str):
+    """
+    The result of a command refused by the transmit scheduler. A refusal is
+    a failure (falsy) carrying its reason.
+    """
+    def __bool__(self):
+        """
+        A refusal is a failed result.
+
+        Return:
+            False.
+        """
+        return False
+
+
+class Transmitter:
+    """
+    The transmit scheduler class. The pigpio waves are a global resource of
+    the daemon, so the IR emissions are serialized on a single worker thread,
+    keeping the blocking GPIO calls away from the network loop.
+    The queue is served by priority class, then in arrival order. It is
+    bounded: when full, a new entry evicts the latest entry of a lower
+    class or is rejected. The entries past their deadline are dropped
+    instead of being sent late, and the entries over the rate limits are
+    throttled before entering the queue.
+    """
+    PRIORITY_HIGH = 'high'
+    PRIORITY_NORMAL = 'normal'
+    PRIORITY_LOW = 'low'
+    PRIORITIES = {PRIORITY_HIGH: 0, PRIORITY_NORMAL: 1, PRIORITY_LOW: 2}
+
+    REJECTED = Refusal('rejected')
+    EXPIRED = Refusal('expired')
+    LIMITED = Refusal('limited')
+
+    DEFAULT_MAX_DEPTH = 100
+    DEFAULT_TTL = 30.0
+
+    def __init__(self, logger, emitLock=None, maxDepth=DEFAULT_MAX_DEPTH,
+                 ttl=DEFAULT_TTL, rateLimiter=None):
+        """
+        Constructor.
+
+        Params:
+            logger:         The logger.
+            emitLock:       The lock shared with the other transmitters
+                            using the same pigpio daemon (optional).
+            maxDepth:       The maximum number of queued entries (optional).
+            ttl:            The default time to live of the queued entries
+                            in seconds (optional), None for no deadline.
+            rateLimiter:    The rate limiter (optional).
+        """
+        self.logger = logger.getLogger('Transmitter')
+        self.emitLock = emitLock
+        self.maxDepth = maxDepth
+        self.ttl = ttl
+        self.rateLimiter = rateLimiter
+        self.heap = []
+        self.seq = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.stats = {'rejected': 0, 'expired': 0, 'limited': 0}
+        self.depths = {}
+
+    def _transmit(self, device, command, repeat, request):
+        """
+        Transmit a command, under the shared emit lock if any.
+
+        Params:
+            device:         The device transmitting the command.
+            command:        The command name.
+            repeat:         The repeat count of the command.
+            request:        The command request of the entry (None if not
+                            provided), stamped when the transmission starts.
+
+        Return:
+            True if the command was transmitted, False otherwise.
+        """
+        try:
+            if self.emitLock is not None:
+                with self.emitLock:
+                    if request is not None and request.ready is None:
+                        request.ready = time.monotonic()
+                    return device.transmit(command, repeat, request)
+            if request is not None and request.ready is None:
+                request.ready = time.monotonic()
+            return device.transmit(command, repeat, request)
+        except Exception as e:
+            self.logger.error(f"Transmission of {command} failed: {e}")
+            return False
+
+    def _count(self, jobs, delta):
+        """
+        Update the queued command counts of the devices of an entry (under
+        the queue condition).
+
+        Params:
+            jobs:           The jobs of the entry.
+            delta:          1 when the entry is queued, -1 when it leaves
+                            the queue.
+        """
+        for device, command, callback, repeat in jobs:
+            depth = self.depths.get(device, 0) + delta
+            if depth:
+                self.depths[device] = depth
+            else:
+                del self.depths[device]
+
+    def _refuse(self, jobs, batchCallback, result):
+        """
+        Report the refusal of a queue entry to its callbacks.
+
+        Params:
+            jobs:           The jobs of the entry.
+            batchCallback:  The batch callback of the entry.
+            result:         The refusal result.
+        """
+        self.logger.warning('%d commands %s', len(jobs), result)
+        for device, command, callback, repeat in jobs:
+            if callback is not None:
+                callback(result)
+        if batchCallback is not None:
+            batchCallback([(result, 0)] * len(jobs))
+
+    def _getEntry(self):
+        """
+        Wait for the next queue entry to transmit, dropping the expired
+        ones.
+
+        Return:
+            The (jobs, batchCallback, request) entry, None once stopped and
+            the queue is empty.
+        """
+        while True:
+            with self.condition:
+                while not self.heap and self.running:
+                    self.condition.wait()
+                if not self.heap:
+                    return None
+                priority, seq, deadline, jobs, batchCallback, request = \
+                    heapq.heappop(self.heap)
+                self._count(jobs, -1)
+                now = time.monotonic()
+                if request is not None:
+                    request.dequeued = now
+                if deadline is None or now <= deadline:
+                    return jobs, batchCallback, request
+                self.stats['expired'] += 1
+            self._refuse(jobs, batchCallback, self.EXPIRED)
+
+    def _run(self):
+        """
+        Process the transmit queue (transmitter thread). A queue entry is a
+        batch of commands, transmitted back to back.
+        """
+        while True:
+            entry = self._getEntry()
+            if entry is None:
+                break
+            jobs, batchCallback, request = entry
+            results = []
+            for device, command, callback, repeat in jobs:
+                start = time.monotonic()
+                result = self._transmit(device, command, repeat, request)
+                end = time.monotonic()
+                if request is not None:
+                    request.done = end
+                results.append((result, end - start))
+                if callback is not None:
+                    callback(result)
+            if batchCallback is not None:
+                batchCallback(results)
+
+    def start(self):
+        """
+        Start the transmitter thread.
+        """
+        self.logger.info('Starting transmitter')
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='Transmitter',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the transmitter thread once the queued commands are sent.
+        """
+        if self.thread is None:
+            return
+        self.logger.info('Stopping transmitter')
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+
+    def setEmitLock(self, emitLock):
+        """
+        Set the lock shared with the other transmitters using the same
+        pigpio daemon.
+
+        Params:
+            emitLock:       The shared emit lock.
+        """
+        self.emitLock = emitLock
+
+    def _put(self, jobs, batchCallback, priority, deadline, request):
+        """
+        Queue an entry, evicting the latest entry of a lower priority class
+        or rejecting the new one when the queue is full. The entries over
+        the rate limits are throttled.
+
+        Params:
+            jobs:           The (device, command, callback, repeat) jobs.
+            batchCallback:  The batch callback (None if not needed).
+            priority:       The priority class, None for normal.
+            deadline:       The deadline (time.monotonic), None for the
+                            default time to live.
+            request:        The command request, None if not provided.
+        """
+        if self.rateLimiter is not None and not self.rateLimiter.acquire(
+                [device for device, command, callback, repeat in jobs]):
+            with self.condition:
+                self.stats['limited'] += 1
+            self._refuse(jobs, batchCallback, self.LIMITED)
+            return
+        rank = self.PRIORITIES[priority or self.PRIORITY_NORMAL]
+        if deadline is None and self.ttl is not None:
+            deadline = time.monotonic() + self.ttl
+        entry = (rank, next(self.seq), deadline, jobs, batchCallback,
+                 request)
+        refused = None
+        with self.condition:
+            if len(self.heap) >= self.maxDepth:
+                victim = max(self.heap)
+                if victim[0] <= rank:
+                    refused = entry
+                else:
+                    refused = victim
+                    self.heap.remove(victim)
+                    heapq.heapify(self.heap)
+                    heapq.heappush(self.heap, entry)
+                    self._count(victim[3], -1)
+                    self._count(jobs, 1)
+                self.stats['rejected'] += 1
+            else:
+                heapq.heappush(self.heap, entry)
+                self._count(jobs, 1)
+            self.condition.notify()
+        if refused is not None:
+            self._refuse(refused[3], refused[4], self.REJECTED)
+
+    def submit(self, device, command, callback=None, repeat=1,
+               priority=None, deadline=None, request=None):
+        """
+        Queue a command for transmission.
+
+        Params:
+            device:         The device transmitting the command.
+            command:        The command name.
+            callback:       The function called with the transmission result.
+            repeat:         The repeat count of the command (optional).
+            priority:       The priority class (optional), normal by default.
+            deadline:       The time (time.monotonic) after which the command
+                            is dropped (optional), the default time to live
+                            applies when not provided.
+            request:        The command request (optional), stamped with
+                            the dequeue, transmission start and end times.
+        """
+        self._put([(device, command, callback, repeat)], None, priority,
+                  deadline, request)
+
+    def submitBatch(self, jobs, callback=None, priority=None, deadline=None,
+                    request=None):
+        """
+        Queue a batch of commands for transmission as a unit: the commands
+        are transmitted back to back, in order.
+
+        Params:
+            jobs:           The list of (device, command, callback) jobs,
+                            the job callbacks are optional (None).
+            callback:       The function called with the list of job
+                            results, as (result, duration) tuples.
+            priority:       The priority class (optional), normal by default.
+            deadline:       The time (time.monotonic) after which the batch
+                            is dropped (optional), the default time to live
+                            applies when not provided.
+            request:        The command request (optional), stamped with
+                            the dequeue, transmission start and end times.
+        """
+        self._put([(device, command, jobCallback, 1)
+                   for device, command, jobCallback in jobs], callback,
+                  priority, deadline, request)
+
+    def getQueueDepth(self):
+        """
+        Get the number of commands and batches waiting for transmission.
+
+        Return:
+            The transmit queue depth.
+        """
+        with self.condition:
+            return len(self.heap)
+
+    def getDeviceDepth(self, device):
+        """
+        Get the number of commands of a device waiting for transmission.
+
+        Params:
+            device:         The device.
+
+        Return:
+            The queued command count of the device.
+        """
+        with self.condition:
+            return self.depths.get(device, 0)
+
+    def getStats(self):
+        """
+        Get the transmit scheduler metrics.
+
+        Return:
+            The queue depth, the rejected, expired and limited entry counts
+            and the throttle counters of the rate limiter (throttled).
+        """
+        with self.condition:
+            stats = dict(self.stats, depth=len(self.heap))
+        if self.rateLimiter is not None:
+            stats['throttled'] = self.rateLimiter.getStats()
+        return stats
+
+    def collectMetrics(self):
+        """
+        Collect the transmit scheduler metrics of the metrics registry.
+
+        Return:
+            The queued command count by output, the refused entry counts by
+            reason and the throttled entry counts by scope.
+        """
+        with self.condition:
+            refused = dict(self.stats)
+            outputs = {}
+            for device, depth in self.depths.items():
+                output = device.config.linkedEmitter
+                outputs[output] = outputs.get(output, 0) + depth
+        metrics = [
+            ('piir_transmit_queue_depth', 'gauge',
+             'The commands waiting for transmission, by output.',
+             [({'output': output}, depth)
+              for output, depth in outputs.items()]),
+            ('piir_transmit_refused_total', 'counter',
+             'The entries refused by the transmit scheduler, by reason.',
+             [({'reason': reason}, count)
+              for reason, count in refused.items()]),
+        ]
+        if self.rateLimiter is not None:
+            throttled = self.rateLimiter.getStats()
+            samples = [({'scope': 'global', 'key': ''},
+                        throttled[self.rateLimiter.SCOPE_GLOBAL])]
+            for scope in (self.rateLimiter.SCOPE_OUTPUT,
+                          self.rateLimiter.SCOPE_DEVICE):
+                samples.extend(({'scope': scope, 'key': key}, count)
+                               for key, count in throttled[scope].items())
+            metrics.append(('piir_transmit_throttled_total', 'counter',
+                            'The entries throttled by the rate limiter, by '
+                            'scope.', samples))
+        return metrics
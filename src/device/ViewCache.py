@@ -0,0 +1,65 @@
+import threading
+
+from .Metrics import registry
+
+
+LOOKUPS = registry.counter('piir_view_cache_lookups_total',
+                           'The view lookups, by result.')
+
+
+class ViewCache:
+    """
+    The view cache class. The views are built once, then served from the
+    cache until the next invalidation. Each
+    invalidation starts a new generation, so a view built while its source
+    was changing is never stored.
+    """
+    def __init__(self):
+        """
+        Constructor.
+        """
+        self.generation = 0
+        self.views = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Get a view, building it if needed. The view is shared by all the
+        callers and must not be modified.
+
+        Params:
+            key:            The view key.
+            build:          The function building the view.
+
+        Return:
+            The view.
+        """
+        with self.lock:
+            view = self.views.get(key)
+            generation = self.generation
+        if view is not None:
+            LOOKUPS.inc(result='hit')
+            return view
+        LOOKUPS.inc(result='miss')
+        view = build()
+        with self.lock:
+            if generation == self.generation:
+                self.views[key] = view
+        return view
+
+    def invalidate(self):
+        """
+        Drop all the views and start a new generation.
+        """
+        with self.lock:
+            self.generation += 1
+            self.views.clear()
+
+    def getGeneration(self):
+        """
+        Get the current generation.
+
+        Return:
+            The number of invalidations so far.
+        """
+        return self.generation
@@ -71,3 +71,94 @@ class HardwareFileAccess(Exception):
     Exception raise when access to the Hardware configuration file fail.
     """
     pass
+
+
+class InvalidConfig(Exception):
+    """
+    Exception raised when a configuration is invalid.
+    """
+    def __init__(self, config, field, reason):
+        """
+        Constructor.
+
+        Params:
+            config:     The invalid configuration name.
+            field:      The invalid configuration field.
+            reason:     The reason why the field is invalid.
+        """
+        super().__init__(f"invalid {config} configuration {field}: "
+                         f"{reason}.")
+
+
+class InvalidDeviceConfig(InvalidConfig):
+    """
+    Exception raised when a device configuration is invalid.
+    """
+    def __init__(self, field, reason):
+        """
+        Constructor.
+
+        Params:
+            field:      The invalid configuration field.
+            reason:     The reason why the field is invalid.
+        """
+        super().__init__('device', field, reason)
+
+
+class InvalidCommandBatch(Exception):
+    """
+    Exception raised when a command batch is invalid.
+    """
+    def __init__(self, index, reason):
+        """
+        Constructor.
+
+        Params:
+            index:      The index of the invalid batch item.
+            reason:     The reason why the item is invalid.
+        """
+        super().__init__(f"invalid command batch item {index}: {reason}.")
+        self.index = index
+
+
+class SceneNotFound(Exception):
+    """
+    Exception raised when no scene corresponding to the search was found.
+    """
+    def __init__(self, name):
+        """
+        Constructor.
+
+        Params:
+            name:       The name of the scene that was not found.
+        """
+        super().__init__(f"scene {name} not found.")
+
+
+class SceneFileAccess(Exception):
+    """
+    Exception raised when access to the scene file fail.
+    """
+    pass
+
+
+class GroupFileAccess(Exception):
+    """
+    Exception raised when access to the group file fail.
+    """
+    pass
+
+
+class ScheduleFileAccess(Exception):
+    """
+    Exception raised when access to the schedule file fail.
+    """
+    pass
+
+
+class ShardError(Exception):
+    """
+    Exception raised when a shard request fails or when the worker process
+    of the shard is not responding.
+    """
+    pass
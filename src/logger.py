@@ -1,19 +1,200 @@
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+
+from device.RateLimiter import TokenBucket
+
+
+# The log records are handed to a queue by the logging threads (network
+# loops, transmitter) and formatted and written by a single listener thread.
+_listener = None
+
+LOG_FORMAT_JSON = 'json'
+LOG_FORMAT_TEXT = 'text'
+TEXT_FORMAT = '%(asctime)s %(levelname)s:%(name)s:%(message)s'
+
+# The rate limit of each logger, the errors are never limited.
+LOG_RATE = 20.0
+LOG_BURST = 100
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    The structured log formatter, one JSON object per line.
+    """
+    def format(self, record):
+        """
+        Format a log record.
+
+        Params:
+            record:         The log record.
+
+        Return:
+            The JSON log line.
+        """
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    The per logger rate limit filter. The records over the rate of their
+    logger are dropped before being formatted, the next record let through
+    carrying the number of dropped ones (suppressed).
+    """
+    def __init__(self, rate=LOG_RATE, burst=LOG_BURST):
+        """
+        Constructor.
+
+        Params:
+            rate:           The records per second of each logger
+                            (optional).
+            burst:          The record burst of each logger (optional).
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.suppressed = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        """
+        Check if a record is under the rate of its logger.
+
+        Params:
+            record:         The log record.
+
+        Return:
+            True if the record is let through, False if it is dropped.
+        """
+        if record.levelno >= logging.ERROR:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(record.name)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst, now)
+                self.buckets[record.name] = bucket
+            else:
+                bucket.refill(now)
+            if bucket.tokens < 1:
+                self.suppressed[record.name] = \
+                    self.suppressed.get(record.name, 0) + 1
+                return False
+            bucket.tokens -= 1
+            record.suppressed = self.suppressed.pop(record.name, 0)
+        return True
+
+
+class _ForwardHandler(logging.Handler):
+    """
+    The handler of the worker process records, handing them to the logger
+    of the same name in this process.
+    """
+    def emit(self, record):
+        """
+        Forward a record.
+
+        Params:
+            record:         The log record.
+        """
+        logging.getLogger(record.name).handle(record)
 
 
 def initLogger():
     """
-    Initialize the logger.
+    Initialize the logger. The records are queued and written to stderr by
+    a listener thread, as JSON lines unless PIIR_LOG_FORMAT is text.
     """
+    global _listener
+    if _listener is not None:
+        return logging
+
     logger_level = logging.INFO
 
     if 'APP_ENV' in os.environ:
         if os.environ['APP_ENV'] == 'dev':
             logger_level = logging.DEBUG
 
-    logging.basicConfig(level=logger_level,
-                        format='%(asctime)s %(levelname)s:'
-                        '%(name)s:%(message)s')
+    handler = logging.StreamHandler()
+    if os.environ.get('PIIR_LOG_FORMAT', LOG_FORMAT_JSON) == LOG_FORMAT_TEXT:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    logQueue = queue.SimpleQueue()
+    queueHandler = logging.handlers.QueueHandler(logQueue)
+    queueHandler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.setLevel(logger_level)
+    root.addHandler(queueHandler)
+    _listener = logging.handlers.QueueListener(logQueue, handler)
+    _listener.start()
 
     return logging
+
+
+def stopLogger():
+    """
+    Stop the logger listener thread once the queued records are written.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    for handler in logging.getLogger().handlers[:]:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logging.getLogger().removeHandler(handler)
+
+
+def initWorkerLogger(logQueue):
+    """
+    Initialize the logger of a forked worker process. The handlers
+    inherited from the parent are dropped, their listener thread not running
+    in the worker, and the records are handed to the parent through a
+    multiprocessing queue (see forwardWorkerLogs).
+
+    Params:
+        logQueue:       The multiprocessing queue read by the parent.
+    """
+    global _listener
+    _listener = None
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    queueHandler = logging.handlers.QueueHandler(logQueue)
+    queueHandler.addFilter(RateLimitFilter())
+    root.addHandler(queueHandler)
+
+
+def forwardWorkerLogs(logQueue):
+    """
+    Start forwarding the records of the worker processes to the loggers of
+    this process.
+
+    Params:
+        logQueue:       The multiprocessing queue of the worker records.
+
+    Return:
+        The started listener, to stop once the workers are gone.
+    """
+    listener = logging.handlers.QueueListener(logQueue, _ForwardHandler())
+    listener.start()
+    return listener
@@ -9,8 +9,8 @@ import sys
 sys.path.append(os.path.abspath('./src'))
 
 from config import Config                               # noqa: E402
-from exceptions import MqttFileAccess, \
-    HardwareFileAccess                                  # noqa: E402
+from exceptions import MqttFileAccess, HardwareFileAccess, \
+    InvalidConfig, InvalidDeviceConfig                  # noqa: E402
 
 
 class TestConfig(TestCase):
@@ -77,6 +77,24 @@ class TestConfig(TestCase):
             mockedConf.assert_any_call(f"{Config.CONFIG_PATH}/"
                                        f"{Config.HW_CONFIG_FILE}")
 
+    def test_constructorInvalidConfig(self):
+        """
+        The constructor must raise an InvalidConfig error if a loaded
+        configuration file is invalid.
+        """
+        del self.hardConfig['in']
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf, \
+                self.assertRaises(InvalidConfig) as context:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=json.dumps(self.hardConfig))
+                 .return_value]
+            Config(logging)
+        self.assertTrue('in: missing' in str(context.exception),
+                        'Config failed to raise an InvalidConfig error '
+                        'when the hardware configuration is invalid.')
+
     def test_getBrokerHostname(self):
         """
         The getBrokerHostname must return the broker hostname/IP.
@@ -226,7 +244,7 @@ class TestConfig(TestCase):
         """
         newConfig = self.mqttConfig.copy()
         newConfig['broker']['hostname'] = 'new hostname'
-        newConfig['broker']['port'] = 'new port'
+        newConfig['broker']['port'] = 2000
         newConfig['user']['name'] = 'new username'
         newConfig['user']['password'] = 'new password'
         with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
@@ -240,6 +258,30 @@ class TestConfig(TestCase):
                              'Config setMqttConfig failed to '
                              'update the current MQTT configuration.')
 
+    def test_setMqttConfigInvalid(self):
+        """
+        The setMqttConfig must raise an InvalidConfig error and keep the
+        current configuration when the new configuration is invalid.
+        """
+        newConfig = json.loads(self.mqttConfStr)
+        newConfig['broker']['port'] = 'new port'
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=self.hardConfStr).return_value]
+            appConfig = Config(logging)
+            with self.assertRaises(InvalidConfig) as context:
+                appConfig.setMqttConfig(newConfig)
+            self.assertTrue('invalid MQTT configuration broker.port: '
+                            'expected int' in str(context.exception),
+                            'Config setMqttConfig failed to raise an '
+                            'InvalidConfig error with an invalid '
+                            'configuration.')
+            self.assertEqual(appConfig.getMqttConfig(), self.mqttConfig,
+                             'Config setMqttConfig updated the MQTT '
+                             'configuration with an invalid configuration.')
+
     def test_saveMqttConfigFail(self):
         """
         The saveMqttConfig method must raise an MqttFileAccess when the write
@@ -479,6 +521,150 @@ class TestConfig(TestCase):
                              'the Raspberry Pi gpio ID of the output at '
                              'the given index.')
 
+    def test_getGatewayTopicDefault(self):
+        """
+        The getGatewayTopic must return the default topic when the gateway
+        topic is not configured.
+        """
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=self.hardConfStr).return_value]
+            appConfig = Config(logging)
+            self.assertEqual(appConfig.getGatewayTopic(),
+                             Config.DEFAULT_GATEWAY_TOPIC,
+                             'Config getGatewayTopic failed to return the '
+                             'default topic.')
+
+    def test_getGatewayTopic(self):
+        """
+        The getGatewayTopic must return the configured gateway topic.
+        """
+        mqttConfig = dict(self.mqttConfig, gatewayTopic='home/ir')
+        with patch('builtins.open',
+                   mock_open(read_data=json.dumps(mqttConfig))) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=self.hardConfStr).return_value]
+            appConfig = Config(logging)
+            self.assertEqual(appConfig.getGatewayTopic(), 'home/ir',
+                             'Config getGatewayTopic failed to return the '
+                             'configured topic.')
+
+    def test_getStatusInterval(self):
+        """
+        The getStatusInterval must return the configured status interval,
+        the default one when not configured.
+        """
+        for mqttConfig, expected in \
+                ((self.mqttConfig, Config.DEFAULT_STATUS_INTERVAL),
+                 (dict(self.mqttConfig, statusInterval=1), 1)):
+            with patch('builtins.open',
+                       mock_open(read_data=json.dumps(mqttConfig))) \
+                    as mockedConf:
+                mockedConf.side_effect = \
+                    [mockedConf.return_value,
+                     mock_open(read_data=self.hardConfStr).return_value]
+                appConfig = Config(logging)
+                self.assertEqual(appConfig.getStatusInterval(), expected,
+                                 'Config getStatusInterval failed to return '
+                                 'the status interval.')
+
+    def test_getMetricsInterval(self):
+        """
+        The getMetricsInterval must return the configured metrics interval,
+        None when the publications are not configured.
+        """
+        for mqttConfig, expected in \
+                ((self.mqttConfig, None),
+                 (dict(self.mqttConfig, metricsInterval=30), 30)):
+            with patch('builtins.open',
+                       mock_open(read_data=json.dumps(mqttConfig))) \
+                    as mockedConf:
+                mockedConf.side_effect = \
+                    [mockedConf.return_value,
+                     mock_open(read_data=self.hardConfStr).return_value]
+                appConfig = Config(logging)
+                self.assertEqual(appConfig.getMetricsInterval(), expected,
+                                 'Config getMetricsInterval failed to '
+                                 'return the metrics interval.')
+
+    def test_getDiscoveryPrefix(self):
+        """
+        The getDiscoveryPrefix must return the configured discovery prefix,
+        None when the discovery is not configured.
+        """
+        for mqttConfig, expected in \
+                ((self.mqttConfig, None),
+                 (dict(self.mqttConfig, discoveryPrefix='homeassistant'),
+                  'homeassistant')):
+            with patch('builtins.open',
+                       mock_open(read_data=json.dumps(mqttConfig))) \
+                    as mockedConf:
+                mockedConf.side_effect = \
+                    [mockedConf.return_value,
+                     mock_open(read_data=self.hardConfStr).return_value]
+                appConfig = Config(logging)
+                self.assertEqual(appConfig.getDiscoveryPrefix(), expected,
+                                 'Config getDiscoveryPrefix failed to return '
+                                 'the discovery prefix.')
+
+    def test_getShardCountDefault(self):
+        """
+        The getShardCount must return 0 when sharding is not configured.
+        """
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=self.hardConfStr).return_value]
+            appConfig = Config(logging)
+            self.assertEqual(appConfig.getShardCount(), 0,
+                             'Config getShardCount failed to return 0 '
+                             'when sharding is not configured.')
+
+    def test_getShardCount(self):
+        """
+        The getShardCount must return the configured shard count.
+        """
+        hardConfig = self.hardConfig.copy()
+        hardConfig['shards'] = 4
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=json.dumps(hardConfig)).return_value]
+            appConfig = Config(logging)
+            self.assertEqual(appConfig.getShardCount(), 4,
+                             'Config getShardCount failed to return the '
+                             'configured shard count.')
+
+    def test_getRateLimits(self):
+        """
+        The getRateLimit and getOutputRateLimits methods must return the
+        configured global and output rate limits.
+        """
+        hardConfig = json.loads(self.hardConfStr)
+        hardConfig['rateLimit'] = {'rate': 20, 'burst': 40}
+        hardConfig['out'][0]['rateLimit'] = {'rate': 5, 'burst': 10}
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=json.dumps(hardConfig)).return_value]
+            appConfig = Config(logging)
+            self.assertEqual(appConfig.getRateLimit(),
+                             {'rate': 20, 'burst': 40},
+                             'Config getRateLimit failed to return the '
+                             'global rate limit.')
+            self.assertEqual(appConfig.getOutputRateLimits(),
+                             {hardConfig['out'][0]['name']:
+                              {'rate': 5, 'burst': 10}},
+                             'Config getOutputRateLimits failed to return '
+                             'the output rate limits.')
+
     def test_getHwConfig(self):
         """
         The getHwConfig must return the hardware configuration.
@@ -536,6 +722,88 @@ class TestConfig(TestCase):
                                 'HardwareFileAccess exception when access to '
                                 'the Hw configuration access failed.')
 
+    def test_setHwConfigInvalid(self):
+        """
+        The setHwConfig must raise an InvalidConfig error when the new
+        configuration is invalid.
+        """
+        newConfig = json.loads(self.hardConfStr)
+        del newConfig['out'][1]['gpioId']
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=self.hardConfStr).return_value]
+            appConfig = Config(logging)
+            with self.assertRaises(InvalidConfig) as context:
+                appConfig.setHwConfig(newConfig)
+            self.assertTrue('invalid hardware configuration out[].gpioId: '
+                            'missing' in str(context.exception),
+                            'Config setHwConfig failed to raise an '
+                            'InvalidConfig error with an invalid '
+                            'configuration.')
+
+    def test_setHwConfigInvalidRateLimit(self):
+        """
+        The setHwConfig must raise an InvalidConfig error when a rate limit
+        has no rate or no burst.
+        """
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=self.hardConfStr).return_value]
+            appConfig = Config(logging)
+            for rateLimit, message in (({'rate': 0, 'burst': 1},
+                                        'rateLimit.rate: expected > 0'),
+                                       ({'rate': 1, 'burst': 0},
+                                        'rateLimit.burst: expected >= 1')):
+                newConfig = json.loads(self.hardConfStr)
+                newConfig['rateLimit'] = rateLimit
+                with self.assertRaises(InvalidConfig) as context:
+                    appConfig.setHwConfig(newConfig)
+                self.assertTrue(message in str(context.exception),
+                                'Config setHwConfig failed to reject an '
+                                'invalid rate limit.')
+
+    def test_validateDeviceConfig(self):
+        """
+        The validateDeviceConfig method must accept a device configuration
+        matching the hardware and reject the mismatching ones.
+        """
+        with open('./tests/unit/device/devices.json') as devFiles:
+            devConfig = json.loads(devFiles.read())[0]
+        output = self.hardConfig['out'][2]
+        devConfig['linkedEmitter'] = output['name']
+        devConfig['commandSet']['emitterGpio'] = output['gpioId']
+        devConfig['commandSet']['receiverGpio'] = \
+            self.hardConfig['in']['gpioId']
+        with patch('builtins.open', mock_open(read_data=self.mqttConfStr)) \
+                as mockedConf:
+            mockedConf.side_effect = \
+                [mockedConf.return_value,
+                 mock_open(read_data=self.hardConfStr).return_value]
+            appConfig = Config(logging)
+        appConfig.validateDeviceConfig(devConfig)
+        cases = [
+            ('linkedEmitter', 'OUT42', 'linkedEmitter: unknown output'),
+            ('emitterGpio', output['gpioId'] + 1, 'commandSet.emitterGpio'),
+            ('receiverGpio', 99, 'commandSet.receiverGpio'),
+            ('packetGap', '0.1', 'commandSet.packetGap: expected int or '
+                                 'float'),
+        ]
+        for field, value, message in cases:
+            badConfig = json.loads(json.dumps(devConfig))
+            if field == 'linkedEmitter':
+                badConfig[field] = value
+            else:
+                badConfig['commandSet'][field] = value
+            with self.assertRaises(InvalidDeviceConfig) as context:
+                appConfig.validateDeviceConfig(badConfig)
+            self.assertTrue(message in str(context.exception),
+                            f"Config validateDeviceConfig failed to reject "
+                            f"an invalid {field}.")
+
     def test_saveHwConfigWriting(self):
         """
         The saveHwConfig method must write the current active configuration
@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from config.schema import Minimum, Optional, \
+    compileValidator                                        # noqa: E402
+from exceptions import InvalidConfig                        # noqa: E402
+
+
+class TestSchema(TestCase):
+    """
+    Schema validators test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        schema = {
+            'name': str,
+            'items': [{'id': Minimum(int, 1),
+                       'ratio': Minimum((int, float), 0, exclusive=True)}],
+            'extra': Optional({'flag': bool}),
+        }
+        self.validate = compileValidator('validateTest', schema,
+                                         lambda field, reason:
+                                         InvalidConfig('test', field, reason))
+        self.value = {
+            'name': 'test',
+            'items': [{'id': 1, 'ratio': 0.5}, {'id': 2, 'ratio': 1}],
+        }
+
+    def assertInvalid(self, value, message):
+        """
+        Assert that a value is rejected with the given message.
+
+        Params:
+            value:          The value to validate.
+            message:        The expected error message.
+        """
+        with self.assertRaises(InvalidConfig) as context:
+            self.validate(value)
+        self.assertTrue(message in str(context.exception),
+                        f"Validator failed to report {message}, got "
+                        f"{context.exception}.")
+
+    def test_validValue(self):
+        """
+        The validator must accept a valid value, with or without its
+        optional entries.
+        """
+        self.validate(self.value)
+        self.value['extra'] = {'flag': True}
+        self.validate(self.value)
+
+    def test_missingEntry(self):
+        """
+        The validator must reject a value with a missing entry.
+        """
+        del self.value['items'][1]['id']
+        self.assertInvalid(self.value, 'items[].id: missing')
+
+    def test_wrongType(self):
+        """
+        The validator must reject entries of the wrong type, booleans are
+        not accepted as integers.
+        """
+        self.value['items'][0]['id'] = True
+        self.assertInvalid(self.value, 'items[].id: expected int')
+
+    def test_optionalEntry(self):
+        """
+        The validator must validate the optional entries when present.
+        """
+        self.value['extra'] = {'flag': 'yes'}
+        self.assertInvalid(self.value, 'extra.flag: expected bool')
+
+    def test_minimum(self):
+        """
+        The validator must reject the numbers under their lower bound.
+        """
+        self.value['items'][0]['id'] = 0
+        self.assertInvalid(self.value, 'items[].id: expected >= 1')
+        self.value['items'][0]['id'] = 1
+        self.value['items'][1]['ratio'] = 0
+        self.assertInvalid(self.value, 'items[].ratio: expected > 0')
+
+    def test_notObject(self):
+        """
+        The validator must reject a value that is not an object.
+        """
+        self.assertInvalid(['test'], 'config: expected object')
+        self.value['items'] = {}
+        self.assertInvalid(self.value, 'items: expected list')
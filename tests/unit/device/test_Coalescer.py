@@ -0,0 +1,166 @@
+import time
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Coalescer import Coalescer                      # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+
+
+class TestCoalescer(TestCase):
+    """
+    Coalescer class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.send = Mock()
+        self.coalescer = Coalescer(self.send, window=10, maxRepeat=3)
+
+    def tearDown(self):
+        """
+        Test cases teardown.
+        """
+        self.coalescer.setWindow(0)
+        self.coalescer.flush()
+
+    def test_submitDisabled(self):
+        """
+        The submit method must send the command right away when the
+        coalescing is disabled.
+        """
+        callback = Mock()
+        self.coalescer.setWindow(0)
+        self.coalescer.submit('volumeUp', callback)
+        self.send.assert_called_once_with('volumeUp', 1, callback, None,
+                                          None, [])
+
+    def test_submitMergeRepeats(self):
+        """
+        The submit method must merge the repeats of a command into one
+        command with a repeat count, sent when the window closes.
+        """
+        callback = Mock()
+        self.coalescer.submit('volumeUp', callback)
+        self.coalescer.submit('volumeUp', callback)
+        self.send.assert_not_called()
+        self.assertEqual(self.coalescer.getPendingCount(), 1,
+                         'Coalescer failed to merge the repeats.')
+        self.coalescer.flush()
+        command, repeat, onResult, priority, deadline, request = \
+            self.send.call_args[0]
+        self.assertEqual((command, repeat), ('volumeUp', 2),
+                         'Coalescer failed to send the repeat count.')
+        onResult(True)
+        self.assertEqual(callback.call_count, 2,
+                         'Coalescer failed to report the result to each '
+                         'merged command.')
+
+    def test_submitMaxRepeat(self):
+        """
+        The submit method must send the merged command once it reaches the
+        maximum repeat count, without waiting for the window.
+        """
+        for i in range(3):
+            self.coalescer.submit('volumeUp')
+        self.send.assert_called_once_with('volumeUp', 3, None, None, None,
+                                          [])
+        self.assertEqual(self.coalescer.getPendingCount(), 0,
+                         'Coalescer failed to close the window.')
+
+    def test_submitMergeRequests(self):
+        """
+        The submit method must keep the requests of all the merged commands.
+        """
+        self.coalescer.submit('volumeUp', request='req1')
+        self.coalescer.submit('volumeUp')
+        self.coalescer.submit('volumeUp', request='req2')
+        self.send.assert_called_once_with('volumeUp', 3, None, None, None,
+                                          ['req1', 'req2'])
+
+    def test_submitLatestWins(self):
+        """
+        The submit method must keep the latest state request of a state.
+        """
+        self.coalescer.submit('volume=10')
+        self.coalescer.submit('volume=20')
+        self.coalescer.submit('volume=30')
+        self.coalescer.submit('power=on')
+        self.coalescer.flush()
+        self.assertEqual(sorted(call[0][:2] for call
+                                in self.send.call_args_list),
+                         [('power=on', 1), ('volume=30', 1)],
+                         'Coalescer failed to keep the latest request.')
+
+    def test_submitMergePriority(self):
+        """
+        The submit method must keep the highest priority class of the
+        merged commands.
+        """
+        self.coalescer.submit('volumeUp', priority='low')
+        self.coalescer.submit('volumeUp', priority='high')
+        self.coalescer.submit('volume=10')
+        self.coalescer.submit('volume=20', priority='low')
+        self.coalescer.flush()
+        priorities = {call[0][0]: call[0][3]
+                      for call in self.send.call_args_list}
+        self.assertEqual(priorities, {'volumeUp': 'high', 'volume=20': None},
+                         'Coalescer failed to keep the highest priority.')
+
+    def test_submitMergeDeadline(self):
+        """
+        The submit method must keep the latest deadline of the merged
+        commands, no deadline being the latest.
+        """
+        self.coalescer.submit('volumeUp', deadline=20.0)
+        self.coalescer.submit('volumeUp', deadline=10.0)
+        self.coalescer.submit('volume=10', deadline=10.0)
+        self.coalescer.submit('volume=20')
+        self.coalescer.submit('volume=30', deadline=30.0)
+        self.coalescer.flush()
+        deadlines = {call[0][0]: call[0][4]
+                     for call in self.send.call_args_list}
+        self.assertEqual(deadlines, {'volumeUp': 20.0, 'volume=30': None},
+                         'Coalescer failed to keep the latest deadline.')
+
+    def test_submitWindowClose(self):
+        """
+        The coalesced command must be sent when its window closes.
+        """
+        self.coalescer.setWindow(0.01)
+        self.coalescer.submit('volumeUp')
+        self.coalescer.submit('volumeUp')
+        deadline = time.monotonic() + 1
+        while not self.send.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.send.assert_called_once_with('volumeUp', 2, None, None, None,
+                                          [])
+
+    def test_submitNetworkLoop(self):
+        """
+        The windows must be timed on the network loop when available, the
+        timer of a window sent early not sending the next window.
+        """
+        netLoop = Mock(spec_set=NetworkLoop)
+        coalescer = Coalescer(self.send, window=10, maxRepeat=2,
+                              netLoop=netLoop)
+        coalescer.submit('volumeUp')
+        coalescer.submit('volumeUp')
+        coalescer.submit('volumeUp')
+        self.assertEqual(netLoop.callLater.call_count, 2,
+                         'Coalescer failed to time the windows on the '
+                         'network loop.')
+        delay, flushKey, key, entry = netLoop.callLater.call_args_list[0][0]
+        flushKey(key, entry)
+        self.send.assert_called_once_with('volumeUp', 2, None, None, None,
+                                          [])
+        self.assertEqual(coalescer.getPendingCount(), 1,
+                         'Coalescer sent the next window on an old timer.')
+        flushKey(*netLoop.callLater.call_args[0][2:])
+        self.assertEqual(self.send.call_count, 2,
+                         'Coalescer failed to send the window on its '
+                         'timer.')
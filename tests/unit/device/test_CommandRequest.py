@@ -0,0 +1,77 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.CommandRequest import CommandRequest            # noqa: E402
+
+
+class TestCommandRequest(TestCase):
+    """
+    CommandRequest class test cases.
+    """
+    @patch('device.CommandRequest.time.monotonic')
+    def test_getTimings(self, mockedMonotonic):
+        """
+        The getTimings method must return the duration of each stage.
+        """
+        mockedMonotonic.return_value = 10.0
+        request = CommandRequest('req1', 'power')
+        request.dequeued = 10.5
+        request.ready = 10.75
+        request.done = 11.0
+        self.assertEqual(request.getTimings(),
+                         {'queued': 0.5, 'ready': 0.25, 'transmit': 0.25,
+                          'total': 1.0},
+                         'CommandRequest getTimings failed to return the '
+                         'stage durations.')
+
+    def test_getTimingsNotReached(self):
+        """
+        The getTimings method must return None for the stages not reached.
+        """
+        request = CommandRequest('req1', 'power')
+        self.assertEqual(request.getTimings(),
+                         {'queued': None, 'ready': None, 'transmit': None,
+                          'total': None},
+                         'CommandRequest getTimings failed to return None '
+                         'for the stages not reached.')
+
+    def test_toResult(self):
+        """
+        The toResult method must return the result correlated with the
+        request.
+        """
+        request = CommandRequest('req1', 'power')
+        result = request.toResult('done')
+        self.assertEqual((result['id'], result['command'], result['result']),
+                         ('req1', 'power', 'done'),
+                         'CommandRequest toResult failed to correlate the '
+                         'result.')
+
+    def test_traceId(self):
+        """
+        Each request must get its own trace ID, returned with its result.
+        """
+        request = CommandRequest('req1', 'power')
+        self.assertNotEqual(request.traceId,
+                            CommandRequest('req1', 'power').traceId,
+                            'CommandRequest failed to get a unique trace ID.')
+        self.assertEqual(request.toResult('done')['trace'], request.traceId,
+                         'CommandRequest toResult failed to return the '
+                         'trace ID.')
+
+    @patch('device.CommandRequest.time.monotonic')
+    def test_addSpan(self, mockedMonotonic):
+        """
+        The addSpan method must add a span ending now by default.
+        """
+        mockedMonotonic.return_value = 10.0
+        request = CommandRequest('req1', 'power')
+        request.addSpan('receive', 9.5, 9.75)
+        request.addSpan('publish', 9.9)
+        self.assertEqual(request.spans,
+                         [('receive', 9.5, 9.75), ('publish', 9.9, 10.0)],
+                         'CommandRequest addSpan failed to add the spans.')
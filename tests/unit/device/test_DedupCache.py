@@ -0,0 +1,74 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.DedupCache import DedupCache                    # noqa: E402
+
+
+class TestDedupCache(TestCase):
+    """
+    DedupCache class test cases.
+    """
+    def test_claimNew(self):
+        """
+        The claim method must return None for a new request.
+        """
+        cache = DedupCache()
+        self.assertIsNone(cache.claim('req1'),
+                          'DedupCache failed to accept a new request.')
+
+    def test_claimDuplicate(self):
+        """
+        The claim method must return PENDING for a duplicate of a request in
+        progress, and its result once completed.
+        """
+        cache = DedupCache()
+        cache.claim('req1')
+        self.assertIs(cache.claim('req1'), DedupCache.PENDING,
+                      'DedupCache failed to detect the pending duplicate.')
+        cache.complete('req1', True)
+        self.assertIs(cache.claim('req1'), True,
+                      'DedupCache failed to return the cached result.')
+        self.assertEqual(cache.getDuplicateCount(), 2,
+                         'DedupCache failed to count the duplicates.')
+
+    def test_claimCapacity(self):
+        """
+        The claim method must evict the oldest request once the cache is
+        full.
+        """
+        cache = DedupCache(capacity=2)
+        for requestId in ['req1', 'req2', 'req3']:
+            cache.claim(requestId)
+        self.assertIsNone(cache.claim('req1'),
+                          'DedupCache failed to evict the oldest request.')
+        self.assertIs(cache.claim('req3'), DedupCache.PENDING,
+                      'DedupCache evicted a recent request.')
+
+    @patch('device.DedupCache.time.monotonic')
+    def test_claimExpired(self, mockedMonotonic):
+        """
+        The claim method must treat a request past the dedup window as a
+        new one.
+        """
+        mockedMonotonic.return_value = 100.0
+        cache = DedupCache(window=10)
+        cache.claim('req1')
+        cache.complete('req1', True)
+        mockedMonotonic.return_value = 111.0
+        self.assertIsNone(cache.claim('req1'),
+                          'DedupCache failed to expire the request.')
+
+    def test_release(self):
+        """
+        The release method must drop the claim of a request, so its
+        redelivery is processed again.
+        """
+        cache = DedupCache()
+        cache.claim('req1')
+        cache.release('req1')
+        self.assertIsNone(cache.claim('req1'),
+                          'DedupCache failed to release the request.')
@@ -1,16 +1,23 @@
+import json
 import logging
 from unittest import TestCase
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, mock_open, patch
 
 from ircodec.command import CommandSet
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 
 import os
 import sys
 sys.path.append(os.path.abspath('./src'))
 
 from config import Config                                   # noqa: E402
-from device.Device import Device                            # noqa: E402
+from device.CommandRequest import CommandRequest            # noqa: E402
+from device.Device import Device, RECEIVE_TO_TRANSMIT       # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+from device.StateModel import StateModel                    # noqa: E402
+from device.Transmitter import Transmitter                  # noqa: E402
 from exceptions import CommandNotFound, CommandFileAccess   # noqa: E402
 
 
@@ -166,9 +173,14 @@ class TestDevice(TestCase):
         self.assertEqual(device.client.on_subscribe, device._on_subscribe,
                          'Device _initClient method failed to initialize '
                          'the client event callbacks.')
-        self.assertEqual(device.client.on_log, device._on_log,
-                         'Device _initClient method failed to initialize'
-                         'the client event callbacks.')
+        if device.logBridge.logger.isEnabledFor(logging.DEBUG):
+            self.assertEqual(device.client.on_log, device.logBridge.onLog,
+                             'Device _initClient method failed to initialize'
+                             'the client event callbacks.')
+        else:
+            self.assertTrue(device.client.enable_logger.called,
+                            'Device _initClient method failed to enable the '
+                            'client logger.')
 
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
@@ -208,8 +220,8 @@ class TestDevice(TestCase):
     @patch('device.Device.mqtt.Client')
     def test__initMqttClientConnect(self, mockedClient, mockedCmdSet):
         """
-        The _initMqttClient (called by the constructor) method must connect
-        the client to the appropriate broker.
+        The _initMqttClient (called by the constructor) method must
+        asynchronously connect the client to the appropriate broker.
         """
         mockedClient.side_effect = [self.mockedClient]
         mockedCmdSet.side_effect = [self.mockedCmdSet]
@@ -217,7 +229,9 @@ class TestDevice(TestCase):
                         self.deviceConfig, isNew=True)
         hostname = self.mockedAppConfig.getBrokerHostname()
         port = self.mockedAppConfig.getBrokerPort()
-        self.mockedClient.connect.assert_called_once_with(hostname, port=port)
+        self.mockedClient.connect_async.assert_called_once_with(hostname,
+                                                                port=port)
+        self.mockedClient.connect.assert_not_called()
 
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
@@ -259,7 +273,7 @@ class TestDevice(TestCase):
         mockedCmdSet.side_effect = [self.mockedCmdSet]
         device = Device(logging, self.mockedAppConfig,
                         self.deviceConfig, isNew=True)
-        device._on_connect(None, None, None, None)
+        device._on_connect(None, None, None, 0)
         topic = f"{self.baseTopic}{device.STATUS_TOPIC}"
         self.mockedClient.publish.assert_called_once_with(topic, payload=device.ONLINE_MSG,     # noqa: E501
                                                           qos=1, retain=True)                   # noqa: E501
@@ -274,7 +288,7 @@ class TestDevice(TestCase):
         mockedCmdSet.side_effect = [self.mockedCmdSet]
         device = Device(logging, self.mockedAppConfig,
                         self.deviceConfig, isNew=True)
-        device._on_connect(None, None, None, None)
+        device._on_connect(None, None, None, 0)
         topic = f"{self.baseTopic}{device.CMD_TOPIC}"
         self.mockedClient.subscribe.assert_called_once_with(topic)
 
@@ -289,7 +303,25 @@ class TestDevice(TestCase):
         device = Device(logging, self.mockedAppConfig,
                         self.deviceConfig, isNew=True)
         device._on_disconnect(None, None, None)
-        self.assertTrue(True)
+        self.assertEqual(device.getState()['status'], Device.OFFLINE_MSG,
+                         'Device _on_disconnect failed to set the offline '
+                         'status.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_disconnectV5(self, mockedClient, mockedCmdSet):
+        """
+        The _on_disconnect method must accept the MQTT v5 properties.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device._on_disconnect(None, None, 0,
+                              Properties(PacketTypes.DISCONNECT))
+        self.assertEqual(device.getState()['status'], Device.OFFLINE_MSG,
+                         'Device _on_disconnect failed to handle an MQTT v5 '
+                         'disconnection.')
 
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
@@ -308,7 +340,14 @@ class TestDevice(TestCase):
         device = Device(logging, self.mockedAppConfig,
                         self.deviceConfig, isNew=True)
         device._on_message(None, None, msg)
-        mockedPubCmdResult.assert_called_once_with(False)
+        mockedPubCmdResult.assert_called_once()
+        success, cmdRequest = mockedPubCmdResult.call_args[0]
+        self.assertEqual(success, False,
+                         'Device _on_message failed to publish the command '
+                         'result.')
+        self.assertFalse(cmdRequest.structured,
+                         'Device _on_message failed to track the plain '
+                         'command with an unstructured request.')
 
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
@@ -347,7 +386,14 @@ class TestDevice(TestCase):
         device = Device(logging, self.mockedAppConfig,
                         self.deviceConfig, isNew=True)
         device._on_message(None, None, msg)
-        mockedPubCmdResult.assert_called_once_with(True)
+        mockedPubCmdResult.assert_called_once()
+        success, cmdRequest = mockedPubCmdResult.call_args[0]
+        self.assertEqual(success, True,
+                         'Device _on_message failed to publish the command '
+                         'result.')
+        self.assertFalse(cmdRequest.structured,
+                         'Device _on_message failed to track the plain '
+                         'command with an unstructured request.')
 
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
@@ -375,19 +421,6 @@ class TestDevice(TestCase):
         device._on_subscribe(None, None, None, None)
         self.assertTrue(True)
 
-    @patch('device.Device.CommandSet')
-    @patch('device.Device.mqtt.Client')
-    def test__on_log(self, mockedClient, mockedCmdSet):
-        """
-        The _on_log method does not do much.
-        """
-        mockedClient.side_effect = [self.mockedClient]
-        mockedCmdSet.side_effect = [self.mockedCmdSet]
-        device = Device(logging, self.mockedAppConfig,
-                        self.deviceConfig, isNew=True)
-        device._on_log(None, None, mqtt.MQTT_LOG_INFO, None)
-        self.assertTrue(True)
-
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
     def test_startLoop(self, mockedClient, mockedCmdSet):
@@ -416,6 +449,43 @@ class TestDevice(TestCase):
         self.mockedClient.loop_stop.assert_called_once()
         self.mockedClient.disconnect.assert_called_once()
 
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_getStartupTimingsCmdSet(self, mockedClient, mockedCmdSet):
+        """
+        The getStartupTimings method must return the command set load
+        timing right after the device creation.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        timings = device.getStartupTimings()
+        self.assertEqual(list(timings.keys()), ['commandSet'],
+                         'Device getStartupTimings failed to return only '
+                         'the command set load timing before connection.')
+        self.assertTrue(timings['commandSet'] >= 0,
+                        'Device getStartupTimings failed to return a valid '
+                        'command set load timing.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_getStartupTimingsConnect(self, mockedClient, mockedCmdSet):
+        """
+        The getStartupTimings method must return the connect timing once
+        the loop was started and the client connected.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.startLoop()
+        device._on_connect(None, None, None, 0)
+        timings = device.getStartupTimings()
+        self.assertTrue('connect' in timings and timings['connect'] >= 0,
+                        'Device getStartupTimings failed to return the '
+                        'connect timing once connected.')
+
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
     def test_getName(self, mockedClient, mockedCmdSet):
@@ -460,6 +530,10 @@ class TestDevice(TestCase):
         self.assertEqual(configuration, self.deviceConfig,
                          'Device getConfig failed to return the'
                          'device configuration.')
+        configuration['name'] = 'changed'
+        self.assertEqual(device.getName(), self.deviceConfig['name'],
+                         'Device getConfig failed to return a copy of the'
+                         'device configuration.')
 
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
@@ -502,29 +576,54 @@ class TestDevice(TestCase):
         The getCommandList method must return the list of command
         supported by the device.
         """
-        cmdSetJson = {
-            "type": "CommandSet",
-            "name": "rm-s103",
-            "emitter_gpio": 22,
-            "receiver_gpio": 11,
-            "commands": {
-                "power": {},
-                "volumeUp": {},
-                "volumeDown": {},
-                "channelUp": {},
-                "channelDown": {}
-            }
+        commands = {
+            "power": {},
+            "volumeUp": {},
+            "volumeDown": {},
+            "channelUp": {},
+            "channelDown": {}
         }
+        mockedCmdSetInst = Mock(spec_set=CommandSet('rm-s103'))
+        mockedCmdSetInst.commands = commands
         mockedClient.side_effect = [self.mockedClient]
-        mockedCmdSet.side_effect = [self.mockedCmdSet]
-        self.mockedCmdSet.to_json.return_value = cmdSetJson
+        mockedCmdSet.side_effect = [mockedCmdSetInst]
         device = Device(logging, self.mockedAppConfig,
                         self.deviceConfig, isNew=True)
         commandList = device.getCommandList()
-        self.assertEqual(commandList, cmdSetJson['commands'].keys(),
+        self.assertEqual(commandList, list(commands.keys()),
                          'Device getCommandList failed to return the device'
                          'supported command list.')
 
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_getCommandListCached(self, mockedClient, mockedCmdSet):
+        """
+        The getCommandList method must serve the cached list until a
+        command is added or deleted.
+        """
+        mockedCmdSetInst = Mock(spec_set=CommandSet('rm-s103'))
+        mockedCmdSetInst.commands = {'power': {}}
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [mockedCmdSetInst]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        commandList = device.getCommandList()
+        mockedCmdSetInst.commands = {'power': {}, 'mute': {}}
+        self.assertIs(device.getCommandList(), commandList,
+                      'Device getCommandList failed to serve the cached '
+                      'command list.')
+        device.addCommand('mute', 'Mute')
+        self.assertEqual(device.getCommandList(), ['power', 'mute'],
+                         'Device addCommand failed to invalidate the cached '
+                         'command list.')
+        mockedCmdSetInst.commands = {'mute': {}}
+        device.deleteCommand('power')
+        self.assertEqual(device.getCommandList(), ['mute'],
+                         'Device deleteCommand failed to invalidate the '
+                         'cached command list.')
+        self.assertEqual(device.getGeneration(), 2,
+                         'Device failed to count the command set changes.')
+
     @patch('device.Device.CommandSet')
     @patch('device.Device.mqtt.Client')
     def test_addCommandCmdSetAdd(self, mockedClient, mockedCmdSet):
@@ -613,3 +712,661 @@ class TestDevice(TestCase):
                                 f"{self.deviceConfig['commandSet']['model']}.json")     # noqa: E501
         device.saveCommandSet()
         self.mockedCmdSet.save_as.assert_called_once_with(saveFile)
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_transmitUnsupported(self, mockedClient, mockedCmdSet):
+        """
+        The transmit method must return False when the command is not
+        supported.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        self.mockedCmdSet.emit.side_effect = [KeyError()]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        self.assertFalse(device.transmit('not supported command'),
+                         'Device transmit failed to return False when the '
+                         'command is not supported.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandTransmitter(self, mockedClient, mockedCmdSet):
+        """
+        The sendCommand method must queue the command in the transmitter
+        when one is provided.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        transmitter = Mock()
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, transmitter=transmitter)
+        device.sendCommand('power')
+        transmitter.submit.assert_called_once_with(device, 'power',
+                                                   device._publishCmdResult,
+                                                   1, 'normal', None, None)
+        self.mockedCmdSet.emit.assert_not_called()
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_startLoopNetLoop(self, mockedClient, mockedCmdSet):
+        """
+        The startLoop method must add the client to the shared network loop
+        when one is provided.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        netLoop = Mock()
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, netLoop=netLoop)
+        device.startLoop()
+        netLoop.addClient.assert_called_once_with(self.mockedClient)
+        self.mockedClient.loop_start.assert_not_called()
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_stopLoopNetLoop(self, mockedClient, mockedCmdSet):
+        """
+        The stopLoop method must remove the client from the shared network
+        loop and disconnect it when a network loop is provided.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        netLoop = Mock()
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, netLoop=netLoop)
+        device.stopLoop()
+        netLoop.removeClient.assert_called_once_with(self.mockedClient)
+        self.mockedClient.loop_stop.assert_not_called()
+        self.mockedClient.disconnect.assert_called_once()
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_eventCallbackStatus(self, mockedClient, mockedCmdSet):
+        """
+        The device must notify its event callback of the status changes.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        callback = Mock()
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.setEventCallback(callback)
+        device._on_connect(self.mockedClient, None, None, 0)
+        callback.assert_called_once_with(device, Device.EVT_STATUS,
+                                         {'status': Device.ONLINE_MSG})
+        self.assertEqual(device.getState()['status'], Device.ONLINE_MSG,
+                         'Device failed to update its status on connection.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_eventCallbackResult(self, mockedClient, mockedCmdSet):
+        """
+        The device must notify its event callback of the command results.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        callback = Mock()
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.setEventCallback(callback)
+        device._publishCmdResult(True)
+        callback.assert_called_once_with(device, Device.EVT_RESULT,
+                                         {'lastResult': Device.SUCCESS_MSG})
+        self.assertEqual(device.getState(),
+                         {'status': Device.OFFLINE_MSG,
+                          'lastResult': Device.SUCCESS_MSG},
+                         'Device getState failed to return the last command '
+                         'result.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_eventCallbackConfig(self, mockedClient, mockedCmdSet):
+        """
+        The device must notify its event callback of the configuration
+        changes.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        callback = Mock()
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.setEventCallback(callback)
+        newConfig = dict(self.deviceConfig, topicPrefix='newPrefix')
+        device.setConfig(newConfig)
+        callback.assert_called_once_with(device, Device.EVT_CONFIG,
+                                         newConfig)
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandCallback(self, mockedClient, mockedCmdSet):
+        """
+        The sendCommand method must publish the result and then call the
+        provided callback with it.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        callback = Mock()
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.sendCommand('power', callback)
+        self.mockedClient.publish.assert_called_once()
+        callback.assert_called_once_with(True)
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandStateRequest(self, mockedClient, mockedCmdSet):
+        """
+        The sendCommand method must transmit the planned commands of a
+        state request and update the predicted state.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        callback = Mock()
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.states = StateModel({'input': {
+            'type': 'discrete',
+            'commands': {'tv': 'inputTv', 'cd': 'inputCd'},
+        }})
+        device.sendCommand('input=cd', callback)
+        self.mockedCmdSet.emit.assert_called_with('inputCd', emit_gap=0.01)
+        callback.assert_called_once_with(True)
+        self.assertEqual(device.getPredictedState(), {'input': 'cd'},
+                         'sendCommand failed to update the predicted state.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandStateRequestRedundant(self, mockedClient,
+                                              mockedCmdSet):
+        """
+        The sendCommand method must not transmit anything when the device
+        is already in the requested state, and publish a success.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        callback = Mock()
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.states = StateModel({'power': {
+            'type': 'toggle',
+            'command': 'power',
+            'values': ['off', 'on'],
+        }})
+        device.states.setValue('power', 'on')
+        device.sendCommand('power=on', callback)
+        self.mockedCmdSet.emit.assert_not_called()
+        self.mockedClient.publish.assert_called_once_with(
+            f"{self.baseTopic}{Device.RESULT_TOPIC}",
+            payload=Device.SUCCESS_MSG)
+        callback.assert_called_once_with(True)
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandStateRequestUnsupported(self, mockedClient,
+                                                mockedCmdSet):
+        """
+        The sendCommand method must publish an error when the state request
+        is not supported.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        callback = Mock()
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device.sendCommand('volume=10', callback)
+        self.mockedCmdSet.emit.assert_not_called()
+        self.mockedClient.publish.assert_called_once_with(
+            f"{self.baseTopic}{Device.RESULT_TOPIC}",
+            payload=Device.ERROR_MSG)
+        callback.assert_called_once_with(False)
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandStateRequestTransmitter(self, mockedClient,
+                                                mockedCmdSet):
+        """
+        The sendCommand method must queue a state request as is in the
+        transmitter when one is provided, the commands being planned when
+        it is transmitted, after the previous requests.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        transmitter = Mock()
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, transmitter=transmitter)
+        device.states = StateModel({'power': {
+            'type': 'toggle',
+            'command': 'power',
+            'values': ['off', 'on'],
+        }})
+        device.states.setValue('power', 'off')
+        device.sendCommand('power=on')
+        device.sendCommand('power=on')
+        self.assertEqual([submitCall[0][1] for submitCall
+                          in transmitter.submit.call_args_list],
+                         ['power=on'] * 2,
+                         'sendCommand failed to queue the state requests.')
+        for i in range(2):
+            device.transmit('power=on')
+        self.assertEqual(self.mockedCmdSet.emit.call_count,
+                         Device.PACKET_COUNT,
+                         'Device failed to plan the second request after '
+                         'the first one.')
+        self.assertEqual(device.getPredictedState(), {'power': 'on'},
+                         'Device failed to update the predicted state.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_transmitStateRequestBlindToggle(self, mockedClient,
+                                             mockedCmdSet):
+        """
+        The transmit method must assume the requested value of an unknown
+        toggle state after a blind press, and report it, the next requests
+        being planned from the assumed value.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True)
+        device.states = StateModel({'power': {
+            'type': 'toggle',
+            'command': 'power',
+            'values': ['off', 'on'],
+        }})
+        self.assertEqual(device.transmit('power=on'), Device.ASSUMED_MSG,
+                         'Device transmit failed to report the assumed '
+                         'state.')
+        self.assertEqual(device.getPredictedState(), {'power': 'on'},
+                         'Device transmit failed to assume the requested '
+                         'value.')
+        self.assertIs(device.transmit('power=on'), True,
+                      'Device transmit failed to plan from the assumed '
+                      'value.')
+        self.assertEqual(self.mockedCmdSet.emit.call_count,
+                         Device.PACKET_COUNT,
+                         'Device transmit failed to skip the redundant '
+                         'press.')
+        self.assertEqual(Device.getResultMsg(Device.ASSUMED_MSG),
+                         Device.ASSUMED_MSG,
+                         'Device failed to report the assumed result.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_transmitRepeat(self, mockedClient, mockedCmdSet):
+        """
+        The transmit method must send the packets of each repeat in one
+        burst.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        self.assertTrue(device.transmit('volumeUp', 3),
+                        'Device transmit failed to return True.')
+        self.assertEqual(self.mockedCmdSet.emit.call_count,
+                         Device.PACKET_COUNT * 3,
+                         'Device transmit failed to send the packets of '
+                         'each repeat.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandCoalesce(self, mockedClient, mockedCmdSet):
+        """
+        The sendCommand method must coalesce the rapid repeats when the
+        device configuration enables it, and send them on stopLoop.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        self.deviceConfig['coalesce'] = {'window': 10}
+        transmitter = Mock()
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, transmitter=transmitter)
+        device.sendCommand('volumeUp')
+        device.sendCommand('volumeUp')
+        transmitter.submit.assert_not_called()
+        device.stopLoop()
+        transmitter.submit.assert_called_once_with(device, 'volumeUp',
+                                                   device._publishCmdResult,
+                                                   2, 'normal', None, None)
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_sendCommandCoalesceRequests(self, mockedClient, mockedCmdSet):
+        """
+        The sendCommand method must publish the result of each request
+        merged in a coalesced command.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        self.deviceConfig['coalesce'] = {'window': 10}
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True)
+        requests = [CommandRequest(f"req{i}", 'volumeUp') for i in range(2)]
+        for cmdRequest in requests:
+            device.sendCommand('volumeUp', cmdRequest=cmdRequest)
+        device.coalescer.flush()
+        results = [json.loads(call[1]['payload']) for call
+                   in self.mockedClient.publish.call_args_list
+                   if call[0][0] == f"{self.baseTopic}{Device.RESULT_TOPIC}"]
+        self.assertEqual(sorted((result['id'], result['result'])
+                                for result in results),
+                         [('req0', Device.SUCCESS_MSG),
+                          ('req1', Device.SUCCESS_MSG)],
+                         'Device sendCommand failed to publish the result '
+                         'of each merged request.')
+        self.assertIsNotNone(results[0]['timings']['total'],
+                             'Device sendCommand failed to time the merged '
+                             'request.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test_getQueueDepth(self, mockedClient, mockedCmdSet):
+        """
+        The getQueueDepth method must count the commands in the coalescing
+        window and in the transmit queue.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        self.deviceConfig['coalesce'] = {'window': 10}
+        transmitter = Mock()
+        transmitter.getDeviceDepth.return_value = 2
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, transmitter=transmitter)
+        device.sendCommand('volumeUp')
+        self.assertEqual(device.getQueueDepth(), 3,
+                         'Device getQueueDepth failed to count the queued '
+                         'commands.')
+        transmitter.getDeviceDepth.assert_called_once_with(device)
+        device.coalescer.flush()
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__publishCmdResultRefused(self, mockedClient, mockedCmdSet):
+        """
+        The _publishCmdResult method must publish the refusal reason of a
+        command refused by the transmitter.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        device._publishCmdResult(Transmitter.EXPIRED)
+        self.mockedClient.publish.assert_called_once_with(
+            f"{self.baseTopic}{Device.RESULT_TOPIC}",
+            payload=str(Transmitter.EXPIRED))
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__publishCmdResultUnstructured(self, mockedClient, mockedCmdSet):
+        """
+        The _publishCmdResult method must publish the bare result of a
+        plain command request and record its receive to transmit time.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        cmdRequest = CommandRequest(None, 'power', structured=False)
+        cmdRequest.ready = cmdRequest.received + 0.25
+        count = sum(summary['count'] for labels, summary
+                    in RECEIVE_TO_TRANSMIT.getSummary())
+        device._publishCmdResult(True, cmdRequest)
+        self.mockedClient.publish.assert_called_once_with(
+            f"{self.baseTopic}{Device.RESULT_TOPIC}",
+            payload=Device.SUCCESS_MSG)
+        self.assertEqual(sum(summary['count'] for labels, summary
+                             in RECEIVE_TO_TRANSMIT.getSummary()), count + 1,
+                         'Device _publishCmdResult failed to record the '
+                         'receive to transmit time.')
+
+    @patch('device.Device.tracer')
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_messageTrace(self, mockedClient, mockedCmdSet,
+                              mockedTracer):
+        """
+        The _on_message method must trace the command stages, with a span
+        per IR packet.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        msg = Mock()
+        msg.payload.decode.return_value = 'power'
+        device._on_message(None, None, msg)
+        cmdRequest, name, result = mockedTracer.finish.call_args[0]
+        self.assertEqual((cmdRequest.command, name, result),
+                         ('power', f"{self.deviceConfig['location']}."
+                                   f"{self.deviceConfig['name']}",
+                          Device.SUCCESS_MSG),
+                         'Device _on_message failed to trace the command.')
+        self.assertEqual([span[0] for span in cmdRequest.spans],
+                         ['receive'] + [f"packet {i}" for i
+                                        in range(Device.PACKET_COUNT)]
+                         + ['publish'],
+                         'Device _on_message failed to trace the command '
+                         'stages.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_messageRequest(self, mockedClient, mockedCmdSet):
+        """
+        The _on_message method must send the command of a JSON request with
+        its priority and time to live.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        transmitter = Mock()
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, transmitter=transmitter)
+        msg = Mock()
+        msg.payload = b'{"command": "power", "priority": "high", "ttl": 5}'
+        device._on_message(self.mockedClient, None, msg)
+        args = transmitter.submit.call_args[0]
+        self.assertEqual(args[1], 'power',
+                         '_on_message failed to send the request command.')
+        self.assertEqual(args[4], 'high',
+                         '_on_message failed to send the request priority.')
+        self.assertIsNotNone(args[5],
+                             '_on_message failed to set the request '
+                             'deadline.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_messageInvalidRequest(self, mockedClient, mockedCmdSet):
+        """
+        The _on_message method must publish an error when the JSON request
+        is invalid.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        transmitter = Mock()
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, transmitter=transmitter)
+        msg = Mock()
+        msg.payload = b'{"command": "power", "priority": "urgent"}'
+        device._on_message(self.mockedClient, None, msg)
+        transmitter.submit.assert_not_called()
+        self.mockedClient.publish.assert_called_once_with(
+            f"{self.baseTopic}{Device.RESULT_TOPIC}",
+            payload=Device.ERROR_MSG)
+
+    @patch('device.Device.CommandSet.load')
+    @patch('device.Device.mqtt.Client')
+    def test_getPriority(self, mockedClient, mockedCmdSetLoad):
+        """
+        The getPriority method must return the command set priority of a
+        command, normal by default.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSetLoad.side_effect = [self.mockedCmdSet]
+        cmdSet = json.dumps({'priorities': {'power': 'high'}})
+        with patch('builtins.open', mock_open(read_data=cmdSet)):
+            device = Device(logging, self.mockedAppConfig, self.deviceConfig)
+        self.assertEqual(device.getPriority('power'), 'high',
+                         'getPriority failed to return the command set '
+                         'priority.')
+        self.assertEqual(device.getPriority('volumeUp'), 'normal',
+                         'getPriority failed to return the default '
+                         'priority.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_messageDuplicate(self, mockedClient, mockedCmdSet):
+        """
+        The _on_message method must not retransmit a redelivered request
+        and publish its cached result again.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        msg = Mock()
+        msg.payload = b'{"command": "power", "id": "req1"}'
+        device._on_message(self.mockedClient, None, msg)
+        device._on_message(self.mockedClient, None, msg)
+        self.assertEqual(self.mockedCmdSet.emit.call_count,
+                         Device.PACKET_COUNT,
+                         '_on_message failed to suppress the duplicate.')
+        results = [json.loads(publishCall[1]['payload']) for publishCall
+                   in self.mockedClient.publish.call_args_list]
+        self.assertEqual([(result['id'], result['result'])
+                          for result in results],
+                         [('req1', Device.SUCCESS_MSG)] * 2,
+                         '_on_message failed to publish the cached result.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_messageDuplicateRefused(self, mockedClient, mockedCmdSet):
+        """
+        The _on_message method must process again the redelivery of a
+        request refused by the transmitter.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        transmitter = Mock()
+        transmitter.submit.side_effect = \
+            lambda device, command, onResult, *args: \
+            onResult(Transmitter.LIMITED)
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, transmitter=transmitter)
+        msg = Mock()
+        msg.payload = b'{"command": "power", "id": "req1"}'
+        device._on_message(self.mockedClient, None, msg)
+        device._on_message(self.mockedClient, None, msg)
+        self.assertEqual(transmitter.submit.call_count, 2,
+                         '_on_message failed to process the redelivery of a '
+                         'refused request.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_messageStructuredResult(self, mockedClient, mockedCmdSet):
+        """
+        The _on_message method must publish the structured result of a
+        JSON request, with its ID and stage timings.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        msg = Mock()
+        msg.payload = b'{"command": "power", "id": "req1"}'
+        device._on_message(self.mockedClient, None, msg)
+        topic = self.mockedClient.publish.call_args[0][0]
+        result = json.loads(self.mockedClient.publish.call_args[1]['payload'])
+        self.assertEqual(topic, f"{self.baseTopic}{Device.RESULT_TOPIC}",
+                         '_on_message failed to publish on the result topic.')
+        self.assertEqual((result['id'], result['command'], result['result']),
+                         ('req1', 'power', Device.SUCCESS_MSG),
+                         '_on_message failed to correlate the result.')
+        self.assertTrue(all(duration is not None for duration
+                            in result['timings'].values()),
+                        '_on_message failed to time the request stages.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_messageResponseTopic(self, mockedClient, mockedCmdSet):
+        """
+        The _on_message method must publish the result of an MQTT v5
+        request on its response topic, with its correlation data.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        self.mockedAppConfig.getMqttProtocol.return_value = mqtt.MQTTv5
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        mockedClient.assert_called_once_with(
+            client_id=f"{self.deviceConfig['location']}."
+                      f"{self.deviceConfig['name']}",
+            protocol=mqtt.MQTTv5)
+        msg = Mock()
+        msg.payload = b'power'
+        msg.properties.ResponseTopic = 'client/responses'
+        msg.properties.CorrelationData = b'42'
+        device._on_message(self.mockedClient, None, msg)
+        args, kwargs = self.mockedClient.publish.call_args
+        self.assertEqual(args[0], 'client/responses',
+                         '_on_message failed to publish on the response '
+                         'topic.')
+        self.assertEqual(kwargs['properties'].CorrelationData, b'42',
+                         '_on_message failed to return the correlation '
+                         'data.')
+        self.assertEqual(json.loads(kwargs['payload'])['result'],
+                         Device.SUCCESS_MSG,
+                         '_on_message failed to publish the result.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_connectRefused(self, mockedClient, mockedCmdSet):
+        """
+        A connection refused by the broker must be reported to the network
+        loop, without going online nor flushing the outbox.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        netLoop = Mock(spec_set=NetworkLoop)
+        device = Device(logging, self.mockedAppConfig, self.deviceConfig,
+                        isNew=True, netLoop=netLoop)
+        self.mockedClient.publish.return_value = \
+            Mock(rc=mqtt.MQTT_ERR_NO_CONN)
+        device._publishCmdResult(True)
+        self.mockedClient.publish.reset_mock()
+        eventCallback = Mock()
+        device.setEventCallback(eventCallback)
+        device._on_connect(self.mockedClient, None, None,
+                           mqtt.CONNACK_REFUSED_NOT_AUTHORIZED)
+        netLoop.onConnAck.assert_called_once_with(
+            mqtt.CONNACK_REFUSED_NOT_AUTHORIZED)
+        self.mockedClient.publish.assert_not_called()
+        self.mockedClient.subscribe.assert_not_called()
+        eventCallback.assert_not_called()
+        self.assertEqual(device.getState()['status'], Device.OFFLINE_MSG,
+                         'Device failed to stay offline on a refused '
+                         'connection.')
+        self.assertEqual(device.getOutboxStats()['buffered'], 1,
+                         'Device failed to keep the buffered results on a '
+                         'refused connection.')
+
+    @patch('device.Device.CommandSet')
+    @patch('device.Device.mqtt.Client')
+    def test__on_connectFlushOutbox(self, mockedClient, mockedCmdSet):
+        """
+        The results published while disconnected must be published once
+        reconnected.
+        """
+        mockedClient.side_effect = [self.mockedClient]
+        mockedCmdSet.side_effect = [self.mockedCmdSet]
+        device = Device(logging, self.mockedAppConfig,
+                        self.deviceConfig, isNew=True)
+        resultTopic = f"{self.baseTopic}{Device.RESULT_TOPIC}"
+        self.mockedClient.publish.return_value = \
+            Mock(rc=mqtt.MQTT_ERR_NO_CONN)
+        device._publishCmdResult(True)
+        self.mockedClient.publish.reset_mock()
+        self.mockedClient.publish.return_value = \
+            Mock(rc=mqtt.MQTT_ERR_SUCCESS)
+        device._on_connect(self.mockedClient, None, None, 0)
+        self.mockedClient.publish.assert_called_with(
+            resultTopic, payload=Device.SUCCESS_MSG)
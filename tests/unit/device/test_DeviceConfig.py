@@ -0,0 +1,115 @@
+import json
+from unittest import TestCase
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.DeviceConfig import DeviceConfig                # noqa: E402
+from exceptions import InvalidDeviceConfig                  # noqa: E402
+
+
+class TestDeviceConfig(TestCase):
+    """
+    DeviceConfig class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        with open('./tests/unit/device/devices.json') as devFiles:
+            self.devices = json.loads(devFiles.read())
+
+    def test_fromDictFields(self):
+        """
+        The fromDict method must parse all the configuration fields.
+        """
+        config = DeviceConfig.fromDict(self.devices[0])
+        self.assertEqual(config.name, self.devices[0]['name'],
+                         'DeviceConfig failed to parse the device name.')
+        self.assertEqual(config.commandSet.packetGap,
+                         self.devices[0]['commandSet']['packetGap'],
+                         'DeviceConfig failed to parse the command set '
+                         'reference.')
+        self.assertEqual(config.lastWill.qos,
+                         self.devices[0]['lastWill']['qos'],
+                         'DeviceConfig failed to parse the last will.')
+        self.assertEqual(config.baseTopic,
+                         f"{self.devices[0]['topicPrefix']}/"
+                         f"{self.devices[0]['location']}/"
+                         f"{self.devices[0]['name']}/",
+                         'DeviceConfig failed to compute the base topic.')
+
+    def test_fromDictMissingField(self):
+        """
+        The fromDict method must raise an InvalidDeviceConfig error when
+        a field is missing.
+        """
+        del self.devices[0]['commandSet']['emitterGpio']
+        with self.assertRaises(InvalidDeviceConfig) as context:
+            DeviceConfig.fromDict(self.devices[0])
+        self.assertTrue('commandSet.emitterGpio: missing'
+                        in str(context.exception),
+                        'DeviceConfig failed to raise an InvalidDeviceConfig '
+                        'error when a field is missing.')
+
+    def test_fromDictWrongType(self):
+        """
+        The fromDict method must raise an InvalidDeviceConfig error when
+        a field has the wrong type.
+        """
+        self.devices[0]['lastWill']['retain'] = 'yes'
+        with self.assertRaises(InvalidDeviceConfig) as context:
+            DeviceConfig.fromDict(self.devices[0])
+        self.assertTrue('lastWill.retain: expected bool'
+                        in str(context.exception),
+                        'DeviceConfig failed to raise an InvalidDeviceConfig '
+                        'error when a field has the wrong type.')
+
+    def test_fromDictPacketGapInt(self):
+        """
+        The fromDict method must coerce an integer packet gap to a float.
+        """
+        self.devices[0]['commandSet']['packetGap'] = 1
+        config = DeviceConfig.fromDict(self.devices[0])
+        self.assertIs(type(config.commandSet.packetGap), float,
+                      'DeviceConfig failed to coerce the packet gap to a '
+                      'float.')
+
+    def test_toDictRoundTrip(self):
+        """
+        The toDict method must return a new copy of the raw configuration,
+        optional entries included.
+        """
+        self.devices[0]['groups'] = ['tv']
+        config = DeviceConfig.fromDict(self.devices[0])
+        rawConfig = config.toDict()
+        self.assertEqual(rawConfig, self.devices[0],
+                         'DeviceConfig toDict failed to serialize the '
+                         'configuration.')
+        rawConfig['commandSet']['model'] = 'changed'
+        self.assertNotEqual(config.commandSet.model, 'changed',
+                            'DeviceConfig toDict failed to return a copy '
+                            'of the configuration.')
+
+    def test_toJsonCached(self):
+        """
+        The toJson method must serialize the configuration once.
+        """
+        config = DeviceConfig.fromDict(self.devices[0])
+        self.assertEqual(json.loads(config.toJson()), self.devices[0],
+                         'DeviceConfig toJson failed to serialize the '
+                         'configuration.')
+        self.assertTrue(config.toJson() is config.toJson(),
+                        'DeviceConfig toJson failed to cache the '
+                        'serialization.')
+
+    def test_slots(self):
+        """
+        The records must not have an instance dictionary.
+        """
+        config = DeviceConfig.fromDict(self.devices[0])
+        self.assertFalse(hasattr(config, '__dict__')
+                         or hasattr(config.commandSet, '__dict__')
+                         or hasattr(config.lastWill, '__dict__'),
+                         'DeviceConfig records failed to use slots.')
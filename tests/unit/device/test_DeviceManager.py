@@ -8,10 +8,12 @@ import os
 import sys
 sys.path.append(os.path.abspath('./src'))
 
+from config import Config                                   # noqa: E402
 from device.Device import Device                            # noqa: E402
 from device.DeviceManager import DeviceManager              # noqa: E402
 from exceptions import DeviceFileAccess, DeviceNotFound, \
-    DeviceExists                                            # noqa: E402
+    DeviceExists, InvalidCommandBatch, \
+    InvalidDeviceConfig                                     # noqa: E402
 
 
 class TestDevMngr(TestCase):
@@ -25,6 +27,7 @@ class TestDevMngr(TestCase):
         with open('./tests/unit/device/devices.json') as devFiles:
             self.devicesStr = devFiles.read()
             self.devices = json.loads(self.devicesStr)
+        self.appConfig = Mock(spec_set=Config)
 
         self.mockDevs = []
         for device in self.devices:
@@ -54,6 +57,20 @@ class TestDevMngr(TestCase):
         self.mockedToshCmdSets = [('./commandSets/tochiba', (),
                                   ('cmdSetTosh1.json', 'cmdSetTosh2.json'))]
 
+    def _walk(self, path):
+        """
+        Walk the mocked command sets directory.
+
+        Params:
+            path:           The walked directory.
+
+        Return:
+            The mocked directory tree.
+        """
+        return {'./commandSets': self.mockedCmdSetsDir,
+                './commandSets/samsung': self.mockedSecCmdsets,
+                './commandSets/toshiba': self.mockedToshCmdSets}.get(path, [])
+
     @patch('device.DeviceManager.Device')
     def test_constructorDevsFileError(self, mockedDevice):
         """
@@ -64,13 +81,40 @@ class TestDevMngr(TestCase):
         with patch('builtins.open', mock_open(read_data=self.devicesStr)) \
                 as mockedFile, self.assertRaises(DeviceFileAccess) as context:
             mockedFile.side_effect = OSError
-            devMngr = DeviceManager(logging, {})                # noqa: F841
+            devMngr = DeviceManager(logging, self.appConfig)  # noqa: F841
             self.assertTrue('unable to access device configuraion file'
                             in str(context.exception),
                             'DeviceManager failed to raise a DeviceFileAccess '
                             'exception when access to the device '
                             'configurations access failed.')
 
+    @patch('device.DeviceManager.Device')
+    def test_constructorInvalidDevsFile(self, mockedDevice):
+        """
+        The constructor must raise an InvalidDeviceConfig error if a device
+        configuration of the devices file is invalid.
+        """
+        del self.devices[0]['topicPrefix']
+        with patch('builtins.open',
+                   mock_open(read_data=json.dumps(self.devices))), \
+                self.assertRaises(InvalidDeviceConfig):
+            DeviceManager(logging, self.appConfig)
+        mockedDevice.assert_not_called()
+
+    @patch('device.DeviceManager.Device')
+    def test_constructorDevsHardwareMismatch(self, mockedDevice):
+        """
+        The constructor must check each device configuration against the
+        hardware configuration before creating the devices.
+        """
+        self.appConfig.validateDeviceConfig.side_effect = \
+            [None, InvalidDeviceConfig('linkedEmitter', 'unknown output')]
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)), \
+                self.assertRaises(InvalidDeviceConfig):
+            DeviceManager(logging, self.appConfig)
+        self.appConfig.validateDeviceConfig.assert_any_call(self.devices[0])
+        mockedDevice.assert_not_called()
+
     @patch('device.DeviceManager.Device')
     def test_constructorOpenDevsFile(self, mockedDevice):
         """
@@ -79,7 +123,7 @@ class TestDevMngr(TestCase):
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open',
                    mock_open(read_data=self.devicesStr)) as mockedFile:
-            devMngr = DeviceManager(logging, {})                # noqa: F841
+            devMngr = DeviceManager(logging, self.appConfig)  # noqa: F841
             mockedFile.assert_called_once_with('./config/components/'
                                                'devices.json')
 
@@ -91,11 +135,42 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})         # noqa: F841
+            devMngr = DeviceManager(logging, self.appConfig)  # noqa: F841
             self.assertEqual(mockedDevice.call_count, len(self.devices),
                              'DeviceManager constructor failed to create '
                              'all the device from the devices faile.')
 
+    @patch('device.DeviceManager.ShardManager')
+    @patch('device.DeviceManager.Device')
+    def test_constructorSharded(self, mockedDevice, mockedShardMngr):
+        """
+        The constructor must start the device shards instead of creating
+        the devices when sharding is enabled.
+        """
+        mockedShardMngr.return_value.getDevices.return_value = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig, shardCount=2)
+            mockedShardMngr.assert_called_once_with(logging, self.appConfig,
+                                                    self.devices, 2)
+            mockedShardMngr.return_value.start.assert_called_once()
+            mockedDevice.assert_not_called()
+            self.assertEqual(devMngr.getDevices(), self.mockDevs,
+                             'DeviceManager failed to expose the sharded '
+                             'devices.')
+
+    @patch('device.DeviceManager.ShardManager')
+    @patch('device.DeviceManager.Device')
+    def test_stopLoopsSharded(self, mockedDevice, mockedShardMngr):
+        """
+        The stopLoops method must stop the device shards.
+        """
+        mockedShardMngr.return_value.getDevices.return_value = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig, shardCount=2)
+            devMngr.stopLoops()
+            mockedShardMngr.return_value.stopLoops.assert_called_once()
+            mockedShardMngr.return_value.stop.assert_called_once()
+
     @patch('device.DeviceManager.Device')
     def test_startLoops(self, mockedDevice):
         """
@@ -103,7 +178,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             devMngr.startLoops()
             for dev in self.mockDevs:
                 self.assertTrue(dev.startLoop.called,
@@ -118,7 +193,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             devMngr.stopLoops()
             for dev in self.mockDevs:
                 self.assertTrue(dev.stopLoop.called,
@@ -126,6 +201,48 @@ class TestDevMngr(TestCase):
                                 'call the stopLoop method on all '
                                 'the devices.')
 
+    @patch('device.DeviceManager.Device')
+    def test_getStartupTimings(self, mockedDevice):
+        """
+        The getStartupTimings method must return the startup phase timings
+        aggregated with the device timings.
+        """
+        for idx, dev in enumerate(self.mockDevs):
+            dev.getStartupTimings.return_value = {'commandSet': 0.5,
+                                                  'connect': idx + 1.0}
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+            timings = devMngr.getStartupTimings()
+            self.assertTrue('configLoad' in timings
+                            and 'devicesInit' in timings,
+                            'DeviceManager getStartupTimings failed to '
+                            'return the manager phase timings.')
+            self.assertEqual(timings['commandSetLoad'],
+                             0.5 * len(self.mockDevs),
+                             'DeviceManager getStartupTimings failed to '
+                             'sum the command set load timings.')
+            self.assertEqual(timings['connect'], float(len(self.mockDevs)),
+                             'DeviceManager getStartupTimings failed to '
+                             'return the slowest device connection.')
+
+    @patch('device.DeviceManager.Device')
+    def test_getStartupTimingsNotConnected(self, mockedDevice):
+        """
+        The getStartupTimings method must not return a connect timing
+        until all the devices are connected.
+        """
+        for dev in self.mockDevs:
+            dev.getStartupTimings.return_value = {'commandSet': 0.5}
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+            timings = devMngr.getStartupTimings()
+            self.assertFalse('connect' in timings,
+                             'DeviceManager getStartupTimings returned a '
+                             'connect timing before the devices were '
+                             'connected.')
+
     @patch('device.DeviceManager.Device')
     def test_getDefaultConfig(self, mockedDevice):
         """
@@ -134,7 +251,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             defConfig = devMngr.getDefaultConfig()
             self.assertFalse(defConfig is devMngr.DEFAULT_CONFIG,
                              'DeviceManger getDefaultConfig failed to'
@@ -153,7 +270,7 @@ class TestDevMngr(TestCase):
         lookupName = 'prout'
         lookupLocation = 'atlantic'
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             with self.assertRaises(DeviceNotFound) as context:
                 devMngr.getDeviceByName(lookupName, lookupLocation)
             print(str(context.exception))
@@ -169,7 +286,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             foundDev = devMngr.getDeviceByName(self.devices[1]['name'],
                                                self.devices[1]['location'])
             self.assertTrue(foundDev is self.mockDevs[1],
@@ -184,7 +301,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             with self.assertRaises(IndexError) as context:
                 devMngr.getDeviceByIdx(len(self.devices) + 3)
             self.assertTrue('list index out of range'
@@ -207,7 +324,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             devCount = devMngr.getDeviceCount()
             self.assertEqual(devCount, len(self.devices),
                              'DeviceManager getDevsCount failed to return'
@@ -220,7 +337,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             deviceList = devMngr.getDevices()
             self.assertEqual(len(deviceList), len(self.devices),
                              'DeviceManager getDevices failed to return the'
@@ -238,7 +355,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             with self.assertRaises(DeviceExists) as context:
                 devMngr.addDevice(self.devices[0])
             self.assertTrue(f"device {self.devices[0]['location']}."
@@ -279,7 +396,7 @@ class TestDevMngr(TestCase):
         self.mockDevs.append(mockedDev)
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             devMngr.addDevice(mockedDevConfig)
             self.assertEqual(len(devMngr.devices), len(self.devices) + 1,
                              'DeviceManager addDevice failed to create the '
@@ -296,7 +413,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevices.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             devMngr.saveDevices()
             for device in self.mockDevs:
                 device.getConfig.assert_called_once()
@@ -309,7 +426,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
 
         with patch('builtins.open', mock_open(read_data=self.devicesStr)) \
                 as mockedFile, self.assertRaises(DeviceFileAccess) as context:
@@ -328,7 +445,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
 
         with patch('builtins.open', mock_open(read_data=self.devicesStr)) \
                 as mockedFile:
@@ -367,7 +484,7 @@ class TestDevMngr(TestCase):
         self.mockDevs.append(mockedDev)
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
             devMngr.addDevice(mockedDevConfig)
 
         with patch('builtins.open', mock_open(read_data=self.devicesStr)) \
@@ -387,7 +504,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
 
         with patch('os.walk') as mockedWalk:
             devMngr.listManufacturer()
@@ -401,7 +518,7 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
 
         with patch('os.walk') as mockedWalk:
             mockedWalk.return_value = self.mockedCmdSetsDir
@@ -418,9 +535,10 @@ class TestDevMngr(TestCase):
         """
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
 
         with patch('os.walk') as mockedWalk:
+            mockedWalk.side_effect = self._walk
             devMngr.listCommandSets('sony')
             mockedWalk.assert_called_with('./commandSets/sony')
 
@@ -440,19 +558,371 @@ class TestDevMngr(TestCase):
 
         mockedDevice.side_effect = self.mockDevs
         with patch('builtins.open', mock_open(read_data=self.devicesStr)):
-            devMngr = DeviceManager(logging, {})
+            devMngr = DeviceManager(logging, self.appConfig)
 
         with patch('os.walk') as mockedWalk:
-            mockedWalk.return_value = self.mockedSecCmdsets
+            mockedWalk.side_effect = self._walk
             resultCmdSets = devMngr.listCommandSets('samsung')
             self.assertEqual(resultCmdSets, secCmdSets,
                              'DeviceManager listCommandSets failed to return '
                              'the list of command sets for a given '
                              'manufacturer.')
 
-            mockedWalk.return_value = self.mockedToshCmdSets
             resultCmdSets = devMngr.listCommandSets('toshiba')
             self.assertEqual(resultCmdSets, toshCmdSets,
                              'DeviceManager listCommandSets failed to return '
                              'the list of command sets for a given '
                              'manufacturer.')
+
+    @patch('device.DeviceManager.Device')
+    def test_getDevicesSnapshot(self, mockedDevice):
+        """
+        The getDevicesSnapshot method must return the current version with
+        the configuration and state of all the devices.
+        """
+        for mockedDev in self.mockDevs:
+            mockedDev.getState.return_value = {'status': 'ONLINE',
+                                               'lastResult': None}
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        snapshot = devMngr.getDevicesSnapshot()
+        self.assertEqual(snapshot['version'], 0,
+                         'DeviceManager getDevicesSnapshot failed to return '
+                         'the current version.')
+        self.assertEqual(snapshot['devices'],
+                         [{'config': device,
+                           'state': {'status': 'ONLINE', 'lastResult': None}}
+                          for device in self.devices],
+                         'DeviceManager getDevicesSnapshot failed to return '
+                         'the configuration and state of all the devices.')
+
+    @patch('device.DeviceManager.Device')
+    def test_getStatusSummary(self, mockedDevice):
+        """
+        The getStatusSummary method must return the online flag, last
+        result and queue depth of each device.
+        """
+        mockedDevice.ONLINE_MSG = Device.ONLINE_MSG
+        for idx, mockedDev in enumerate(self.mockDevs):
+            mockedDev.getState.return_value = {
+                'status': Device.ONLINE_MSG if idx else Device.OFFLINE_MSG,
+                'lastResult': Device.SUCCESS_MSG}
+            mockedDev.getQueueDepth.return_value = idx
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        summary = devMngr.getStatusSummary()
+        self.assertEqual(list(summary.values()),
+                         [{'online': bool(idx),
+                           'lastResult': Device.SUCCESS_MSG,
+                           'queueDepth': idx}
+                          for idx in range(len(self.mockDevs))],
+                         'DeviceManager getStatusSummary failed to return '
+                         'the status of all the devices.')
+
+    @patch('device.DeviceManager.ShardManager')
+    @patch('device.DeviceManager.Device')
+    def test_getStatusSummarySharded(self, mockedDevice,
+                                     mockedShardManager):
+        """
+        The getStatusSummary method must read the sharded device states from
+        the shard manager, without calling the device proxies.
+        """
+        mockedDevice.ONLINE_MSG = Device.ONLINE_MSG
+        shardMngr = mockedShardManager.return_value
+        shardMngr.getDevices.return_value = self.mockDevs
+        shardMngr.getDeviceStates.return_value = {
+            mockedDev: ({'status': Device.ONLINE_MSG, 'lastResult': None}, 2)
+            for mockedDev in self.mockDevs}
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig, shardCount=2)
+        summary = devMngr.getStatusSummary()
+        self.assertEqual(list(summary.values()),
+                         [{'online': True, 'lastResult': None,
+                           'queueDepth': 2}] * len(self.mockDevs),
+                         'DeviceManager getStatusSummary failed to return '
+                         'the sharded device states.')
+        for mockedDev in self.mockDevs:
+            mockedDev.getState.assert_not_called()
+
+    @patch('device.DeviceManager.Device')
+    def test_deltaDeviceEvent(self, mockedDevice):
+        """
+        The device events must be published to the listeners as versioned
+        deltas.
+        """
+        mockedDevice.EVT_CONFIG = Device.EVT_CONFIG
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        listener = Mock()
+        devMngr.addListener(listener)
+        device = self.mockDevs[0]
+        device.setEventCallback.assert_called_once_with(devMngr
+                                                        ._onDeviceEvent)
+        devId = f"{self.devices[0]['location']}.{self.devices[0]['name']}"
+        devMngr._onDeviceEvent(device, Device.EVT_STATUS,
+                               {'status': 'ONLINE'})
+        devMngr._onDeviceEvent(device, Device.EVT_CONFIG, self.devices[0])
+        self.assertEqual(listener.call_args_list[0][0][0],
+                         {'version': 1, 'op': DeviceManager.DELTA_STATE,
+                          'id': devId, 'data': {'status': 'ONLINE'}},
+                         'DeviceManager failed to publish the state delta.')
+        self.assertEqual(listener.call_args_list[1][0][0],
+                         {'version': 2, 'op': DeviceManager.DELTA_UPDATE,
+                          'id': devId, 'data': self.devices[0]},
+                         'DeviceManager failed to publish the update delta.')
+
+    @patch('device.DeviceManager.Device')
+    def test_deltaAddRemove(self, mockedDevice):
+        """
+        The device additions and removals must be published to the
+        listeners as versioned deltas.
+        """
+        newDevConfig = dict(self.devices[0], name='newDevice')
+        newDev = Mock(spec_set=Device)
+        newDev.getName.return_value = newDevConfig['name']
+        newDev.getLocation.return_value = newDevConfig['location']
+        newDev.getConfig.return_value = newDevConfig
+        newDev.getState.return_value = {'status': 'OFFLINE',
+                                        'lastResult': None}
+        mockedDevice.side_effect = self.mockDevs + [newDev]
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        listener = Mock()
+        devMngr.addListener(listener)
+        devId = f"{newDevConfig['location']}.{newDevConfig['name']}"
+        devMngr.addDevice(newDevConfig)
+        listener.assert_called_once_with({
+            'version': 1, 'op': DeviceManager.DELTA_ADD, 'id': devId,
+            'data': {'config': newDevConfig,
+                     'state': {'status': 'OFFLINE', 'lastResult': None}}})
+        listener.reset_mock()
+        devMngr.removeDevice(newDevConfig['name'], newDevConfig['location'])
+        listener.assert_called_once_with({'version': 2,
+                                          'op': DeviceManager.DELTA_REMOVE,
+                                          'id': devId})
+        newDev.stopLoop.assert_called_once()
+        self.assertNotIn(newDev, devMngr.getDevices(),
+                         'DeviceManager removeDevice failed to remove the '
+                         'device.')
+
+    @patch('device.DeviceManager.Device')
+    def test_getDevsConfigListCached(self, mockedDevice):
+        """
+        The getDevsConfigList method must serve the cached list until a
+        device configuration changes.
+        """
+        mockedDevice.EVT_CONFIG = Device.EVT_CONFIG
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        devsConfig = devMngr.getDevsConfigList()
+        self.assertEqual(devMngr.getDevsConfigList(), self.devices,
+                         'DeviceManager getDevsConfigList failed to return '
+                         'the device list.')
+        self.assertEqual(self.mockDevs[0].getConfig.call_count, 1,
+                         'DeviceManager failed to serve the cached device '
+                         'list.')
+        newConfig = dict(self.devices[0], topicPrefix='newPrefix')
+        self.mockDevs[0].getConfig.return_value = newConfig
+        devMngr._onDeviceEvent(self.mockDevs[0], Device.EVT_CONFIG,
+                               newConfig)
+        self.assertIsNot(devMngr.getDevsConfigList(), devsConfig,
+                         'DeviceManager failed to invalidate the device list '
+                         'on configuration change.')
+        self.assertEqual(devMngr.getDevsConfigList()[0], newConfig,
+                         'DeviceManager failed to rebuild the device list.')
+
+    @patch('device.DeviceManager.Device')
+    def test_listCommandSetsUnknown(self, mockedDevice):
+        """
+        The listCommandSets must neither walk nor cache an unknown
+        manufacturer.
+        """
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+
+        with patch('os.walk') as mockedWalk:
+            mockedWalk.side_effect = self._walk
+            self.assertEqual(devMngr.listCommandSets('../config'), [],
+                             'DeviceManager listCommandSets failed to '
+                             'ignore an unknown manufacturer.')
+            mockedWalk.assert_called_once_with('./commandSets')
+        self.assertEqual(list(devMngr.catalog.views), ['manufacturers'],
+                         'DeviceManager cached an unknown manufacturer.')
+
+    @patch('device.DeviceManager.Device')
+    def test_listManufacturerCached(self, mockedDevice):
+        """
+        The catalog listings must be served from the cache until the catalog
+        is invalidated.
+        """
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+
+        with patch('os.walk') as mockedWalk:
+            mockedWalk.return_value = self.mockedCmdSetsDir
+            devMngr.listManufacturer()
+            devMngr.listManufacturer()
+            mockedWalk.assert_called_once()
+            devMngr.invalidateCatalog()
+            devMngr.listManufacturer()
+            self.assertEqual(mockedWalk.call_count, 2,
+                             'DeviceManager invalidateCatalog failed to drop '
+                             'the cached catalog.')
+
+    @patch('device.DeviceManager.Device')
+    def test_sendCommandsInvalid(self, mockedDevice):
+        """
+        The sendCommands method must validate the whole batch before
+        sending any command.
+        """
+        for mockedDev in self.mockDevs:
+            mockedDev.getCommandList.return_value = ['power']
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        devId = f"{self.devices[0]['location']}.{self.devices[0]['name']}"
+        for batch in ([], [{'device': devId}],
+                      [{'device': devId, 'command': 'power'},
+                       {'device': 'unknown.device', 'command': 'power'}],
+                      [{'device': devId, 'command': 'power'},
+                       {'device': devId, 'command': 'fly'}]):
+            with self.assertRaises(InvalidCommandBatch):
+                devMngr.sendCommands(batch, Mock())
+        for mockedDev in self.mockDevs:
+            mockedDev.sendCommand.assert_not_called()
+
+    @patch('device.DeviceManager.Device')
+    def test_validateBatchStateRequest(self, mockedDevice):
+        """
+        The batch validation must accept the state requests of a declared
+        state and reject the others, without reading the command list.
+        """
+        for mockedDev in self.mockDevs:
+            mockedDev.getStates.return_value = {'power': {}}
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        devId = f"{self.devices[0]['location']}.{self.devices[0]['name']}"
+        self.assertEqual(devMngr._validateBatch([{'device': devId,
+                                                  'command': 'power=on'}]),
+                         [(self.mockDevs[0], 'power=on')],
+                         'DeviceManager failed to accept a state request.')
+        with self.assertRaises(InvalidCommandBatch):
+            devMngr._validateBatch([{'device': devId,
+                                     'command': 'volume=10'}])
+        self.mockDevs[0].getCommandList.assert_not_called()
+
+    @patch('device.DeviceManager.Device')
+    def test_sendCommandsBatch(self, mockedDevice):
+        """
+        The sendCommands method must hand the batch to the transmitter as a
+        unit and report the aggregate result.
+        """
+        mockedDevice.SUCCESS_MSG = Device.SUCCESS_MSG
+        mockedDevice.ERROR_MSG = Device.ERROR_MSG
+        mockedDevice.getResultMsg = Device.getResultMsg
+        for mockedDev in self.mockDevs:
+            mockedDev.getCommandList.return_value = ['power']
+            mockedDev.getPriority.return_value = 'normal'
+            mockedDev.getCommandJob.side_effect = \
+                lambda command, dev=mockedDev: (dev, command, None)
+        self.mockDevs[1].getPriority.return_value = 'high'
+        mockedDevice.side_effect = self.mockDevs
+        transmitter = Mock()
+        transmitter.submitBatch.side_effect = \
+            lambda jobs, callback, priority: callback([(True, 0.1),
+                                                       (False, 0.2)])
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig,
+                                    transmitter=transmitter)
+        devIds = [f"{device['location']}.{device['name']}"
+                  for device in self.devices[:2]]
+        callback = Mock()
+        devMngr.sendCommands([{'device': devId, 'command': 'power'}
+                              for devId in devIds], callback)
+        transmitter.submitBatch.assert_called_once()
+        self.assertEqual(transmitter.submitBatch.call_args[0][0],
+                         [(self.mockDevs[0], 'power', None),
+                          (self.mockDevs[1], 'power', None)],
+                         'DeviceManager sendCommands failed to submit the '
+                         'batch jobs.')
+        self.assertEqual(transmitter.submitBatch.call_args[0][2], 'high',
+                         'DeviceManager sendCommands failed to submit the '
+                         'batch with its highest priority.')
+        result = callback.call_args[0][0]
+        self.assertEqual(result['result'], Device.ERROR_MSG,
+                         'DeviceManager sendCommands failed to report the '
+                         'batch failure.')
+        self.assertEqual([(item['device'], item['result'], item['elapsed'])
+                          for item in result['items']],
+                         [(devIds[0], Device.SUCCESS_MSG, 0.1),
+                          (devIds[1], Device.ERROR_MSG, 0.2)],
+                         'DeviceManager sendCommands failed to report the '
+                         'item results.')
+
+    @patch('device.DeviceManager.Device')
+    def test_sendCommandsAsync(self, mockedDevice):
+        """
+        The sendCommands method must not wait for the transmissions when
+        there is no transmitter, each command being sent once the previous
+        one is done.
+        """
+        mockedDevice.SUCCESS_MSG = Device.SUCCESS_MSG
+        mockedDevice.ERROR_MSG = Device.ERROR_MSG
+        mockedDevice.getResultMsg = Device.getResultMsg
+        pending = []
+        for mockedDev in self.mockDevs:
+            mockedDev.getCommandList.return_value = ['power']
+            mockedDev.sendCommand.side_effect = \
+                lambda command, callback: pending.append(callback)
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        devId = f"{self.devices[0]['location']}.{self.devices[0]['name']}"
+        callback = Mock()
+        devMngr.sendCommands([{'device': devId, 'command': 'power'}] * 2,
+                             callback)
+        self.assertEqual(len(pending), 1,
+                         'DeviceManager sendCommands failed to send the '
+                         'commands one after the other.')
+        pending.pop()(True)
+        callback.assert_not_called()
+        pending.pop()(False)
+        self.assertEqual([item['result'] for item
+                          in callback.call_args[0][0]['items']],
+                         [Device.SUCCESS_MSG, Device.ERROR_MSG],
+                         'DeviceManager sendCommands failed to report the '
+                         'item results.')
+
+    @patch('device.DeviceManager.Device')
+    def test_sendCommandsSequential(self, mockedDevice):
+        """
+        The sendCommands method must send the commands one by one when
+        there is no transmitter.
+        """
+        mockedDevice.SUCCESS_MSG = Device.SUCCESS_MSG
+        mockedDevice.ERROR_MSG = Device.ERROR_MSG
+        for mockedDev in self.mockDevs:
+            mockedDev.getCommandList.return_value = ['power']
+            mockedDev.sendCommand.side_effect = \
+                lambda command, callback: callback(True)
+        mockedDevice.side_effect = self.mockDevs
+        with patch('builtins.open', mock_open(read_data=self.devicesStr)):
+            devMngr = DeviceManager(logging, self.appConfig)
+        devId = f"{self.devices[0]['location']}.{self.devices[0]['name']}"
+        callback = Mock()
+        devMngr.sendCommands([{'device': devId, 'command': 'power'}] * 2,
+                             callback)
+        self.assertEqual(self.mockDevs[0].sendCommand.call_count, 2,
+                         'DeviceManager sendCommands failed to send all the '
+                         'commands.')
+        self.assertEqual(callback.call_args[0][0]['result'],
+                         Device.SUCCESS_MSG,
+                         'DeviceManager sendCommands failed to report the '
+                         'batch success.')
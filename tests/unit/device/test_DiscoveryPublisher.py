@@ -0,0 +1,152 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Device import Device                            # noqa: E402
+from device.DeviceManager import DeviceManager              # noqa: E402
+from device.DiscoveryPublisher import DiscoveryPublisher    # noqa: E402
+from device.Gateway import Gateway                          # noqa: E402
+
+
+class TestDiscoveryPublisher(TestCase):
+    """
+    DiscoveryPublisher class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.states = {
+            'power': {'type': 'toggle', 'command': 'power',
+                      'values': ['off', 'on']},
+            'input': {'type': 'discrete',
+                      'commands': {'tv': 'inputTv', 'cd': 'inputCd'}},
+            'volume': {'type': 'relative', 'up': 'volumeUp',
+                       'down': 'volumeDown', 'min': 0, 'max': 50},
+        }
+        self.amp = self._getDevice('amp', ['power', 'inputTv'], self.states)
+        self.devManager = Mock(spec_set=DeviceManager)
+        self.devManager.getDevices.return_value = [self.amp]
+        self.gateway = Mock(spec_set=Gateway)
+        self.gateway.isConnected.return_value = True
+        self.discovery = DiscoveryPublisher(logging, self.devManager,
+                                            'homeassistant')
+        self.discovery.registerTopics(self.gateway)
+
+    def _getDevice(self, name, commands, states):
+        device = Mock(spec_set=Device)
+        device.getConfig.return_value = {
+            'name': name,
+            'location': 'living room',
+            'topicPrefix': 'devices',
+            'commandSet': {'manufacturer': 'sony', 'model': 'rm-s103'},
+        }
+        device.getCommandList.return_value = commands
+        device.getStates.return_value = states
+        device.getGeneration.return_value = 0
+        return device
+
+    def _getPublished(self):
+        return {call[0][0]: json.loads(call[0][1]) if call[0][1] else ''
+                for call in self.gateway.publishRetained.call_args_list}
+
+    def test_registerTopics(self):
+        """
+        The registerTopics method must sync on connection and on the device
+        list changes, and register nothing when the discovery is disabled.
+        """
+        self.gateway.addConnectHandler.assert_called_once_with(
+            self.discovery.sync)
+        self.devManager.addListener.assert_called_once_with(
+            self.discovery._onDelta)
+        gateway = Mock(spec_set=Gateway)
+        DiscoveryPublisher(logging, self.devManager,
+                           None).registerTopics(gateway)
+        gateway.addConnectHandler.assert_not_called()
+
+    def test_syncConfigs(self):
+        """
+        The sync method must publish a button per command and an entity
+        per state.
+        """
+        self.assertEqual(self.discovery.sync(), 5,
+                         'DiscoveryPublisher failed to publish the configs.')
+        published = self._getPublished()
+        button = published['homeassistant/button/living_room_amp/power/'
+                           'config']
+        self.assertEqual((button['command_topic'], button['payload_press'],
+                          button['availability_topic']),
+                         ('devices/living room/amp/command', 'power',
+                          'devices/living room/amp/status'),
+                         'DiscoveryPublisher failed to publish a button.')
+        switch = published['homeassistant/switch/living_room_amp/'
+                           'state_power/config']
+        self.assertEqual((switch['payload_on'], switch['payload_off']),
+                         ('power=on', 'power=off'),
+                         'DiscoveryPublisher failed to publish a switch.')
+        select = published['homeassistant/select/living_room_amp/'
+                           'state_input/config']
+        self.assertEqual(select['options'], ['tv', 'cd'],
+                         'DiscoveryPublisher failed to publish a select.')
+        number = published['homeassistant/number/living_room_amp/'
+                           'state_volume/config']
+        self.assertEqual((number['min'], number['max'], number['step']),
+                         (0, 50, 1),
+                         'DiscoveryPublisher failed to publish a number.')
+
+    def test_syncClimate(self):
+        """
+        The sync method must publish a climate entity for the mode and
+        temperature states.
+        """
+        self.amp.getStates.return_value = {
+            'mode': {'type': 'discrete',
+                     'commands': {'off': 'off', 'cool': 'cool'}},
+            'temperature': {'type': 'relative', 'up': 'tempUp',
+                            'down': 'tempDown', 'min': 16, 'max': 30},
+        }
+        self.amp.getCommandList.return_value = []
+        self.discovery.sync()
+        published = self._getPublished()
+        self.assertEqual(list(published),
+                         ['homeassistant/climate/living_room_amp/climate/'
+                          'config'],
+                         'DiscoveryPublisher failed to merge the climate '
+                         'states.')
+        climate = list(published.values())[0]
+        self.assertEqual((climate['modes'], climate['min_temp'],
+                          climate['max_temp']),
+                         (['off', 'cool'], 16, 30),
+                         'DiscoveryPublisher failed to publish a climate.')
+
+    def test_syncChanged(self):
+        """
+        The sync method must only publish the changed configs and clear the
+        configs of the removed entities.
+        """
+        self.discovery.sync()
+        self.assertEqual(self.discovery.sync(), 0,
+                         'DiscoveryPublisher failed to skip the unchanged '
+                         'configs.')
+        self.amp.getGeneration.return_value = 1
+        self.amp.getCommandList.return_value = ['power']
+        self.gateway.publishRetained.reset_mock()
+        self.assertEqual(self.discovery.sync(), 1,
+                         'DiscoveryPublisher failed to sync the changes.')
+        self.gateway.publishRetained.assert_called_once_with(
+            'homeassistant/button/living_room_amp/inputTv/config', '')
+
+    def test_syncDisconnected(self):
+        """
+        The sync method must not publish while the gateway is disconnected.
+        """
+        self.gateway.isConnected.return_value = False
+        self.assertEqual(self.discovery.sync(), 0,
+                         'DiscoveryPublisher failed to wait for the '
+                         'connection.')
+        self.gateway.publishRetained.assert_not_called()
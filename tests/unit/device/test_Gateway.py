@@ -0,0 +1,174 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import paho.mqtt.client as mqtt
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from config import Config                                   # noqa: E402
+from device.DeviceManager import DeviceManager              # noqa: E402
+from device.Gateway import Gateway                          # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+from exceptions import InvalidCommandBatch                  # noqa: E402
+
+
+class TestGateway(TestCase):
+    """
+    Gateway class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.mockedAppConfig = Mock(spec_set=Config)
+        self.mockedAppConfig.getGatewayTopic.return_value = 'piirblaster'
+        self.mockedAppConfig.getBrokerHostname.return_value = 'broker'
+        self.mockedAppConfig.getBrokerPort.return_value = 1883
+        self.mockedDevMngr = Mock(spec_set=DeviceManager)
+
+    def _getMessage(self, topic, payload):
+        msg = Mock()
+        msg.topic = topic
+        msg.payload = payload.encode('utf-8')
+        return msg
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_constructorConnect(self, mockedClient):
+        """
+        The constructor must set the gateway last will and connect to the
+        broker asynchronously.
+        """
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr)
+        gateway.client.will_set.assert_called_once_with('piirblaster/status',
+                                                        Gateway.OFFLINE_MSG,
+                                                        1, True)
+        gateway.client.connect_async.assert_called_once_with('broker',
+                                                             port=1883)
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_onConnectSubscribe(self, mockedClient):
+        """
+        The on connect callback must subscribe to the handled topics.
+        """
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr)
+        gateway.addHandler('test', Mock())
+        gateway._on_connect(gateway.client, None, None, 0)
+        subscribed = [call[0][0] for call in
+                      gateway.client.subscribe.call_args_list]
+        self.assertEqual(subscribed, ['piirblaster/commands',
+                                      'piirblaster/test'],
+                         'Gateway failed to subscribe to the handled '
+                         'topics.')
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_onConnectReportConnAck(self, mockedClient):
+        """
+        The on connect callback must report the connection result to the
+        network loop.
+        """
+        netLoop = Mock(spec_set=NetworkLoop)
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr, netLoop)
+        gateway._on_connect(gateway.client, None, None, 0)
+        netLoop.onConnAck.assert_called_once_with(0)
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_onConnectRefused(self, mockedClient):
+        """
+        A connection refused by the broker must be reported to the network
+        loop, without publishing nor running the connect handlers.
+        """
+        netLoop = Mock(spec_set=NetworkLoop)
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr, netLoop)
+        handler = Mock()
+        gateway.addConnectHandler(handler)
+        gateway._on_connect(gateway.client, None, None,
+                            mqtt.CONNACK_REFUSED_NOT_AUTHORIZED)
+        netLoop.onConnAck.assert_called_once_with(
+            mqtt.CONNACK_REFUSED_NOT_AUTHORIZED)
+        gateway.client.publish.assert_not_called()
+        gateway.client.subscribe.assert_not_called()
+        handler.assert_not_called()
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_topicHandler(self, mockedClient):
+        """
+        The topic handlers must be subscribed, right away when connected,
+        and called with the topic of the messages matching their filter.
+        """
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr)
+        gateway.client.is_connected.return_value = False
+        handler = Mock()
+        gateway.addTopicHandler('home/+/all/command', handler)
+        gateway.client.subscribe.assert_not_called()
+        gateway._on_connect(gateway.client, None, None, 0)
+        gateway.client.subscribe.assert_any_call('home/+/all/command')
+        gateway.client.is_connected.return_value = True
+        gateway.addTopicHandler('other/+/all/command', handler)
+        gateway.client.subscribe.assert_called_with('other/+/all/command')
+        gateway._on_message(gateway.client, None,
+                            self._getMessage('home/kitchen/all/command',
+                                             'power'))
+        handler.assert_called_once_with('home/kitchen/all/command', 'power')
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_connectHandler(self, mockedClient):
+        """
+        The connect handlers must be called on each connection.
+        """
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr)
+        handler = Mock()
+        gateway.addConnectHandler(handler)
+        gateway._on_connect(gateway.client, None, None, 0)
+        gateway._on_connect(gateway.client, None, None, 0)
+        self.assertEqual(handler.call_count, 2,
+                         'Gateway failed to call the connect handler.')
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_onCommandsSendBatch(self, mockedClient):
+        """
+        The command batches must be sent through the device manager and
+        their aggregate result published.
+        """
+        result = {'result': 'done', 'elapsed': 0.1, 'items': []}
+        self.mockedDevMngr.sendCommands.side_effect = \
+            lambda batch, callback: callback(result)
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr)
+        batch = [{'device': 'livingRoom.tv', 'command': 'power'}]
+        gateway._on_message(gateway.client, None,
+                            self._getMessage('piirblaster/commands',
+                                             json.dumps(batch)))
+        self.assertEqual(self.mockedDevMngr.sendCommands.call_args[0][0],
+                         batch,
+                         'Gateway failed to send the command batch.')
+        gateway.client.publish.assert_called_once_with(
+            'piirblaster/commands/result', payload=json.dumps(result))
+
+    @patch('device.Gateway.mqtt.Client')
+    def test_onCommandsInvalid(self, mockedClient):
+        """
+        The invalid command batches must be answered with an invalid result.
+        """
+        self.mockedDevMngr.sendCommands.side_effect = \
+            InvalidCommandBatch(0, 'device livingRoom.tv not found')
+        gateway = Gateway(logging, self.mockedAppConfig,
+                          self.mockedDevMngr)
+        for payload in ('not json', '[{"device": "livingRoom.tv"}]'):
+            gateway.client.publish.reset_mock()
+            gateway._on_message(gateway.client, None,
+                                self._getMessage('piirblaster/commands',
+                                                 payload))
+            published = json.loads(gateway.client.publish
+                                   .call_args[1]['payload'])
+            self.assertEqual(published['result'], Gateway.INVALID_MSG,
+                             'Gateway failed to reject an invalid batch.')
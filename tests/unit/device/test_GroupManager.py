@@ -0,0 +1,186 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import Mock, patch, mock_open
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Device import Device                            # noqa: E402
+from device.DeviceManager import DeviceManager              # noqa: E402
+from device.Gateway import Gateway                          # noqa: E402
+from device.GroupManager import GroupManager                # noqa: E402
+from device.ShardManager import DeviceProxy, Shard          # noqa: E402
+from exceptions import InvalidConfig                        # noqa: E402
+
+
+class TestGroupManager(TestCase):
+    """
+    GroupManager class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.groups = [{
+            'name': 'tvs',
+            'devices': ['livingRoom.tv', 'bedroom.tv', 'garage.tv'],
+        }]
+        self.groupsStr = json.dumps(self.groups)
+        self.tv = self._getDevice('livingRoom', 'tv', ['power', 'hdmi1'])
+        self.amp = self._getDevice('livingRoom', 'amp', ['power'])
+        self.bedTv = self._getDevice('bedroom', 'tv', ['power'])
+        self.devManager = Mock(spec_set=DeviceManager)
+        self.devManager.getDevices.return_value = [self.tv, self.amp,
+                                                   self.bedTv]
+        self.devManager.getGeneration.return_value = 0
+        self.devManager.sendJobs.side_effect = \
+            lambda jobs, callback: callback([(True, 0.1)] * len(jobs))
+        self.gateway = Mock(spec=Gateway)
+        self.gateway.baseTopic = 'piirblaster/'
+        self.gateway.INVALID_MSG = Gateway.INVALID_MSG
+
+    def _getDevice(self, location, name, commands):
+        device = Mock(spec_set=Device)
+        device.getName.return_value = name
+        device.getLocation.return_value = location
+        device.getConfig.return_value = {'topicPrefix': 'home'}
+        device.getCommandList.return_value = commands
+        device.getGeneration.return_value = 0
+        return device
+
+    def _getGroupMngr(self):
+        with patch('builtins.open', mock_open(read_data=self.groupsStr)):
+            groupMngr = GroupManager(logging, self.devManager)
+        groupMngr.registerTopics(self.gateway)
+        return groupMngr
+
+    def test_constructorNoGroupFile(self):
+        """
+        The constructor must start without named groups when there is no
+        group file.
+        """
+        with patch('builtins.open') as mockedFile:
+            mockedFile.side_effect = FileNotFoundError
+            groupMngr = GroupManager(logging, self.devManager)
+        self.assertEqual(groupMngr.groups, {},
+                         'GroupManager failed to start without groups.')
+
+    def test_constructorInvalidGroups(self):
+        """
+        The constructor must raise an InvalidConfig error when the groups
+        are invalid.
+        """
+        self.groupsStr = json.dumps([{'name': 'tvs'}])
+        with self.assertRaises(InvalidConfig):
+            self._getGroupMngr()
+
+    def test_getIndex(self):
+        """
+        The getIndex method must index the devices by location and named
+        group topic with their supported commands, the unknown devices being
+        skipped, and rebuild the index only when the device list changes.
+        """
+        groupMngr = self._getGroupMngr()
+        index = groupMngr.getIndex()
+        self.assertEqual(index['home/livingRoom/all/command'],
+                         [('livingRoom.tv', self.tv, {'power', 'hdmi1'}),
+                          ('livingRoom.amp', self.amp, {'power'})],
+                         'GroupManager failed to index the location group.')
+        self.assertEqual(index['piirblaster/group/tvs/command'],
+                         [('livingRoom.tv', self.tv, {'power', 'hdmi1'}),
+                          ('bedroom.tv', self.bedTv, {'power'})],
+                         'GroupManager failed to index the named group.')
+        self.assertIs(groupMngr.getIndex(), index,
+                      'GroupManager failed to reuse the group index.')
+        self.devManager.getGeneration.return_value = 1
+        self.assertIsNot(groupMngr.getIndex(), index,
+                         'GroupManager failed to rebuild the group index.')
+
+    def test_getIndexCommandSetChange(self):
+        """
+        The getIndex method must rebuild the index when a device command set
+        changes.
+        """
+        groupMngr = self._getGroupMngr()
+        groupMngr.getIndex()
+        self.amp.getCommandList.return_value = ['power', 'hdmi1']
+        self.amp.getGeneration.return_value = 1
+        self.assertEqual(groupMngr.getIndex()['home/livingRoom/all/command'],
+                         [('livingRoom.tv', self.tv, {'power', 'hdmi1'}),
+                          ('livingRoom.amp', self.amp, {'power', 'hdmi1'})],
+                         'GroupManager failed to refresh the supported '
+                         'commands.')
+
+    def test_getIndexDeviceProxy(self):
+        """
+        The getIndex method must index the devices running in a shard.
+        """
+        with open('./tests/unit/device/devices.json') as devFiles:
+            devConfig = json.loads(devFiles.read())[0]
+        shard = Mock(spec_set=Shard)
+        shard.request.return_value = ['power']
+        proxy = DeviceProxy(shard, 0, devConfig)
+        self.devManager.getDevices.return_value = [proxy]
+        index = self._getGroupMngr().getIndex()
+        self.assertEqual(index[f"{devConfig['topicPrefix']}/"
+                               f"{devConfig['location']}/all/command"],
+                         [(f"{devConfig['location']}.{devConfig['name']}",
+                           proxy, {'power'})],
+                         'GroupManager failed to index a sharded device.')
+
+    def test_registerTopics(self):
+        """
+        The registerTopics method must serve the named groups and the
+        location groups of each topic prefix once.
+        """
+        groupMngr = self._getGroupMngr()
+        filters = [call[0][0] for call in
+                   self.gateway.addTopicHandler.call_args_list]
+        self.assertEqual(filters, ['piirblaster/group/+/command',
+                                   'home/+/all/command'],
+                         'GroupManager failed to serve the group topics.')
+        self.devManager.addListener.assert_called_once_with(
+            groupMngr._onDelta)
+
+    def test_onGroupMessage(self):
+        """
+        A group command must be sent as one batch to the devices supporting
+        it and its aggregate result published on the group result topic.
+        """
+        groupMngr = self._getGroupMngr()
+        groupMngr._onGroupMessage('home/livingRoom/all/command', 'hdmi1')
+        self.devManager.sendJobs.assert_called_once()
+        self.assertEqual(self.devManager.sendJobs.call_args[0][0],
+                         [(self.tv, 'hdmi1')],
+                         'GroupManager failed to skip the unsupported '
+                         'devices.')
+        topic, result = self.gateway.publishTo.call_args[0]
+        self.assertEqual(topic, 'home/livingRoom/all/result',
+                         'GroupManager failed to publish on the group '
+                         'result topic.')
+        self.assertEqual(result['result'], Device.SUCCESS_MSG,
+                         'GroupManager failed to report the group result.')
+        self.assertEqual([item['device'] for item in result['items']],
+                         ['livingRoom.tv'],
+                         'GroupManager failed to report the device results.')
+        groupMngr._onGroupMessage('home/livingRoom/all/command', 'power')
+        self.assertEqual(self.tv.getCommandList.call_count, 1,
+                         'GroupManager queried the device commands per '
+                         'message.')
+
+    def test_onGroupMessageUnsupported(self):
+        """
+        A group command supported by none of the group devices must be
+        answered with an invalid result.
+        """
+        groupMngr = self._getGroupMngr()
+        groupMngr._onGroupMessage('piirblaster/group/tvs/command', 'hdmi2')
+        self.devManager.sendJobs.assert_not_called()
+        topic, result = self.gateway.publishTo.call_args[0]
+        self.assertEqual((topic, result['result']),
+                         ('piirblaster/group/tvs/result',
+                          Gateway.INVALID_MSG),
+                         'GroupManager failed to reject an unsupported '
+                         'group command.')
@@ -0,0 +1,213 @@
+import http.client
+import json
+import logging
+import socket
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Device import Device                            # noqa: E402
+from device.LocalEndpoint import LocalEndpoint              # noqa: E402
+from device.Metrics import Registry                         # noqa: E402
+from device.ShardManager import DeviceProxy, Shard          # noqa: E402
+from exceptions import DeviceNotFound                       # noqa: E402
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix domain socket.
+    """
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class TestLocalEndpoint(TestCase):
+    """
+    LocalEndpoint class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.device = Mock(spec_set=Device)
+        self.device.sendCommand.side_effect = lambda command, callback: \
+            callback(command == 'power')
+        self.devManager = Mock()
+        self.devManager.getDeviceByName.side_effect = \
+            lambda name, location: self._getDevice(name, location)
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.socketPath = os.path.join(self.tmpDir.name, 'test.sock')
+
+    def tearDown(self):
+        """
+        Test cases cleanup.
+        """
+        self.tmpDir.cleanup()
+
+    def _getDevice(self, name, location):
+        if (name, location) != ('tv', 'livingRoom'):
+            raise DeviceNotFound(name, location)
+        return self.device
+
+    def _post(self, conn, path, payload):
+        conn.request('POST', path, body=json.dumps(payload),
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_executeCommandResult(self):
+        """
+        The executeCommand method must dispatch the command to the device
+        and return its result with the elapsed time.
+        """
+        endpoint = LocalEndpoint(logging, self.devManager)
+        code, payload = endpoint.executeCommand('livingRoom', 'tv', 'power')
+        self.device.sendCommand.assert_called_once()
+        self.assertEqual(code, 200,
+                         'LocalEndpoint executeCommand failed to succeed.')
+        self.assertEqual(payload['result'], Device.SUCCESS_MSG,
+                         'LocalEndpoint executeCommand failed to return the '
+                         'transmission result.')
+        self.assertGreaterEqual(payload['elapsed'], 0,
+                                'LocalEndpoint executeCommand failed to '
+                                'return the elapsed time.')
+        code, payload = endpoint.executeCommand('livingRoom', 'tv', 'fly')
+        self.assertEqual(payload['result'], Device.ERROR_MSG,
+                         'LocalEndpoint executeCommand failed to return the '
+                         'unsupported result.')
+
+    def test_executeCommandNotFound(self):
+        """
+        The executeCommand method must return a 404 code when the device
+        does not exist.
+        """
+        endpoint = LocalEndpoint(logging, self.devManager)
+        code, payload = endpoint.executeCommand('kitchen', 'tv', 'power')
+        self.assertEqual(code, 404,
+                         'LocalEndpoint executeCommand failed to report an '
+                         'unknown device.')
+
+    def test_executeCommandTimeout(self):
+        """
+        The executeCommand method must return a 504 code when the result
+        does not come in time.
+        """
+        self.device.sendCommand.side_effect = None
+        endpoint = LocalEndpoint(logging, self.devManager)
+        endpoint.CMD_TIMEOUT = 0.01
+        code, payload = endpoint.executeCommand('livingRoom', 'tv', 'power')
+        self.assertEqual(code, 504,
+                         'LocalEndpoint executeCommand failed to report a '
+                         'timeout.')
+
+    def test_executeCommandShardTimeout(self):
+        """
+        The executeCommand method must not wait for a shard device result
+        longer than the command timeout.
+        """
+        with open('./tests/unit/device/devices.json') as devFiles:
+            devConfig = json.loads(devFiles.read())[0]
+        self.device = DeviceProxy(Mock(spec_set=Shard), 0, devConfig)
+        endpoint = LocalEndpoint(logging, self.devManager)
+        endpoint.CMD_TIMEOUT = 0.01
+        code, payload = endpoint.executeCommand('livingRoom', 'tv', 'power')
+        self.device.shard.submit.assert_called_once()
+        self.assertEqual(code, 504,
+                         'LocalEndpoint executeCommand failed to time out a '
+                         'shard device command.')
+
+    def test_serveHttp(self):
+        """
+        The endpoint must serve the commands over loopback HTTP.
+        """
+        endpoint = LocalEndpoint(logging, self.devManager, httpPort=0)
+        endpoint.start()
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1',
+                                              endpoint.getHttpPort())
+            code, payload = self._post(conn, '/devices/livingRoom/tv/'
+                                       'command', {'command': 'power'})
+            self.assertEqual((code, payload['result']),
+                             (200, Device.SUCCESS_MSG),
+                             'LocalEndpoint failed to serve a command over '
+                             'HTTP.')
+            code, payload = self._post(conn, '/devices/livingRoom/tv/'
+                                       'command', {'cmd': 'power'})
+            self.assertEqual(code, 400,
+                             'LocalEndpoint failed to reject an invalid '
+                             'request.')
+            code, payload = self._post(conn, '/devices', {})
+            self.assertEqual(code, 404,
+                             'LocalEndpoint failed to reject an unknown '
+                             'path.')
+            conn.close()
+        finally:
+            endpoint.stop()
+
+    def test_serveMetrics(self):
+        """
+        The endpoint must serve the metrics in the Prometheus text format on
+        GET /metrics.
+        """
+        registry = Registry()
+        registry.counter('test_total', 'The test counter.').inc()
+        endpoint = LocalEndpoint(logging, self.devManager, httpPort=0)
+        with patch('device.LocalEndpoint.registry', registry):
+            endpoint.start()
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1',
+                                                  endpoint.getHttpPort())
+                conn.request('GET', '/metrics')
+                response = conn.getresponse()
+                body = response.read().decode('utf-8')
+                conn.request('GET', '/devices')
+                unknown = conn.getresponse()
+                unknown.read()
+                conn.close()
+            finally:
+                endpoint.stop()
+        self.assertEqual(response.status, 200,
+                         'LocalEndpoint failed to serve the metrics.')
+        self.assertEqual(response.getheader('Content-Type'),
+                         LocalEndpoint.METRICS_TYPE,
+                         'LocalEndpoint failed to serve the metrics in the '
+                         'Prometheus text format.')
+        self.assertEqual(body, registry.render(),
+                         'LocalEndpoint failed to serve the registry '
+                         'metrics.')
+        self.assertEqual(unknown.status, 404,
+                         'LocalEndpoint failed to reject an unknown path.')
+
+    def test_serveUnixSocket(self):
+        """
+        The endpoint must serve the commands over a Unix domain socket and
+        remove the socket when stopped.
+        """
+        endpoint = LocalEndpoint(logging, self.devManager,
+                                 socketPath=self.socketPath)
+        endpoint.start()
+        try:
+            self.assertEqual(os.stat(self.socketPath).st_mode & 0o777, 0o600,
+                             'LocalEndpoint failed to restrict the socket '
+                             'access to its user.')
+            conn = _UnixConnection(self.socketPath)
+            code, payload = self._post(conn, '/devices/livingRoom/tv/'
+                                       'command', {'command': 'power'})
+            conn.close()
+        finally:
+            endpoint.stop()
+        self.assertEqual((code, payload['result']),
+                         (200, Device.SUCCESS_MSG),
+                         'LocalEndpoint failed to serve a command over the '
+                         'Unix socket.')
+        self.assertFalse(os.path.exists(self.socketPath),
+                         'LocalEndpoint failed to remove its socket.')
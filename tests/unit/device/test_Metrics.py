@@ -0,0 +1,191 @@
+import pickle
+from unittest import TestCase
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Metrics import HistogramBuckets, Registry       # noqa: E402
+
+
+class TestMetrics(TestCase):
+    """
+    Metrics classes test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.registry = Registry()
+
+    def test_counterInc(self):
+        """
+        The counter inc method must count per label set.
+        """
+        counter = self.registry.counter('test_total', 'The test counter.')
+        counter.inc(result='done')
+        counter.inc(2, result='done')
+        counter.inc(result='error')
+        self.assertEqual(sorted((labels['result'], value) for labels, value
+                                in counter.getSamples()),
+                         [('done', 3), ('error', 1)],
+                         'Counter inc failed to count per label set.')
+
+    def test_registrySameMetric(self):
+        """
+        The registry must return the same metric for the same name.
+        """
+        first = self.registry.histogram('test_seconds', 'The test time.')
+        second = self.registry.histogram('test_seconds', 'The test time.')
+        self.assertIs(first, second,
+                      'Registry histogram failed to reuse the metric of a '
+                      'name.')
+
+    def test_bucketsBoundedError(self):
+        """
+        The histogram buckets must record a value in a bucket bounding it
+        within the bucket relative error.
+        """
+        buckets = HistogramBuckets()
+        for value in (0.0001, 0.003, 0.25, 1.7, 40.0):
+            buckets.record(value)
+            bound = buckets.getQuantile(1.0)
+            self.assertGreaterEqual(bound, value,
+                                    'HistogramBuckets failed to bound the '
+                                    'recorded value.')
+            self.assertLess(bound, value * 2 ** (1 / buckets.SUB_BUCKETS)
+                            * 1.0001,
+                            'HistogramBuckets failed to bound the relative '
+                            'error of the recorded value.')
+            buckets = HistogramBuckets()
+
+    def test_bucketsQuantiles(self):
+        """
+        The histogram buckets must return the quantiles of the recorded
+        values, None when empty.
+        """
+        buckets = HistogramBuckets()
+        self.assertIsNone(buckets.getQuantile(0.5),
+                          'HistogramBuckets failed to return None when '
+                          'empty.')
+        for value in range(1, 101):
+            buckets.record(value / 1000)
+        p50 = buckets.getQuantile(0.5)
+        p99 = buckets.getQuantile(0.99)
+        self.assertTrue(0.05 <= p50 < 0.06,
+                        'HistogramBuckets failed to return the median.')
+        self.assertTrue(0.099 <= p99 < 0.12,
+                        'HistogramBuckets failed to return the p99.')
+        self.assertEqual(buckets.count, 100,
+                         'HistogramBuckets failed to count the values.')
+
+    def test_bucketsOutOfRange(self):
+        """
+        The histogram buckets must record the values out of their range in
+        the first and last buckets.
+        """
+        buckets = HistogramBuckets()
+        buckets.record(0)
+        buckets.record(1e12)
+        self.assertEqual(buckets.counts[0], 1,
+                         'HistogramBuckets failed to record a tiny value in '
+                         'the first bucket.')
+        self.assertEqual(buckets.counts[-1], 1,
+                         'HistogramBuckets failed to record a huge value in '
+                         'the last bucket.')
+
+    def test_renderPrometheus(self):
+        """
+        The render method must export the counters, histograms and
+        collected metrics in the Prometheus text format.
+        """
+        self.registry.counter('test_total', 'The test counter.').inc(
+            result='done')
+        histogram = self.registry.histogram('test_seconds', 'The test time.')
+        histogram.observe(0.5, op='save')
+        self.registry.addCollector(lambda: [('test_depth', Registry.GAUGE,
+                                             'The test depth.',
+                                             [({'output': 'OUT1'}, 3)])])
+        lines = self.registry.render().splitlines()
+        for line in ('# TYPE test_total counter',
+                     'test_total{result="done"} 1',
+                     '# TYPE test_seconds histogram',
+                     'test_seconds_bucket{op="save",le="+Inf"} 1',
+                     'test_seconds_count{op="save"} 1',
+                     'test_seconds_sum{op="save"} 0.5',
+                     '# HELP test_depth The test depth.',
+                     '# TYPE test_depth gauge',
+                     'test_depth{output="OUT1"} 3'):
+            self.assertIn(line, lines,
+                          f"Registry render failed to export {line}.")
+        buckets = [line for line in lines
+                   if line.startswith('test_seconds_bucket')]
+        counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+        self.assertEqual(counts, sorted(counts),
+                         'Registry render failed to export cumulative '
+                         'buckets.')
+
+    def test_getSummary(self):
+        """
+        The getSummary method must summarize the histograms by their count,
+        sum and quantiles.
+        """
+        histogram = self.registry.histogram('test_seconds', 'The test time.')
+        for value in (0.1, 0.2, 0.3):
+            histogram.observe(value)
+        self.registry.addCollector(lambda: [('test_depth', Registry.GAUGE,
+                                             'The test depth.',
+                                             [({}, 3)])])
+        summary = self.registry.getSummary()
+        value = summary['test_seconds'][0]['value']
+        self.assertEqual(value['count'], 3,
+                         'Registry getSummary failed to return the count.')
+        self.assertAlmostEqual(value['sum'], 0.6,
+                               msg='Registry getSummary failed to return '
+                                   'the sum.')
+        self.assertEqual(set(value), {'count', 'sum', 'p50', 'p90', 'p99'},
+                         'Registry getSummary failed to return the '
+                         'quantiles.')
+        self.assertEqual(summary['test_depth'], [{'labels': {}, 'value': 3}],
+                         'Registry getSummary failed to return the collected '
+                         'metrics.')
+
+    def test_snapshotSources(self):
+        """
+        The counters and histograms of the snapshot sources must be
+        exported with the labels of their process, next to the ones of the
+        registry.
+        """
+        self.registry.counter('test_total', 'The test counter.').inc()
+        worker = Registry()
+        worker.counter('test_total', 'The test counter.').inc(2)
+        worker.histogram('test_seconds', 'The test time.').observe(0.5)
+        snapshot = pickle.loads(pickle.dumps(worker.getSnapshot()))
+        self.registry.addSource(lambda: [({'shard': 0}, snapshot)])
+        lines = self.registry.render().splitlines()
+        for line in ('test_total 1', 'test_total{shard="0"} 2',
+                     'test_seconds_count{shard="0"} 1'):
+            self.assertIn(line, lines,
+                          f"Registry render failed to export {line}.")
+        self.assertEqual(self.registry.getSummary()['test_seconds'][0]
+                         ['value']['count'], 1,
+                         'Registry getSummary failed to summarize the '
+                         'snapshot histograms.')
+
+    def test_clear(self):
+        """
+        The clear method must drop the recorded values, the collectors and
+        the snapshot sources.
+        """
+        counter = self.registry.counter('test_total', 'The test counter.')
+        counter.inc()
+        self.registry.addCollector(lambda: [])
+        self.registry.addSource(lambda: [])
+        self.registry.clear()
+        counter.inc()
+        self.assertEqual(counter.getSamples(), [({}, 1)],
+                         'Registry clear failed to drop the values.')
+        self.assertEqual((self.registry.collectors, self.registry.sources),
+                         ([], []),
+                         'Registry clear failed to drop the collectors and '
+                         'the sources.')
@@ -0,0 +1,83 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Gateway import Gateway                          # noqa: E402
+from device.Metrics import Registry                         # noqa: E402
+from device.MetricsPublisher import MetricsPublisher        # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+
+
+class TestMetricsPublisher(TestCase):
+    """
+    MetricsPublisher class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.registry = Registry()
+        self.registry.counter('test_total', 'The test counter.').inc()
+        registryPatcher = patch('device.MetricsPublisher.registry',
+                                self.registry)
+        registryPatcher.start()
+        self.addCleanup(registryPatcher.stop)
+        self.gateway = Mock(spec_set=Gateway)
+        self.netLoop = Mock(spec_set=NetworkLoop)
+        self.publisher = MetricsPublisher(logging, self.netLoop,
+                                          interval=0.01)
+        self.publisher.registerTopics(self.gateway)
+
+    def tearDown(self):
+        """
+        Test cases teardown.
+        """
+        self.publisher.stop()
+
+    def test_publish(self):
+        """
+        The publish method must publish the metrics summary on the metrics
+        topic.
+        """
+        self.publisher.publish()
+        subTopic, payload = self.gateway.publish.call_args[0]
+        self.assertEqual(subTopic, MetricsPublisher.METRICS_TOPIC,
+                         'MetricsPublisher failed to publish on the metrics '
+                         'topic.')
+        self.assertEqual(json.loads(payload), self.registry.getSummary(),
+                         'MetricsPublisher failed to publish the metrics '
+                         'summary.')
+
+    def test_tick(self):
+        """
+        The metrics must be published on the network loop once per interval
+        until the publisher is stopped.
+        """
+        self.publisher.start()
+        delay, tick, tickId = self.netLoop.callLater.call_args[0]
+        self.assertEqual(delay, 0.01,
+                         'MetricsPublisher failed to schedule the tick.')
+        tick(tickId)
+        self.gateway.publish.assert_called_once()
+        self.assertEqual(self.netLoop.callLater.call_count, 2,
+                         'MetricsPublisher failed to schedule the next '
+                         'tick.')
+        self.publisher.stop()
+        tick(tickId)
+        self.assertEqual(self.netLoop.callLater.call_count, 2,
+                         'MetricsPublisher kept ticking once stopped.')
+
+    def test_startDisabled(self):
+        """
+        The start method must not schedule the publications when no
+        interval is configured.
+        """
+        publisher = MetricsPublisher(logging, self.netLoop)
+        publisher.registerTopics(self.gateway)
+        publisher.start()
+        self.netLoop.callLater.assert_not_called()
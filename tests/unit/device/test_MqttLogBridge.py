@@ -0,0 +1,122 @@
+import logging
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+import paho.mqtt.client as mqtt                             # noqa: E402
+
+from device.MqttLogBridge import ClientLogger, MqttLogBridge  # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+
+
+class TestMqttLogBridge(TestCase):
+    """
+    MqttLogBridge class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.bridge = MqttLogBridge(logging, interval=60)
+        self.bridge.logger = Mock(spec_set=logging.Logger)
+        self.bridge.logger.isEnabledFor.return_value = True
+        self.client = Mock()
+        self.bridge.attach(self.client, 'livingRoom.tv')
+
+    def test_install(self):
+        """
+        The install method must return the bridge shared by all the
+        clients.
+        """
+        self.assertIs(MqttLogBridge.install(logging),
+                      MqttLogBridge.install(logging),
+                      'MqttLogBridge failed to share the bridge.')
+
+    def test_attach(self):
+        """
+        The attach method must set the bridge as the client log callback.
+        """
+        self.assertEqual(self.client.on_log, self.bridge.onLog,
+                         'MqttLogBridge failed to attach the client.')
+
+    def test_attachNotDebug(self):
+        """
+        The attach method must let paho log lazily to a standard logger
+        when the debug level is disabled.
+        """
+        self.bridge.logger.isEnabledFor.return_value = False
+        client = Mock()
+        self.bridge.attach(client, 'livingRoom.tv')
+        clientLogger, = client.enable_logger.call_args[0]
+        self.assertIsInstance(clientLogger, ClientLogger,
+                              'MqttLogBridge failed to enable the paho '
+                              'logger.')
+        self.assertIsInstance(client.on_log, Mock,
+                              'MqttLogBridge failed to leave the log callback '
+                              'unset.')
+        self.assertEqual(clientLogger.process('Sending %s', {}),
+                         ('livingRoom.tv: Sending %s', {}),
+                         'ClientLogger failed to prefix the client name.')
+
+    def test_attachNetworkLoop(self):
+        """
+        The attach method must tick the summaries on the network loop, once
+        per interval.
+        """
+        netLoop = Mock(spec_set=NetworkLoop)
+        self.bridge.attach(Mock(), 'livingRoom.light', netLoop)
+        self.bridge.attach(Mock(), 'kitchen.light', netLoop)
+        netLoop.callLater.assert_called_once_with(60, self.bridge._tick,
+                                                  netLoop)
+        self.bridge.onLog(self.client, None, mqtt.MQTT_LOG_DEBUG,
+                          'Sending PINGREQ')
+        self.bridge.logger.debug.reset_mock()
+        netLoop.callLater.reset_mock()
+        self.bridge._tick(netLoop)
+        self.bridge.logger.debug.assert_called_once_with(
+            '%s: %s in %.0fs', 'livingRoom.tv', '1 Sending PINGREQ', 60)
+        netLoop.callLater.assert_called_once_with(60, self.bridge._tick,
+                                                  netLoop)
+
+    def test_onLogFiltered(self):
+        """
+        The messages of a disabled level must be dropped before any work.
+        """
+        self.bridge.logger.isEnabledFor.return_value = False
+        self.bridge.onLog(self.client, None, mqtt.MQTT_LOG_DEBUG,
+                          'Sending PINGREQ')
+        self.bridge.logger.debug.assert_not_called()
+        self.assertEqual(self.bridge.counts, {},
+                         'MqttLogBridge failed to drop a filtered message.')
+
+    def test_onLogLevels(self):
+        """
+        The messages above the debug level must be logged right away at
+        their level.
+        """
+        self.bridge.onLog(self.client, None, mqtt.MQTT_LOG_ERR,
+                          'Connection lost')
+        self.bridge.logger.log.assert_called_once_with(
+            logging.ERROR, '%s: %s', 'livingRoom.tv', 'Connection lost')
+
+    def test_onLogSampled(self):
+        """
+        The repetitive debug messages must be logged once and counted in
+        the client summary.
+        """
+        for i in range(3):
+            self.bridge.onLog(self.client, None, mqtt.MQTT_LOG_DEBUG,
+                              'Sending PINGREQ')
+        self.bridge.onLog(self.client, None, mqtt.MQTT_LOG_DEBUG,
+                          'Received PINGRESP')
+        self.assertEqual(self.bridge.logger.debug.call_count, 2,
+                         'MqttLogBridge failed to sample the repetitive '
+                         'messages.')
+        self.bridge.logger.debug.reset_mock()
+        self.bridge.flush()
+        self.bridge.logger.debug.assert_called_once_with(
+            '%s: %s in %.0fs', 'livingRoom.tv',
+            '3 Sending PINGREQ, 1 Received PINGRESP', 60)
@@ -0,0 +1,179 @@
+import logging
+import socket
+import threading
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+
+
+class TestNetworkLoop(TestCase):
+    """
+    NetworkLoop class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.netLoop = NetworkLoop(logging)
+        self.mockedClient = Mock()
+
+    def tearDown(self):
+        """
+        Test cases teardown.
+        """
+        self.netLoop.stop()
+        self.netLoop.loop.close()
+
+    def _sync(self):
+        """
+        Wait for the callbacks already scheduled on the loop to run.
+        """
+        done = threading.Event()
+        self.netLoop.callSoon(done.set)
+        done.wait(1)
+
+    def test_addClientSocketCallbacks(self):
+        """
+        The addClient method must register the socket callbacks
+        of the client.
+        """
+        self.netLoop.addClient(self.mockedClient)
+        self.assertEqual(self.mockedClient.on_socket_open,
+                         self.netLoop._on_socket_open,
+                         'NetworkLoop addClient failed to register the '
+                         'socket callbacks.')
+        self.assertEqual(self.mockedClient.on_socket_close,
+                         self.netLoop._on_socket_close,
+                         'NetworkLoop addClient failed to register the '
+                         'socket callbacks.')
+        self.assertEqual(self.mockedClient.on_socket_register_write,
+                         self.netLoop._on_socket_register_write,
+                         'NetworkLoop addClient failed to register the '
+                         'socket callbacks.')
+        self.assertEqual(self.mockedClient.on_socket_unregister_write,
+                         self.netLoop._on_socket_unregister_write,
+                         'NetworkLoop addClient failed to register the '
+                         'socket callbacks.')
+
+    def test_addClientConnect(self):
+        """
+        The addClient method must connect the client from the connect
+        executor once the loop is running.
+        """
+        connected = threading.Event()
+        self.mockedClient.reconnect.side_effect = connected.set
+        self.netLoop.start()
+        self.netLoop.addClient(self.mockedClient)
+        connected.wait(1)
+        self.netLoop.stop()
+        self.mockedClient.reconnect.assert_called_once()
+        self.assertEqual(self.netLoop.getClientCount(), 1,
+                         'NetworkLoop addClient failed to add the client.')
+
+    def test_removeClient(self):
+        """
+        The removeClient method must remove the client from the loop.
+        """
+        self.netLoop.start()
+        self.netLoop.addClient(self.mockedClient)
+        self.netLoop.removeClient(self.mockedClient)
+        self.netLoop.stop()
+        self.assertEqual(self.netLoop.getClientCount(), 0,
+                         'NetworkLoop removeClient failed to remove '
+                         'the client.')
+
+    def test_socketOpenReadClient(self):
+        """
+        The loop must read the client once its socket has incoming data.
+        """
+        sockR, sockW = socket.socketpair()
+        readDone = threading.Event()
+        self.mockedClient.loop_read.side_effect = \
+            lambda: readDone.set() or sockR.recv(1)
+        self.netLoop.start()
+        self.netLoop._on_socket_open(self.mockedClient, None, sockR)
+        sockW.send(b'x')
+        readDone.wait(1)
+        self.netLoop._on_socket_close(self.mockedClient, None, sockR)
+        self.netLoop.stop()
+        sockR.close()
+        sockW.close()
+        self.mockedClient.loop_read.assert_called()
+
+    def test_miscLoopAllClients(self):
+        """
+        The loop must process the periodic events of all the clients.
+        """
+        clients = [Mock(), Mock()]
+        self.netLoop.start()
+        for client in clients:
+            self.netLoop.addClient(client)
+        self.netLoop.callSoon(self.netLoop._miscLoop)
+        self._sync()
+        self.netLoop.stop()
+        for client in clients:
+            client.loop_misc.assert_called()
+
+    def test_callLater(self):
+        """
+        The callLater method must run the callback on the loop after the
+        delay.
+        """
+        called = threading.Event()
+        self.netLoop.start()
+        self.netLoop.callLater(0.01, called.set)
+        self.assertTrue(called.wait(1),
+                        'NetworkLoop failed to run the delayed callback.')
+
+    def test_getReconnectDelayBackoff(self):
+        """
+        The getReconnectDelay method must back off exponentially on the
+        shared connection failures, with jitter, up to the maximum delay.
+        """
+        for failures in range(10):
+            self.netLoop.failures = failures
+            delay = min(NetworkLoop.RECONNECT_MAX,
+                        NetworkLoop.RECONNECT_MIN * 2 ** failures)
+            self.assertTrue(delay / 2 <= self.netLoop.getReconnectDelay()
+                            <= delay,
+                            'NetworkLoop getReconnectDelay failed to back '
+                            f"off after {failures} failures.")
+
+    def test_connectFailureBackoff(self):
+        """
+        The connection failures must increase the shared backoff, and only
+        a connection accepted by the broker must reset it.
+        """
+        failed = Mock()
+        failed.exception.return_value = OSError('refused')
+        done = Mock()
+        done.exception.return_value = None
+        self.netLoop.loop.call_later = Mock()
+        self.netLoop._onConnectDone(self.mockedClient, failed)
+        self.netLoop._onConnectDone(Mock(), failed)
+        self.assertEqual(self.netLoop.failures, 2,
+                         'NetworkLoop failed to share the failure count.')
+        self.netLoop._onConnectDone(self.mockedClient, done)
+        self.netLoop.onConnAck(5)
+        self.assertEqual(self.netLoop.failures, 2,
+                         'NetworkLoop reset the backoff before the broker '
+                         'accepted the connection.')
+        self.netLoop.onConnAck(0)
+        self.assertEqual(self.netLoop.failures, 0,
+                         'NetworkLoop failed to reset the backoff.')
+
+    def test_socketCloseBackoff(self):
+        """
+        A closed socket must count as a failure of the shared backoff.
+        """
+        self.netLoop.loop.call_later = Mock()
+        self.netLoop.loop.remove_reader = Mock()
+        self.netLoop.clients.add(self.mockedClient)
+        self.netLoop._removeSocket(self.mockedClient, 42)
+        self.assertEqual(self.netLoop.failures, 1,
+                         'NetworkLoop failed to count the closed socket.')
@@ -0,0 +1,82 @@
+from unittest import TestCase
+from unittest.mock import Mock, call
+
+import paho.mqtt.client as mqtt
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Outbox import Outbox                            # noqa: E402
+
+
+class TestOutbox(TestCase):
+    """
+    Outbox class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.mockedClient = Mock(spec_set=mqtt.Client)
+        self.connected = Mock(rc=mqtt.MQTT_ERR_SUCCESS)
+        self.disconnected = Mock(rc=mqtt.MQTT_ERR_NO_CONN)
+
+    def test_constructorBoundQueue(self):
+        """
+        The constructor must bound the paho message queue to the outbox
+        capacity.
+        """
+        Outbox(self.mockedClient, 10)
+        self.mockedClient.max_queued_messages_set.assert_called_once_with(10)
+
+    def test_publishConnected(self):
+        """
+        The publish method must not buffer the messages published while
+        connected.
+        """
+        self.mockedClient.publish.return_value = self.connected
+        outbox = Outbox(self.mockedClient)
+        outbox.publish('topic', 'done')
+        self.mockedClient.publish.assert_called_once_with('topic',
+                                                          payload='done')
+        self.assertEqual(outbox.getStats()['buffered'], 0,
+                         'Outbox buffered a published message.')
+
+    def test_flushInOrder(self):
+        """
+        The flush method must publish the messages buffered while
+        disconnected, in order.
+        """
+        self.mockedClient.publish.return_value = self.disconnected
+        outbox = Outbox(self.mockedClient)
+        outbox.publish('topic', 'first')
+        outbox.publish('topic', 'second')
+        self.mockedClient.publish.reset_mock()
+        self.mockedClient.publish.return_value = self.connected
+        outbox.flush()
+        self.assertEqual(self.mockedClient.publish.call_args_list,
+                         [call('topic', payload='first'),
+                          call('topic', payload='second')],
+                         'Outbox failed to flush the messages in order.')
+        self.assertEqual(outbox.getStats()['buffered'], 0,
+                         'Outbox failed to empty the buffer.')
+
+    def test_publishBounded(self):
+        """
+        The publish method must drop the oldest buffered messages once the
+        outbox is full.
+        """
+        self.mockedClient.publish.return_value = self.disconnected
+        outbox = Outbox(self.mockedClient, 2)
+        for payload in ['first', 'second', 'third']:
+            outbox.publish('topic', payload)
+        self.assertEqual(outbox.getStats(), {'buffered': 2, 'dropped': 1},
+                         'Outbox failed to bound the buffer.')
+        self.mockedClient.publish.reset_mock()
+        self.mockedClient.publish.return_value = self.connected
+        outbox.flush()
+        self.assertEqual([publishCall[1]['payload'] for publishCall
+                          in self.mockedClient.publish.call_args_list],
+                         ['second', 'third'],
+                         'Outbox failed to drop the oldest message.')
@@ -0,0 +1,139 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.DeviceConfig import DeviceConfig                # noqa: E402
+from device.RateLimiter import RateLimiter                  # noqa: E402
+
+
+class TestRateLimiter(TestCase):
+    """
+    RateLimiter class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.devices = []
+        for name, output in [('tv', 'OUT0'), ('amp', 'OUT0'),
+                             ('fan', 'OUT1')]:
+            device = Mock()
+            device.config = DeviceConfig.fromDict({
+                'name': name,
+                'location': 'livingRoom',
+                'linkedEmitter': output,
+                'commandSet': {
+                    'model': 'model',
+                    'manufacturer': 'manufacturer',
+                    'description': '',
+                    'emitterGpio': 4,
+                    'receiverGpio': 11,
+                    'packetGap': 0.01,
+                },
+                'topicPrefix': 'prefix',
+                'lastWill': {'qos': 1, 'retain': True},
+            })
+            self.devices.append(device)
+
+    def test_acquireUnlimited(self):
+        """
+        The acquire method must admit the commands when no limit is set.
+        """
+        limiter = RateLimiter()
+        self.assertTrue(all(limiter.acquire(self.devices)
+                            for i in range(100)),
+                        'RateLimiter failed to admit the unlimited '
+                        'commands.')
+
+    @patch('device.RateLimiter.time.monotonic')
+    def test_acquireOutputLimit(self, mockedMonotonic):
+        """
+        The acquire method must throttle the commands of an output over its
+        limit, without affecting the other outputs, and refill over time.
+        """
+        mockedMonotonic.return_value = 100.0
+        limiter = RateLimiter(outputLimits={'OUT0': {'rate': 1,
+                                                     'burst': 2}})
+        tv, amp, fan = self.devices
+        self.assertTrue(limiter.acquire([tv, amp]),
+                        'RateLimiter failed to admit the burst.')
+        self.assertFalse(limiter.acquire([tv]),
+                         'RateLimiter failed to throttle the output.')
+        self.assertTrue(limiter.acquire([fan]),
+                        'RateLimiter throttled another output.')
+        mockedMonotonic.return_value = 101.0
+        self.assertTrue(limiter.acquire([amp]),
+                        'RateLimiter failed to refill the bucket.')
+        self.assertEqual(limiter.getStats()['outputs'], {'OUT0': 1},
+                         'RateLimiter failed to count the throttled '
+                         'output.')
+
+    @patch('device.RateLimiter.time.monotonic')
+    def test_acquireAllOrNone(self, mockedMonotonic):
+        """
+        The acquire method must not take any token when one of the buckets
+        is empty.
+        """
+        mockedMonotonic.return_value = 100.0
+        limiter = RateLimiter({'rate': 1, 'burst': 3},
+                              {'OUT0': {'rate': 1, 'burst': 2}})
+        tv, amp, fan = self.devices
+        self.assertTrue(limiter.acquire([tv]),
+                        'RateLimiter failed to admit the command.')
+        self.assertFalse(limiter.acquire([tv, amp]),
+                         'RateLimiter failed to throttle the batch.')
+        self.assertTrue(limiter.acquire([fan, fan]),
+                        'RateLimiter took the global tokens of a throttled '
+                        'batch.')
+        self.assertFalse(limiter.acquire([fan]),
+                         'RateLimiter failed to throttle globally.')
+        self.assertEqual(limiter.getStats()['global'], 1,
+                         'RateLimiter failed to count the global throttle.')
+
+    @patch('device.RateLimiter.time.monotonic')
+    def test_acquireDeviceLimit(self, mockedMonotonic):
+        """
+        The acquire method must throttle a device over the limit of its
+        configuration.
+        """
+        mockedMonotonic.return_value = 100.0
+        tv = self.devices[0]
+        config = tv.config.toDict()
+        config['rateLimit'] = {'rate': 1, 'burst': 1}
+        tv.config = DeviceConfig.fromDict(config)
+        limiter = RateLimiter()
+        self.assertTrue(limiter.acquire([tv]),
+                        'RateLimiter failed to admit the burst.')
+        self.assertFalse(limiter.acquire([tv]),
+                         'RateLimiter failed to throttle the device.')
+        self.assertTrue(limiter.acquire([self.devices[1]]),
+                        'RateLimiter throttled another device.')
+        self.assertEqual(limiter.getStats()['devices'],
+                         {tv.config.clientId: 1},
+                         'RateLimiter failed to count the throttled device.')
+
+    @patch('device.RateLimiter.time.monotonic')
+    def test_acquireOversizeBatch(self, mockedMonotonic):
+        """
+        The acquire method must admit a batch larger than a bucket once the
+        bucket is full, charging the whole bucket.
+        """
+        mockedMonotonic.return_value = 100.0
+        limiter = RateLimiter(outputLimits={'OUT0': {'rate': 1,
+                                                     'burst': 2}})
+        tv, amp, fan = self.devices
+        self.assertTrue(limiter.acquire([tv, amp, tv]),
+                        'RateLimiter failed to admit the oversize batch.')
+        self.assertFalse(limiter.acquire([tv]),
+                         'RateLimiter failed to charge the whole bucket.')
+        mockedMonotonic.return_value = 101.0
+        self.assertFalse(limiter.acquire([tv, amp, tv]),
+                         'RateLimiter admitted the oversize batch before the '
+                         'bucket is full.')
+        mockedMonotonic.return_value = 102.0
+        self.assertTrue(limiter.acquire([tv, amp, tv]),
+                        'RateLimiter failed to admit the oversize batch '
+                        'once the bucket is full.')
@@ -0,0 +1,207 @@
+import json
+import logging
+import threading
+from unittest import TestCase
+from unittest.mock import Mock, patch, mock_open
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Device import Device                            # noqa: E402
+from device.DeviceManager import DeviceManager              # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+from device.SceneManager import SceneManager                # noqa: E402
+from exceptions import InvalidConfig, SceneNotFound         # noqa: E402
+
+
+class TestSceneManager(TestCase):
+    """
+    SceneManager class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.scenes = [{
+            'name': 'movieNight',
+            'steps': [
+                {'device': 'livingRoom.tv', 'command': 'power'},
+                {'device': 'livingRoom.amp', 'command': 'power',
+                 'delay': 0.01},
+                {'device': 'livingRoom.tv', 'command': 'hdmi1',
+                 'repeat': 2},
+                {'device': 'livingRoom.amp', 'command': 'volumeUp',
+                 'repeat': 3},
+            ],
+        }]
+        self.scenesStr = json.dumps(self.scenes)
+        self.tv = self._getDevice('tv', 'OUT0', ['power', 'hdmi1'])
+        self.amp = self._getDevice('amp', 'OUT1', ['power', 'volumeUp'])
+        self.devManager = Mock(spec_set=DeviceManager)
+        self.devManager.getDevices.return_value = [self.tv, self.amp]
+        self.devManager.getGeneration.return_value = 0
+        self.devManager.sendJobs.side_effect = \
+            lambda jobs, callback: callback([(True, 0.1)] * len(jobs))
+
+    def _getDevice(self, name, output, commands):
+        device = Mock(spec_set=Device)
+        device.getName.return_value = name
+        device.getLocation.return_value = 'livingRoom'
+        device.getConfig.return_value = {'linkedEmitter': output}
+        device.getCommandList.return_value = commands
+        device.getGeneration.return_value = 0
+        return device
+
+    def _getSceneMngr(self):
+        with patch('builtins.open', mock_open(read_data=self.scenesStr)):
+            return SceneManager(logging, self.devManager)
+
+    def test_constructorNoSceneFile(self):
+        """
+        The constructor must start without scenes when there is no scene
+        file.
+        """
+        with patch('builtins.open') as mockedFile:
+            mockedFile.side_effect = FileNotFoundError
+            sceneMngr = SceneManager(logging, self.devManager)
+        self.assertEqual(sceneMngr.getScenes(), {},
+                         'SceneManager failed to start without scenes.')
+
+    def test_constructorInvalidScenes(self):
+        """
+        The constructor must raise an InvalidConfig error when the scenes
+        are invalid.
+        """
+        self.scenesStr = json.dumps([{'name': 'movieNight'}])
+        with self.assertRaises(InvalidConfig):
+            self._getSceneMngr()
+
+    def test_getPlanLanes(self):
+        """
+        The scene plan must have one lane per output, chaining the
+        consecutive steps of an output until a delay.
+        """
+        plan = self._getSceneMngr().getPlan('movieNight')
+        self.assertEqual(sorted(plan.lanes), ['OUT0', 'OUT1'],
+                         'SceneManager failed to group the steps by output.')
+        tvLane = plan.lanes['OUT0']
+        self.assertEqual(len(tvLane), 1,
+                         'SceneManager failed to chain the steps of an '
+                         'output.')
+        self.assertEqual(tvLane[0].jobs, [(self.tv, 'power'),
+                                          (self.tv, 'hdmi1'),
+                                          (self.tv, 'hdmi1')],
+                         'SceneManager failed to repeat the step commands.')
+        ampLane = plan.lanes['OUT1']
+        self.assertEqual([chain.steps for chain in ampLane],
+                         [[1], [3, 3, 3]],
+                         'SceneManager failed to break the chain after a '
+                         'delay.')
+        self.assertEqual(ampLane[0].delay, 0.01,
+                         'SceneManager failed to keep the step delay.')
+
+    def test_getPlanCached(self):
+        """
+        The scene plan must be compiled once and recompiled when a device
+        it uses changes.
+        """
+        sceneMngr = self._getSceneMngr()
+        plan = sceneMngr.getPlan('movieNight')
+        self.assertIs(sceneMngr.getPlan('movieNight'), plan,
+                      'SceneManager failed to cache the scene plan.')
+        self.tv.getGeneration.return_value = 1
+        self.assertIsNot(sceneMngr.getPlan('movieNight'), plan,
+                         'SceneManager failed to recompile the plan after '
+                         'a command set change.')
+        plan = sceneMngr.getPlan('movieNight')
+        self.devManager.getGeneration.return_value = 1
+        self.assertIsNot(sceneMngr.getPlan('movieNight'), plan,
+                         'SceneManager failed to recompile the plan after '
+                         'a device list change.')
+
+    def test_getPlanInvalid(self):
+        """
+        The scene compilation must fail on unknown scenes, devices and
+        commands.
+        """
+        sceneMngr = self._getSceneMngr()
+        with self.assertRaises(SceneNotFound):
+            sceneMngr.getPlan('unknown')
+        self.tv.getCommandList.return_value = ['power']
+        with self.assertRaises(InvalidConfig):
+            sceneMngr.getPlan('movieNight')
+        self.devManager.getDevices.return_value = [self.amp]
+        with self.assertRaises(InvalidConfig):
+            sceneMngr.getPlan('movieNight')
+
+    def test_runScene(self):
+        """
+        The runScene method must run all the plan chains and report the
+        result of each step.
+        """
+        done = threading.Event()
+        results = []
+
+        def callback(result):
+            results.append(result)
+            done.set()
+
+        self._getSceneMngr().runScene('movieNight', callback)
+        self.assertTrue(done.wait(1),
+                        'SceneManager failed to report the scene result.')
+        self.assertEqual(self.devManager.sendJobs.call_count, 3,
+                         'SceneManager failed to send each plan chain.')
+        result = results[0]
+        self.assertEqual(result['result'], Device.SUCCESS_MSG,
+                         'SceneManager failed to report the scene success.')
+        self.assertEqual([round(item['elapsed'], 3)
+                          for item in result['items']],
+                         [0.1, 0.1, 0.2, 0.3],
+                         'SceneManager failed to report the step timings.')
+
+    def test_runSceneNetworkLoop(self):
+        """
+        The runScene method must time the step delays on the network loop
+        instead of a thread.
+        """
+        netLoop = Mock(spec_set=NetworkLoop)
+        callback = Mock()
+        with patch('builtins.open', mock_open(read_data=self.scenesStr)):
+            sceneMngr = SceneManager(logging, self.devManager, netLoop)
+        sceneMngr.runScene('movieNight', callback)
+        delay, runChain, *args = netLoop.callLater.call_args[0]
+        self.assertEqual(delay, 0.01,
+                         'SceneManager failed to time the delay on the '
+                         'network loop.')
+        callback.assert_not_called()
+        runChain(*args)
+        self.assertEqual(callback.call_args[0][0]['result'],
+                         Device.SUCCESS_MSG,
+                         'SceneManager failed to report the scene once its '
+                         'delayed chain is done.')
+
+    def test_constructorInvalidRepeat(self):
+        """
+        The constructor must raise an InvalidConfig error when a step
+        repeat is not positive.
+        """
+        self.scenes[0]['steps'][0]['repeat'] = 0
+        self.scenesStr = json.dumps(self.scenes)
+        with self.assertRaises(InvalidConfig):
+            self._getSceneMngr()
+
+    def test_sceneTopic(self):
+        """
+        The scene manager must serve the scene triggers on the gateway.
+        """
+        gateway = Mock()
+        gateway.INVALID_MSG = 'invalid'
+        sceneMngr = self._getSceneMngr()
+        sceneMngr.registerTopics(gateway)
+        gateway.addHandler.assert_called_once_with(SceneManager.SCENE_TOPIC,
+                                                   sceneMngr._onSceneMessage)
+        sceneMngr._onSceneMessage('unknown')
+        self.assertEqual(gateway.publishResult.call_args[0][1]['result'],
+                         'invalid',
+                         'SceneManager failed to reject an unknown scene.')
@@ -0,0 +1,244 @@
+import datetime
+import json
+import logging
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.DeviceManager import DeviceManager              # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+from device.Scheduler import FILE_IO_TIME, Scheduler        # noqa: E402
+from exceptions import InvalidConfig                        # noqa: E402
+
+
+class TestScheduler(TestCase):
+    """
+    Scheduler class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.schedulesFile = os.path.join(self.tmpDir.name,
+                                          'schedules.json')
+        self.patcher = patch.object(Scheduler, 'SCHEDULES_FILE',
+                                    self.schedulesFile)
+        self.patcher.start()
+        self.devManager = Mock(spec_set=DeviceManager)
+        self.netLoop = Mock(spec_set=NetworkLoop)
+
+    def tearDown(self):
+        """
+        Test cases cleanup.
+        """
+        self.patcher.stop()
+        self.tmpDir.cleanup()
+
+    def test_constructorLoadJobs(self):
+        """
+        The constructor must load the saved jobs, and start without jobs
+        when there is no schedule file.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        self.assertEqual(scheduler.getJobs(), [],
+                         'Scheduler failed to start without jobs.')
+        job = {'id': 'tvOff', 'device': 'livingRoom.tv', 'command': 'power',
+               'at': time.time() + 60}
+        with open(self.schedulesFile, 'w') as schedulesFile:
+            schedulesFile.write(json.dumps([job]))
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        self.assertEqual(scheduler.getJobs(), [dict(job, next=job['at'])],
+                         'Scheduler failed to load the saved jobs.')
+
+    def test_addJobInvalid(self):
+        """
+        The addJob method must reject the invalid jobs.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        for job in ({'device': 'livingRoom.tv', 'delay': 1},
+                    {'scene': 'movieNight', 'device': 'livingRoom.tv',
+                     'command': 'power', 'delay': 1},
+                    {'scene': 'movieNight'},
+                    {'scene': 'movieNight', 'delay': 1, 'interval': 1},
+                    {'scene': 'movieNight', 'interval': 0},
+                    {'scene': 'movieNight', 'time': '7h'},
+                    {'scene': 'movieNight', 'time': '07:00', 'days': [7]},
+                    {'scene': 'movieNight', 'delay': 1, 'days': [0]},
+                    {'scene': 'movieNight', 'at': 1, 'start': 1},
+                    {'scene': 'movieNight', 'delay': '1'}):
+            with self.assertRaises(InvalidConfig):
+                scheduler.addJob(job)
+
+    def test_addJobPersist(self):
+        """
+        The addJob method must turn the delays into fire times and save the
+        jobs.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        start = time.time()
+        job = scheduler.addJob({'scene': 'sleep', 'delay': 2700})
+        self.assertTrue(start + 2700 <= job['at'] <= time.time() + 2700,
+                        'Scheduler addJob failed to turn the delay into a '
+                        'fire time.')
+        with open(self.schedulesFile) as schedulesFile:
+            self.assertEqual(json.loads(schedulesFile.read()), [job],
+                             'Scheduler addJob failed to save the job.')
+        self.assertTrue(scheduler.removeJob(job['id']),
+                        'Scheduler removeJob failed to remove the job.')
+        self.assertFalse(scheduler.removeJob(job['id']),
+                         'Scheduler removeJob failed to report an unknown '
+                         'job.')
+
+    def test_nextTimeOfDay(self):
+        """
+        The recurring jobs at a time of day must fire on the next allowed
+        day.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        friday = datetime.datetime(2021, 1, 1, 8, 0).timestamp()
+        nextTime = scheduler._getNextTime({'time': '07:00',
+                                           'days': [0, 1, 2, 3, 4]},
+                                          friday)
+        self.assertEqual(datetime.datetime.fromtimestamp(nextTime),
+                         datetime.datetime(2021, 1, 4, 7, 0),
+                         'Scheduler failed to compute the next weekday '
+                         'fire time.')
+
+    def test_nextInterval(self):
+        """
+        The interval jobs must fire on their start, then skip the missed
+        fire times.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        job = {'interval': 10, 'start': 100}
+        self.assertEqual(scheduler._getNextTime(job, 95), 100,
+                         'Scheduler failed to fire on the start.')
+        self.assertEqual(scheduler._getNextTime(job, 125, 100), 130,
+                         'Scheduler failed to skip the missed fire times.')
+
+    def test_intervalPhase(self):
+        """
+        The interval jobs must keep their phase across the restarts.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        job = scheduler.addJob({'id': 'radio', 'scene': 'radio',
+                                'interval': 3600})
+        with patch('device.Scheduler.time.time') as mockedTime:
+            mockedTime.return_value = job['start'] + 5000
+            scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        self.assertEqual(scheduler.getJobs()[0]['next'],
+                         job['start'] + 7200,
+                         'Scheduler failed to keep the interval phase.')
+
+    def test_runFireJobs(self):
+        """
+        The scheduler must fire the due jobs, keep the recurring ones and
+        report the fire time jitter.
+        """
+        fired = threading.Event()
+        self.devManager.sendCommands.side_effect = \
+            lambda batch, callback: fired.set()
+        netLoop = NetworkLoop(logging)
+        netLoop.start()
+        scheduler = Scheduler(logging, self.devManager, netLoop)
+        scheduler.start()
+        try:
+            scheduler.addJob({'device': 'livingRoom.tv', 'command': 'power',
+                              'delay': 0.01})
+            self.assertTrue(fired.wait(1),
+                            'Scheduler failed to fire the due job.')
+            scheduler.addJob({'id': 'radio', 'scene': 'radio',
+                              'interval': 3600})
+        finally:
+            scheduler.stop()
+            netLoop.stop()
+        self.devManager.sendCommands.assert_called_once_with(
+            [{'device': 'livingRoom.tv', 'command': 'power'}],
+            scheduler._logResult)
+        self.assertEqual([job['id'] for job in scheduler.getJobs()],
+                         ['radio'],
+                         'Scheduler failed to drop the fired one-shot job.')
+        stats = scheduler.getStats()
+        self.assertEqual((stats['pending'], stats['fired']), (1, 1),
+                         'Scheduler failed to report its job counts.')
+        self.assertGreaterEqual(stats['jitterMax'], 0,
+                                'Scheduler failed to report the jitter.')
+
+    def test_tickArmNextJob(self):
+        """
+        The scheduler must arm a single tick for the next due job, re-armed
+        for an earlier job, and ignore the ticks once stopped.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        scheduler.addJob({'scene': 'sleep', 'delay': 60})
+        self.netLoop.callLater.assert_not_called()
+        scheduler.start()
+        scheduler.addJob({'scene': 'radio', 'delay': 120})
+        self.assertEqual(self.netLoop.callLater.call_count, 1,
+                         'Scheduler armed a tick for a later job.')
+        scheduler.addJob({'scene': 'tv', 'delay': 30})
+        self.assertEqual(self.netLoop.callLater.call_count, 2,
+                         'Scheduler failed to arm a tick for an earlier '
+                         'job.')
+        delay, tick, tickId = self.netLoop.callLater.call_args[0]
+        self.assertAlmostEqual(delay, 30, delta=1,
+                               msg='Scheduler armed the tick at the wrong '
+                                   'time.')
+        scheduler.stop()
+        tick(tickId)
+        self.assertEqual(len(scheduler.getJobs()), 3,
+                         'Scheduler fired a job once stopped.')
+
+    def test_handleRequest(self):
+        """
+        The handleRequest method must add, list and remove the jobs.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        result = scheduler.handleRequest({'op': 'add', 'job': {
+            'scene': 'sleep', 'delay': 60}})
+        self.assertEqual(result['result'], 'success',
+                         'Scheduler failed to add a job on request.')
+        jobId = result['job']['id']
+        result = scheduler.handleRequest({'op': 'list'})
+        self.assertEqual([job['id'] for job in result['jobs']], [jobId],
+                         'Scheduler failed to list the jobs on request.')
+        result = scheduler.handleRequest({'op': 'remove', 'id': jobId})
+        self.assertEqual(result['result'], 'success',
+                         'Scheduler failed to remove a job on request.')
+        for request in (None, {'op': 'fly'},
+                        {'op': 'add', 'job': {'scene': 'sleep'}}):
+            self.assertEqual(scheduler.handleRequest(request)['result'],
+                             'invalid',
+                             'Scheduler failed to reject an invalid '
+                             'request.')
+
+    def test_collectMetrics(self):
+        """
+        The collectMetrics method must return the job counts and the jitter,
+        and the saves must be timed.
+        """
+        scheduler = Scheduler(logging, self.devManager, self.netLoop)
+        saves = sum(summary['count'] for labels, summary
+                    in FILE_IO_TIME.getSummary()
+                    if labels == {'op': 'saveSchedules'})
+        scheduler.addJob({'scene': 'sleep', 'delay': 2700})
+        metrics = {name: samples for name, metricType, description, samples
+                   in scheduler.collectMetrics()}
+        self.assertEqual(metrics['piir_schedule_pending'], [({}, 1)],
+                         'Scheduler collectMetrics failed to return the '
+                         'pending job count.')
+        self.assertEqual(metrics['piir_schedule_fired_total'], [({}, 0)],
+                         'Scheduler collectMetrics failed to return the '
+                         'fired job count.')
+        self.assertEqual(sum(summary['count'] for labels, summary
+                             in FILE_IO_TIME.getSummary()
+                             if labels == {'op': 'saveSchedules'}),
+                         saves + 1,
+                         'Scheduler failed to time the schedule save.')
@@ -0,0 +1,262 @@
+import json
+import logging
+import multiprocessing
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.Device import Device                            # noqa: E402
+from device.ShardManager import Shard, ShardManager         # noqa: E402
+from exceptions import ShardError                           # noqa: E402
+
+
+class TestShardManager(TestCase):
+    """
+    ShardManager class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        with open('./tests/unit/device/devices.json') as devFiles:
+            self.devices = json.loads(devFiles.read())
+        self.devices[1]['linkedEmitter'] = 'OUT1'
+        self.devices.append(dict(self.devices[0], name='testDev4'))
+
+    def test_constructorGroupByOutput(self):
+        """
+        The constructor must keep the devices linked to the same output
+        in the same shard.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        devices = shardMngr.getDevices()
+        self.assertTrue(devices[0].shard is devices[2].shard
+                        and devices[0].shard is devices[3].shard,
+                        'ShardManager failed to group the devices of the '
+                        'same output in the same shard.')
+        self.assertFalse(devices[0].shard is devices[1].shard,
+                         'ShardManager failed to spread the outputs over '
+                         'the shards.')
+
+    def test_constructorDropEmptyShards(self):
+        """
+        The constructor must not create shards without devices.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 8)
+        self.assertEqual(len(shardMngr.shards), 2,
+                         'ShardManager failed to drop the empty shards.')
+
+    def test_getDevicesConfigOrder(self):
+        """
+        The getDevices method must return the device proxies in the
+        configuration order.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        self.assertEqual([device.getConfig() for device in
+                          shardMngr.getDevices()], self.devices,
+                         'ShardManager getDevices failed to return the '
+                         'devices in the configuration order.')
+
+    @patch('device.ShardManager.Device')
+    def test_shardProcesses(self, mockedDevice):
+        """
+        The shard processes must run their devices and report their
+        metrics to the coordinator.
+        """
+        mockedDevice.return_value.getStartupTimings.return_value = {}
+        mockedDevice.return_value.getState.return_value = {
+            'status': Device.ONLINE_MSG, 'lastResult': None}
+        mockedDevice.return_value.getQueueDepth.return_value = 0
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        shardMngr.start()
+        try:
+            shardMngr.startLoops()
+            stats = shardMngr.getShardStats()
+            states = shardMngr.getDeviceStates()
+            snapshots = shardMngr.getMetricsSnapshots()
+            traces = shardMngr.getTraces()
+            shardMngr.stopLoops()
+        finally:
+            shardMngr.stop()
+        self.assertEqual(sorted(shardStats['devices'] for shardStats
+                                in stats), [1, 3],
+                         'ShardManager failed to run the devices in the '
+                         'shard processes.')
+        self.assertEqual(len(set(shardStats['pid'] for shardStats
+                                 in stats)), 2,
+                         'ShardManager failed to run each shard in its '
+                         'own process.')
+        self.assertEqual([states[device] for device
+                          in shardMngr.getDevices()],
+                         [({'status': Device.ONLINE_MSG,
+                            'lastResult': None}, 0)] * len(self.devices),
+                         'ShardManager failed to return the device states.')
+        self.assertEqual(sorted(labels['shard'] for labels, snapshot
+                                in snapshots), [0, 1],
+                         'ShardManager failed to return the shard metrics.')
+        self.assertEqual(traces, [],
+                         'ShardManager failed to return the shard traces.')
+
+    def test_proxySetConfig(self):
+        """
+        The device proxy setConfig method must forward the new configuration
+        to the shard.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        device = shardMngr.getDevices()[1]
+        device.shard.request = Mock()
+        newConfig = dict(self.devices[1], name='newName')
+        device.setConfig(newConfig)
+        device.shard.request.assert_called_once_with(ShardManager
+                                                     .REQ_SET_CONFIG,
+                                                     device.devIdx, newConfig)
+        self.assertEqual(device.getName(), 'newName',
+                         'Device proxy setConfig failed to update the '
+                         'coordinator configuration.')
+
+    @patch('device.ShardManager.Device')
+    def test_shardRequestError(self, mockedDevice):
+        """
+        A failed request must be reported to the coordinator without
+        stopping the shard, and a dead shard must fail its requests.
+        """
+        mockedDevice.return_value.getStartupTimings.return_value = {}
+        mockedDevice.return_value.getState.side_effect = \
+            RuntimeError('state failure')
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        shardMngr.start()
+        device = shardMngr.getDevices()[1]
+        try:
+            with self.assertRaises(RuntimeError,
+                                   msg='Device proxy failed to raise the '
+                                       'shard request error.'):
+                device.getState()
+            self.assertEqual(len(shardMngr.getShardStats()), 2,
+                             'ShardManager failed to keep serving after a '
+                             'request error.')
+            device.shard.process.kill()
+            device.shard.reader.join(5)
+            with self.assertRaises(ShardError,
+                                   msg='Device proxy failed to detect the '
+                                       'dead shard.'):
+                device.getState()
+            self.assertEqual(len(shardMngr.getShardStats()), 1,
+                             'ShardManager failed to skip the dead shard '
+                             'metrics.')
+        finally:
+            shardMngr.stop()
+
+    def test_requestTimeout(self):
+        """
+        The shard request method must time out when the worker does not
+        reply, and fail the pending requests once the worker is gone.
+        """
+        shard = Shard(0, logging.getLogger('test'))
+        conn, workerConn = multiprocessing.Pipe()
+        shard.attach(conn, Mock())
+        with self.assertRaises(ShardError,
+                               msg='Shard request failed to time out.'):
+            shard.request(ShardManager.REQ_STATS, timeout=0.05)
+        results = []
+        shard.submit(lambda success, result: results.append(success),
+                     ShardManager.REQ_STATS)
+        workerConn.close()
+        shard.reader.join(5)
+        self.assertEqual(results, [False],
+                         'Shard failed to fail the pending requests of a '
+                         'dead worker.')
+        self.assertEqual(shard.pending, {},
+                         'Shard failed to drop the timed out request.')
+
+    def test_proxyCall(self):
+        """
+        The device proxy must call the device methods in the shard.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        device = shardMngr.getDevices()[1]
+        device.shard.request = Mock(return_value={'power': 'on'})
+        self.assertEqual(device.getPredictedState(), {'power': 'on'},
+                         'Device proxy failed to return the shard reply.')
+        device.shard.request.assert_called_once_with(ShardManager.REQ_CALL,
+                                                     device.devIdx,
+                                                     'getPredictedState')
+        self.assertEqual(device.getConfigRecord().topicPrefix,
+                         self.devices[1]['topicPrefix'],
+                         'Device proxy failed to return the configuration '
+                         'record.')
+
+    def test_proxyCommandListCached(self):
+        """
+        The device proxy must cache the command list and the state
+        declarations until the command set changes.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        device = shardMngr.getDevices()[1]
+        device.shard.request = Mock(return_value=['power'])
+        device.getCommandList()
+        device.getCommandList()
+        device.getStates()
+        device.getStates()
+        self.assertEqual(device.shard.request.call_count, 2,
+                         'Device proxy failed to cache the command list and '
+                         'the state declarations.')
+        device.addCommand('hdmi1', 'HDMI 1')
+        device.getCommandList()
+        self.assertEqual(device.shard.request.call_count, 4,
+                         'Device proxy failed to drop the cached command '
+                         'list on a command set change.')
+        self.assertEqual(device.getGeneration(), 1,
+                         'Device proxy failed to count the command set '
+                         'change.')
+
+    def test_proxySendCommand(self):
+        """
+        The device proxy sendCommand method must submit the command without
+        waiting, and report a shard failure as an error.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        device = shardMngr.getDevices()[1]
+        device.shard.submit = Mock()
+        callback = Mock()
+        device.sendCommand('power', callback)
+        onReply, request, devIdx, command, wait = \
+            device.shard.submit.call_args[0]
+        self.assertEqual((request, devIdx, command, wait),
+                         (ShardManager.REQ_SEND_COMMAND, device.devIdx,
+                          'power', True),
+                         'Device proxy failed to submit the command.')
+        callback.assert_not_called()
+        onReply(True, True)
+        callback.assert_called_once_with(True)
+        callback.reset_mock()
+        device.shard.submit.side_effect = ShardError('shard 0 is not running')
+        device.sendCommand('power', callback)
+        callback.assert_called_once_with(False)
+
+    def test_shardEvents(self):
+        """
+        The shard device events must reach the event callback of their
+        device proxy, without stopping the shard reader on a callback error.
+        """
+        shardMngr = ShardManager(logging, Mock(), self.devices, 2)
+        device = shardMngr.getDevices()[0]
+        events = []
+        device.setEventCallback(lambda proxy, event, data:
+                                events.append((proxy, event, data)))
+        conn, workerConn = multiprocessing.Pipe()
+        device.shard.attach(conn, Mock())
+        failing = shardMngr.getDevices()[2]
+        failing.setEventCallback(Mock(side_effect=RuntimeError('failure')))
+        workerConn.send((ShardManager.MSG_EVENT, failing.devIdx,
+                         (Device.EVT_STATUS, {'status': 'ONLINE'})))
+        workerConn.send((ShardManager.MSG_EVENT, device.devIdx,
+                         (Device.EVT_RESULT, {'lastResult': 'done'})))
+        workerConn.close()
+        device.shard.reader.join(5)
+        self.assertEqual(events, [(device, Device.EVT_RESULT,
+                                   {'lastResult': 'done'})],
+                         'Shard failed to forward the device events to their '
+                         'proxy.')
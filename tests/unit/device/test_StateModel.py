@@ -0,0 +1,154 @@
+from unittest import TestCase
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.StateModel import StateModel                    # noqa: E402
+from exceptions import CommandNotFound, InvalidConfig       # noqa: E402
+
+
+class TestStateModel(TestCase):
+    """
+    StateModel class test cases.
+    """
+    def setUp(self):
+        """
+        Test case setup.
+        """
+        self.states = {
+            'power': {
+                'type': 'toggle',
+                'command': 'power',
+                'values': ['off', 'on'],
+            },
+            'input': {
+                'type': 'discrete',
+                'commands': {'tv': 'inputTv', 'cd': 'inputCd'},
+            },
+            'volume': {
+                'type': 'relative',
+                'up': 'volumeUp',
+                'down': 'volumeDown',
+                'min': 0,
+                'max': 4,
+                'step': 2,
+            },
+        }
+
+    def test_constructorUnknownValues(self):
+        """
+        The constructor must start with unknown state values.
+        """
+        model = StateModel(self.states)
+        self.assertEqual(model.getValues(),
+                         {'power': None, 'input': None, 'volume': None},
+                         'StateModel failed to start with unknown values.')
+
+    def test_constructorInvalid(self):
+        """
+        The constructor must raise InvalidConfig when a state declaration
+        is invalid.
+        """
+        invalidStates = [
+            {'power': {'type': 'unknown'}},
+            {'power': {'type': 'toggle', 'command': 'power', 'values': []}},
+            {'input': {'type': 'discrete', 'commands': {'tv': 1}}},
+            {'volume': {'type': 'relative', 'up': 'up', 'down': 'down',
+                        'min': 4, 'max': 0}},
+        ]
+        for states in invalidStates:
+            with self.assertRaises(InvalidConfig) as context:
+                StateModel(states)
+            self.assertTrue(isinstance(context.exception, InvalidConfig),
+                            f"StateModel failed to reject {states}.")
+
+    def test_isRequest(self):
+        """
+        The isRequest method must detect the state requests.
+        """
+        self.assertTrue(StateModel.isRequest('power=on'),
+                        'isRequest failed to detect a state request.')
+        self.assertFalse(StateModel.isRequest('power'),
+                         'isRequest failed to reject a plain command.')
+
+    def test_planUnsupported(self):
+        """
+        The plan method must raise CommandNotFound when the state or the
+        value is not supported.
+        """
+        model = StateModel(self.states)
+        for request in ['unknown=1', 'power=standby', 'input=dvd',
+                        'volume=loud', 'volume=6']:
+            with self.assertRaises(CommandNotFound):
+                model.plan(request)
+
+    def test_planToggle(self):
+        """
+        The plan method must press a toggle command once when the state is
+        unknown, assuming the requested value, and as many times as needed
+        to cycle to the value otherwise.
+        """
+        model = StateModel(self.states)
+        self.assertEqual(model.plan('power=on'), (['power'], 'on', True),
+                         'plan failed to press the unknown toggle once.')
+        model.setValue('power', 'on')
+        self.assertEqual(model.plan('power=on'), ([], 'on', False),
+                         'plan failed to skip the redundant toggle.')
+        self.assertEqual(model.plan('power=off'), (['power'], 'off', False),
+                         'plan failed to cycle the toggle.')
+
+    def test_planDiscrete(self):
+        """
+        The plan method must send the value command of a discrete state,
+        unless the device already has the value.
+        """
+        model = StateModel(self.states)
+        self.assertEqual(model.plan('input=cd'), (['inputCd'], 'cd', False),
+                         'plan failed to send the value command.')
+        model.setValue('input', 'cd')
+        self.assertEqual(model.plan('input=cd'), ([], 'cd', False),
+                         'plan failed to skip the redundant value.')
+
+    def test_planRelative(self):
+        """
+        The plan method must calibrate an unknown relative state down to
+        its minimum, then step to the value, and report the value actually
+        reached.
+        """
+        model = StateModel(self.states)
+        self.assertEqual(model.plan('volume=2'),
+                         (['volumeDown', 'volumeDown', 'volumeUp'], 2,
+                          False),
+                         'plan failed to calibrate the unknown state.')
+        model.setValue('volume', '4')
+        self.assertEqual(model.plan('volume=0'),
+                         (['volumeDown', 'volumeDown'], 0, False),
+                         'plan failed to step down to the value.')
+        self.assertEqual(model.plan('volume=4'), ([], 4, False),
+                         'plan failed to skip the redundant value.')
+        self.assertEqual(model.plan('volume=1'), (['volumeDown'], 2, False),
+                         'plan failed to report the closest step reached.')
+
+    def test_onTransmit(self):
+        """
+        The onTransmit method must update the known states from the
+        transmitted commands, and keep the unknown toggle and relative
+        states unknown.
+        """
+        model = StateModel(self.states)
+        model.onTransmit('power')
+        model.onTransmit('volumeUp')
+        model.onTransmit('inputTv')
+        self.assertEqual(model.getValues(),
+                         {'power': None, 'input': 'tv', 'volume': None},
+                         'onTransmit failed to update the discrete state '
+                         'only.')
+        model.setValue('power', 'off')
+        model.setValue('volume', 3)
+        model.onTransmit('power')
+        model.onTransmit('volumeUp')
+        self.assertEqual(model.getValues(),
+                         {'power': 'on', 'input': 'tv', 'volume': 4},
+                         'onTransmit failed to update the known states '
+                         'within bounds.')
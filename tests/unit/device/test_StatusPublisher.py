@@ -0,0 +1,95 @@
+import json
+import logging
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.DeviceManager import DeviceManager              # noqa: E402
+from device.Gateway import Gateway                          # noqa: E402
+from device.NetworkLoop import NetworkLoop                  # noqa: E402
+from device.StatusPublisher import StatusPublisher          # noqa: E402
+
+
+class TestStatusPublisher(TestCase):
+    """
+    StatusPublisher class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.summary = {
+            'livingRoom.tv': {'online': True, 'lastResult': 'done',
+                              'queueDepth': 1},
+            'bedroom.tv': {'online': False, 'lastResult': None,
+                           'queueDepth': 0},
+        }
+        self.devManager = Mock(spec_set=DeviceManager)
+        self.devManager.getStatusSummary.side_effect = \
+            lambda: json.loads(json.dumps(self.summary))
+        self.gateway = Mock(spec_set=Gateway)
+        self.netLoop = Mock(spec_set=NetworkLoop)
+        self.publisher = StatusPublisher(logging, self.devManager,
+                                         self.netLoop, interval=0.01)
+        self.publisher.registerTopics(self.gateway)
+
+    def tearDown(self):
+        """
+        Test cases teardown.
+        """
+        self.publisher.stop()
+
+    def test_getStatus(self):
+        """
+        The getStatus method must return the device counts and the status
+        of each device.
+        """
+        self.assertEqual(self.publisher.getStatus(),
+                         {'online': 1, 'total': 2, 'devices': self.summary},
+                         'StatusPublisher getStatus failed to aggregate the '
+                         'device status.')
+
+    def test_publishChanged(self):
+        """
+        The publish method must publish the retained status only when it
+        changed since the last publication.
+        """
+        self.assertTrue(self.publisher.publish(),
+                        'StatusPublisher failed to publish the status.')
+        subTopic, payload = self.gateway.publish.call_args[0]
+        self.assertEqual(subTopic, StatusPublisher.STATUS_TOPIC,
+                         'StatusPublisher failed to publish on the status '
+                         'topic.')
+        self.assertEqual(self.gateway.publish.call_args[1],
+                         {'qos': 1, 'retain': True},
+                         'StatusPublisher failed to retain the status.')
+        self.assertFalse(self.publisher.publish(),
+                         'StatusPublisher failed to skip an unchanged '
+                         'status.')
+        self.summary['bedroom.tv']['online'] = True
+        self.assertTrue(self.publisher.publish(),
+                        'StatusPublisher failed to publish a changed '
+                        'status.')
+        self.assertEqual(self.gateway.publish.call_count, 2,
+                         'StatusPublisher failed to throttle the status.')
+
+    def test_tick(self):
+        """
+        The status must be published on the network loop once per interval
+        until the publisher is stopped.
+        """
+        self.publisher.start()
+        delay, tick, tickId = self.netLoop.callLater.call_args[0]
+        self.assertEqual(delay, 0.01,
+                         'StatusPublisher failed to schedule the tick.')
+        tick(tickId)
+        self.gateway.publish.assert_called_once()
+        self.assertEqual(self.netLoop.callLater.call_count, 2,
+                         'StatusPublisher failed to schedule the next tick.')
+        self.publisher.stop()
+        tick(tickId)
+        self.assertEqual(self.netLoop.callLater.call_count, 2,
+                         'StatusPublisher kept ticking once stopped.')
@@ -0,0 +1,165 @@
+import json
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.CommandRequest import CommandRequest            # noqa: E402
+from device.Tracer import Tracer                            # noqa: E402
+
+
+class TestTracer(TestCase):
+    """
+    Tracer class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.tracer = Tracer(capacity=3)
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.traceFile = os.path.join(self.tmpDir.name, 'traces.json')
+
+    def tearDown(self):
+        """
+        Test cases cleanup.
+        """
+        self.tmpDir.cleanup()
+
+    def _getRequest(self, command='power'):
+        request = CommandRequest(None, command)
+        request.addSpan('receive', request.received - 0.01,
+                        request.received)
+        request.dequeued = request.received + 0.1
+        request.ready = request.received + 0.2
+        request.addSpan('packet 0', request.ready, request.ready + 0.1)
+        request.done = request.received + 0.3
+        request.addSpan('publish', request.done, request.done + 0.01)
+        return request
+
+    def test_finish(self):
+        """
+        The finish method must record the trace with the stage spans of the
+        request, relative to its start.
+        """
+        request = self._getRequest()
+        self.tracer.finish(request, 'livingRoom.tv', 'done')
+        trace, = self.tracer.getTraces()
+        self.assertEqual((trace['id'], trace['device'], trace['command'],
+                          trace['result']),
+                         (request.traceId, 'livingRoom.tv', 'power', 'done'),
+                         'Tracer finish failed to record the trace.')
+        self.assertEqual([span['name'] for span in trace['spans']],
+                         ['receive', 'queued', 'ready', 'transmit',
+                          'packet 0', 'publish'],
+                         'Tracer finish failed to record the stage spans '
+                         'in order.')
+        self.assertAlmostEqual(trace['duration'], 0.32,
+                               msg='Tracer finish failed to record the '
+                                   'trace duration.')
+        self.assertEqual(trace['spans'][0]['start'], 0,
+                         'Tracer finish failed to start the spans at the '
+                         'trace start.')
+
+    def test_finishNotTransmitted(self):
+        """
+        The finish method must record the trace of a request that never
+        reached the transmission.
+        """
+        request = CommandRequest('req1', 'power')
+        self.tracer.finish(request, 'livingRoom.tv', 'expired')
+        trace, = self.tracer.getTraces()
+        self.assertEqual((trace['spans'], trace['duration']), ([], 0),
+                         'Tracer finish failed to record an empty trace.')
+
+    def test_getTracesRing(self):
+        """
+        The getTraces method must return the most recent traces, limited in
+        number or selected by ID.
+        """
+        requests = [self._getRequest(f"cmd{i}") for i in range(5)]
+        for request in requests:
+            self.tracer.finish(request, 'livingRoom.tv', 'done')
+        self.assertEqual([trace['command'] for trace
+                          in self.tracer.getTraces()],
+                         ['cmd2', 'cmd3', 'cmd4'],
+                         'Tracer failed to keep the most recent traces.')
+        self.assertEqual([trace['command'] for trace
+                          in self.tracer.getTraces(limit=1)],
+                         ['cmd4'],
+                         'Tracer getTraces failed to limit the traces.')
+        self.assertEqual([trace['command'] for trace in self.tracer.getTraces(
+                          traceId=requests[3].traceId)],
+                         ['cmd3'],
+                         'Tracer getTraces failed to select a trace by ID.')
+
+    def test_getTracesSources(self):
+        """
+        The getTraces method must merge the traces of the trace sources in
+        time order, the limit applying to the merged traces.
+        """
+        worker = Tracer()
+        requests = [self._getRequest(f"cmd{i}") for i in range(3)]
+        self.tracer.finish(requests[0], 'livingRoom.tv', 'done')
+        worker.finish(requests[1], 'bedroom.tv', 'done')
+        self.tracer.finish(requests[2], 'livingRoom.tv', 'done')
+        source = Mock(side_effect=lambda traceId:
+                      worker.getTraces(traceId=traceId))
+        self.tracer.addSource(source)
+        self.assertEqual([trace['command'] for trace
+                          in self.tracer.getTraces(limit=2)],
+                         ['cmd1', 'cmd2'],
+                         'Tracer getTraces failed to merge the source '
+                         'traces.')
+        self.assertEqual([trace['device'] for trace in self.tracer.getTraces(
+                          traceId=requests[1].traceId)],
+                         ['bedroom.tv'],
+                         'Tracer getTraces failed to select a source trace '
+                         'by ID.')
+        source.assert_called_with(requests[1].traceId)
+
+    def test_clear(self):
+        """
+        The clear method must drop the recorded traces and the trace
+        sources.
+        """
+        self.tracer.finish(self._getRequest(), 'livingRoom.tv', 'done')
+        self.tracer.addSource(Mock(return_value=[]))
+        self.tracer.clear()
+        self.assertEqual((self.tracer.getTraces(), self.tracer.sources),
+                         ([], []),
+                         'Tracer clear failed to drop the traces and the '
+                         'sources.')
+
+    def test_export(self):
+        """
+        The export method must write the traces in the Chrome trace event
+        format, and do nothing without export file.
+        """
+        self.assertIsNone(self.tracer.export(),
+                          'Tracer export failed to skip the export without '
+                          'export file.')
+        self.tracer.finish(self._getRequest(), 'livingRoom.tv', 'done')
+        self.tracer.setExportPath(self.traceFile)
+        self.assertEqual(self.tracer.export(), 1,
+                         'Tracer export failed to count the exported '
+                         'traces.')
+        with open(self.traceFile) as traceFile:
+            document = json.loads(traceFile.read())
+        events = [event for event in document['traceEvents']
+                  if event['ph'] == 'X']
+        self.assertEqual([event['name'] for event in events],
+                         ['power', 'receive', 'queued', 'ready', 'transmit',
+                          'packet 0', 'publish'],
+                         'Tracer export failed to write the command and '
+                         'stage events.')
+        command = events[0]
+        for event in events[1:]:
+            self.assertTrue(command['ts'] <= event['ts'] and
+                            event['ts'] + event['dur']
+                            <= command['ts'] + command['dur'] + 1,
+                            'Tracer export failed to nest the stage events '
+                            'in the command event.')
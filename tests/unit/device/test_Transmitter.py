@@ -0,0 +1,249 @@
+import logging
+import time
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.CommandRequest import CommandRequest            # noqa: E402
+from device.RateLimiter import RateLimiter                  # noqa: E402
+from device.Transmitter import Transmitter                  # noqa: E402
+
+
+class TestTransmitter(TestCase):
+    """
+    Transmitter class test cases.
+    """
+    def setUp(self):
+        """
+        Test cases setup.
+        """
+        self.transmitter = Transmitter(logging)
+        self.mockedDev = Mock()
+        self.mockedDev.transmit.return_value = True
+
+    def tearDown(self):
+        """
+        Test cases teardown.
+        """
+        self.transmitter.stop()
+
+    def test_submitQueueCommand(self):
+        """
+        The submit method must queue the command until the transmitter
+        is started.
+        """
+        self.transmitter.submit(self.mockedDev, 'power')
+        self.assertEqual(self.transmitter.getQueueDepth(), 1,
+                         'Transmitter submit failed to queue the command.')
+        self.mockedDev.transmit.assert_not_called()
+
+    def test_runTransmitCommands(self):
+        """
+        The transmitter must transmit the queued commands in order and call
+        their callback with the result.
+        """
+        callback = Mock()
+        self.transmitter.submit(self.mockedDev, 'power', callback)
+        self.transmitter.submit(self.mockedDev, 'volumeUp', callback)
+        self.transmitter.start()
+        self.transmitter.stop()
+        self.assertEqual([call[0][0] for call in
+                          self.mockedDev.transmit.call_args_list],
+                         ['power', 'volumeUp'],
+                         'Transmitter failed to transmit the commands '
+                         'in order.')
+        self.assertEqual(callback.call_count, 2,
+                         'Transmitter failed to call the command callbacks.')
+        callback.assert_called_with(True)
+
+    def test_runTransmitError(self):
+        """
+        The transmitter must report a failed result when the transmission
+        raises an error.
+        """
+        callback = Mock()
+        self.mockedDev.transmit.side_effect = Exception('pigpio error')
+        self.transmitter.submit(self.mockedDev, 'power', callback)
+        self.transmitter.start()
+        self.transmitter.stop()
+        callback.assert_called_once_with(False)
+
+    def test_submitBatch(self):
+        """
+        The transmitter must transmit a batch in order, calling the job
+        callbacks and then the batch callback with the timed results.
+        """
+        jobCallback = Mock()
+        batchCallback = Mock()
+        self.mockedDev.transmit.side_effect = [True, False]
+        self.transmitter.submitBatch([(self.mockedDev, 'power', jobCallback),
+                                      (self.mockedDev, 'fly', None)],
+                                     batchCallback)
+        self.assertEqual(self.transmitter.getQueueDepth(), 1,
+                         'Transmitter submitBatch failed to queue the batch '
+                         'as a unit.')
+        self.transmitter.start()
+        self.transmitter.stop()
+        jobCallback.assert_called_once_with(True)
+        results = batchCallback.call_args[0][0]
+        self.assertEqual([result for result, duration in results],
+                         [True, False],
+                         'Transmitter failed to report the batch results.')
+        self.assertTrue(all(duration >= 0 for result, duration in results),
+                        'Transmitter failed to time the batch jobs.')
+
+    def test_submitRepeat(self):
+        """
+        The transmitter must transmit a command with its repeat count.
+        """
+        self.transmitter.submit(self.mockedDev, 'volumeUp', None, 3)
+        self.transmitter.start()
+        self.transmitter.stop()
+        self.mockedDev.transmit.assert_called_once_with('volumeUp', 3, None)
+
+    def test_runPriorityOrder(self):
+        """
+        The transmitter must transmit the queued commands by priority
+        class, then in arrival order.
+        """
+        self.transmitter.submit(self.mockedDev, 'volumeUp', priority='low')
+        self.transmitter.submit(self.mockedDev, 'volumeDown')
+        self.transmitter.submit(self.mockedDev, 'power', priority='high')
+        self.transmitter.start()
+        self.transmitter.stop()
+        self.assertEqual([call[0][0] for call in
+                          self.mockedDev.transmit.call_args_list],
+                         ['power', 'volumeDown', 'volumeUp'],
+                         'Transmitter failed to transmit the commands by '
+                         'priority.')
+
+    def test_runExpired(self):
+        """
+        The transmitter must drop the commands past their deadline and
+        report them as expired.
+        """
+        callback = Mock()
+        self.transmitter.submit(self.mockedDev, 'power', callback,
+                                deadline=time.monotonic() - 1)
+        self.transmitter.start()
+        self.transmitter.stop()
+        self.mockedDev.transmit.assert_not_called()
+        callback.assert_called_once_with(Transmitter.EXPIRED)
+        self.assertFalse(callback.call_args[0][0],
+                         'Transmitter failed to report the expiry as a '
+                         'failure.')
+        self.assertEqual(self.transmitter.getStats()['expired'], 1,
+                         'Transmitter failed to count the expired command.')
+
+    def test_submitQueueFull(self):
+        """
+        The submit method must reject a command when the queue is full of
+        commands of the same or a higher priority class.
+        """
+        transmitter = Transmitter(logging, maxDepth=1)
+        callback = Mock()
+        transmitter.submit(self.mockedDev, 'power')
+        transmitter.submit(self.mockedDev, 'volumeUp', callback)
+        callback.assert_called_once_with(Transmitter.REJECTED)
+        self.assertEqual(transmitter.getQueueDepth(), 1,
+                         'Transmitter failed to bound the queue.')
+        self.assertEqual(transmitter.getStats()['rejected'], 1,
+                         'Transmitter failed to count the rejected '
+                         'command.')
+
+    def test_submitQueueFullEvict(self):
+        """
+        The submit method must evict the latest command of a lower priority
+        class when the queue is full.
+        """
+        transmitter = Transmitter(logging, maxDepth=1)
+        callback = Mock()
+        transmitter.submit(self.mockedDev, 'volumeUp', callback,
+                           priority='low')
+        transmitter.submit(self.mockedDev, 'power', priority='high')
+        callback.assert_called_once_with(Transmitter.REJECTED)
+        transmitter.start()
+        transmitter.stop()
+        self.mockedDev.transmit.assert_called_once_with('power', 1, None)
+
+    def test_getDeviceDepth(self):
+        """
+        The getDeviceDepth method must count the queued commands of a device
+        until they leave the queue.
+        """
+        otherDev = Mock()
+        otherDev.transmit.return_value = True
+        self.transmitter.submit(self.mockedDev, 'power')
+        self.transmitter.submitBatch([(self.mockedDev, 'hdmi1', None),
+                                      (otherDev, 'power', None)])
+        self.assertEqual((self.transmitter.getDeviceDepth(self.mockedDev),
+                          self.transmitter.getDeviceDepth(otherDev)),
+                         (2, 1),
+                         'Transmitter failed to count the queued commands '
+                         'of each device.')
+        self.transmitter.start()
+        self.transmitter.stop()
+        self.assertEqual(self.transmitter.getDeviceDepth(self.mockedDev), 0,
+                         'Transmitter failed to count the sent commands.')
+
+    def test_submitLimited(self):
+        """
+        The submit method must refuse the commands throttled by the rate
+        limiter before they enter the queue.
+        """
+        limiter = Mock()
+        limiter.acquire.return_value = False
+        limiter.getStats.return_value = {}
+        transmitter = Transmitter(logging, rateLimiter=limiter)
+        callback = Mock()
+        transmitter.submit(self.mockedDev, 'power', callback)
+        limiter.acquire.assert_called_once_with([self.mockedDev])
+        callback.assert_called_once_with(Transmitter.LIMITED)
+        self.assertEqual(transmitter.getQueueDepth(), 0,
+                         'Transmitter failed to keep the throttled command '
+                         'out of the queue.')
+        self.assertEqual(transmitter.getStats()['limited'], 1,
+                         'Transmitter failed to count the throttled '
+                         'command.')
+
+    def test_runStampRequest(self):
+        """
+        The transmitter must stamp the command request with its dequeue,
+        transmission start and end times.
+        """
+        request = CommandRequest('req1', 'power')
+        self.transmitter.submit(self.mockedDev, 'power', request=request)
+        self.transmitter.start()
+        self.transmitter.stop()
+        self.assertTrue(request.received <= request.dequeued
+                        <= request.ready <= request.done,
+                        'Transmitter failed to stamp the request stages.')
+
+    def test_collectMetrics(self):
+        """
+        The collectMetrics method must return the queued command count by
+        output, the refused entry counts and the throttle counters.
+        """
+        limiter = RateLimiter()
+        transmitter = Transmitter(logging, rateLimiter=limiter)
+        self.mockedDev.config.linkedEmitter = 'OUT1'
+        self.mockedDev.config.extra = {}
+        transmitter.submit(self.mockedDev, 'power')
+        transmitter.submit(self.mockedDev, 'volumeUp')
+        metrics = {name: samples for name, metricType, description, samples
+                   in transmitter.collectMetrics()}
+        self.assertEqual(metrics['piir_transmit_queue_depth'],
+                         [({'output': 'OUT1'}, 2)],
+                         'Transmitter collectMetrics failed to return the '
+                         'queue depth by output.')
+        self.assertIn(({'reason': 'limited'}, 0),
+                      metrics['piir_transmit_refused_total'],
+                      'Transmitter collectMetrics failed to return the '
+                      'refused entry counts.')
+        self.assertIn(({'scope': 'global', 'key': ''}, 0),
+                      metrics['piir_transmit_throttled_total'],
+                      'Transmitter collectMetrics failed to return the '
+                      'throttle counters.')
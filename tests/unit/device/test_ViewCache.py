@@ -0,0 +1,57 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from device.ViewCache import ViewCache                      # noqa: E402
+
+
+class TestViewCache(TestCase):
+    """
+    ViewCache class test cases.
+    """
+    def test_getBuildOnce(self):
+        """
+        The get method must build a view once and serve it from the cache
+        afterward.
+        """
+        cache = ViewCache()
+        build = Mock(return_value=['a', 'b'])
+        view = cache.get('view', build)
+        self.assertIs(cache.get('view', build), view,
+                      'ViewCache get failed to serve the cached view.')
+        build.assert_called_once()
+
+    def test_invalidate(self):
+        """
+        The invalidate method must drop the views and start a new
+        generation.
+        """
+        cache = ViewCache()
+        build = Mock(side_effect=[['a'], ['a', 'b']])
+        cache.get('view', build)
+        cache.invalidate()
+        self.assertEqual(cache.get('view', build), ['a', 'b'],
+                         'ViewCache invalidate failed to drop the views.')
+        self.assertEqual(cache.getGeneration(), 1,
+                         'ViewCache invalidate failed to start a new '
+                         'generation.')
+
+    def test_invalidateWhileBuilding(self):
+        """
+        A view built while the cache is invalidated must not be stored.
+        """
+        cache = ViewCache()
+
+        def build():
+            cache.invalidate()
+            return ['stale']
+
+        self.assertEqual(cache.get('view', build), ['stale'],
+                         'ViewCache get failed to return the built view.')
+        self.assertEqual(cache.get('view', Mock(return_value=['fresh'])),
+                         ['fresh'],
+                         'ViewCache stored a view built during an '
+                         'invalidation.')
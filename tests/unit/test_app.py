@@ -12,9 +12,26 @@ class TestApp(TestCase):
     """
     The App class test cases.
     """
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
     @patch('app.Config')
     @patch('app.DeviceManager')
-    def test_conctructorLoadConfig(self, mockedDevMngr, mockedConfig):
+    def test_conctructorLoadConfig(self, mockedDevMngr, mockedConfig,
+                                   mockedNetLoop, mockedTransmitter,
+                                   mockedEndpoint, mockedGateway,
+                                   mockedSceneMngr, mockedScheduler,
+                                   mockedGroupMngr, mockedStatusPublisher,
+                                   mockedDiscovery, mockedMetricsPublisher,
+                                   mockedRegistry):
         """
         The constructor must load the configuration by creating a new
         instance of the Config object.
@@ -23,9 +40,26 @@ class TestApp(TestCase):
         self.assertTrue(mockedConfig.called,
                         'App constructor failed to load the config.')
 
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
     @patch('app.Config')
     @patch('app.DeviceManager')
-    def test_constructorLoadDevMngr(self, mockedDevMngr, mockedConfig):
+    def test_constructorLoadDevMngr(self, mockedDevMngr, mockedConfig,
+                                    mockedNetLoop, mockedTransmitter,
+                                    mockedEndpoint, mockedGateway,
+                                    mockedSceneMngr, mockedScheduler,
+                                    mockedGroupMngr, mockedStatusPublisher,
+                                    mockedDiscovery, mockedMetricsPublisher,
+                                    mockedRegistry):
         """
         The contructor must load the active devices by instanciating a new
         instance of the DeviceManager.
@@ -34,9 +68,26 @@ class TestApp(TestCase):
         self.assertTrue(mockedDevMngr.called,
                         'App constructor failed to load the devices.')
 
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
     @patch('app.Config')
     @patch('app.DeviceManager')
-    def test_runStartDeviceLoops(self, mockedDevMngr, mockedConfig):
+    def test_runStartDeviceLoops(self, mockedDevMngr, mockedConfig,
+                                 mockedNetLoop, mockedTransmitter,
+                                 mockedEndpoint, mockedGateway,
+                                 mockedSceneMngr, mockedScheduler,
+                                 mockedGroupMngr, mockedStatusPublisher,
+                                 mockedDiscovery, mockedMetricsPublisher,
+                                 mockedRegistry):
         """
         The App run method must start the nertwork loop of the active
         devices by calling the device manager startLoops method.
@@ -49,9 +100,26 @@ class TestApp(TestCase):
         self.assertTrue(devMngrMock.startLoops.called,
                         'App.run failed to start the loop of the devices')
 
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
     @patch('app.Config')
     @patch('app.DeviceManager')
-    def test_stopStopDeviceLoops(self, mockedDevMngr, mockedConfig):
+    def test_stopStopDeviceLoops(self, mockedDevMngr, mockedConfig,
+                                 mockedNetLoop, mockedTransmitter,
+                                 mockedEndpoint, mockedGateway,
+                                 mockedSceneMngr, mockedScheduler,
+                                 mockedGroupMngr, mockedStatusPublisher,
+                                 mockedDiscovery, mockedMetricsPublisher,
+                                 mockedRegistry):
         """
         The App stop method must stop the nertwork loop of the active
         devices by calling the device manager stopLoops method.
@@ -63,3 +131,426 @@ class TestApp(TestCase):
         app.stop()
         self.assertTrue(devMngrMock.stopLoops.called,
                         'App.run failed to start the loop of the devices')
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_constructorShareRuntime(self, mockedDevMngr, mockedConfig,
+                                     mockedNetLoop, mockedTransmitter,
+                                     mockedEndpoint, mockedGateway,
+                                     mockedSceneMngr, mockedScheduler,
+                                     mockedGroupMngr, mockedStatusPublisher,
+                                     mockedDiscovery, mockedMetricsPublisher,
+                                     mockedRegistry):
+        """
+        The constructor must pass the shared network loop and transmitter
+        to the device manager.
+        """
+        app = App()
+        self.assertEqual(mockedDevMngr.call_args[0][1:4],
+                         (app.config, app.netLoop, app.transmitter),
+                         'App constructor failed to share the network loop '
+                         'and the transmitter with the device manager.')
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_runStartRuntime(self, mockedDevMngr, mockedConfig,
+                             mockedNetLoop, mockedTransmitter,
+                             mockedEndpoint, mockedGateway,
+                             mockedSceneMngr, mockedScheduler,
+                             mockedGroupMngr, mockedStatusPublisher,
+                             mockedDiscovery, mockedMetricsPublisher,
+                             mockedRegistry):
+        """
+        The App run method must start the network loop and the transmitter.
+        """
+        app = App()
+        app.run()
+        app.netLoop.start.assert_called_once()
+        app.transmitter.start.assert_called_once()
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_stopStopRuntime(self, mockedDevMngr, mockedConfig,
+                             mockedNetLoop, mockedTransmitter,
+                             mockedEndpoint, mockedGateway,
+                             mockedSceneMngr, mockedScheduler,
+                             mockedGroupMngr, mockedStatusPublisher,
+                             mockedDiscovery, mockedMetricsPublisher,
+                             mockedRegistry):
+        """
+        The App stop method must stop the network loop and the transmitter.
+        """
+        app = App()
+        app.stop()
+        app.netLoop.stop.assert_called_once()
+        app.transmitter.stop.assert_called_once()
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_localEndpointOptIn(self, mockedDevMngr, mockedConfig,
+                                mockedNetLoop, mockedTransmitter,
+                                mockedEndpoint, mockedGateway,
+                                mockedSceneMngr, mockedScheduler,
+                                mockedGroupMngr, mockedStatusPublisher,
+                                mockedDiscovery, mockedMetricsPublisher,
+                                mockedRegistry):
+        """
+        The local command endpoint servers must be disabled unless
+        configured, an invalid HTTP port disabling the HTTP server.
+        """
+        with patch.dict(os.environ):
+            os.environ.pop('PIIR_SOCKET', None)
+            os.environ.pop('PIIR_HTTP_PORT', None)
+            App()
+            self.assertEqual(mockedEndpoint.call_args[0][2:], (None, None),
+                             'App failed to disable the local endpoint by '
+                             'default.')
+            for httpPort in ('http', '70000'):
+                os.environ['PIIR_HTTP_PORT'] = httpPort
+                App()
+                self.assertEqual(mockedEndpoint.call_args[0][2:],
+                                 (None, None),
+                                 'App failed to disable the local endpoint '
+                                 'on an invalid port.')
+            os.environ['PIIR_HTTP_PORT'] = '8086'
+            App()
+            self.assertEqual(mockedEndpoint.call_args[0][2:], (None, 8086),
+                             'App failed to enable the local HTTP endpoint.')
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_localEndpointRuntime(self, mockedDevMngr, mockedConfig,
+                                  mockedNetLoop, mockedTransmitter,
+                                  mockedEndpoint, mockedGateway,
+                                  mockedSceneMngr, mockedScheduler,
+                                  mockedGroupMngr, mockedStatusPublisher,
+                                  mockedDiscovery, mockedMetricsPublisher,
+                                  mockedRegistry):
+        """
+        The local command endpoint must serve the device manager devices
+        while the app runs.
+        """
+        with patch.dict(os.environ, {'PIIR_SOCKET': '/tmp/test.sock',
+                                     'PIIR_HTTP_PORT': ''}):
+            app = App()
+        mockedEndpoint.assert_called_once_with(mockedEndpoint.call_args[0][0],
+                                               app.deviceMngr,
+                                               '/tmp/test.sock', None)
+        app.run()
+        app.endpoint.start.assert_called_once()
+        app.stop()
+        app.endpoint.stop.assert_called_once()
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_gatewayRuntime(self, mockedDevMngr, mockedConfig,
+                            mockedNetLoop, mockedTransmitter,
+                            mockedEndpoint, mockedGateway,
+                            mockedSceneMngr, mockedScheduler,
+                            mockedGroupMngr, mockedStatusPublisher,
+                            mockedDiscovery, mockedMetricsPublisher,
+                            mockedRegistry):
+        """
+        The gateway must run on the shared network loop while the app runs.
+        """
+        app = App()
+        self.assertEqual(mockedGateway.call_args[0][1:],
+                         (app.config, app.deviceMngr, app.netLoop),
+                         'App constructor failed to create the gateway.')
+        app.run()
+        app.gateway.startLoop.assert_called_once()
+        app.stop()
+        app.gateway.stopLoop.assert_called_once()
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_constructorSceneTopics(self, mockedDevMngr, mockedConfig,
+                                    mockedNetLoop, mockedTransmitter,
+                                    mockedEndpoint, mockedGateway,
+                                    mockedSceneMngr, mockedScheduler,
+                                    mockedGroupMngr, mockedStatusPublisher,
+                                    mockedDiscovery, mockedMetricsPublisher,
+                                    mockedRegistry):
+        """
+        The constructor must serve the scene triggers on the gateway.
+        """
+        app = App()
+        app.sceneMngr.registerTopics.assert_called_once_with(app.gateway)
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_schedulerRuntime(self, mockedDevMngr, mockedConfig,
+                              mockedNetLoop, mockedTransmitter,
+                              mockedEndpoint, mockedGateway,
+                              mockedSceneMngr, mockedScheduler,
+                              mockedGroupMngr, mockedStatusPublisher,
+                              mockedDiscovery, mockedMetricsPublisher,
+                              mockedRegistry):
+        """
+        The scheduler must serve its topic on the gateway and run while the
+        app runs.
+        """
+        app = App()
+        app.scheduler.registerTopics.assert_called_once_with(app.gateway)
+        app.run()
+        app.scheduler.start.assert_called_once()
+        app.stop()
+        app.scheduler.stop.assert_called_once()
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_constructorGroupTopics(self, mockedDevMngr, mockedConfig,
+                                    mockedNetLoop, mockedTransmitter,
+                                    mockedEndpoint, mockedGateway,
+                                    mockedSceneMngr, mockedScheduler,
+                                    mockedGroupMngr, mockedStatusPublisher,
+                                    mockedDiscovery, mockedMetricsPublisher,
+                                    mockedRegistry):
+        """
+        The constructor must serve the group topics on the gateway.
+        """
+        app = App()
+        app.groupMngr.registerTopics.assert_called_once_with(app.gateway)
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_statusPublisherRuntime(self, mockedDevMngr, mockedConfig,
+                                    mockedNetLoop, mockedTransmitter,
+                                    mockedEndpoint, mockedGateway,
+                                    mockedSceneMngr, mockedScheduler,
+                                    mockedGroupMngr, mockedStatusPublisher,
+                                    mockedDiscovery, mockedMetricsPublisher,
+                                    mockedRegistry):
+        """
+        The status publisher must publish on the gateway and run while the
+        app runs.
+        """
+        app = App()
+        app.statusPublisher.registerTopics.assert_called_once_with(
+            app.gateway)
+        app.run()
+        app.statusPublisher.start.assert_called_once()
+        app.stop()
+        app.statusPublisher.stop.assert_called_once()
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_constructorDiscovery(self, mockedDevMngr, mockedConfig,
+                                  mockedNetLoop, mockedTransmitter,
+                                  mockedEndpoint, mockedGateway,
+                                  mockedSceneMngr, mockedScheduler,
+                                  mockedGroupMngr, mockedStatusPublisher,
+                                  mockedDiscovery, mockedMetricsPublisher,
+                                  mockedRegistry):
+        """
+        The constructor must publish the discovery configs with the
+        configured discovery prefix.
+        """
+        app = App()
+        self.assertEqual(mockedDiscovery.call_args[0][1:],
+                         (app.deviceMngr, app.config.getDiscoveryPrefix()),
+                         'App constructor failed to create the discovery '
+                         'publisher.')
+        app.discovery.registerTopics.assert_called_once_with(app.gateway)
+
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_metricsRuntime(self, mockedDevMngr, mockedConfig,
+                            mockedNetLoop, mockedTransmitter,
+                            mockedEndpoint, mockedGateway,
+                            mockedSceneMngr, mockedScheduler,
+                            mockedGroupMngr, mockedStatusPublisher,
+                            mockedDiscovery, mockedMetricsPublisher,
+                            mockedRegistry):
+        """
+        The constructor must add the component collectors to the metrics
+        registry and the metrics publisher must run while the app runs.
+        """
+        app = App()
+        self.assertEqual(mockedMetricsPublisher.call_args[0][2],
+                         app.config.getMetricsInterval(),
+                         'App constructor failed to create the metrics '
+                         'publisher with the configured interval.')
+        app.metricsPublisher.registerTopics.assert_called_once_with(
+            app.gateway)
+        self.assertEqual([call[0][0] for call
+                          in mockedRegistry.addCollector.call_args_list],
+                         [app.transmitter.collectMetrics,
+                          app.deviceMngr.collectMetrics,
+                          app.gateway.collectMetrics,
+                          app.scheduler.collectMetrics],
+                         'App constructor failed to add the component '
+                         'collectors to the metrics registry.')
+        mockedRegistry.addSource.assert_called_once_with(
+            app.deviceMngr.getShardMetrics)
+        app.run()
+        app.metricsPublisher.start.assert_called_once()
+        app.stop()
+        app.metricsPublisher.stop.assert_called_once()
+
+    @patch('app.tracer')
+    @patch('app.registry')
+    @patch('app.MetricsPublisher')
+    @patch('app.DiscoveryPublisher')
+    @patch('app.StatusPublisher')
+    @patch('app.GroupManager')
+    @patch('app.Scheduler')
+    @patch('app.SceneManager')
+    @patch('app.Gateway')
+    @patch('app.LocalEndpoint')
+    @patch('app.Transmitter')
+    @patch('app.NetworkLoop')
+    @patch('app.Config')
+    @patch('app.DeviceManager')
+    def test_traceExport(self, mockedDevMngr, mockedConfig,
+                         mockedNetLoop, mockedTransmitter,
+                         mockedEndpoint, mockedGateway,
+                         mockedSceneMngr, mockedScheduler,
+                         mockedGroupMngr, mockedStatusPublisher,
+                         mockedDiscovery, mockedMetricsPublisher,
+                         mockedRegistry, mockedTracer):
+        """
+        The constructor must set the trace export file from PIIR_TRACE_FILE
+        and the traces must be exported when the app stops.
+        """
+        with patch.dict(os.environ, {'PIIR_TRACE_FILE': '/tmp/traces.json'}):
+            app = App()
+        mockedTracer.setExportPath.assert_called_once_with(
+            '/tmp/traces.json')
+        mockedTracer.addSource.assert_called_once_with(
+            app.deviceMngr.getShardTraces)
+        mockedTracer.export.return_value = 2
+        app.stop()
+        mockedTracer.export.assert_called_once_with()
@@ -0,0 +1,111 @@
+import json
+import logging
+import logging.handlers
+import queue
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import os
+import sys
+sys.path.append(os.path.abspath('./src'))
+
+from logger import JsonFormatter, RateLimitFilter, forwardWorkerLogs, \
+    initLogger, initWorkerLogger, stopLogger                # noqa: E402
+
+
+class TestLogger(TestCase):
+    """
+    The logger test cases.
+    """
+    def _getRecord(self, level=logging.INFO, name='Device'):
+        return logging.LogRecord(name, level, __file__, 1, 'Message %s',
+                                 ('received',), None)
+
+    def test_jsonFormatter(self):
+        """
+        The JSON formatter must format a record as a JSON object.
+        """
+        record = self._getRecord()
+        record.suppressed = 3
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual((entry['level'], entry['logger'], entry['message'],
+                          entry['suppressed']),
+                         ('INFO', 'Device', 'Message received', 3),
+                         'JsonFormatter failed to format the record.')
+
+    def test_rateLimitFilter(self):
+        """
+        The rate limit filter must drop the records over the rate of their
+        logger, except the errors, and report the dropped records with the
+        next one let through.
+        """
+        rateFilter = RateLimitFilter(rate=0.001, burst=2)
+        results = [rateFilter.filter(self._getRecord()) for i in range(4)]
+        self.assertEqual(results, [True, True, False, False],
+                         'RateLimitFilter failed to limit the records.')
+        self.assertTrue(rateFilter.filter(self._getRecord(name='Gateway')),
+                        'RateLimitFilter failed to limit each logger '
+                        'separately.')
+        self.assertTrue(rateFilter.filter(self._getRecord(logging.ERROR)),
+                        'RateLimitFilter failed to let the errors through.')
+        rateFilter.buckets['Device'].tokens = 1
+        record = self._getRecord()
+        rateFilter.filter(record)
+        self.assertEqual(record.suppressed, 2,
+                         'RateLimitFilter failed to report the dropped '
+                         'records.')
+
+    def test_initLoggerQueue(self):
+        """
+        The initLogger function must install a single queue handler, until
+        the logger is stopped.
+        """
+        root = logging.getLogger()
+        stopLogger()
+        with patch.dict(os.environ, {'PIIR_LOG_FORMAT': 'text'}):
+            initLogger()
+            initLogger()
+        queueHandlers = [handler for handler in root.handlers
+                         if isinstance(handler,
+                                       logging.handlers.QueueHandler)]
+        self.assertEqual(len(queueHandlers), 1,
+                         'initLogger failed to install the queue handler '
+                         'once.')
+        stopLogger()
+        self.assertFalse(any(isinstance(handler,
+                                        logging.handlers.QueueHandler)
+                             for handler in root.handlers),
+                         'stopLogger failed to remove the queue handler.')
+
+    def test_workerLogs(self):
+        """
+        The worker records must be handed to the worker queue instead of the
+        inherited handlers, and forwarded to the loggers of the parent.
+        """
+        root = logging.getLogger()
+        inherited = Mock(spec=logging.Handler)
+        inherited.level = logging.NOTSET
+        handlers = root.handlers[:]
+        root.handlers = [inherited]
+        logQueue = queue.Queue()
+        try:
+            initWorkerLogger(logQueue)
+            logging.getLogger('Shard').warning('Message %s', 'sent')
+        finally:
+            root.handlers = handlers
+        inherited.handle.assert_not_called()
+        record = logQueue.get_nowait()
+        self.assertEqual(record.getMessage(), 'Message sent',
+                         'initWorkerLogger failed to queue the worker '
+                         'records.')
+        parentHandler = Mock(spec=logging.Handler)
+        parentHandler.level = logging.NOTSET
+        parentLogger = logging.getLogger('Shard')
+        parentLogger.addHandler(parentHandler)
+        listener = forwardWorkerLogs(logQueue)
+        try:
+            logQueue.put(record)
+        finally:
+            listener.stop()
+            parentLogger.removeHandler(parentHandler)
+        parentHandler.handle.assert_called_once_with(record)